@@ -0,0 +1,112 @@
+"""
+Benchmark loading the flat articles: Element based FlatArticleStore vs the array-backed
+FlatArticleArrayStore.
+
+Each store is loaded in a fresh process so the reported peak RSS is not shared.
+
+Usage:
+    PYTHONPATH=src python scripts/dev/benchmark_document_store.py -t data/wiki.txt -pp data/wiki
+    PYTHONPATH=src python scripts/dev/benchmark_document_store.py --synthetic 1000000
+"""
+import os
+import json
+import time
+import logging
+import argparse
+import resource
+import tempfile
+from uuid import uuid4
+from multiprocessing import get_context
+
+from xutils.byte_reader import ByteReader
+
+logger = logging.getLogger(__name__)
+
+STORES = ["element", "array", "array-cached"]
+
+
+def write_synthetic_flat_articles(path_prefix: str, count: int) -> None:
+    """Write a flat articles file with count articles (no text file is needed to load)."""
+    offset = 0
+    with open(f"{path_prefix}_flat_articles.json", "w", encoding="utf-8") as file:
+        for _ in range(count):
+            xdata = {
+                "class": "FlatArticle",
+                "uid": str(uuid4()),
+                "header_offset": offset,
+                "header_byte_length": 20,
+                "body_offset": offset + 20,
+                "body_byte_length": 2000,
+            }
+            file.write(json.dumps(xdata) + "\n")
+            offset += 2020
+
+
+def load_store(store_name: str, text_path: str, path_prefix: str) -> dict:
+    """Load the documents using the named store and report the elapsed time and peak RSS."""
+    byte_reader = ByteReader(text_path)
+    if store_name == "element":
+        from gen.element.flat.flat_article_store import FlatArticleStore
+        store = FlatArticleStore(path_prefix, byte_reader)
+    elif store_name == "array":
+        from gen.element.flat.flat_article_array_store import FlatArticleArrayStore
+        store = FlatArticleArrayStore(path_prefix, byte_reader, use_cache=False)
+    elif store_name == "array-cached":
+        from gen.element.flat.flat_article_array_store import FlatArticleArrayStore
+        store = FlatArticleArrayStore(path_prefix, byte_reader, use_cache=True)
+        # make sure the cache exists, it is not part of the timing
+        store.load_columns()
+    else:
+        raise ValueError(f"Unknown store: {store_name}")
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    documents = store.load_documents()
+    elapsed = time.perf_counter() - t0
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return {
+        "store": store_name,
+        "documents": len(documents),
+        "seconds": round(elapsed, 4),
+        "peak_rss_mb": round(rss_after / 1024, 1),
+        "rss_growth_mb": round((rss_after - rss_before) / 1024, 1),
+    }
+
+
+def run_in_process(store_name: str, text_path: str, path_prefix: str) -> dict:
+    """Run load_store in a fresh (spawned) process."""
+    with get_context("spawn").Pool(1) as pool:
+        return pool.apply(load_store, (store_name, text_path, path_prefix))
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if args.synthetic:
+            path_prefix = os.path.join(temp_dir, "synthetic")
+            write_synthetic_flat_articles(path_prefix, args.synthetic)
+            text_path = os.devnull
+        else:
+            path_prefix = args.path_prefix
+            text_path = args.text
+
+        for store_name in args.stores:
+            result = run_in_process(store_name, text_path, path_prefix)
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Benchmark loading the flat articles")
+    parser.add_argument("-t", "--text", type=str, help="Path to the text file")
+    parser.add_argument("-pp", "--path-prefix", type=str, help="Prefix of element files")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Generate a synthetic flat articles file with this many articles")
+    parser.add_argument("--stores", nargs="+", choices=STORES, default=STORES)
+    args = parser.parse_args()
+
+    if not args.synthetic and (args.text is None or args.path_prefix is None):
+        parser.error("Provide --text and --path-prefix, or --synthetic")
+
+    main(args)
@@ -0,0 +1,84 @@
+"""
+Benchmark the indexing, segmenting, embedding and search stages on synthetic corpora
+(see bench.pipeline_benchmark), writing the timings as JSON to compare across commits.
+
+Usage:
+    PYTHONPATH=src python scripts/dev/benchmark_pipeline.py -o /tmp/bench_base.json
+    git checkout my-branch
+    PYTHONPATH=src python scripts/dev/benchmark_pipeline.py -o /tmp/bench_head.json \
+        --compare /tmp/bench_base.json
+
+    # compare two existing results
+    PYTHONPATH=src python scripts/dev/benchmark_pipeline.py \
+        --compare /tmp/bench_base.json --head /tmp/bench_head.json
+"""
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+from bench.pipeline_benchmark import (
+    BenchmarkParams, run_benchmarks, compare_results, format_comparison,
+    load_results, write_results
+)
+
+
+def main(args):
+    if args.head:
+        head = load_results(args.head)
+    else:
+        params = BenchmarkParams(
+            articles=args.articles,
+            plots=args.plots,
+            seed=args.seed,
+            max_len=args.max_len,
+            dim=args.dim,
+            search_dim=args.search_dim,
+            stype=args.stype,
+            queries=args.queries,
+            repeat=args.repeat,
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            head = run_benchmarks(params, Path(temp_dir))
+        if args.output:
+            write_results(head, args.output)
+            print(f"Results written to {args.output}")
+
+    if args.compare:
+        base = load_results(args.compare)
+        print(format_comparison(compare_results(base, head, args.stat)))
+    else:
+        for name, stats in head["stages"].items():
+            print(f"{name:<28} {stats['median_s']:.6f}s")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic corpora")
+    parser.add_argument("-a", "--articles", type=int, default=1000,
+                        help="Synthetic wiki articles, 0 to skip the wiki corpus")
+    parser.add_argument("-p", "--plots", type=int, default=1000,
+                        help="Synthetic plots, 0 to skip the plots corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-m", "--max-len", type=int, default=512)
+    parser.add_argument("--dim", type=int, default=768, help="The fake encoder dimension")
+    parser.add_argument("--search-dim", type=int, default=None,
+                        help="Reduce the search embeddings to this dimension")
+    parser.add_argument("-s", "--stype", default="float32",
+                        choices=["float32", "float16", "int8", "uint8"],
+                        help="The search embeddings type")
+    parser.add_argument("-q", "--queries", type=int, default=20, help="Search queries to time")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Runs per stage")
+    parser.add_argument("-o", "--output", type=Path, help="Write the results JSON to this path")
+    parser.add_argument("--compare", type=Path, help="Compare with these (base) results")
+    parser.add_argument("--head", type=Path,
+                        help="Compare these results instead of running the benchmarks")
+    parser.add_argument("--stat", default="median_s", choices=["min_s", "median_s", "mean_s"],
+                        help="The stat to compare")
+    args = parser.parse_args()
+
+    if args.head and not args.compare:
+        parser.error("--head requires --compare")
+
+    main(args)
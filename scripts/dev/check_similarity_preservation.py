@@ -3,8 +3,13 @@
 Evaluates similarity preservation of the embeddings.
 """
 import sys
+import argparse
 import numpy as np
-from scipy.spatial.distance import cosine
+
+from gen.embedding_utils import EmbeddingUtils
+from search.recall_evaluator import (
+    Candidate, RecallEvaluator, make_candidates, format_rows, similarity_preservation
+)
 
 
 class CheckSimilarityPreservation:
@@ -30,33 +35,52 @@ class CheckSimilarityPreservation:
         Returns:
         - Similarity preservation score (0-1, higher is better)
         """
-        # Use the entire dataset if sample_size is not positive
-        if sample_size <= 0 or sample_size > len(orig_emb):
-            sample_size = len(orig_emb)
-
-        # Randomly sample indices
-        rng = np.random.default_rng(seed=42)
-        sample_indices = rng.choice(len(orig_emb), size=sample_size, replace=False)
+        # neighbors within the sample by blocked matrix products (see search.recall_evaluator)
+        return similarity_preservation(orig_emb, trans_emb, sample_size, top_k)
 
-        # Compute preservation for sampled embeddings
-        preservation_scores = []
+    @staticmethod
+    def compute_binary_recall(emb, sample_size=1000, top_k=10, shortlist_size=100):
+        """
+        Measure the recall of binary (Hamming distance) search against exact cosine search
 
-        for idx in sample_indices:
-            # Original nearest neighbors
-            orig_dists = [cosine(orig_emb[idx], orig_emb[j])
-                          for j in sample_indices if j != idx]
-            orig_top_k = np.argsort(orig_dists)[:top_k]
+        Args:
+        - emb: Embedding matrix
+        - top_k: Number of nearest neighbors to compare
+        - shortlist_size: Number of Hamming nearest neighbors that are reranked
 
-            # Transformed nearest neighbors
-            trans_dists = [cosine(trans_emb[idx], trans_emb[j])
-                           for j in sample_indices if j != idx]
-            trans_top_k = np.argsort(trans_dists)[:top_k]
+        Returns:
+        - (Hamming only recall, Hamming shortlist + rerank recall), 0-1, higher is better
+        """
+        # a shortlist of top_k is the Hamming top k, the rerank only orders it
+        evaluator = RecallEvaluator(emb, top_k)
+        hamming_row, rerank_row = evaluator.evaluate(
+            [Candidate(backend="binary", shortlist=top_k),
+             Candidate(backend="binary", shortlist=shortlist_size)],
+            sample_size=sample_size)
+        return hamming_row["recall"], rerank_row["recall"]
 
-            # Compute overlap
-            overlap = len(set(orig_top_k) & set(trans_top_k))
-            preservation_scores.append(overlap / top_k)
+    @staticmethod
+    def load_embeddings(file):
+        """
+        Load the embeddings of a store file, binary embeddings are unpacked to +-1 floats
+        """
+        emb = np.load(file)["embeddings"]
+        if "_binary_" in file:
+            emb = EmbeddingUtils.unpack_binary_embeddings(emb, emb.shape[1] * 8)
+        return emb
 
-        return np.mean(preservation_scores)
+    def compare_binary_recall(self, files, shortlist_sizes):
+        """
+        Compare binary search recall, by shortlist size, of embeddings files
+        """
+        for file in files:
+            print("File:", file)
+            emb = self.load_embeddings(file)
+            for shortlist_size in shortlist_sizes:
+                hamming_recall, rerank_recall = self.compute_binary_recall(
+                    emb, self.sample_size, self.top_k, shortlist_size)
+                print(f"\tShortlist: {shortlist_size}"
+                      f" Hamming Recall: {hamming_recall:.3f} Rerank Recall: {rerank_recall:.3f}")
 
     def compare_embeddings(self, orig_files, trans_files):
         """
@@ -64,7 +88,7 @@ class CheckSimilarityPreservation:
         """
         for orig_file in orig_files:
             print("Original File:", orig_file)
-            orig_emb = np.load(orig_file)["embeddings"]
+            orig_emb = self.load_embeddings(orig_file)
 
             for trans_file in trans_files:
                 if orig_file == trans_file:
@@ -73,7 +97,7 @@ class CheckSimilarityPreservation:
 
                 print("\tTransformed File:", trans_file)
 
-                trans_emb = np.load(trans_file)["embeddings"]
+                trans_emb = self.load_embeddings(trans_file)
 
                 similarity = self.similarity_preservation(orig_emb, trans_emb)
                 print(f"\tPreservation Score: {similarity:.3f}")
@@ -121,6 +145,10 @@ def compare_embeddings_params(comparer):
         [max_len, 512, "uint8"],
         [max_len, 256, "uint8"],
         [max_len, 128, "uint8"],
+        [max_len, 768, "binary"],
+        [max_len, 512, "binary"],
+        [max_len, 256, "binary"],
+        [max_len, 128, "binary"],
     ]
 
     original_files = [embed_store_path("data/train", *params) for params in originals]
@@ -128,6 +156,44 @@ def compare_embeddings_params(comparer):
     comparer.compare_embeddings(original_files, transformed_files)
 
 
+def evaluate_candidates(argv):
+    """
+    Evaluate the recall of search configurations (dim x stype x backend) against exact
+    float32 search of a store's embeddings, on a query set or a sample of the rows.
+    """
+    parser = argparse.ArgumentParser(prog="check_similarity_preservation.py evaluate")
+    parser.add_argument("file", help="The float32 embeddings store file")
+    parser.add_argument("--queries",
+                        help="Query embeddings (.npy, .npz) or queries to encode (.txt)")
+    parser.add_argument("--dims", type=int, nargs="+", default=[None])
+    parser.add_argument("--stypes", nargs="+", default=["float32", "float16", "int8", "uint8"],
+                        choices=["float32", "float16", "int8", "uint8"])
+    parser.add_argument("--backends", nargs="+", default=["exact", "binary", "cascade"],
+                        choices=["exact", "binary", "cascade"])
+    parser.add_argument("--shortlists", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--cascade-dims", type=int, nargs="+", default=[128])
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--sample", type=int, default=1000,
+                        help="Corpus rows to use as queries without --queries, 0 for all")
+    args = parser.parse_args(argv)
+
+    queries = None
+    if args.queries and args.queries.endswith(".txt"):
+        from gen.encoder import Encoder
+        with open(args.queries, encoding="utf-8") as file:
+            texts = [line.strip() for line in file if line.strip()]
+        queries = Encoder(batch_size=32).encode(texts)
+    elif args.queries:
+        queries = np.load(args.queries)
+        if not isinstance(queries, np.ndarray):
+            queries = queries["embeddings"]
+
+    evaluator = RecallEvaluator(CheckSimilarityPreservation.load_embeddings(args.file), args.k)
+    candidates = make_candidates(args.dims, args.stypes, args.backends,
+                                 args.shortlists, args.cascade_dims)
+    print(format_rows(evaluator.evaluate(candidates, queries, args.sample)))
+
+
 def embed_store_path(prefix, max_len, dim, stype):
     """
     Generate a path based on the template and parameters
@@ -145,8 +211,15 @@ if __name__ == "__main__":
         compare_embedding_techniques(comparer)
     elif len(sys.argv) == 2 and sys.argv[1] == "params":
         compare_embeddings_params(comparer)
+    elif len(sys.argv) >= 3 and sys.argv[1] == "evaluate":
+        evaluate_candidates(sys.argv[2:])
+    elif len(sys.argv) >= 3 and sys.argv[1] == "binary":
+        shortlist_sizes = [int(size) for size in sys.argv[3:]] or [10, 50, 100, 500]
+        comparer.compare_binary_recall([sys.argv[2]], shortlist_sizes)
     elif len(sys.argv) != 3:
         print("Usage: python check_similarity_preservation.py <original_file> <transformed_file>")
+        print("       python check_similarity_preservation.py binary <file> [shortlist_size...]")
+        print("       python check_similarity_preservation.py evaluate <file> [options...]")
         sys.exit(1)
     else:
         orig_file = sys.argv[1]
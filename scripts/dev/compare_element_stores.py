@@ -0,0 +1,66 @@
+"""
+Compare the load times of the JSON and binary element stores of an element file.
+
+Converts the JSON element file to the binary (npz) format, unless it exists, loads both
+repeat times in fresh registries and prints the best times and the file sizes.
+
+Usage:
+    PYTHONPATH=src python scripts/dev/compare_element_stores.py \
+        -t data/wiki.txt -e data/wiki_elements.json -r 3
+"""
+import gc
+import time
+import logging
+import argparse
+from pathlib import Path
+
+from gen.element.store import Store
+from gen.element.element import Element
+from gen.element.binary_store import BinaryStore
+
+
+def time_load(store, text_path: Path, element_path: Path, repeat: int) -> float:
+    """The best of repeat load times, each in a new registry."""
+    best = float("inf")
+    for _ in range(repeat):
+        with Element.use_registry():
+            gc.collect()
+            start = time.perf_counter()
+            store.load_elements(text_path, element_path)
+            best = min(best, time.perf_counter() - start)
+        gc.collect()
+    return best
+
+
+def main(args):
+    binary_path = args.binary or args.elements.with_suffix(".npz")
+    if not binary_path.exists():
+        with Element.use_registry() as registry:
+            Store().load_elements(args.text, args.elements)
+            start = time.perf_counter()
+            BinaryStore().store_elements(binary_path, list(registry.values()))
+        print(f"Converted to {binary_path} in {time.perf_counter() - start:.2f}s")
+
+    json_seconds = time_load(Store(), args.text, args.elements, args.repeat)
+    binary_seconds = time_load(BinaryStore(), args.text, binary_path, args.repeat)
+
+    for name, path, seconds in (("json", args.elements, json_seconds),
+                                ("binary", binary_path, binary_seconds)):
+        size = path.stat().st_size / 2 ** 20
+        print(f"{name:<8} {seconds:8.2f}s {size:10.1f} MB")
+    print(f"speedup  {json_seconds / binary_seconds:8.2f}x")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+
+    parser = argparse.ArgumentParser(description="Compare JSON and binary element store loads")
+    parser.add_argument("-t", "--text", type=Path, required=True, help="The text file")
+    parser.add_argument("-e", "--elements", type=Path, required=True,
+                        help="The JSON element file")
+    parser.add_argument("-b", "--binary", type=Path,
+                        help="The binary element file, next to the JSON file by default")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Loads per format")
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,131 @@
+"""
+Check the ONNX Runtime encoder backends against the torch (SentenceTransformer) model and
+compare their query encoding latency.
+
+Parity: cosine similarity between the torch and the onnx embedding of each query.
+Latency: single query encode (batch of 1, as in KNearestFinder.encode_query), after warm-up.
+
+Usage:
+    PYTHONPATH=src python scripts/dev/onnx_encoder_parity.py
+    PYTHONPATH=src python scripts/dev/onnx_encoder_parity.py -r big -c big-onnx big-onnx-int8 \
+        -q queries.txt --min-cosine 0.98
+"""
+import sys
+import time
+import json
+import logging
+import argparse
+from typing import List
+import numpy as np
+
+from gen.encoder import Encoder, encoder_configs
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUERIES = [
+    "a guy meets his high school sweetheart many years after graduation",
+    "the history of the roman empire in the third century",
+    "which river flows through the capital of hungary",
+    "a detective investigates a murder in a small coastal town",
+    "symptoms and treatment of vitamin d deficiency",
+    "an orphan discovers she has magical powers",
+    "the discovery of penicillin",
+    "a heist goes wrong and the crew turns on each other",
+]
+
+
+def read_queries(path: str) -> List[str]:
+    """Read one query per line."""
+    with open(path, "r", encoding="utf-8") as file:
+        queries = [line.strip() for line in file if line.strip()]
+    return queries
+
+
+def cosine_similarities(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Row-wise cosine similarity."""
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return np.sum(a * b, axis=1)
+
+
+def measure_latency(encoder: Encoder, queries: List[str], warmup: int, repeat: int) -> dict:
+    """Encode one query at a time and report latency percentiles in milliseconds."""
+    for query in queries[:warmup]:
+        encoder.encode([query])
+
+    durations = []
+    for _ in range(repeat):
+        for query in queries:
+            t0 = time.perf_counter()
+            encoder.encode([query])
+            durations.append(time.perf_counter() - t0)
+
+    durations_ms = np.array(durations) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(durations_ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(durations_ms, 95)), 2),
+        "mean_ms": round(float(durations_ms.mean()), 2),
+    }
+
+
+def main(args) -> int:
+    queries = read_queries(args.queries) if args.queries else DEFAULT_QUERIES
+    queries = [f"search_query: {query}" for query in queries]
+
+    t0 = time.perf_counter()
+    reference_encoder = Encoder(1, args.reference)
+    reference_embeddings = reference_encoder.encode(queries)
+    logger.info("reference %s loaded and encoded in %.2fs", args.reference,
+                time.perf_counter() - t0)
+
+    results = [{
+        "config": args.reference,
+        **measure_latency(reference_encoder, queries, args.warmup, args.repeat)
+    }]
+
+    ok = True
+    for config_id in args.configs:
+        t0 = time.perf_counter()
+        encoder = Encoder(1, config_id)
+        embeddings = encoder.encode(queries)
+        load_seconds = time.perf_counter() - t0
+
+        similarities = cosine_similarities(reference_embeddings, embeddings)
+        min_cosine = float(similarities.min())
+        ok = ok and min_cosine >= args.min_cosine
+
+        results.append({
+            "config": config_id,
+            "load_and_first_encode_s": round(load_seconds, 2),
+            "min_cosine": round(min_cosine, 5),
+            "mean_cosine": round(float(similarities.mean()), 5),
+            **measure_latency(encoder, queries, args.warmup, args.repeat)
+        })
+
+    for result in results:
+        print(json.dumps(result))
+
+    if not ok:
+        print(f"FAILED: cosine similarity below {args.min_cosine}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    onnx_configs = [config_id for config_id, config in encoder_configs.items()
+                    if config.get("backend") == "onnx"]
+
+    parser = argparse.ArgumentParser(description="ONNX encoder parity and latency check")
+    parser.add_argument("-r", "--reference", type=str, default="big",
+                        help="The torch encoder config to compare against")
+    parser.add_argument("-c", "--configs", nargs="+", default=["big-onnx", "big-onnx-int8"],
+                        choices=onnx_configs, help="The onnx encoder configs to check")
+    parser.add_argument("-q", "--queries", type=str, help="A file with one query per line")
+    parser.add_argument("--min-cosine", type=float, default=0.98,
+                        help="Fail if any query's cosine similarity is below this value")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    sys.exit(main(args))
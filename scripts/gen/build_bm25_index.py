@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""
+Build the BM25 index of the app's segments offline, streaming over the text file.
+The text file and the segment records are read from the app config
+(CONFIG_FILE, default: config.ini), the app loads the index when SEARCH-APP lexical-mode
+is set.
+"""
+import time
+import logging
+import argparse
+from gen.bm25_index import BM25Index, BM25IndexBuilder
+from gen.data.segment_record_store import SegmentRecordStore
+from xutils.byte_reader import create_byte_reader
+from xutils.load_config import load_app_config
+from xutils.app_config import AppConfig
+
+logger = logging.getLogger(__name__)
+
+
+def build_bm25_index(app_config: AppConfig, run_postings: int, force: bool) -> None:
+    """Build and save the BM25 index of the segments of the app config."""
+    embed_config = app_config.embed_config
+    path = BM25Index.get_path(embed_config.prefix, embed_config.max_len)
+    if path.exists() and not force:
+        logger.info("BM25 index exists: %s (use -f to rebuild)", path)
+        return
+
+    segment_record_store = SegmentRecordStore(embed_config.prefix, embed_config.max_len)
+    segment_records = segment_record_store.load_segment_records()
+    byte_reader = create_byte_reader(app_config.text_file_path)
+
+    start = time.perf_counter()
+    builder = BM25IndexBuilder(run_postings=run_postings)
+    index = builder.build_from_records(byte_reader, segment_records)
+    index.save(path)
+    logger.info("BM25 index %s: %d segments, %d terms, %.1f MB postings in %.1fs",
+                path, len(index), len(index.term_ids), index.postings.nbytes / 2 ** 20,
+                time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(
+        description='Build the BM25 index of the app segments',
+        epilog='''Example usage:
+  CONFIG_FILE=config.ini python build_bm25_index.py''',
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('-f', '--force', action='store_true', help='Force rebuild')
+    parser.add_argument('-r', '--run-postings', type=int, default=5_000_000,
+                        help='Postings buffered in memory before spilling a sorted run')
+    parser.add_argument('--debug', action='store_true', default=False,
+                        help='Enable debug logging')
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    app_config = load_app_config(logger)
+
+    build_bm25_index(app_config, args.run_postings, args.force)
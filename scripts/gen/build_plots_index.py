@@ -47,11 +47,19 @@ def list_long_and_short_plots(plots_df: pd.DataFrame):
 
 def main(args):
     plots_dir = args.plots_dir
-    builder: IndexBuilderPlots = IndexBuilderPlots(plots_dir)
+    plot_store = PlotStore(plots_dir)
 
-    plot_record_list = builder.build_index()
+    # in append mode, index the plots appended since the last build
+    indexed_plot_records = plot_store.load_plot_record_list() if args.append else []
+    start_offset = IndexBuilderPlots.get_end_offset(indexed_plot_records)
+    start_index = len(indexed_plot_records)
+    if args.append:
+        logger.info(f"Append mode: {start_index} indexed plots, indexing from {start_offset}")
 
-    plot_store = PlotStore(plots_dir)
+    builder: IndexBuilderPlots = IndexBuilderPlots(plots_dir, start_offset, start_index)
+
+    new_plot_records = builder.build_index()
+    plot_record_list = indexed_plot_records + new_plot_records
 
     plots_df = plot_store.build_plots_dataframe(plot_record_list)
     if logger.isEnabledFor(logging.DEBUG):
@@ -61,7 +69,7 @@ def main(args):
     if args.debug:
         list_long_and_short_plots(plots_df)
 
-    print(f"Done. {len(plot_record_list)} plots")
+    print(f"Done. {len(plot_record_list)} plots ({len(new_plot_records)} new)")
 
 
 if __name__ == "__main__":
@@ -70,6 +78,8 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     # parser.add_argument("-pd", "--plots-dir", type=str, required=True)
     parser.add_argument("-pd", "--plots-dir", type=str, default="ignore/plots")
+    parser.add_argument("-a", "--append", action="store_true",
+                        help="Index only the plots appended since the last build")
     parser.add_argument("-d", "--debug", action="store_true")
     args = parser.parse_args()
 
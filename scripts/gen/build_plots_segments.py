@@ -36,6 +36,9 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("-m", "--max-len", type=int, required=True)
     parser.add_argument("--dump-segments", default=False, action="store_true",
                         help="Dump segment bytes to a json file to be used by verify_segments.py")
+    parser.add_argument("-a", "--append", default=False, action="store_true",
+                        help="Segment only the plots appended since the last build, "
+                        "continuing the segment and document indexes")
     parser.add_argument("--debug", default=False, action="store_true")
     args = parser.parse_args()
 
@@ -56,13 +59,21 @@ def main():
     text_file_path = args.plots_dir / "plots"
     text_byte_reader = ByteReader(text_file_path)
 
+    max_len = args.max_len
+    segment_record_store = SegmentRecordStore(args.plots_dir / "plots", max_len)
+
+    base_segment_index, base_document_index = 0, 0
+    if args.append:
+        base_segment_index, base_document_index = segment_record_store.get_next_indexes()
+
     plot_store = PlotStore(args.plots_dir)
-    plot_record_list = plot_store.load_plot_record_list()
+    plot_record_list = plot_store.load_plot_record_list()[base_document_index:]
+    if not plot_record_list:
+        print("Done. No new plots to segment")
+        return
 
-    max_len = args.max_len
     plot_sentences_generator = get_plot_sentences_generator(plot_record_list, text_byte_reader)
     document_offsets = [plot_record.offset for plot_record in plot_record_list]
-    segment_record_store = SegmentRecordStore(args.plots_dir / "plots", max_len)
     segment_dump_path = args.plots_dir / f"segments_{max_len}.json" if args.dump_segments else None
     plot_count = len(plot_record_list)
 
@@ -73,7 +84,10 @@ def main():
         segment_record_store,
         text_byte_reader,
         segment_dump_path,
-        plot_count
+        plot_count,
+        base_segment_index=base_segment_index,
+        base_document_index=base_document_index,
+        append=args.append
     )
 
 
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+Build the search-ready (morphed) matrix of the app's embedding store offline,
+so the app does not morph the embeddings on its first query.
+The embedding config is read from the app config (CONFIG_FILE, default: config.ini),
+the app loads the matrix when SEARCH-APP persist-search-matrix is set.
+With an article pooling, the matrix of the pooled segment embeddings of each article is
+built too (SEARCH-APP article-pooling).
+"""
+import logging
+import argparse
+import numpy as np
+from gen.embedding_store import EmbeddingStore, StoreMode
+from gen.embedding_utils import EmbeddingUtils
+from gen.search_matrix_store import SearchMatrixStore
+from gen.data.segment_record_store import SegmentRecordStore
+from search.k_nearest_finder import KNearestFinder
+from xutils.load_config import load_app_config
+from xutils.embedding_config import EmbeddingConfig
+
+logger = logging.getLogger(__name__)
+
+
+def build_search_matrix(embed_config: EmbeddingConfig, force: bool) -> None:
+    """Morph the embeddings of the store and save the search matrix."""
+    embedding_store = EmbeddingStore(embed_config, mode=StoreMode.READ, allow_empty=False)
+    search_matrix_store = SearchMatrixStore(embed_config, embedding_store.path)
+
+    _, embeddings = embedding_store.load_embeddings()
+
+    if not force and search_matrix_store.load(len(embeddings)) is not None:
+        logger.info("Search matrix is up to date: %s (use -f to rebuild)",
+                    search_matrix_store.get_path())
+        return
+
+    matrix = EmbeddingUtils.morph_embeddings(embeddings, embed_config)
+    search_matrix_store.save(matrix)
+
+
+def build_article_matrix(embed_config: EmbeddingConfig, pooling: str, force: bool) -> None:
+    """Pool the embeddings of the segments of each article and save the article matrix."""
+    embedding_store = EmbeddingStore(embed_config, mode=StoreMode.READ, allow_empty=False)
+    article_matrix_store = SearchMatrixStore(
+        embed_config, embedding_store.path, kind=f"articles_{pooling}")
+    segment_record_store = SegmentRecordStore(embed_config.prefix, embed_config.max_len)
+
+    uids, embeddings = embedding_store.load_embeddings()
+    segment_records = segment_record_store.load_segment_records()
+    document_indexes = np.array([record.document_index for record in segment_records],
+                                dtype=np.int64)[:len(uids)]
+    article_count = len(np.unique(document_indexes))
+
+    if not force and article_matrix_store.load(article_count) is not None:
+        logger.info("Article matrix is up to date: %s (use -f to rebuild)",
+                    article_matrix_store.get_path())
+        return
+
+    matrix = KNearestFinder.morph_article_embeddings(
+        embeddings, document_indexes, embed_config, pooling)
+    article_matrix_store.save(matrix)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(
+        description='Build the search matrix of the app embedding store',
+        epilog='''Example usage:
+  CONFIG_FILE=config.ini python build_search_matrix.py''',
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('-f', '--force', action='store_true', help='Force rebuild')
+    parser.add_argument('-a', '--article-pooling', choices=['mean', 'max'],
+                        help='Also build the article matrix, by default of the app config')
+    parser.add_argument('--debug', action='store_true', default=False,
+                        help='Enable debug logging')
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    app_config = load_app_config(logger)
+
+    build_search_matrix(app_config.embed_config, args.force)
+
+    article_pooling = args.article_pooling or app_config.article_pooling
+    if article_pooling is not None:
+        build_article_matrix(app_config.embed_config, article_pooling, args.force)
@@ -4,40 +4,62 @@ import argparse
 from pathlib import Path
 from typing import List
 
-from gen.element.store import Store
 from gen.element.element import Element
 from gen.element.article import Article
+from gen.element.binary_store import create_element_store
 from gen.element_validator import ElementValidator
 from gen.index_builder_wiki import IndexBuilderWiki
 from gen.element.flat.flat_article import FlatArticle
 from gen.element.flat.flat_article_store import FlatArticleStore
+from gen.element.flat.flat_article_array_store import FlatArticleArrayStore
 
 
 logger = logging.getLogger(__name__)
 
 
+def get_start_offset(args) -> int:
+    """In append mode, index from the end of the already indexed articles."""
+    if not args.append:
+        return 0
+    columns = FlatArticleArrayStore(args.path_prefix).load_columns()
+    start_offset = columns.end_offset
+    logger.info(f"Append mode: {len(columns)} indexed articles, indexing from {start_offset}")
+    return start_offset
+
+
 def main(args):
-    builder: IndexBuilderWiki = IndexBuilderWiki(args)
+    start_offset = get_start_offset(args)
+    if start_offset >= Path(args.text).stat().st_size:
+        print("Done. No appended text to index")
+        return
+
+    # register this build's elements apart from the process-wide registry
+    with Element.use_registry() as registry:
+        builder: IndexBuilderWiki = IndexBuilderWiki(args, start_offset)
 
-    validator: ElementValidator = ElementValidator(args)
-    validator.validate_elements(Element.instances.values())
+        validator: ElementValidator = ElementValidator(args)
+        validator.validate_elements(registry.values())
 
-    builder.build_index()
+        builder.build_index()
 
-    article_count = len(builder.articles)
-    paragraph_count = sum(article.paragraph_count for article in builder.articles)
-    print(f"Done. {article_count} articles, {paragraph_count} paragraphs")
+        article_count = len(builder.articles)
+        paragraph_count = sum(article.paragraph_count for article in builder.articles)
+        print(f"Done. {article_count} articles, {paragraph_count} paragraphs")
 
-    element_file_path = Path(args.path_prefix + "_elements.json")
-    element_store = Store()
-    element_store.store_elements(element_file_path, Element.instances.values())
+        suffix = ".npz" if args.element_format == "binary" else ".json"
+        element_file_path = Path(args.path_prefix + "_elements" + suffix)
+        element_store = create_element_store(element_file_path)
+        element_store.store_elements(element_file_path, registry.values(), args.append)
 
-    flat_article_list: List[FlatArticle] = \
-        [article.to_flat_article() for article in Element.instances.values()
-         if isinstance(article, Article)]
+        flat_article_list: List[FlatArticle] = \
+            [article.to_flat_article() for article in registry.values()
+             if isinstance(article, Article)]
 
     flat_article_write_store = FlatArticleStore(args.path_prefix, None)
-    flat_article_write_store.write_flat_articles(flat_article_list)
+    if args.append:
+        flat_article_write_store.append_flat_articles(flat_article_list)
+    else:
+        flat_article_write_store.write_flat_articles(flat_article_list)
 
 
 if __name__ == '__main__':
@@ -48,6 +70,11 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Show random paragraphs from a JSON file.")
     parser.add_argument("-t", "--text", type=str, help="Path to the text file")
     parser.add_argument("-pp", "--path-prefix", type=str, help="Prefix of element files")
+    parser.add_argument("-a", "--append", default=False, action="store_true",
+                        help="Index only the articles appended to the text file since the last "
+                        "build and append them to the element files")
+    parser.add_argument("-f", "--element-format", default="json", choices=["json", "binary"],
+                        help="The element store format, binary loads faster, json is readable")
     parser.add_argument("-d", "--debug", default=False, action="store_true", help="Debug mode")
     args = parser.parse_args()
 
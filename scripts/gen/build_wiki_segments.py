@@ -3,20 +3,18 @@ Build segments for the wiki text 103 flat article data set.
 """
 import logging
 import argparse
-from typing import List
 from pathlib import Path
 
 from xutils.byte_reader import ByteReader
-from gen.element.flat.flat_article import FlatArticle
 from gen.data.segment_record_store import SegmentRecordStore
-from gen.element.flat.flat_article_store import FlatArticleStore
+from gen.element.flat.flat_article_array_store import FlatArticleArrayStore, FlatArticleArray
 from xutils.sentence_utils import SentenceUtils
 from gen.segment_orchestrator import SegmentOrchestrator
 
 
-def read_flat_articles(text_file_path: Path, path_prefix: str) -> List[FlatArticle]:
+def read_flat_articles(text_file_path: Path, path_prefix: str) -> FlatArticleArray:
     text_byte_reader = ByteReader(text_file_path)
-    flat_article_store = FlatArticleStore(path_prefix, text_byte_reader)
+    flat_article_store = FlatArticleArrayStore(path_prefix, text_byte_reader)
     flat_articles = flat_article_store.load_flat_articles()
     return flat_articles
 
@@ -35,6 +33,9 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("-m", "--max-len", type=int, required=True)
     parser.add_argument("--dump-segments", default=False, action="store_true",
                         help="Dump segment bytes to a json file to be used by verify_segments.py")
+    parser.add_argument("-a", "--append", default=False, action="store_true",
+                        help="Segment only the articles appended since the last build, "
+                        "continuing the segment and document indexes")
     parser.add_argument("-d", "--debug", default=False, action="store_true")
     args = parser.parse_args()
 
@@ -61,13 +62,22 @@ def main():
 
     text_file_path = args.text
     path_prefix = args.path_prefix
-    articles = read_flat_articles(text_file_path, path_prefix)
+    max_len = args.max_len
+    segment_record_store = SegmentRecordStore(args.path_prefix, max_len)
+
+    base_segment_index, base_document_index = 0, 0
+    if args.append:
+        base_segment_index, base_document_index = segment_record_store.get_next_indexes()
+
+    all_articles = read_flat_articles(text_file_path, path_prefix)
+    articles = [all_articles[i] for i in range(base_document_index, len(all_articles))]
+    if not articles:
+        print("Done. No new articles to segment")
+        return
     sentences_generator = get_article_sentences_generator(articles)
 
-    max_len = args.max_len
     text_byte_reader = ByteReader(text_file_path)
     document_offsets = [document.offset for document in articles]
-    segment_record_store = SegmentRecordStore(args.path_prefix, max_len)
     if args.dump_segments:
         segment_dump_path = f"{args.path_prefix}_{max_len}_segments_dump.json"
     else:
@@ -81,7 +91,10 @@ def main():
         segment_record_store,
         text_byte_reader,
         segment_dump_path,
-        document_count
+        document_count,
+        base_segment_index=base_segment_index,
+        base_document_index=base_document_index,
+        append=args.append
     )
 
 
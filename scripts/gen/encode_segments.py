@@ -17,8 +17,11 @@ from gen.element.element import Element
 from gen.data.segment_record_store import SegmentRecordStore
 from gen.element.extended_segment import ExtendedSegment
 from gen.element.flat.flat_extended_segment import FlatExtendedSegment
-from xutils.byte_reader import ByteReader
+from xutils.byte_reader import create_byte_reader
 from gen.data.segment_record import SegmentRecord
+from gen.segment_encode_pipeline import SegmentEncodePipeline
+from gen.encode_work_queue import Lease, LeaseQueue, EmbeddingShardStore
+from gen.embedding_reuse_cache import EmbeddingReuseCache
 
 __import__("gen.element.article")
 __import__("gen.element.extended_segment")
@@ -39,14 +42,26 @@ class SegmentEncoder:
         self.stop_file_path = Path(self.config.prefix + ".stop")
 
         incremental = self.args.incremental
-        mode = StoreMode.INCREMENTAL if incremental else StoreMode.WRITE
+        if self.args.role == "worker":
+            # workers write shards, only the coordinator writes the store
+            mode = StoreMode.READ
+        else:
+            mode = StoreMode.INCREMENTAL if incremental else StoreMode.WRITE
         embedding_store_class = EmbeddingStore if self.args.records else UUIDEmbeddingStore
         self.embedding_store = embedding_store_class(
             embedding_config=self.config,
             mode=mode,
             allow_empty=True
         )
-        self.byte_reader = ByteReader(args.text)
+        self.byte_reader = create_byte_reader(args.text)
+
+        self.reuse_cache = None
+        if args.reuse_cache:
+            self.reuse_cache = EmbeddingReuseCache(
+                Path(args.reuse_cache),
+                self.encoder.model_key,
+                args.max_len
+            )
 
     @property
     def extended_segments(self):
@@ -150,11 +165,9 @@ class SegmentEncoder:
         return batch_text
 
     def get_batch_text_from_records(self, segment_records: List[SegmentRecord]) -> List[str]:
-        batch_text = []
-        for record in segment_records:
-            _bytes = self.byte_reader.read_bytes(record.offset, record.length)
-            text = _bytes.decode("utf-8")
-            batch_text.append(text)
+        ranges = [(record.offset, record.length) for record in segment_records]
+        views = self.byte_reader.read_many(ranges)
+        batch_text = [str(view, "utf-8") for view in views]
         return batch_text
 
     def get_batch_uids(self, segments: List[Union[ExtendedSegment, SegmentRecord]]) -> List[UUID]:
@@ -200,7 +213,163 @@ class SegmentEncoder:
         if uids_buffer:
             self.persist_embeddings(uids_buffer, embedding_buffer)
 
+    def encode_segments_pipelined(self):
+        """
+        Encode segment records with length bucketing, token budget batches and a text
+        prefetching thread. Embeddings are persisted, in segment order, every buffer_length
+        segments.
+        """
+        if not self.args.records:
+            raise ValueError("pipelined mode requires segment records (--records)")
+
+        segments = self.segments_to_encode
+        if not segments:
+            logger.info("No segments to encode")
+            return
+
+        pipeline = SegmentEncodePipeline(
+            self.byte_reader,
+            self.encode_search_sentences,
+            token_budget=self.args.token_budget,
+            max_batch_size=self.args.batch_size,
+            prefetch_batches=self.args.prefetch_batches,
+        )
+
+        buffer_length = self.args.buffer_length
+        total_windows = (len(segments) + buffer_length - 1) // buffer_length
+        windows = pipeline.encode_windows(segments, window_size=buffer_length)
+        try:
+            for window_index, (window, embeddings) in enumerate(windows):
+                uids = self.get_batch_uids(window)
+                self.persist_embeddings(uids, embeddings)
+                logger.info(f"Persisted window {window_index + 1} / {total_windows}")
+
+                if self.stop_file_path.exists():
+                    logger.info("Stop file found, stopping")
+                    break
+        finally:
+            windows.close()
+
+    @property
+    def work_queue(self) -> LeaseQueue:
+        return LeaseQueue(Path(self.args.work_queue))
+
+    @property
+    def shard_store(self) -> EmbeddingShardStore:
+        return EmbeddingShardStore(Path(self.args.work_queue).with_suffix(".shards"))
+
+    def encode_coordinator(self):
+        """
+        Put the pending segment ranges in the work queue, wait for the workers to encode
+        them and merge their shards, in segment order, into the embedding store.
+        """
+        if not self.args.records:
+            raise ValueError("coordinator mode requires segment records (--records)")
+
+        work_queue = self.work_queue
+        segments = self.segments_to_encode
+        if segments:
+            start = segments[0].segment_index
+            work_queue.initialize(start, start + len(segments), self.args.range_size)
+        elif not work_queue.exists():
+            logger.info("No segments to encode")
+            return
+
+        while not work_queue.is_done():
+            logger.info("work queue status: %s", work_queue.status())
+            if self.stop_file_path.exists():
+                logger.info("Stop file found, stopping (the queue is kept)")
+                return
+            time.sleep(self.args.poll_seconds)
+
+        ranges = work_queue.ranges()
+        shard_store = self.shard_store
+        count = shard_store.merge(ranges, self.embedding_store)
+        logger.info(f"Merged {count} embeddings from {len(ranges)} shards")
+        shard_store.remove_shards(ranges)
+        work_queue.remove()
+
+    def encode_worker(self):
+        """
+        Lease segment ranges from the work queue, encode them and write a shard per range,
+        until the queue is done.
+        """
+        if not self.args.records:
+            raise ValueError("worker mode requires segment records (--records)")
+
+        work_queue = self.work_queue
+        shard_store = self.shard_store
+        worker_id = self.args.worker_id or LeaseQueue.default_worker_id()
+        if not work_queue.exists():
+            raise ValueError(f"work queue {work_queue.path} not found, start the coordinator first")
+        # ranges are segment indexes, index into all the records
+        segments = self.read_segment_records(self.args.records)
+
+        while not self.stop_file_path.exists():
+            if not work_queue.exists():
+                logger.info("work queue merged and removed")
+                break
+            lease = work_queue.acquire(worker_id, self.args.lease_seconds)
+            if lease is None:
+                if work_queue.is_done():
+                    logger.info("work queue done")
+                    break
+                # the remaining ranges are leased, one may expire
+                time.sleep(self.args.poll_seconds)
+                continue
+
+            logger.info(f"{worker_id}: leased [{lease.start}, {lease.stop})")
+            embeddings = self.encode_lease(work_queue, lease, segments[lease.start:lease.stop])
+            if embeddings is None:
+                continue
+            uids = self.get_batch_uids(segments[lease.start:lease.stop])
+            shard_store.write_shard(lease.start, lease.stop, np.array(uids), embeddings)
+            work_queue.complete(lease)
+            self.flush_reuse_cache()
+
+    def encode_lease(
+        self,
+        work_queue: LeaseQueue,
+        lease: Lease,
+        segments: List[SegmentRecord]
+    ) -> Union[NDArray, None]:
+        """
+        Encode the segments of a lease, renewing the lease after each batch.
+        Returns None if the lease was lost.
+        """
+        if self.args.pipelined:
+            pipeline = SegmentEncodePipeline(
+                self.byte_reader,
+                self.encode_search_sentences,
+                token_budget=self.args.token_budget,
+                max_batch_size=self.args.batch_size,
+                prefetch_batches=self.args.prefetch_batches,
+            )
+            chunks = (embeddings for _, embeddings in
+                      pipeline.encode_windows(segments, window_size=self.args.buffer_length))
+        else:
+            batch_size = self.args.batch_size
+            chunks = (self.encode_search_sentences(self.get_batch_text(segments[i:i + batch_size]))
+                      for i in range(0, len(segments), batch_size))
+
+        embeddings_list = []
+        try:
+            for embeddings in chunks:
+                embeddings_list.append(np.asarray(embeddings))
+                if not work_queue.renew(lease, self.args.lease_seconds):
+                    return None
+        finally:
+            chunks.close()
+
+        return np.concatenate(embeddings_list)
+
     def encode_search_sentences(self, sentences: List[str]) -> NDArray:
+        if self.reuse_cache is None:
+            return self._encode_search_sentences(sentences)
+        # only the segments whose bytes were not encoded before are sent to the model
+        return self.reuse_cache.encode(sentences, self._encode_search_sentences)
+
+    def _encode_search_sentences(self, sentences: List[str]) -> NDArray:
         # prepend "search_document: " to each sentence
         sentences = [f"search_document: {sentence}" for sentence in sentences]
         result = self.encoder.encode(sentences)
@@ -208,11 +377,27 @@ class SegmentEncoder:
 
     def persist_embeddings(self, uids: List[UUID], embeddings: List[np.ndarray]) -> None:
         self.embedding_store.extend_embeddings(uids, embeddings)
+        self.flush_reuse_cache()
+
+    def flush_reuse_cache(self) -> None:
+        if self.reuse_cache is None:
+            return
+        self.reuse_cache.flush()
+        hits = self.reuse_cache.hits
+        total = hits + self.reuse_cache.misses
+        logger.info(f"Reuse cache: {hits} / {total} embeddings reused")
 
 
 def main(args):
     segment_encoder = SegmentEncoder(args)
-    segment_encoder.encode_segments()
+    if args.role == "coordinator":
+        segment_encoder.encode_coordinator()
+    elif args.role == "worker":
+        segment_encoder.encode_worker()
+    elif args.pipelined:
+        segment_encoder.encode_segments_pipelined()
+    else:
+        segment_encoder.encode_segments()
 
 
 if __name__ == '__main__':
@@ -232,6 +417,31 @@ if __name__ == '__main__':
                         help="Maximum number of items to process (zero means no limit)")
     parser.add_argument("-d", "--debug", default=False, action="store_true", help="Debug mode")
     parser.add_argument("--records", type=str, help="Path to the segment records file")
+    parser.add_argument("--pipelined", default=False, action="store_true",
+                        help="Length bucketed, token budget batches with text prefetching "
+                        "(requires --records, --batch-size caps the batch size)")
+    parser.add_argument("--token-budget", type=int, default=65536,
+                        help="Pipelined mode: max padded tokens (batch size * longest) per batch")
+    parser.add_argument("--prefetch-batches", type=int, default=4,
+                        help="Pipelined mode: number of batches the reader thread reads ahead")
+    parser.add_argument("--role", choices=["coordinator", "worker"],
+                        help="Multi-worker mode (requires --records and --work-queue): the "
+                        "coordinator queues segment ranges and merges the workers' shards")
+    parser.add_argument("--work-queue", type=str,
+                        help="Multi-worker mode: path of the sqlite work queue, on a filesystem "
+                        "shared by the workers")
+    parser.add_argument("--range-size", type=int, default=10_000,
+                        help="Multi-worker mode: number of segments per leased range")
+    parser.add_argument("--lease-seconds", type=float, default=600,
+                        help="Multi-worker mode: a lease expires unless renewed within this time")
+    parser.add_argument("--poll-seconds", type=float, default=10,
+                        help="Multi-worker mode: how often to check the work queue when idle")
+    parser.add_argument("--worker-id", type=str,
+                        help="Multi-worker mode: worker id (default: hostname:pid)")
+    parser.add_argument("--reuse-cache", type=str,
+                        help="Directory of the embedding reuse cache: segments whose bytes were "
+                        "encoded before (same model and max-len) are not re-encoded, new "
+                        "embeddings are added to the cache")
     args = parser.parse_args()
 
     if args.debug:
@@ -259,5 +469,16 @@ if __name__ == '__main__':
     if args.max_items < 0:
         parser.error("max_items must be non-negative (zero means no limit)")
 
+    if args.pipelined and args.records is None:
+        parser.error("--pipelined requires --records")
+
+    if args.role is not None:
+        if args.records is None:
+            parser.error("--role requires --records")
+        if args.work_queue is None:
+            parser.error("--role requires --work-queue")
+        if args.range_size <= 0:
+            parser.error("--range-size must be positive")
+
     main(args)
     logger.info(f"Elapsed time: {time.time() - t0:.2f} seconds")
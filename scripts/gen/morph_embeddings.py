@@ -63,7 +63,7 @@ if __name__ == "__main__":
                         help='Target dimension')
     parser.add_argument('-m', '--max-len', type=int, help='Max length')
     parser.add_argument('-s', '--stype', type=str, help='Stype'
-                        , choices=["float32", "float16", "int8", "uint8"])
+                        , choices=["float32", "float16", "int8", "uint8", "binary"])
     parser.add_argument('--src-stype', type=str, help='Source stype'
                         , choices=["float32", "float16", "int8", "uint8"])
     parser.add_argument('-f', '--force', action='store_true', help='Force overwrite')
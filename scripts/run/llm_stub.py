@@ -0,0 +1,47 @@
+"""
+Run the OpenAI-compatible LLM stub (see bench.llm_stub) for load tests.
+
+Usage:
+    PYTHONPATH=src python scripts/run/llm_stub.py --port 8100 --latency 0.8 --jitter 0.2
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=stub \
+        PYTHONPATH=src python scripts/run/run_app.py
+"""
+import logging
+import argparse
+import uvicorn
+
+from bench.llm_stub import StubConfig, create_llm_stub_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible chat completions stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.5,
+                        help="Seconds per answer completion")
+    parser.add_argument("--split-latency", type=float, default=0.2,
+                        help="Seconds per query split completion")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Uniform +- seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of the completions failing with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0,
+                        help="Fraction of the completions failing with a 429")
+    parser.add_argument("--answer-chars", type=int, default=1200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        split_latency=args.split_latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        answer_chars=args.answer_chars,
+        seed=args.seed,
+    )
+    app = create_llm_stub_app(config)
+    uvicorn.run(app, host=args.host, port=args.port, log_level=logging.WARNING)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Load test /api/combined (see bench.load_test).
+
+Usage:
+    # open loop, 5 requests per second for 60 seconds
+    PYTHONPATH=src python scripts/run/load_test_cli.py -f queries.txt --rate 5 --duration 60
+
+    # closed loop, 8 concurrent clients, 500 requests, searches and RAG over segments
+    PYTHONPATH=src python scripts/run/load_test_cli.py -f queries.txt --concurrency 8 \
+        --requests 500 --actions search rag -o /tmp/load.json
+
+Run the app against the LLM stub (scripts/run/llm_stub.py) to measure the service rather
+than the LLM.
+"""
+import json
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+import httpx
+
+from bench.load_test import LoadGenerator, format_summary, load_requests, summarize
+
+
+async def run(args) -> dict:
+    requests = load_requests(args.query_file, args.actions, args.kinds)
+    limits = httpx.Limits(max_connections=args.max_connections,
+                          max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout,
+                                 limits=limits) as client:
+        generator = LoadGenerator(client, requests)
+        if args.rate:
+            count = args.requests or int(args.rate * args.duration)
+            elapsed = await generator.run_rate(args.rate, count)
+        else:
+            elapsed = await generator.run_concurrency(args.concurrency, args.requests,
+                                                      args.duration)
+    summary = summarize(generator.results, elapsed)
+    summary["params"] = {
+        "url": args.url,
+        "rate": args.rate,
+        "concurrency": None if args.rate else args.concurrency,
+        "requests": len(generator.results),
+        "query_file": str(args.query_file),
+    }
+    return summary
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+
+    parser = argparse.ArgumentParser(description="Load test /api/combined")
+    parser.add_argument("-f", "--query-file", type=Path, required=True,
+                        help="A query per line, or JSON lines of request fields")
+    parser.add_argument("-u", "--url", default="http://127.0.0.1:8000",
+                        help="The base url of the combined app")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--rate", type=float, help="Open loop: requests per second")
+    mode.add_argument("--concurrency", type=int, help="Closed loop: concurrent clients")
+    parser.add_argument("-n", "--requests", type=int, help="The number of requests")
+    parser.add_argument("-d", "--duration", type=float, help="Seconds to run")
+    parser.add_argument("--actions", nargs="+", default=["search"], choices=["search", "rag"])
+    parser.add_argument("--kinds", nargs="+", default=["segment"],
+                        choices=["segment", "article"])
+    parser.add_argument("--timeout", type=float, default=60.0, help="Request timeout seconds")
+    parser.add_argument("--max-connections", type=int, default=100)
+    parser.add_argument("-o", "--output", type=Path, help="Write the summary JSON here")
+    args = parser.parse_args()
+
+    if args.requests is None and args.duration is None:
+        parser.error("Provide --requests or --duration")
+    if not args.query_file.exists():
+        parser.error(f"Query file {args.query_file} not found")
+
+    summary = asyncio.run(run(args))
+    print(format_summary(summary))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(summary, file, indent=2)
+        print(f"Summary written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
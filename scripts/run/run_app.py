@@ -9,10 +9,31 @@ def get_combined_app(logger):
     if not os.getenv("OPENAI_API_KEY"):
         raise ValueError("OPENAI_API_KEY is not set")
 
+    from web.admin_auth import ADMIN_TOKEN_ENV
     from web.combined_app import create_combined_app
     app_config = get_app_config(logger)
 
-    combined_app = create_combined_app(app_config)
+    combined_app = create_combined_app(
+        app_config,
+        encoder_config_id=app_config.encoder_config_id,
+        binary_shortlist=app_config.binary_shortlist,
+        cascade_dim=app_config.cascade_dim,
+        cascade_shortlist=app_config.cascade_shortlist,
+        persist_search_matrix=app_config.persist_search_matrix,
+        lexical_mode=app_config.lexical_mode,
+        lexical_candidates=app_config.lexical_candidates,
+        lexical_weight=app_config.lexical_weight,
+        article_pooling=app_config.article_pooling,
+        article_drill_down=app_config.article_drill_down,
+        trace_file=app_config.trace_file,
+        trace_sample_rate=app_config.trace_sample_rate,
+        trace_slow_seconds=app_config.trace_slow_seconds,
+        default_corpus_id=app_config.default_corpus_id,
+        corpora=app_config.corpora,
+        corpus_memory_budget_mb=app_config.corpus_memory_budget_mb,
+        reload_poll_seconds=app_config.reload_poll_seconds,
+        admin_token=os.getenv(ADMIN_TOKEN_ENV),
+    )
     return combined_app
 
 
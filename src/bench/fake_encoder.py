@@ -0,0 +1,69 @@
+"""
+A deterministic stand-in for the sentence transformer, for benchmarks and load tests.
+
+An embedding is the sum of fixed random vectors of the text's words (a random projection of
+the bag of words), so texts sharing words are similar and search results are meaningful,
+without loading a model.
+"""
+import re
+import hashlib
+from typing import Dict, List
+import numpy as np
+from numpy.typing import NDArray
+
+from gen.encoder import Encoder
+
+_WORD_REGEX = re.compile(r"\w+")
+
+
+class FakeSentenceModel:
+    """
+    The subset of the SentenceTransformer interface the encoders use.
+    """
+
+    def __init__(self, dim: int = 768, seed: int = 0) -> None:
+        """
+        Initialize the model.
+        Args:
+            dim: The embedding dimension.
+            seed: Mixed into the word vectors, different seeds make different models.
+        """
+        self.dim = dim
+        self.seed = seed
+        self._word_vectors: Dict[str, NDArray] = {}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """The embedding dimension."""
+        return self.dim
+
+    def word_vector(self, word: str) -> NDArray:
+        """The fixed random vector of a word."""
+        vector = self._word_vectors.get(word)
+        if vector is None:
+            digest = hashlib.blake2b(f"{self.seed}:{word}".encode("utf-8"), digest_size=8)
+            rng = np.random.default_rng(int.from_bytes(digest.digest(), "little"))
+            vector = rng.standard_normal(self.dim).astype(np.float32)
+            self._word_vectors[word] = vector
+        return vector
+
+    def encode(self, sentences: List[str], batch_size: int = 32, **_kwargs) -> NDArray:
+        """Encode the sentences into (not normalized) float32 embeddings."""
+        embeddings = np.zeros((len(sentences), self.dim), dtype=np.float32)
+        for index, sentence in enumerate(sentences):
+            for word in _WORD_REGEX.findall(sentence.lower()):
+                embeddings[index] += self.word_vector(word)
+        return embeddings
+
+
+class FakeEncoder(Encoder):
+    """
+    An Encoder backed by a FakeSentenceModel.
+    """
+
+    def __init__(self, batch_size: int = 1, dim: int = 768, seed: int = 0) -> None:
+        super().__init__(batch_size)
+        self._model = FakeSentenceModel(dim, seed)
+
+    @property
+    def model_key(self) -> str:
+        return f"fake-{self._model.dim}:{self._model.seed}"
@@ -0,0 +1,127 @@
+"""
+A local OpenAI-compatible chat completions stub with configurable latency, for load tests.
+
+CombinedService calls the chat completions API twice per RAG request: to split the query
+(expects a JSON object with "query" and "question") and to answer. The stub answers both
+after a simulated latency, without tokens or cost. Point the app at it with:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=stub python scripts/run/run_app.py
+
+See scripts/run/llm_stub.py.
+"""
+import re
+import json
+import time
+import random
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# the last quoted line of the split query prompt is the user input
+_QUOTED_REGEX = re.compile(r'^"(.*)"\s*$', re.MULTILINE)
+
+
+@dataclass
+class StubConfig:
+    """
+    The simulated behavior of the LLM.
+    """
+    # seconds per completion, uniformly +- jitter
+    latency: float = 0.5
+    jitter: float = 0.1
+    # the latency of the query split completion (a short JSON answer)
+    split_latency: float = 0.2
+    # the fraction of the completions that fail with a 500 / are rate limited with a 429
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    answer_chars: int = 1200
+    seed: int = 0
+
+
+def is_split_query_prompt(messages: List[Dict[str, Any]]) -> bool:
+    """Whether the messages are CombinedService.split_query's."""
+    return any("Extract two parts" in str(message.get("content", "")) for message in messages)
+
+
+def split_query_content(messages: List[Dict[str, Any]]) -> str:
+    """The JSON answer to a split query prompt: the user input as both parts."""
+    prompt = str(messages[-1].get("content", ""))
+    matches = _QUOTED_REGEX.findall(prompt)
+    user_input = matches[-1] if matches else prompt
+    return json.dumps({"query": user_input, "question": user_input})
+
+
+def answer_content(answer_chars: int) -> str:
+    """A Markdown answer of answer_chars characters."""
+    line = "- The retrieved passages share a common theme.\n"
+    repeats = answer_chars // len(line) + 1
+    return ("## Answer\n\n" + line * repeats)[:answer_chars]
+
+
+def completion_body(model: str, content: str, prompt_chars: int) -> Dict[str, Any]:
+    """A chat completion response body."""
+    prompt_tokens = prompt_chars // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": f"chatcmpl-stub-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def error_body(message: str, error_type: str) -> Dict[str, Any]:
+    """An OpenAI error response body."""
+    return {"error": {"message": message, "type": error_type, "param": None, "code": None}}
+
+
+def create_llm_stub_app(config: StubConfig) -> FastAPI:
+    """Create the FastAPI app of the stub."""
+    app = FastAPI()
+    rng = random.Random(config.seed)
+    app.state.completions = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request) -> JSONResponse:
+        """Answer a chat completion after the simulated latency."""
+        body = await request.json()
+        messages = body.get("messages", [])
+        split = is_split_query_prompt(messages)
+
+        base_latency = config.split_latency if split else config.latency
+        latency = max(0.0, base_latency + rng.uniform(-config.jitter, config.jitter))
+        await asyncio.sleep(latency)
+        app.state.completions += 1
+
+        draw = rng.random()
+        if draw < config.rate_limit_rate:
+            return JSONResponse(error_body("Rate limited (stub)", "rate_limit_exceeded"),
+                                status_code=429)
+        if draw < config.rate_limit_rate + config.error_rate:
+            return JSONResponse(error_body("Internal error (stub)", "server_error"),
+                                status_code=500)
+
+        content = split_query_content(messages) if split else answer_content(config.answer_chars)
+        prompt_chars = sum(len(str(message.get("content", ""))) for message in messages)
+        return JSONResponse(completion_body(body.get("model", "stub"), content, prompt_chars))
+
+    @app.get("/v1/models")
+    async def models() -> JSONResponse:
+        """The models, for clients that check the connection."""
+        return JSONResponse({"object": "list",
+                             "data": [{"id": "gpt-4o-mini", "object": "model"}]})
+
+    return app
@@ -0,0 +1,242 @@
+"""
+An HTTP load generator for /api/combined.
+
+Replays a query file against the combined app, either open loop at a target rate (requests
+are sent on schedule whatever the response times, latency is measured from the scheduled
+time so a saturated server is not hidden by a slowed-down client) or closed loop with a
+fixed number of concurrent clients. Reports the latency percentiles, throughput and error
+rates per action and kind.
+
+Query file: a query per line, or JSON lines with "query" and optionally "action", "kind",
+"k", "threshold" and "max". Lines without an action/kind cycle through the given ones.
+
+See scripts/run/load_test_cli.py, and bench.llm_stub to take the LLM out of the measurement.
+"""
+import json
+import time
+import asyncio
+import itertools
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+import httpx
+
+
+@dataclass
+class LoadRequest:
+    """
+    A request body of /api/combined.
+    """
+    query: str
+    action: str = "search"
+    kind: str = "segment"
+    k: int = 5
+    threshold: float = 0.3
+    max: int = 10
+
+    def to_json(self, request_id: str) -> Dict[str, Any]:
+        """The request body."""
+        return {"id": request_id, "action": self.action, "kind": self.kind,
+                "query": self.query, "k": self.k, "threshold": self.threshold, "max": self.max}
+
+
+@dataclass
+class LoadResult:
+    """
+    The outcome of a request.
+    """
+    action: str
+    kind: str
+    # the HTTP status, or the exception class name of a failed request
+    status: str
+    seconds: float
+
+    @property
+    def ok(self) -> bool:
+        """Whether the request succeeded."""
+        return self.status == "200"
+
+
+def load_requests(
+    path: Path,
+    actions: Sequence[str] = ("search",),
+    kinds: Sequence[str] = ("segment",)
+) -> List[LoadRequest]:
+    """
+    Load the requests of a query file.
+    Lines without an action/kind get the next of the action x kind combinations.
+    """
+    combinations = itertools.cycle(itertools.product(actions, kinds))
+    requests = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                fields = json.loads(line)
+            else:
+                fields = {"query": line}
+            action, kind = next(combinations)
+            fields.setdefault("action", action)
+            fields.setdefault("kind", kind)
+            requests.append(LoadRequest(**fields))
+    if not requests:
+        raise ValueError(f"No queries in {path}")
+    return requests
+
+
+def percentiles(seconds: Sequence[float]) -> Dict[str, Optional[float]]:
+    """The p50/p95/p99, mean and max latency in ms, None without samples."""
+    if not seconds:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None, "max_ms": None}
+    values = np.asarray(seconds) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "mean_ms": round(float(values.mean()), 2),
+        "max_ms": round(float(values.max()), 2),
+    }
+
+
+def summarize(results: Sequence[LoadResult], elapsed: float) -> Dict[str, Any]:
+    """
+    Summarize the results, overall and per action/kind.
+    Latency percentiles are of the successful requests.
+    """
+    def summarize_group(group: Sequence[LoadResult]) -> Dict[str, Any]:
+        ok_seconds = [result.seconds for result in group if result.ok]
+        statuses: Dict[str, int] = {}
+        for result in group:
+            statuses[result.status] = statuses.get(result.status, 0) + 1
+        errors = len(group) - len(ok_seconds)
+        return {
+            "requests": len(group),
+            "errors": errors,
+            "error_rate": round(errors / len(group), 4) if group else 0.0,
+            "throughput_rps": round(len(ok_seconds) / elapsed, 2) if elapsed else None,
+            "statuses": dict(sorted(statuses.items())),
+            **percentiles(ok_seconds),
+        }
+
+    groups: Dict[Tuple[str, str], List[LoadResult]] = {}
+    for result in results:
+        groups.setdefault((result.action, result.kind), []).append(result)
+
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "overall": summarize_group(results),
+        "by_action_kind": {f"{action}/{kind}": summarize_group(group)
+                           for (action, kind), group in sorted(groups.items())},
+    }
+
+
+class LoadGenerator:
+    """
+    Send the requests to /api/combined and collect the results.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        requests: Sequence[LoadRequest],
+        url: str = "/api/combined"
+    ) -> None:
+        """
+        Initialize the generator.
+        Args:
+            client: The client, with the base url of the app and the request timeout.
+            requests: The requests to replay, cycled through.
+            url: The combined API path.
+        """
+        self.client = client
+        self.requests = requests
+        self.url = url
+        self.results: List[LoadResult] = []
+        self._sequence = itertools.count()
+
+    def next_request(self) -> Tuple[str, LoadRequest]:
+        """The next request and its id."""
+        number = next(self._sequence)
+        return f"load-{number}", self.requests[number % len(self.requests)]
+
+    async def send(self, start: Optional[float] = None) -> LoadResult:
+        """
+        Send the next request.
+        Args:
+            start: The time (perf_counter) the latency is measured from, now by default.
+        """
+        request_id, request = self.next_request()
+        start = time.perf_counter() if start is None else start
+        try:
+            response = await self.client.post(self.url, json=request.to_json(request_id))
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        result = LoadResult(request.action, request.kind, status, time.perf_counter() - start)
+        self.results.append(result)
+        return result
+
+    async def run_rate(self, rate: float, count: int) -> float:
+        """
+        Open loop: send count requests at rate requests per second.
+        Returns the elapsed seconds.
+        """
+        start = time.perf_counter()
+        tasks = []
+        for index in range(count):
+            scheduled = start + index / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(self.send(scheduled)))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - start
+
+    async def run_concurrency(
+        self,
+        concurrency: int,
+        count: Optional[int] = None,
+        duration: Optional[float] = None
+    ) -> float:
+        """
+        Closed loop: concurrency clients send requests back to back, until count requests
+        are sent or for duration seconds.
+        Returns the elapsed seconds.
+        """
+        if count is None and duration is None:
+            raise ValueError("Provide count or duration")
+        start = time.perf_counter()
+        deadline = None if duration is None else start + duration
+        remaining: Iterator[int] = iter(range(count)) if count is not None else itertools.count()
+
+        async def client_loop() -> None:
+            for _ in remaining:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return
+                await self.send()
+
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        return time.perf_counter() - start
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """Format the summary as a table."""
+    header = (f"{'action/kind':<18} {'reqs':>6} {'err%':>6} {'rps':>8} "
+              f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    lines = [header]
+    rows = list(summary["by_action_kind"].items()) + [("overall", summary["overall"])]
+
+    def number(value, fmt):
+        return "-" if value is None else format(value, fmt)
+
+    for name, group in rows:
+        lines.append(
+            f"{name:<18} {group['requests']:>6} {group['error_rate'] * 100:>6.1f} "
+            f"{number(group['throughput_rps'], '.2f'):>8} {number(group['p50_ms'], '.1f'):>9} "
+            f"{number(group['p95_ms'], '.1f'):>9} {number(group['p99_ms'], '.1f'):>9}")
+    lines.append(f"elapsed: {summary['elapsed_s']}s")
+    return "\n".join(lines)
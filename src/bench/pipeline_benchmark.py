@@ -0,0 +1,333 @@
+"""
+End-to-end benchmark of the indexing, segmenting, embedding and search stages.
+
+Builds deterministic synthetic corpora (see bench.synthetic_corpus), runs each stage of the
+pipeline on them and times it, with a FakeEncoder standing in for the model:
+
+    wiki.index              IndexBuilderWiki
+    wiki.split_sentences    SentenceUtils.split_bytes_into_sentences
+    plots.index             IndexBuilderPlots
+    plots.split_sentences   one sentence per line (as build_plots_segments)
+    <corpus>.segment        SegmentBuilder.segmentize_documents
+    <corpus>.overlap        SegmentOverlapSetter.set_overlaps_for_documents
+    <corpus>.records_save   SegmentRecordStore save / load
+    <corpus>.records_load
+    <corpus>.encode         FakeEncoder (for reference, not the model cost)
+    <corpus>.embeddings_extend  EmbeddingStore, extended in batches / loaded
+    <corpus>.embeddings_load
+    <corpus>.morph          EmbeddingUtils.morph_embeddings
+    <corpus>.search_segments    KNearestFinder, per query
+    <corpus>.search_articles
+
+The results are JSON (see run_benchmarks), compare_results() diffs two of them, e.g. the
+results of two commits.
+"""
+import sys
+import time
+import json
+import platform
+import statistics
+import subprocess
+from pathlib import Path
+from argparse import Namespace
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+from bench.fake_encoder import FakeEncoder
+from bench.synthetic_corpus import SyntheticTextGenerator, write_plots_corpus, write_wiki_corpus
+from gen.element.element import Element
+from gen.embedding_store import EmbeddingStore, StoreMode
+from gen.embedding_utils import EmbeddingUtils
+from gen.index_builder_plots import IndexBuilderPlots
+from gen.index_builder_wiki import IndexBuilderWiki
+from gen.segment_builder import SegmentBuilder
+from gen.segment_overlap_setter import SegmentOverlapSetter
+from gen.data.segment_record_store import SegmentRecordStore
+from search.k_nearest_finder import KNearestFinder
+from search.stores import Stores
+from xutils.embedding_config import EmbeddingConfig
+from xutils.sentence_utils import SentenceUtils
+
+SCHEMA_VERSION = 1
+
+
+@dataclass
+class BenchmarkParams:
+    """
+    The corpus sizes and the pipeline parameters of a benchmark run.
+    """
+    articles: int = 1000
+    plots: int = 1000
+    seed: int = 0
+    max_len: int = 512
+    dim: int = 768
+    # the search embeddings: dim reduction and quantization (see EmbeddingUtils)
+    search_dim: Optional[int] = None
+    stype: str = "float32"
+    extend_batches: int = 4
+    queries: int = 20
+    repeat: int = 3
+
+
+class StageTimer:
+    """
+    Time the stages, keeping the stats of each by name.
+    """
+
+    def __init__(self, repeat: int) -> None:
+        self.repeat = repeat
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+    def time(
+        self,
+        name: str,
+        func: Callable[[], Any],
+        repeat: Optional[int] = None,
+        items: Optional[int] = None
+    ) -> Any:
+        """
+        Run func repeat times and record the timing stats.
+        Returns the result of the last run.
+        Args:
+            name: The stage name.
+            func: The stage, run without arguments.
+            repeat: The number of runs, the timer's repeat by default.
+            items: The number of items (documents, segments, queries) a run processes.
+        """
+        repeat = self.repeat if repeat is None else repeat
+        seconds = []
+        result = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            seconds.append(time.perf_counter() - start)
+        self.record(name, seconds, items)
+        return result
+
+    def record(self, name: str, seconds: List[float], items: Optional[int] = None) -> None:
+        """Record the stats of the measured durations of a stage."""
+        stats: Dict[str, Any] = {
+            "runs": len(seconds),
+            "min_s": round(min(seconds), 6),
+            "median_s": round(statistics.median(seconds), 6),
+            "mean_s": round(statistics.fmean(seconds), 6),
+            "max_s": round(max(seconds), 6),
+        }
+        if len(seconds) >= 20:
+            stats["p95_s"] = round(float(np.percentile(seconds, 95)), 6)
+        if items is not None:
+            stats["items"] = items
+            median = stats["median_s"]
+            stats["items_per_s"] = round(items / median, 1) if median else None
+        self.stages[name] = stats
+
+
+def index_wiki(text_path: Path) -> List[Tuple[int, bytes]]:
+    """Index the wiki text, returns the offset and bytes of each article."""
+    # the element registry is global, keep the runs independent
+    Element.instances.clear()
+    builder = IndexBuilderWiki(Namespace(text=str(text_path)))
+    builder.build_index()
+    return [(article.offset, article.bytes) for article in builder.articles]
+
+
+def index_plots(plots_dir: Path) -> List[Tuple[int, bytes]]:
+    """Index the plots, returns the offset and bytes of each plot."""
+    plot_records = IndexBuilderPlots(plots_dir).build_index()
+    text = (plots_dir / "plots").read_bytes()
+    return [(record.offset, text[record.offset:record.offset + record.byte_length])
+            for record in plot_records]
+
+
+def split_plot_text(text: bytes) -> List[bytes]:
+    """Split a plot into its lines, as build_plots_segments does."""
+    return [line + b"\n" for line in text.split(b"\n") if line]
+
+
+def run_corpus(
+    timer: StageTimer,
+    corpus: str,
+    documents: List[Tuple[int, bytes]],
+    split: Callable[[bytes], List[bytes]],
+    params: BenchmarkParams,
+    work_dir: Path
+) -> Dict[str, Any]:
+    """
+    Time the stages following the indexing of a corpus.
+    Returns the corpus stats.
+    """
+    document_offsets = [offset for offset, _ in documents]
+    sentences_per_document = timer.time(
+        f"{corpus}.split_sentences",
+        lambda: [split(text) for _, text in documents],
+        items=len(documents))
+
+    segment_buffers_per_document = timer.time(
+        f"{corpus}.segment",
+        lambda: SegmentBuilder.segmentize_documents(
+            params.max_len, iter(sentences_per_document), document_count=len(documents)),
+        items=len(documents))
+
+    segment_records, extended_buffers_per_document = timer.time(
+        f"{corpus}.overlap",
+        lambda: SegmentOverlapSetter.set_overlaps_for_documents(
+            params.max_len, document_offsets, segment_buffers_per_document),
+        items=len(documents))
+    segment_count = len(segment_records)
+
+    path_prefix = str(work_dir / corpus)
+    record_store = SegmentRecordStore(path_prefix, params.max_len)
+    timer.time(f"{corpus}.records_save",
+               lambda: record_store.save_segment_records(segment_records), items=segment_count)
+    timer.time(f"{corpus}.records_load", record_store.load_segment_records, items=segment_count)
+
+    encoder = FakeEncoder(dim=params.dim, seed=params.seed)
+    segment_texts = [buffer.bytes().decode("utf-8", errors="replace")
+                     for buffers in extended_buffers_per_document for buffer in buffers]
+    embeddings = timer.time(f"{corpus}.encode", lambda: encoder.encode(segment_texts),
+                            repeat=1, items=segment_count)
+
+    embed_config = EmbeddingConfig(prefix=path_prefix, max_len=params.max_len)
+
+    def extend_embeddings() -> None:
+        store = EmbeddingStore(embed_config, StoreMode.WRITE, allow_empty=True)
+        uids = np.arange(segment_count)
+        for batch in np.array_split(np.arange(segment_count), params.extend_batches):
+            store.extend_embeddings(uids[batch], embeddings[batch])
+
+    timer.time(f"{corpus}.embeddings_extend", extend_embeddings, items=segment_count)
+    embedding_store = EmbeddingStore(embed_config, StoreMode.READ, allow_empty=False)
+    timer.time(f"{corpus}.embeddings_load", embedding_store.load_embeddings, items=segment_count)
+
+    search_config = EmbeddingConfig(prefix=path_prefix, max_len=params.max_len,
+                                    dim=params.search_dim, stype=params.stype,
+                                    l2_normalize=True)
+    timer.time(f"{corpus}.morph",
+               lambda: EmbeddingUtils.morph_embeddings(embeddings, search_config),
+               items=segment_count)
+
+    stores = Stores(None, None, record_store, embedding_store)
+    finder = KNearestFinder(stores, search_config)
+    finder.encoder = encoder
+    finder.warm_up()
+
+    generator = SyntheticTextGenerator(params.seed + 2)
+    queries = [" ".join(generator.words(8)) for _ in range(params.queries)]
+    for kind, find in (("segments", finder.find_k_nearest_segments),
+                       ("articles", finder.find_k_nearest_articles)):
+        seconds = []
+        for query in queries:
+            start = time.perf_counter()
+            find(query)
+            seconds.append(time.perf_counter() - start)
+        timer.record(f"{corpus}.search_{kind}", seconds, items=1)
+
+    return {
+        "documents": len(documents),
+        "bytes": sum(len(text) for _, text in documents),
+        "segments": segment_count,
+    }
+
+
+def get_git_commit() -> Optional[str]:
+    """The current git commit, None outside a git work tree."""
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True,
+                                text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def get_environment() -> Dict[str, Any]:
+    """The versions and the platform the results depend on."""
+    # delay the import, torch is slow to import
+    import torch
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def run_benchmarks(params: BenchmarkParams, work_dir: Path) -> Dict[str, Any]:
+    """
+    Generate the corpora in work_dir and time the stages.
+    Returns the results: the params, environment, corpus stats and stage timings.
+    """
+    work_dir = Path(work_dir)
+    timer = StageTimer(params.repeat)
+    corpora = {}
+
+    if params.articles:
+        text_path = write_wiki_corpus(work_dir / "wiki.txt", params.articles, params.seed)
+        articles = timer.time("wiki.index", lambda: index_wiki(text_path), items=params.articles)
+        corpora["wiki"] = run_corpus(timer, "wiki", articles,
+                                     SentenceUtils.split_bytes_into_sentences, params, work_dir)
+
+    if params.plots:
+        plots_dir = write_plots_corpus(work_dir / "plots", params.plots, params.seed)
+        plots = timer.time("plots.index", lambda: index_plots(plots_dir), items=params.plots)
+        corpora["plots"] = run_corpus(timer, "plots", plots, split_plot_text, params, work_dir)
+
+    return {
+        "schema": SCHEMA_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": get_git_commit(),
+        "params": asdict(params),
+        "environment": get_environment(),
+        "corpora": corpora,
+        "stages": timer.stages,
+    }
+
+
+def compare_results(
+    base: Dict[str, Any],
+    head: Dict[str, Any],
+    stat: str = "median_s"
+) -> List[Dict[str, Any]]:
+    """
+    Compare the stage timings of two results.
+    Returns a row per stage: the base and head stat and their ratio (head / base).
+    """
+    rows = []
+    for name in sorted(set(base["stages"]) | set(head["stages"])):
+        base_value = base["stages"].get(name, {}).get(stat)
+        head_value = head["stages"].get(name, {}).get(stat)
+        ratio = None
+        if base_value and head_value is not None:
+            ratio = round(head_value / base_value, 3)
+        rows.append({"stage": name, "base": base_value, "head": head_value, "ratio": ratio})
+    return rows
+
+
+def format_comparison(rows: List[Dict[str, Any]]) -> str:
+    """Format the comparison rows as a table."""
+    lines = [f"{'stage':<28} {'base':>12} {'head':>12} {'ratio':>8}"]
+    for row in rows:
+        base = "-" if row["base"] is None else f"{row['base']:.6f}"
+        head = "-" if row["head"] is None else f"{row['head']:.6f}"
+        ratio = "-" if row["ratio"] is None else f"{row['ratio']:.3f}"
+        lines.append(f"{row['stage']:<28} {base:>12} {head:>12} {ratio:>8}")
+    return "\n".join(lines)
+
+
+def load_results(path: Path) -> Dict[str, Any]:
+    """Load results written by write_results."""
+    with open(path, encoding="utf-8") as file:
+        results = json.load(file)
+    if results.get("schema") != SCHEMA_VERSION:
+        print(f"warning: {path}: schema {results.get('schema')}, expected {SCHEMA_VERSION}",
+              file=sys.stderr)
+    return results
+
+
+def write_results(results: Dict[str, Any], path: Path) -> None:
+    """Write the results as JSON."""
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+        file.write("\n")
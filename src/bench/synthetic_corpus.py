@@ -0,0 +1,144 @@
+"""
+Deterministic synthetic corpora for benchmarks and load tests.
+
+The wiki corpus follows the wikitext-103 layout IndexBuilderWiki parses:
+
+     = Article Title =
+    <blank line>
+     = = Section Title = =
+    <blank line>
+     Sentence one . Sentence two with 3.5 km and Dr. Smith .
+    <blank line>
+
+The plots corpus follows the layout IndexBuilderPlots parses: a plots file of plots, one
+sentence per line, each followed by an <EOS> line, and a titles file with a title per line.
+
+The same seed and sizes produce the same bytes, so benchmark results are comparable
+across commits.
+"""
+import random
+from pathlib import Path
+from typing import List
+
+# a fixed vocabulary, generated rather than listed; the first words are the most frequent
+_SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "an", "el", "or",
+              "un", "is", "ba", "de", "go", "hu", "ja", "pe"]
+
+# sentence splitting corner cases SentenceUtils handles
+_DECORATIONS = ["Dr. Smith", "the U.S. navy", "3.5 km", "Mr. Jones", "example.com", "Ph.D."]
+
+
+def make_vocabulary(size: int = 5000, seed: int = 0) -> List[str]:
+    """A deterministic vocabulary of size distinct lowercase words."""
+    rng = random.Random(seed)
+    words = []
+    seen = set()
+    while len(words) < size:
+        word = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(1, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+class SyntheticTextGenerator:
+    """
+    Generate deterministic sentences, paragraphs and titles.
+    Word frequencies follow a Zipf-like distribution, so queries hit a few common and many
+    rare words, like natural text.
+    """
+
+    def __init__(self, seed: int = 0, vocabulary_size: int = 5000) -> None:
+        self.rng = random.Random(seed)
+        self.vocabulary = make_vocabulary(vocabulary_size, seed)
+        self.weights = [1.0 / (rank + 1) for rank in range(vocabulary_size)]
+
+    def words(self, count: int) -> List[str]:
+        """count words drawn by frequency."""
+        return self.rng.choices(self.vocabulary, weights=self.weights, k=count)
+
+    def title(self) -> str:
+        """A title of 1 to 4 capitalized words."""
+        return " ".join(word.capitalize() for word in self.words(self.rng.randint(1, 4)))
+
+    def sentence(self) -> str:
+        """A sentence of 5 to 30 words, sometimes with an abbreviation or a number."""
+        words = self.words(self.rng.randint(5, 30))
+        if self.rng.random() < 0.2:
+            words.insert(self.rng.randrange(len(words)), self.rng.choice(_DECORATIONS))
+        words[0] = words[0].capitalize()
+        return " ".join(words) + " ."
+
+    def paragraph(self, min_sentences: int = 1, max_sentences: int = 8) -> str:
+        """A paragraph of sentences, on a single line."""
+        count = self.rng.randint(min_sentences, max_sentences)
+        return " ".join(self.sentence() for _ in range(count))
+
+
+def generate_wiki_text(
+    article_count: int,
+    seed: int = 0,
+    max_sections: int = 4,
+    max_paragraphs: int = 4
+) -> bytes:
+    """
+    Generate a wiki text of article_count articles.
+    Args:
+        article_count: The number of articles.
+        seed: The random seed.
+        max_sections: The maximum number of sections per article.
+        max_paragraphs: The maximum number of paragraphs per section.
+    """
+    generator = SyntheticTextGenerator(seed)
+    rng = generator.rng
+    lines = []
+    for _ in range(article_count):
+        lines.append(f" = {generator.title()} = ")
+        lines.append("")
+        for section_index in range(rng.randint(1, max_sections)):
+            if section_index:
+                lines.append(f" = = {generator.title()} = = ")
+                lines.append("")
+            for _ in range(rng.randint(1, max_paragraphs)):
+                lines.append(f" {generator.paragraph()} ")
+                lines.append("")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def write_wiki_corpus(text_path: Path, article_count: int, seed: int = 0) -> Path:
+    """Write a wiki text of article_count articles to text_path."""
+    text_path = Path(text_path)
+    text_path.parent.mkdir(parents=True, exist_ok=True)
+    text_path.write_bytes(generate_wiki_text(article_count, seed))
+    return text_path
+
+
+def generate_plots(plot_count: int, seed: int = 0, max_sentences: int = 30) -> List[List[str]]:
+    """Generate plot_count plots, each a list of sentences."""
+    generator = SyntheticTextGenerator(seed)
+    rng = generator.rng
+    return [[generator.sentence() for _ in range(rng.randint(3, max_sentences))]
+            for _ in range(plot_count)]
+
+
+def write_plots_corpus(plots_dir: Path, plot_count: int, seed: int = 0) -> Path:
+    """
+    Write the plots and titles files of plot_count plots to plots_dir.
+    """
+    plots_dir = Path(plots_dir)
+    plots_dir.mkdir(parents=True, exist_ok=True)
+    generator = SyntheticTextGenerator(seed + 1)
+    titles = [generator.title() for _ in range(plot_count)]
+    plots = generate_plots(plot_count, seed)
+
+    with open(plots_dir / "plots", "wb") as plots_file:
+        for plot in plots:
+            for sentence in plot:
+                plots_file.write(sentence.encode("utf-8") + b"\n")
+            plots_file.write(b"<EOS>\n")
+
+    with open(plots_dir / "titles", "wb") as titles_file:
+        for title in titles:
+            titles_file.write(title.encode("utf-8") + b"\n")
+
+    return plots_dir
@@ -0,0 +1,359 @@
+"""
+A BM25 inverted index of the segment texts, for lexical candidate generation.
+
+Exact-term queries (names, titles, rare entities) are retrieved poorly by the dense
+embeddings. The index maps each term to the ascending rows of the segments containing it
+(the segment record order, the rows of the embeddings) along with the term frequencies.
+
+Postings are delta encoded varints, the terms are looked up by a 64-bit hash:
+
+    term_hashes         (T,) uint64  sorted
+    term_ids            (T,) int64   the term id of each hash
+    postings_start      (T + 1,) int64  byte offsets into postings, by term id
+    postings            (P bytes,) uint8  the row deltas of each term, varint encoded
+    term_frequencies    (N postings,) uint8  per posting, clipped to 255
+    document_frequencies (T,) int64  by term id
+    lengths             (R,) int32  the number of tokens of each segment
+
+The builder streams over the segment texts and spills sorted runs of postings, the runs are
+merged in term ranges, so the build memory is bounded by the run size (and the vocabulary).
+
+    {path prefix}_{max len}_bm25.npz
+"""
+import re
+import shutil
+import hashlib
+import logging
+import tempfile
+from array import array
+from pathlib import Path
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+from numpy.typing import NDArray
+
+from gen.data.segment_record import SegmentRecord
+from xutils.byte_reader import ByteReader
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# longer tokens are noise: urls, hashes, markup
+MAX_TOKEN_LENGTH = 32
+
+
+def tokenize(text: str) -> List[str]:
+    """Split the text into lowercase word tokens."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower())
+            if len(token) <= MAX_TOKEN_LENGTH]
+
+
+def term_hash(term: str) -> int:
+    """A stable 64-bit hash of a term."""
+    digest = hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def varint_sizes(values: NDArray) -> NDArray:
+    """The encoded sizes (bytes) of the varints of non-negative integers."""
+    values = np.asarray(values, dtype=np.uint64)
+    sizes = np.ones(len(values), dtype=np.int64)
+    for shift in range(7, 64, 7):
+        sizes += values >= np.uint64(1 << shift)
+    return sizes
+
+
+def encode_varints(values: NDArray) -> NDArray:
+    """
+    Encode non-negative integers as varints, 7 bits per byte, the high bit set on all but
+    the last byte of a value.
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    byte_counts = varint_sizes(values)
+    starts = np.cumsum(byte_counts) - byte_counts
+    encoded = np.empty(int(byte_counts.sum()), dtype=np.uint8)
+    for index in range(int(byte_counts.max(initial=0))):
+        selected = byte_counts > index
+        payload = (values[selected] >> np.uint64(7 * index)) & np.uint64(0x7F)
+        more = (byte_counts[selected] > index + 1).astype(np.uint64) << np.uint64(7)
+        encoded[starts[selected] + index] = payload | more
+    return encoded
+
+
+def decode_varints(encoded: NDArray) -> NDArray:
+    """Decode the varints of encode_varints."""
+    encoded = np.asarray(encoded, dtype=np.uint8)
+    if len(encoded) == 0:
+        return np.empty(0, dtype=np.int64)
+    ends = np.flatnonzero(encoded < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    value_indexes = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shifts = 7 * (np.arange(len(encoded)) - starts[value_indexes])
+    parts = (encoded & 0x7F).astype(np.int64) << shifts
+    return np.add.reduceat(parts, starts)
+
+
+class BM25Index:
+    """
+    The BM25 scores of the segments for the terms of a query.
+    """
+    FORMAT_VERSION = 1
+    COLUMN_NAMES = ("term_hashes", "term_ids", "postings_start", "postings",
+                    "term_frequencies", "document_frequencies", "lengths")
+
+    def __init__(
+        self,
+        term_hashes: NDArray,
+        term_ids: NDArray,
+        postings_start: NDArray,
+        postings: NDArray,
+        term_frequencies: NDArray,
+        document_frequencies: NDArray,
+        lengths: NDArray,
+        k1: float = 1.2,
+        b: float = 0.75
+    ):
+        """
+        Initialize the index from its columns (see the module docstring).
+        Args:
+            k1: The term frequency saturation.
+            b: The length normalization.
+        """
+        self.term_hashes = term_hashes
+        self.term_ids = term_ids
+        self.postings_start = postings_start
+        self.postings = postings
+        self.term_frequencies = term_frequencies
+        self.document_frequencies = document_frequencies
+        self.lengths = lengths
+        self.k1 = k1
+        self.b = b
+
+        # where the term frequencies of each term start
+        self.frequencies_start = np.concatenate(([0], np.cumsum(document_frequencies)))
+        average_length = float(lengths.mean()) if len(lengths) else 1.0
+        self.length_norms = k1 * (1 - b + b * lengths / max(average_length, 1.0))
+
+    def __len__(self) -> int:
+        """The number of indexed segments."""
+        return len(self.lengths)
+
+    @property
+    def nbytes(self) -> int:
+        """The bytes of the index columns."""
+        return sum(getattr(self, name).nbytes for name in self.COLUMN_NAMES)
+
+    @staticmethod
+    def get_path(path_prefix: str, max_len: int) -> Path:
+        """The path of the index of the segments of a path prefix and max len."""
+        return Path(f"{path_prefix}_{max_len}_bm25.npz")
+
+    @classmethod
+    def load(cls, path: Path, **kwargs) -> "BM25Index":
+        """Load an index saved by BM25IndexBuilder."""
+        with np.load(path) as data:
+            version = int(data["format_version"])
+            if version != cls.FORMAT_VERSION:
+                raise ValueError(f"Unsupported BM25 index version {version} in {path}")
+            columns = {name: data[name] for name in cls.COLUMN_NAMES}
+        index = cls(**columns, **kwargs)
+        logger.info("bm25 index %s: %d segments, %d terms, %d postings",
+                    path, len(index), len(index.term_ids), len(index.term_frequencies))
+        return index
+
+    def save(self, path: Path) -> None:
+        """Save the index columns."""
+        columns = {name: getattr(self, name) for name in self.COLUMN_NAMES}
+        np.savez(path, format_version=np.int64(self.FORMAT_VERSION), **columns)
+
+    def lookup(self, term: str) -> Optional[int]:
+        """The term id of a term, None if it is not indexed."""
+        hashed = np.uint64(term_hash(term))
+        position = int(np.searchsorted(self.term_hashes, hashed))
+        if position == len(self.term_hashes) or self.term_hashes[position] != hashed:
+            return None
+        return int(self.term_ids[position])
+
+    def get_postings(self, term_id: int) -> Tuple[NDArray, NDArray]:
+        """The ascending rows of the segments of a term and the term frequencies."""
+        encoded = self.postings[self.postings_start[term_id]:self.postings_start[term_id + 1]]
+        rows = np.cumsum(decode_varints(encoded))
+        frequencies = self.term_frequencies[
+            self.frequencies_start[term_id]:self.frequencies_start[term_id + 1]]
+        return rows, frequencies
+
+    def score(self, query: str, rows: Optional[NDArray] = None) -> Tuple[NDArray, NDArray]:
+        """
+        Score the segments containing any of the query terms.
+        Args:
+            query: The query.
+            rows: If set, the ascending rows to restrict the scores to.
+        Returns:
+            The ascending rows of the matching segments and their BM25 scores.
+        """
+        row_count = len(self.lengths)
+        row_parts, score_parts = [], []
+        for term in set(tokenize(query)):
+            term_id = self.lookup(term)
+            if term_id is None:
+                continue
+            term_rows, frequencies = self.get_postings(term_id)
+            if rows is not None:
+                selected = np.isin(term_rows, rows, assume_unique=True)
+                term_rows, frequencies = term_rows[selected], frequencies[selected]
+            document_frequency = self.document_frequencies[term_id]
+            idf = np.log(1 + (row_count - document_frequency + 0.5) / (document_frequency + 0.5))
+            frequencies = frequencies.astype(np.float32)
+            term_scores = idf * frequencies * (self.k1 + 1) / \
+                (frequencies + self.length_norms[term_rows])
+            row_parts.append(term_rows)
+            score_parts.append(term_scores)
+
+        if not row_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        matched_rows, inverse = np.unique(np.concatenate(row_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        return matched_rows, scores.astype(np.float32)
+
+    @staticmethod
+    def top(rows: NDArray, scores: NDArray, size: int) -> Tuple[NDArray, NDArray]:
+        """The (up to) size best scored rows, best first."""
+        if size < len(rows):
+            selected = np.argpartition(-scores, size - 1)[:size]
+            rows, scores = rows[selected], scores[selected]
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
+
+
+class BM25IndexBuilder:
+    """
+    Build a BM25 index by streaming over the segment texts.
+    """
+
+    def __init__(self, run_postings: int = 5_000_000, batch_size: int = 1000):
+        """
+        Initialize the builder.
+        Args:
+            run_postings: The number of postings buffered before a sorted run is spilled
+                to disk, and merged at once - bounds the build memory.
+            batch_size: The number of segment texts read at once.
+        """
+        self.run_postings = run_postings
+        self.batch_size = batch_size
+
+    def build_from_records(
+        self,
+        byte_reader: ByteReader,
+        segment_records: List[SegmentRecord]
+    ) -> BM25Index:
+        """Build the index of the texts of the segment records, in record order."""
+        def texts() -> Iterable[str]:
+            for start in range(0, len(segment_records), self.batch_size):
+                batch = segment_records[start:start + self.batch_size]
+                views = byte_reader.read_many([(record.offset, record.length)
+                                               for record in batch])
+                for view in views:
+                    yield str(view, "utf-8", errors="replace")
+
+        return self.build(texts())
+
+    def build(self, texts: Iterable[str]) -> BM25Index:
+        """Build the index of the texts, the row of a text is its position."""
+        temp_dir = Path(tempfile.mkdtemp(prefix="bm25_"))
+        try:
+            vocabulary = {}
+            lengths = array("i")
+            run_paths = []
+            run_terms, run_rows, run_frequencies = array("q"), array("q"), array("B")
+
+            for row, text in enumerate(texts):
+                counts = Counter(tokenize(text))
+                lengths.append(sum(counts.values()))
+                for term, count in counts.items():
+                    run_terms.append(vocabulary.setdefault(term, len(vocabulary)))
+                    run_rows.append(row)
+                    run_frequencies.append(min(count, 255))
+                if len(run_terms) >= self.run_postings:
+                    run_paths.append(self.spill(temp_dir, len(run_paths),
+                                                run_terms, run_rows, run_frequencies))
+                    run_terms, run_rows, run_frequencies = array("q"), array("q"), array("B")
+            if len(run_terms) > 0:
+                run_paths.append(self.spill(temp_dir, len(run_paths),
+                                            run_terms, run_rows, run_frequencies))
+
+            index = self.merge(run_paths, vocabulary, np.frombuffer(lengths, dtype=np.int32))
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        return index
+
+    @staticmethod
+    def spill(temp_dir: Path, number: int, terms: array, rows: array,
+              frequencies: array) -> Path:
+        """Save a run of postings sorted by term (and row), return its path."""
+        terms = np.frombuffer(terms, dtype=np.int64)
+        order = np.argsort(terms, kind="stable")
+        path = temp_dir / f"run_{number}"
+        path.mkdir()
+        np.save(path / "terms.npy", terms[order])
+        np.save(path / "rows.npy", np.frombuffer(rows, dtype=np.int64)[order])
+        np.save(path / "frequencies.npy", np.frombuffer(frequencies, dtype=np.uint8)[order])
+        logger.debug("bm25 build: spilled %d postings to %s", len(order), path)
+        return path
+
+    def merge(self, run_paths: List[Path], vocabulary: dict, lengths: NDArray) -> BM25Index:
+        """Merge the sorted runs in term ranges of up to run_postings postings."""
+        term_count = len(vocabulary)
+        runs = [tuple(np.load(path / f"{name}.npy", mmap_mode="r")
+                      for name in ("terms", "rows", "frequencies"))
+                for path in run_paths]
+
+        document_frequencies = np.zeros(term_count, dtype=np.int64)
+        for terms, _, _ in runs:
+            document_frequencies += np.bincount(terms, minlength=term_count)
+
+        # the postings of a term in a run are ascending and the runs are in row order
+        postings_parts, frequency_parts = [], []
+        postings_sizes = np.zeros(term_count, dtype=np.int64)
+        cumulative = np.cumsum(document_frequencies)
+        first_term = 0
+        while first_term < term_count:
+            limit = (cumulative[first_term - 1] if first_term else 0) + self.run_postings
+            end_term = max(int(np.searchsorted(cumulative, limit, side="right")), first_term + 1)
+            terms, rows, frequencies = [], [], []
+            for run_terms, run_rows, run_frequencies in runs:
+                start, end = np.searchsorted(run_terms, [first_term, end_term])
+                terms.append(run_terms[start:end])
+                rows.append(run_rows[start:end])
+                frequencies.append(run_frequencies[start:end])
+            terms, rows = np.concatenate(terms), np.concatenate(rows)
+            order = np.argsort(terms, kind="stable")
+            terms, rows = terms[order], rows[order]
+            frequency_parts.append(np.concatenate(frequencies)[order])
+
+            deltas = np.diff(rows, prepend=0)
+            term_starts = np.flatnonzero(np.diff(terms, prepend=-1))
+            deltas[term_starts] = rows[term_starts]
+            encoded = encode_varints(deltas)
+            byte_ends = np.cumsum(np.concatenate(
+                [[0], np.bincount(terms - first_term,
+                                  weights=varint_sizes(deltas),
+                                  minlength=end_term - first_term)]))
+            postings_sizes[first_term:end_term] = np.diff(byte_ends).astype(np.int64)
+            postings_parts.append(encoded)
+            first_term = end_term
+
+        postings_start = np.concatenate(([0], np.cumsum(postings_sizes)))
+        terms = list(vocabulary)
+        term_hashes = np.fromiter((term_hash(term) for term in terms), dtype=np.uint64,
+                                  count=len(terms))
+        hash_order = np.argsort(term_hashes)
+        return BM25Index(
+            term_hashes=term_hashes[hash_order],
+            # the term ids are the vocabulary (insertion) order
+            term_ids=hash_order.astype(np.int64),
+            postings_start=postings_start,
+            postings=np.concatenate(postings_parts or [np.empty(0, dtype=np.uint8)]),
+            term_frequencies=np.concatenate(frequency_parts or [np.empty(0, dtype=np.uint8)]),
+            document_frequencies=document_frequencies,
+            lengths=lengths.copy(),
+        )
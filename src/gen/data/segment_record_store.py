@@ -1,8 +1,9 @@
 """
 A store for segment records.
 """
+import json
 import logging
-from typing import List
+from typing import List, Optional, Tuple
 from pathlib import Path
 import pandas as pd
 
@@ -58,6 +59,58 @@ class SegmentRecordStore:
         )
         self.write_segment_records(segment_records_path, segment_record_df)
 
+    def get_next_indexes(self) -> Tuple[int, int]:
+        """
+        The (segment index, document index) following the stored records, where the
+        segments of appended documents start. (0, 0) if the store does not exist.
+        The document index is the count of the segmented documents, which includes the
+        trailing documents without segments (empty or short ones). Stores segmented before
+        the count was saved fall back to the document index following the records.
+        """
+        segment_records_path = self.get_segment_record_store_path()
+        if not segment_records_path.exists():
+            return 0, 0
+        segment_record_df = self.read_segment_record_df(segment_records_path)
+        next_segment_index, next_document_index = 0, 0
+        if len(segment_record_df) > 0:
+            next_segment_index = int(segment_record_df["segment_index"].max()) + 1
+            next_document_index = int(segment_record_df["document_index"].max()) + 1
+        document_count = self.load_document_count()
+        if document_count is not None:
+            next_document_index = document_count
+        return next_segment_index, next_document_index
+
+    def save_document_count(self, document_count: int) -> None:
+        """
+        Save the number of the segmented documents, where the next append starts.
+        """
+        with open(self.get_document_count_path(), "w", encoding="utf-8") as file:
+            json.dump({"document_count": document_count}, file)
+
+    def load_document_count(self) -> Optional[int]:
+        """
+        Load the number of the segmented documents, None if it was not saved.
+        """
+        document_count_path = self.get_document_count_path()
+        if not document_count_path.exists():
+            return None
+        with open(document_count_path, "r", encoding="utf-8") as file:
+            return int(json.load(file)["document_count"])
+
+    def append_segment_records(self, segment_records: List[SegmentRecord]) -> None:
+        """
+        Append segment records to the store, e.g. the segments of appended documents.
+        """
+        segment_records_path = self.get_segment_record_store_path()
+        if not segment_records_path.exists():
+            self.save_segment_records(segment_records)
+            return
+        segment_record_df = pd.DataFrame(
+            segment_records,
+            columns=SegmentRecord._fields
+        )
+        segment_record_df.to_csv(segment_records_path, mode='a', header=False, index=False)
+
     @staticmethod
     def write_segment_records(path_or_buffer, segment_record_df: pd.DataFrame) -> None:
         """
@@ -74,3 +127,9 @@ class SegmentRecordStore:
         segment_records_path_str = f"{path_prefix}_{max_len}_segment_records.csv"
         segment_records_path = Path(segment_records_path_str)
         return segment_records_path
+
+    def get_document_count_path(self) -> Path:
+        """
+        Get the path to the count of the segmented documents.
+        """
+        return Path(f"{self.path_prefix}_{self.max_len}_segmented_documents.json")
@@ -16,6 +16,8 @@ class Article(Container):
     """
     Article is a container of a header and paragraphs.
     """
+    __slots__ = ("_header", "body")
+
     def __init__(self, header: Header, uid: Optional[UUID] = None) -> None:
         """
         Create a new article.
@@ -64,6 +66,7 @@ class Article(Container):
         )
 
         self.body.append_element(paragraph)
+        self.invalidate()
 
     def append_element(self, element: Element) -> None:
         """
@@ -0,0 +1,366 @@
+"""
+A binary (npz) element store.
+
+Store writes an element per JSON line: string uids, references by uid, and a class name
+resolved per record. BinaryStore writes the same elements as numpy columns:
+
+    uids            (N, 16) uint8, the uuids' bytes
+    class_names     the class table, class_ids index it
+    class_ids       (N,) uint8
+    offset, length  (N,) int64, the text range of sections, -1 for containers
+    refs            (N, 3) int32, referenced elements by row (integer id), -1 for none
+    children_start  (N + 1,) int64, the CSR index of children
+    children        (C,) int32, the rows of the list containers' elements
+
+The references of each class (REFERENCES) are: paragraph -> article, fragment -> parent,
+article -> header + body, segment -> article, extended segment -> segment + overlaps.
+
+Loading is a single pass over the rows. References are resolved lazily: an element is
+created when first referenced, or at its row. The section bytes are read upfront with
+coalesced reads (ByteReader.read_many). The loaded elements are those of the JSON store.
+
+The JSON store stays the readable format for debugging. Flat elements (FlatArticle,
+FlatExtendedSegment) are not supported, they have their own column stores.
+"""
+import logging
+from uuid import UUID
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Type, Union
+import numpy as np
+from numpy.typing import NDArray
+
+from gen.element.store import Store
+from gen.element.element import Element
+from gen.element.section import Section
+from gen.element.header import Header
+from gen.element.paragraph import Paragraph
+from gen.element.fragment import Fragment
+from gen.element.article import Article
+from gen.element.list_container import ListContainer
+from gen.element.segment import Segment
+from gen.element.extended_segment import ExtendedSegment
+from xutils.byte_reader import ByteReader, create_byte_reader
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+ELEMENT_CLASSES: Tuple[Type[Element], ...] = (
+    Section, Header, Paragraph, Fragment, Article, ListContainer, Segment, ExtendedSegment
+)
+
+# the attributes each class references other elements by, in refs column order
+REFERENCES: Dict[Type[Element], Tuple[str, ...]] = {
+    Section: (),
+    Header: (),
+    Paragraph: ("article",),
+    Fragment: ("parent",),
+    Article: ("header", "body"),
+    ListContainer: (),
+    Segment: ("article",),
+    ExtendedSegment: ("segment", "before_overlap", "after_overlap"),
+}
+MAX_REFERENCES = 3
+
+
+class ElementColumns:
+    """
+    The columns of a binary element store, row i describes the element of integer id i.
+    """
+    COLUMN_NAMES = (
+        "uids",
+        "class_ids",
+        "offset",
+        "length",
+        "refs",
+        "children_start",
+        "children",
+    )
+
+    def __init__(
+        self,
+        class_names: Sequence[str],
+        uids: NDArray,
+        class_ids: NDArray,
+        offset: NDArray,
+        length: NDArray,
+        refs: NDArray,
+        children_start: NDArray,
+        children: NDArray
+    ) -> None:
+        """
+        Initialize the columns.
+        Args:
+            class_names: The class table.
+            uids: (N, 16) uint8 array of the uuids' bytes (UUID.bytes)
+            class_ids: (N,) uint8 array of indexes into class_names
+            offset: (N,) int64 array, -1 for containers
+            length: (N,) int64 array, -1 for containers
+            refs: (N, 3) int32 array of referenced rows, -1 for none
+            children_start: (N + 1,) int64 array, row i's children are
+                children[children_start[i]:children_start[i + 1]]
+            children: (C,) int32 array of rows
+        """
+        self.class_names = list(class_names)
+        self.uids = uids
+        self.class_ids = class_ids
+        self.offset = offset
+        self.length = length
+        self.refs = refs
+        self.children_start = children_start
+        self.children = children
+
+    def __len__(self) -> int:
+        return len(self.class_ids)
+
+    def uid_rows(self) -> Dict[UUID, int]:
+        """The rows by uid."""
+        uid_bytes = self.uids.tobytes()
+        return {UUID(bytes=uid_bytes[row * 16:row * 16 + 16]): row for row in range(len(self))}
+
+    @classmethod
+    def from_elements(
+        cls,
+        elements: Sequence[Element],
+        base: Optional["ElementColumns"] = None
+    ) -> "ElementColumns":
+        """
+        Build the columns of the elements.
+        Args:
+            elements: The elements, references must be to stored elements.
+            base: Columns to append the elements to, the elements may reference them.
+        """
+        elements = list(elements)
+        class_names = list(base.class_names) if base else []
+        rows = base.uid_rows() if base else {}
+        base_count = len(rows)
+        for row, element in enumerate(elements, start=base_count):
+            rows[element.uid] = row
+
+        count = len(elements)
+        uids = bytearray()
+        class_ids = np.empty(count, dtype=np.uint8)
+        offset = np.full(count, -1, dtype=np.int64)
+        length = np.full(count, -1, dtype=np.int64)
+        refs = np.full((count, MAX_REFERENCES), -1, dtype=np.int32)
+        children_counts = np.zeros(count, dtype=np.int64)
+        children: List[int] = []
+
+        def row_of(element: Element, referrer: Element) -> int:
+            if element.uid not in rows:
+                raise ValueError(f"{referrer} references {element}, which is not stored")
+            return rows[element.uid]
+
+        for index, element in enumerate(elements):
+            element_class = type(element)
+            if element_class not in REFERENCES:
+                raise ValueError(f"{element_class.__name__} is not supported by the binary "
+                                 "element store, use the JSON store")
+            if element_class.__name__ not in class_names:
+                class_names.append(element_class.__name__)
+            uids += element.uid.bytes
+            class_ids[index] = class_names.index(element_class.__name__)
+            if isinstance(element, Section):
+                offset[index] = element.offset
+                length[index] = element.byte_length
+            for ref_index, name in enumerate(REFERENCES[element_class]):
+                referenced = getattr(element, name)
+                if referenced is not None:
+                    refs[index, ref_index] = row_of(referenced, element)
+            if isinstance(element, ListContainer):
+                rows_of_children = [row_of(child, element) for child in element.elements]
+                children.extend(rows_of_children)
+                children_counts[index] = len(rows_of_children)
+
+        columns = cls(
+            class_names=class_names,
+            uids=np.frombuffer(bytes(uids), dtype=np.uint8).reshape(-1, 16),
+            class_ids=class_ids,
+            offset=offset,
+            length=length,
+            refs=refs,
+            children_start=np.concatenate(([0], np.cumsum(children_counts))),
+            children=np.array(children, dtype=np.int32),
+        )
+        if base is not None:
+            columns = base.concatenate(columns)
+        return columns
+
+    def concatenate(self, other: "ElementColumns") -> "ElementColumns":
+        """The columns of self's rows followed by other's (other extends self's class table)."""
+        return ElementColumns(
+            class_names=other.class_names,
+            uids=np.concatenate((self.uids, other.uids)),
+            class_ids=np.concatenate((self.class_ids, other.class_ids)),
+            offset=np.concatenate((self.offset, other.offset)),
+            length=np.concatenate((self.length, other.length)),
+            refs=np.concatenate((self.refs, other.refs)),
+            children_start=np.concatenate(
+                (self.children_start, other.children_start[1:] + self.children_start[-1])),
+            children=np.concatenate((self.children, other.children)),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "ElementColumns":
+        """Load the columns from a npz file."""
+        with np.load(path) as data:
+            version = int(data["version"])
+            if version != FORMAT_VERSION:
+                raise ValueError(f"Unsupported element store version {version} in {path}")
+            columns = cls(
+                class_names=[str(name) for name in data["class_names"]],
+                **{name: data[name] for name in cls.COLUMN_NAMES}
+            )
+        return columns
+
+    def save(self, path: Path) -> None:
+        """Save the columns to a npz file."""
+        with open(path, "wb") as file:
+            np.savez(
+                file,
+                version=np.array(FORMAT_VERSION),
+                class_names=np.array(self.class_names),
+                **{name: getattr(self, name) for name in self.COLUMN_NAMES}
+            )
+
+
+class ElementLoader:
+    """
+    Create the elements of the columns, each once, referenced elements first.
+    """
+
+    def __init__(self, columns: ElementColumns, byte_reader: ByteReader) -> None:
+        self.columns = columns
+        self.byte_reader = byte_reader
+        self.elements: List[Optional[Element]] = [None] * len(columns)
+        self._uid_bytes = columns.uids.tobytes()
+        classes = [
+            next(element_class for element_class in ELEMENT_CLASSES
+                 if element_class.__name__ == name)
+            for name in columns.class_names
+        ]
+        # python lists, indexing numpy arrays per element is slow
+        self._classes = [classes[class_id] for class_id in columns.class_ids.tolist()]
+        self._offsets = columns.offset.tolist()
+        self._refs = columns.refs.tolist()
+        self._children_start = columns.children_start.tolist()
+        self._children = columns.children.tolist()
+        self._bytes: Dict[int, bytes] = {}
+
+    def read_section_bytes(self) -> None:
+        """Read the bytes of all the sections, coalescing adjacent ranges."""
+        rows = np.flatnonzero(self.columns.offset >= 0)
+        ranges = list(zip(self.columns.offset[rows].tolist(), self.columns.length[rows].tolist()))
+        views = self.byte_reader.read_many(ranges)
+        self._bytes = {row: bytes(view) for row, view in zip(rows.tolist(), views)}
+
+    def load(self) -> List[Element]:
+        """Create all the elements, in row order."""
+        self.read_section_bytes()
+        for row in range(len(self.elements)):
+            self.get(row)
+        self._bytes = {}
+        return self.elements
+
+    def get(self, row: int) -> Element:
+        """The element of the row, created on first access."""
+        element = self.elements[row]
+        if element is None:
+            element = self._create(row)
+        return element
+
+    def _ref(self, row: int, index: int) -> Optional[Element]:
+        ref = self._refs[row][index]
+        return None if ref < 0 else self.get(ref)
+
+    def _create(self, row: int) -> Element:
+        element_class = self._classes[row]
+        uid = UUID(bytes=self._uid_bytes[row * 16:row * 16 + 16])
+        offset = self._offsets[row]
+
+        # as the classes' from_xdata + resolve_dependencies do
+        if element_class is Paragraph:
+            element = Paragraph(offset, self._bytes.pop(row), self._ref(row, 0), uid=uid)
+        elif element_class is Fragment:
+            element = Fragment(self._ref(row, 0), offset, self._bytes.pop(row), uid=uid)
+        elif element_class is Section or element_class is Header:
+            element = element_class(offset, self._bytes.pop(row), uid=uid)
+        elif element_class is Article:
+            # the paragraphs append themselves to a new body, as in Article.from_xdata
+            element = Article(self._ref(row, 0), uid=uid)
+        elif element_class is Segment:
+            element = Segment(self._ref(row, 0), uid=uid)
+        elif element_class is ListContainer:
+            element = ListContainer(uid=uid)
+        else:
+            element = ExtendedSegment(self._ref(row, 0), uid=uid)
+        self.elements[row] = element
+
+        if element_class is ListContainer or element_class is Segment:
+            start, stop = self._children_start[row], self._children_start[row + 1]
+            for child in self._children[start:stop]:
+                element.append_element(self.get(child))
+        elif element_class is ExtendedSegment:
+            before_overlap = self._ref(row, 1)
+            if before_overlap is not None:
+                element.before_overlap = before_overlap
+            after_overlap = self._ref(row, 2)
+            if after_overlap is not None:
+                element.after_overlap = after_overlap
+        return element
+
+
+class BinaryStore:
+    """
+    A binary (npz) element store, see the module docstring.
+    Has the interface of Store.
+    """
+
+    def __init__(self, single_store: bool = True) -> None:
+        """
+        Initialize the store.
+        Args:
+            single_store: if true, when loading elements, assert Element.instances is empty
+        """
+        self.single_store = single_store
+
+    def store_elements(self, path: Path, elements: Sequence[Element], append: bool = False) -> None:
+        """
+        Store elements in the store.
+        Args:
+            path: The store file.
+            elements: The elements to store.
+            append: Append the elements to an existing store file, they may reference its
+                elements.
+        """
+        base = ElementColumns.load(path) if append and Path(path).exists() else None
+        ElementColumns.from_elements(elements, base).save(path)
+
+    def load_elements(
+        self,
+        text_file_path: Path,
+        element_store_path: Path
+    ) -> List[Element]:
+        """Load elements from a file using a byte reader."""
+        text_byte_reader = create_byte_reader(text_file_path)
+        return self.load_elements_byte_reader(text_byte_reader, element_store_path)
+
+    def load_elements_byte_reader(
+        self,
+        text_byte_reader: ByteReader,
+        element_store_path: Path
+    ) -> List[Element]:
+        """Load elements from a file using a byte reader, returns them in store order."""
+        if self.single_store:
+            assert len(Element.instances) == 0, "Store already contains elements"
+        columns = ElementColumns.load(element_store_path)
+        elements = ElementLoader(columns, text_byte_reader).load()
+        logger.debug("loaded %d elements from %s", len(elements), element_store_path)
+        return elements
+
+
+def create_element_store(path: Path, single_store: bool = True) -> Union[Store, BinaryStore]:
+    """The element store of the file: BinaryStore for .npz files, Store (JSON) otherwise."""
+    if Path(path).suffix == ".npz":
+        return BinaryStore(single_store)
+    return Store(single_store)
@@ -10,7 +10,10 @@ from gen.element.element import Element
 class Container(Element, ABC):
     """
     Container is an element that contains (group) other elements.
+    The concatenated bytes/text and the lengths are memoized, see reset() and invalidate().
     """
+    __slots__ = ("__bytes", "__text", "__clean_text", "__byte_length", "__char_length")
+
     def __init__(self, uid: Optional[UUID] = None) -> None:
         """
         Initialize the container.
@@ -23,6 +26,8 @@ class Container(Element, ABC):
         self.__bytes: Union[bytes, None] = None
         self.__text: Union[str, None] = None
         self.__clean_text: Union[str, None] = None
+        self.__byte_length: Union[int, None] = None
+        self.__char_length: Union[int, None] = None
 
     @property
     @abstractmethod
@@ -72,16 +77,18 @@ class Container(Element, ABC):
         """
         The byte length of the container.
         """
-        byte_length = sum(element.byte_length for element in self.elements)
-        return byte_length
+        if self.__byte_length is None:
+            self.__byte_length = sum(element.byte_length for element in self.elements)
+        return self.__byte_length
 
     @property
     def char_length(self) -> int:
         """
         The character length of the container.
         """
-        char_length = sum(element.char_length for element in self.elements)
-        return char_length
+        if self.__char_length is None:
+            self.__char_length = sum(element.char_length for element in self.elements)
+        return self.__char_length
 
     @property
     def clean_length(self) -> int:
@@ -93,13 +100,21 @@ class Container(Element, ABC):
 
     def reset(self) -> None:
         """
-        Reset the memoizations of the container.
+        Reset the memoizations of the container and its elements.
         """
         for element in self.elements:
             element.reset()
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """
+        Reset the memoizations of the container only, when its list of elements changes.
+        """
         self.__bytes = None
         self.__text = None
         self.__clean_text = None
+        self.__byte_length = None
+        self.__char_length = None
 
     @property
     def element_count(self) -> int:
@@ -1,10 +1,11 @@
 """
 Define Element, an abstract base class for all elements.
 """
-from typing import TYPE_CHECKING, Tuple, Optional, Dict
+from typing import TYPE_CHECKING, Tuple, Optional, Dict, Iterator
 import re
 import unicodedata
 from abc import ABC
+from contextlib import contextmanager
 from uuid import UUID, uuid4
 
 from xutils.encoding_utils import EncodingUtils
@@ -24,18 +25,46 @@ class Element(ABC):
     - byte_length: the length of the element in bytes
     - char_length: the length of the element in characters
     - clean_length: the length of the element in characters after normalizing the text
+
+    Elements are slotted (no per-instance __dict__), an index holds millions of them.
+    Subclasses declare __slots__ for their attributes.
+
+    New elements are registered by uid in Element.instances, where xdata references are
+    resolved. It is process-wide unless scoped with use_registry().
     """
+    __slots__ = ("uid",)
+
     CLEAN_TEXT_PATTERN = r'[^a-zA-Z0-9\s,.!?\'"-]+'
     CLEAN_TEXT_REGEX = re.compile(CLEAN_TEXT_PATTERN)
 
     instances: Dict[UUID, 'Element'] = {}
 
+    # the element classes by xdata class name, see hierarchy_from_xdata()
+    _xdata_classes: Dict[str, type] = {}
+
     def __init__(self, uid: Optional[UUID] = None):
         if uid is None:
             uid = uuid4()
         self.uid = uid
         Element.instances[uid] = self
 
+    @staticmethod
+    @contextmanager
+    def use_registry(
+        registry: Optional[Dict[UUID, 'Element']] = None
+    ) -> Iterator[Dict[UUID, 'Element']]:
+        """
+        Register the elements created in the context, and resolve references, in the given
+        registry (a new one by default) instead of the enclosing one, which is restored on
+        exit. The registry is dropped with its elements when no longer referenced.
+        """
+        previous = Element.instances
+        Element.instances = {} if registry is None else registry
+        try:
+            yield Element.instances
+        finally:
+            Element.instances = previous
+
     def __str__(self):
         return f"{self.__class__.__name__} (uid={self.uid})"
 
@@ -51,10 +80,15 @@ class Element(ABC):
     def hierarchy_from_xdata(cls, xdata: dict, byte_reader: ByteReader):
         """
         Create an element from xdata.
+        The class is looked up in the subclass hierarchy once per class name.
         """
+        element_class = Element._xdata_classes.get(xdata['class'])
+        if element_class is not None:
+            return element_class.from_xdata(xdata, byte_reader)
         result = Element._hierarchy_from_xdata(xdata, byte_reader)
         if result is None:
             raise ValueError(f"Unknown class: {xdata['class']}")
+        Element._xdata_classes[xdata['class']] = type(result)
         return result
 
     @classmethod
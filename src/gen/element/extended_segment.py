@@ -13,6 +13,8 @@ class ExtendedSegment(Container):
     """
     ExtendedSegment is a container of a segment and its (optional) overlaps.
     """
+    __slots__ = ("_before_overlap", "_segment", "_after_overlap")
+
     def __init__(self, segment: Segment, uid: Optional[UUID] = None) -> None:
         """
         Initialize the ExtendedSegment.
@@ -13,6 +13,9 @@ class FlatArticle(Element):
     A flat article is a flat representation of an article.
     It holds the body text as a whole, not broken into paragraphs.
     """
+    __slots__ = ("_header_offset", "_header_byte_length", "_body_offset", "_body_byte_length",
+                 "_byte_reader", "__header_bytes", "__body_bytes", "header", "body")
+
     def __init__(
         self,
         uid: UUID,
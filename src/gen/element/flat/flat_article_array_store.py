@@ -0,0 +1,276 @@
+"""
+An array-backed store for flat articles.
+
+FlatArticleStore loads the flat articles as Element objects (two AttributeProxy objects
+per article, registered in Element.instances). For large data sets (wikipedia) this means
+millions of objects and a slow startup.
+
+FlatArticleArrayStore keeps the header/body offsets and lengths in numpy columns and hands
+out lightweight FlatArticleView objects on access.
+"""
+import json
+import logging
+from uuid import UUID
+from pathlib import Path
+from typing import Iterator, Optional
+import numpy as np
+from numpy.typing import NDArray
+
+from gen.data.document_store import DocumentStore
+from xutils.byte_reader import ByteReader
+from xutils.attribute_proxy import AttributeProxy
+
+logger = logging.getLogger(__name__)
+
+
+class FlatArticleColumns:
+    """
+    The columns of the flat articles: uids, header offset / byte length, body offset / byte length.
+    Row i describes the i-th article in the flat articles file.
+    """
+    COLUMN_NAMES = (
+        "header_offset",
+        "header_byte_length",
+        "body_offset",
+        "body_byte_length",
+    )
+
+    def __init__(
+        self,
+        uids: NDArray,
+        header_offset: NDArray,
+        header_byte_length: NDArray,
+        body_offset: NDArray,
+        body_byte_length: NDArray
+    ) -> None:
+        """
+        Initialize the columns.
+        Args:
+            uids: (N, 16) uint8 array of the uuids' bytes (UUID.bytes)
+            header_offset: (N,) int64 array
+            header_byte_length: (N,) int64 array
+            body_offset: (N,) int64 array
+            body_byte_length: (N,) int64 array
+        """
+        self.uids = uids
+        self.header_offset = header_offset
+        self.header_byte_length = header_byte_length
+        self.body_offset = body_offset
+        self.body_byte_length = body_byte_length
+
+    def __len__(self) -> int:
+        return len(self.header_offset)
+
+    @property
+    def end_offset(self) -> int:
+        """The offset following the last article, where appended articles start."""
+        if len(self) == 0:
+            return 0
+        return int(np.max(self.body_offset + self.body_byte_length))
+
+    @classmethod
+    def from_handle(cls, file) -> "FlatArticleColumns":
+        """
+        Build the columns from a flat articles (json lines) file handle.
+        """
+        uids = []
+        columns = {name: [] for name in cls.COLUMN_NAMES}
+        for line in file:
+            xdata = json.loads(line)
+            uids.append(UUID(xdata["uid"]).bytes)
+            for name in cls.COLUMN_NAMES:
+                columns[name].append(xdata[name])
+
+        return cls(
+            uids=np.frombuffer(b"".join(uids), dtype=np.uint8).reshape(-1, 16),
+            **{name: np.array(values, dtype=np.int64) for name, values in columns.items()}
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "FlatArticleColumns":
+        """Load the columns from a npz file."""
+        with np.load(path) as data:
+            columns = cls(
+                uids=data["uids"],
+                **{name: data[name] for name in cls.COLUMN_NAMES}
+            )
+        return columns
+
+    def save(self, path: Path) -> None:
+        """Save the columns to a npz file."""
+        np.savez(
+            path,
+            uids=self.uids,
+            **{name: getattr(self, name) for name in self.COLUMN_NAMES}
+        )
+
+
+class FlatArticleView:
+    """
+    A lightweight, read only, view of a flat article.
+    Provides the FlatArticle interface used by the search (header.text, offset, bytes, text).
+    """
+    __slots__ = ("_columns", "_index", "_byte_reader")
+
+    def __init__(self, columns: FlatArticleColumns, index: int, byte_reader: ByteReader) -> None:
+        self._columns = columns
+        self._index = index
+        self._byte_reader = byte_reader
+
+    @property
+    def uid(self) -> UUID:
+        """The uid of the article."""
+        return UUID(bytes=self._columns.uids[self._index].tobytes())
+
+    @property
+    def header(self) -> AttributeProxy:
+        """Access header properties as article.header.text etc."""
+        return AttributeProxy(self, '_header')
+
+    @property
+    def body(self) -> AttributeProxy:
+        """Access body properties as article.body.text etc."""
+        return AttributeProxy(self, '_body')
+
+    @property
+    def _header_offset(self) -> int:
+        return int(self._columns.header_offset[self._index])
+
+    @property
+    def _header_byte_length(self) -> int:
+        return int(self._columns.header_byte_length[self._index])
+
+    @property
+    def _header_bytes(self) -> bytes:
+        return self._byte_reader.read_bytes(self._header_offset, self._header_byte_length)
+
+    @property
+    def _header_text(self) -> str:
+        return self._header_bytes.decode('utf-8')
+
+    @property
+    def _header_char_length(self) -> int:
+        return len(self._header_text)
+
+    @property
+    def _body_offset(self) -> int:
+        return int(self._columns.body_offset[self._index])
+
+    @property
+    def _body_byte_length(self) -> int:
+        return int(self._columns.body_byte_length[self._index])
+
+    @property
+    def _body_bytes(self) -> bytes:
+        return self._byte_reader.read_bytes(self._body_offset, self._body_byte_length)
+
+    @property
+    def _body_text(self) -> str:
+        return self._body_bytes.decode('utf-8')
+
+    @property
+    def _body_char_length(self) -> int:
+        return len(self._body_text)
+
+    @property
+    def offset(self) -> int:
+        """The offset of the article (its header) in the text file."""
+        return self._header_offset
+
+    @property
+    def byte_length(self) -> int:
+        """The byte length of the article (header + body)."""
+        return self._header_byte_length + self._body_byte_length
+
+    @property
+    def bytes(self) -> bytes:
+        """The bytes of the article (header + body)."""
+        return self._header_bytes + self._body_bytes
+
+    @property
+    def text(self) -> str:
+        """The text of the article (header + body)."""
+        return self.bytes.decode('utf-8')
+
+
+class FlatArticleArray:
+    """
+    A read only sequence of flat articles backed by FlatArticleColumns.
+    Views are created on access and are not retained.
+    """
+    def __init__(self, columns: FlatArticleColumns, byte_reader: ByteReader) -> None:
+        self.columns = columns
+        self.byte_reader = byte_reader
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def __getitem__(self, index: int) -> FlatArticleView:
+        length = len(self.columns)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError(f"article index out of range: {index}")
+        return FlatArticleView(self.columns, index, self.byte_reader)
+
+    def __iter__(self) -> Iterator[FlatArticleView]:
+        for index in range(len(self.columns)):
+            yield FlatArticleView(self.columns, index, self.byte_reader)
+
+
+class FlatArticleArrayStore(DocumentStore):
+    """
+    An array-backed store for flat articles.
+    Reads the same flat articles file as FlatArticleStore. The parsed columns are cached
+    in a npz file next to it, subsequent loads read the npz file.
+    """
+    def __init__(
+        self,
+        path_prefix: str,
+        text_byte_reader: Optional[ByteReader] = None,
+        use_cache: bool = True
+    ) -> None:
+        self.flat_article_store_path = Path(f'{path_prefix}_flat_articles.json')
+        self.columns_cache_path = Path(f'{path_prefix}_flat_articles.npz')
+        self.text_byte_reader = text_byte_reader
+        self.use_cache = use_cache
+
+    def load_documents(self) -> FlatArticleArray:
+        """
+        Load the documents from this document store.
+        """
+        documents = self.load_flat_articles()
+        return documents
+
+    def load_flat_articles(self) -> FlatArticleArray:
+        """Load the flat articles as an array of views."""
+        if self.text_byte_reader is None:
+            raise ValueError("text_byte_reader is required to read flat articles")
+        columns = self.load_columns()
+        flat_articles = FlatArticleArray(columns, self.text_byte_reader)
+        return flat_articles
+
+    def load_columns(self) -> FlatArticleColumns:
+        """
+        Load the flat article columns, from the cache if it is up to date.
+        """
+        if self.is_cache_valid():
+            logger.debug("loading flat article columns from %s", self.columns_cache_path)
+            return FlatArticleColumns.load(self.columns_cache_path)
+
+        with open(self.flat_article_store_path, 'r', encoding='utf-8') as file:
+            columns = FlatArticleColumns.from_handle(file)
+
+        if self.use_cache:
+            columns.save(self.columns_cache_path)
+            logger.info("saved flat article columns to %s", self.columns_cache_path)
+
+        return columns
+
+    def is_cache_valid(self) -> bool:
+        """Is the npz cache present and newer than the flat articles file."""
+        if not self.use_cache or not self.columns_cache_path.exists():
+            return False
+        cache_mtime = self.columns_cache_path.stat().st_mtime
+        store_mtime = self.flat_article_store_path.stat().st_mtime
+        return cache_mtime >= store_mtime
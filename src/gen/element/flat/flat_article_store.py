@@ -49,3 +49,8 @@ class FlatArticleStore:
         """Write the flat articles to the flat article store."""
         flat_article_store_path = self.flat_article_store_path
         self.store.store_elements(flat_article_store_path, flat_articles)
+
+    def append_flat_articles(self, flat_articles: List[FlatArticle]):
+        """Append flat articles, e.g. of appended text, to the flat article store."""
+        flat_article_store_path = self.flat_article_store_path
+        self.store.store_elements(flat_article_store_path, flat_articles, append=True)
@@ -13,6 +13,8 @@ class FlatExtendedSegment(Element):
     FlatExtendedSegment is a flat representation of an ExtendedSegment.
     It has the header and the text (not broken into paragraphs).
     """
+    __slots__ = ("article_uid", "_offset", "_byte_length", "_byte_reader", "_bytes")
+
     def __init__(
         self,
         uid: UUID,
@@ -11,6 +11,8 @@ class Fragment(Section):
     """
     Fragment is a fragment of a section. It adds a parent section attribute.
     """
+    __slots__ = ("parent",)
+
     def __init__(self, parent: Element, offset: int, _bytes: bytes, uid: UUID = None):
         """
         Initialize the fragment.
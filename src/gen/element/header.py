@@ -10,4 +10,4 @@ class Header(Section):
     Header element.
     Captures the article's title.
     """
-    pass
+    __slots__ = ()
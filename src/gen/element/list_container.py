@@ -11,6 +11,8 @@ class ListContainer(Container):
     """
     ListContainer is a container that contains a list of elements.
     """
+    __slots__ = ("_elements",)
+
     def __init__(self, element: Optional[Element] = None, uid: Optional[UUID] = None):
         """
         Initialize the list container.
@@ -28,6 +30,7 @@ class ListContainer(Container):
         assert isinstance(element, Element), f'element must be an Element (got {type(element)})'
 
         self._elements.append(element)
+        self.invalidate()
 
     @property
     def offset(self) -> int:
@@ -15,6 +15,8 @@ class Paragraph(Section):
     """
     A paragraph is a section of an article.
     """
+    __slots__ = ("article",)
+
     def __init__(self, offset: int, _bytes: bytes, article: 'Article', uid: UUID = None):
         """
         Initialize the paragraph.
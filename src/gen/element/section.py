@@ -17,6 +17,7 @@ class Section(Element):
     A section is a single concrete element. It has an offset and bytes.
     The other properties are derived.
     """
+    __slots__ = ("_offset", "_bytes", "__text", "__clean_text")
 
     def __init__(self, offset: int, _bytes: bytes, uid: Optional[UUID] = None) -> None:
         """
@@ -15,6 +15,8 @@ class Segment(ListContainer):
     A segment is a chunk of text that fits (along with its overlaps, see ExtendedSegment)
     into the model context window.
     """
+    __slots__ = ("article",)
+
     def __init__(self, article: Article, element: Optional[Element] = None,
                  uid: Optional[UUID] = None):
         """
@@ -37,11 +37,16 @@ class Store:
         """
         self.single_store = single_store
 
-    def store_elements(self, path: Path, elements: list[Element]) -> None:
+    def store_elements(self, path: Path, elements: list[Element], append: bool = False) -> None:
         """
         Store elements in the store.
+        Args:
+            path: The store file.
+            elements: The elements to store.
+            append: Append the elements to an existing store file.
         """
-        with open(path, 'w', encoding='utf-8') as file:
+        mode = 'a' if append else 'w'
+        with open(path, mode, encoding='utf-8') as file:
             self.write_elements_to_handle(file, elements)
 
     def write_elements_to_handle(self, file, elements: list[Element]) -> None:
@@ -0,0 +1,192 @@
+"""
+Embedding reuse across segment rebuilds.
+
+Re-running build_wiki_segments.py (a corpus refresh, overlap tweaks) produces new segment
+indexes, but most segments have the same bytes as in the previous build. The cache maps a
+content key, a hash of (model key, max_len, segment bytes), to the segment's embedding so
+only new or changed segments are sent to the model.
+
+Layout of the cache directory, one part per flush:
+    part_<time>_<pid>_<n>.embeddings.npy   - (n, dim) embeddings
+    part_<time>_<pid>_<n>.keys.npy         - (n,) 16 byte content keys, written last
+
+Parts are only ever added, so concurrent encoders (e.g. the workers of a work queue) can
+share a cache directory. The embeddings are memory mapped, only the keys are loaded.
+"""
+import os
+import time
+import hashlib
+import logging
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+import numpy as np
+from numpy.typing import NDArray
+from gen.gen_metrics import CACHE_REQUESTS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+KEY_DTYPE = np.dtype("S16")
+
+EncodeFunction = Callable[[List[str]], NDArray]
+
+
+class EmbeddingReuseCache:
+    """
+    A content-addressed, append-only cache of segment embeddings.
+    """
+    KEYS_SUFFIX = ".keys.npy"
+    EMBEDDINGS_SUFFIX = ".embeddings.npy"
+
+    def __init__(self, cache_dir: Path, model_key: str, max_len: int):
+        """
+        Initialize the cache.
+        Args:
+            cache_dir: The cache directory, it may be shared by several models and max_lens.
+            model_key: Identifies the model (and quantization) that produces the embeddings.
+            max_len: The max segment length, part of the content key.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.model_key = model_key
+        self.max_len = max_len
+
+        self._sorted_keys: Optional[NDArray] = None
+        self._sorted_parts: Optional[NDArray] = None
+        self._sorted_rows: Optional[NDArray] = None
+        self._part_embeddings: List[NDArray] = []
+
+        self._pending_keys: List[NDArray] = []
+        self._pending_embeddings: List[NDArray] = []
+        self._flush_count = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def make_keys(self, texts: Sequence[str]) -> NDArray:
+        """The content keys of the texts."""
+        prefix = f"{self.model_key}\0{self.max_len}\0".encode("utf-8")
+        keys = np.empty(len(texts), dtype=KEY_DTYPE)
+        for i, text in enumerate(texts):
+            digest = hashlib.blake2b(prefix, digest_size=KEY_DTYPE.itemsize)
+            digest.update(text.encode("utf-8"))
+            keys[i] = digest.digest()
+        return keys
+
+    def load(self) -> None:
+        """Index the keys of the cache parts, the embeddings are memory mapped."""
+        keys_list = []
+        parts_list = []
+        self._part_embeddings = []
+        paths = sorted(self.cache_dir.glob(f"part_*{self.KEYS_SUFFIX}"))
+        for path in paths:
+            embeddings_path = path.with_name(
+                path.name[:-len(self.KEYS_SUFFIX)] + self.EMBEDDINGS_SUFFIX)
+            keys = np.load(path)
+            embeddings = np.load(embeddings_path, mmap_mode="r")
+            if len(keys) != len(embeddings):
+                logger.warning("skipping inconsistent cache part %s", path)
+                continue
+            keys_list.append(keys.astype(KEY_DTYPE, copy=False))
+            parts_list.append(np.full(len(keys), len(self._part_embeddings), dtype=np.int32))
+            self._part_embeddings.append(embeddings)
+
+        if keys_list:
+            all_keys = np.concatenate(keys_list)
+            all_parts = np.concatenate(parts_list)
+            all_rows = np.concatenate([np.arange(len(keys)) for keys in keys_list])
+        else:
+            all_keys = np.empty(0, dtype=KEY_DTYPE)
+            all_parts = np.empty(0, dtype=np.int32)
+            all_rows = np.empty(0, dtype=np.int64)
+
+        order = np.argsort(all_keys, kind="stable")
+        self._sorted_keys = all_keys[order]
+        self._sorted_parts = all_parts[order]
+        self._sorted_rows = all_rows[order]
+        logger.info("embedding reuse cache %s: %d entries in %d parts",
+                    self.cache_dir, len(all_keys), len(self._part_embeddings))
+
+    def lookup(self, keys: NDArray) -> Tuple[NDArray, Optional[NDArray]]:
+        """
+        Look up content keys.
+        Returns (hit mask, the embeddings of the hits in keys order or None if no hits).
+        """
+        if self._sorted_keys is None:
+            self.load()
+
+        sorted_keys = self._sorted_keys
+        if len(sorted_keys) == 0 or len(keys) == 0:
+            return np.zeros(len(keys), dtype=bool), None
+
+        positions = np.searchsorted(sorted_keys, keys)
+        positions = np.minimum(positions, len(sorted_keys) - 1)
+        hit_mask = sorted_keys[positions] == keys
+        if not hit_mask.any():
+            return hit_mask, None
+
+        hit_positions = positions[hit_mask]
+        hit_parts = self._sorted_parts[hit_positions]
+        hit_rows = self._sorted_rows[hit_positions]
+        example = self._part_embeddings[hit_parts[0]]
+        embeddings = np.empty((len(hit_positions), example.shape[1]), dtype=example.dtype)
+        for part in np.unique(hit_parts):
+            part_mask = hit_parts == part
+            embeddings[part_mask] = self._part_embeddings[part][hit_rows[part_mask]]
+        return hit_mask, embeddings
+
+    def add(self, keys: NDArray, embeddings: NDArray) -> None:
+        """Add entries, they are written on flush()."""
+        if len(keys) == 0:
+            return
+        self._pending_keys.append(np.asarray(keys, dtype=KEY_DTYPE))
+        self._pending_embeddings.append(np.asarray(embeddings))
+
+    def flush(self) -> None:
+        """Write the pending entries as a new part."""
+        if not self._pending_keys:
+            return
+        keys = np.concatenate(self._pending_keys)
+        embeddings = np.concatenate(self._pending_embeddings)
+        self._pending_keys.clear()
+        self._pending_embeddings.clear()
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._flush_count += 1
+        stem = f"part_{time.time_ns()}_{os.getpid()}_{self._flush_count}"
+        # the keys file marks a complete part, write it last
+        for suffix, array in ((self.EMBEDDINGS_SUFFIX, embeddings), (self.KEYS_SUFFIX, keys)):
+            path = self.cache_dir / f"{stem}{suffix}"
+            temp_path = self.cache_dir / f"{stem}.tmp{suffix}"
+            np.save(temp_path, array)
+            os.replace(temp_path, path)
+        logger.info("embedding reuse cache: flushed %d entries", len(keys))
+
+    def encode(self, texts: List[str], encode: EncodeFunction) -> NDArray:
+        """
+        Encode texts, reusing cached embeddings and encoding only the misses.
+        The misses are added to the cache.
+        """
+        if not texts:
+            return np.asarray(encode(texts))
+
+        keys = self.make_keys(texts)
+        hit_mask, hit_embeddings = self.lookup(keys)
+        miss_indexes = np.flatnonzero(~hit_mask)
+        self.hits += len(keys) - len(miss_indexes)
+        self.misses += len(miss_indexes)
+        CACHE_REQUESTS_TOTAL.labels("embedding_reuse", "hit").inc(len(keys) - len(miss_indexes))
+        CACHE_REQUESTS_TOTAL.labels("embedding_reuse", "miss").inc(len(miss_indexes))
+
+        if len(miss_indexes) == 0:
+            return hit_embeddings
+
+        miss_embeddings = np.asarray(encode([texts[i] for i in miss_indexes]))
+        self.add(keys[miss_indexes], miss_embeddings)
+
+        if hit_embeddings is None:
+            return miss_embeddings
+
+        embeddings = np.empty((len(texts), miss_embeddings.shape[1]),
+                              dtype=miss_embeddings.dtype)
+        embeddings[miss_indexes] = miss_embeddings
+        embeddings[hit_mask] = hit_embeddings
+        return embeddings
@@ -2,13 +2,13 @@
 Utility class for embedding operations.
 """
 import logging
-from typing import Optional, Literal
+from typing import Optional, Literal, Tuple
 import numpy as np
 from numpy.typing import NDArray
 from xutils.embedding_config import EmbeddingConfig
 from xutils.timer import LoggingTimer, log_timeit
 
-TargetStype = Optional[Literal["float32", "float16", "int8", "uint8"]]
+TargetStype = Optional[Literal["float32", "float16", "int8", "uint8", "binary"]]
 
 logger = logging.getLogger(__name__)
 
@@ -117,6 +117,8 @@ class EmbeddingUtils:
                     quantized_embeddings = np.round(embeddings * 127).astype(np.int8)
                 elif stype == "uint8":
                     quantized_embeddings = np.round((embeddings + 1) * 127.5).astype(np.uint8)
+                elif stype == "binary":
+                    quantized_embeddings = EmbeddingUtils.binarize_embeddings(embeddings)
                 else:
                     raise ValueError(f"Unknown stype: {stype}")
 
@@ -152,3 +154,64 @@ class EmbeddingUtils:
         norms = np.linalg.norm(embeddings, axis=1)
         result = np.all(np.abs(norms - 1) < tolerance)
         return result
+
+    @staticmethod
+    def binarize_embeddings(embeddings: NDArray) -> NDArray:
+        """
+        Keep the sign bit of each dimension, packed 8 dimensions per byte: (n, ceil(dim / 8)).
+        Accepts float, int8 and (zero point 127.5) uint8 embeddings.
+        """
+        threshold = 127 if embeddings.dtype == np.uint8 else 0
+        return np.packbits(embeddings > threshold, axis=1)
+
+    @staticmethod
+    def unpack_binary_embeddings(binary_embeddings: NDArray, dim: int) -> NDArray:
+        """
+        Unpack binary embeddings to L2 normalized +-1/sqrt(dim) float32 embeddings.
+        The cosine similarity of unpacked embeddings is 1 - 2 * hamming_distance / dim.
+        """
+        bits = np.unpackbits(binary_embeddings, axis=1, count=dim)
+        signs = bits.astype(np.float32) * 2 - 1
+        return signs / np.float32(np.sqrt(dim))
+
+    @staticmethod
+    def dequantize_embeddings(embeddings: NDArray) -> NDArray:
+        """Map quantized int8/uint8 embeddings back to float32 (unit scale)."""
+        if embeddings.dtype == np.int8:
+            result = embeddings.astype(np.float32) / 127
+        elif embeddings.dtype == np.uint8:
+            result = embeddings.astype(np.float32) / 127.5 - 1
+        else:
+            result = embeddings.astype(np.float32, copy=False)
+        return result
+
+    @staticmethod
+    def pool_embeddings(
+        embeddings: NDArray,
+        group_indexes: NDArray,
+        pooling: str = "mean"
+    ) -> Tuple[NDArray, NDArray]:
+        """
+        Pool the embeddings of each group, e.g. the segments of each document, by their
+        sum, mean or element-wise max.
+        Returns the ascending group indexes and their (float32) pooled embeddings.
+        """
+        if pooling not in ("sum", "mean", "max"):
+            raise ValueError(f"Unknown pooling: {pooling}")
+        group_indexes = np.asarray(group_indexes)
+        embeddings = embeddings.astype(np.float32, copy=False)
+        if len(group_indexes) == 0:
+            return group_indexes, np.empty((0, embeddings.shape[1]), dtype=np.float32)
+        if np.any(np.diff(group_indexes) < 0):
+            order = np.argsort(group_indexes, kind="stable")
+            group_indexes, embeddings = group_indexes[order], embeddings[order]
+        starts = np.flatnonzero(np.diff(group_indexes, prepend=-1))
+
+        if pooling == "max":
+            pooled = np.maximum.reduceat(embeddings, starts, axis=0)
+        else:
+            pooled = np.add.reduceat(embeddings, starts, axis=0)
+            if pooling == "mean":
+                counts = np.diff(np.append(starts, len(group_indexes)))
+                pooled /= counts[:, None]
+        return group_indexes[starts], pooled.astype(np.float32, copy=False)
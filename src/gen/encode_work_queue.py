@@ -0,0 +1,280 @@
+"""
+A lease-based work queue and embedding shards for multi-worker encoding.
+
+The coordinator splits the segment indexes into ranges and puts them in a sqlite queue.
+Workers (processes on one or several machines sharing a filesystem) lease a range, encode
+it, write an embedding shard for it and mark the range done. A lease expires unless it is
+renewed, so the range of a crashed worker is picked up by another worker.
+When all ranges are done the shards are merged, in segment order, into the embedding store.
+
+Note: sqlite relies on file locks, on a network filesystem make sure locking is supported
+(e.g. NFSv4 with locking enabled).
+"""
+import os
+import time
+import socket
+import sqlite3
+import logging
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+import numpy as np
+from numpy.typing import NDArray
+
+from gen.embedding_store import EmbeddingStore
+
+logger = logging.getLogger(__name__)
+
+
+class Lease(NamedTuple):
+    """A leased range of segment indexes [start, stop)."""
+    range_id: int
+    start: int
+    stop: int
+    worker_id: str
+
+
+class LeaseQueue:
+    """
+    A sqlite-backed queue of segment index ranges handed out as expiring leases.
+    """
+    PENDING = "pending"
+    LEASED = "leased"
+    DONE = "done"
+
+    def __init__(self, path: Path, timeout: float = 60.0):
+        """
+        Initialize the queue.
+        Args:
+            path: The sqlite database file.
+            timeout: How long to wait for the database lock.
+        """
+        self.path = Path(path)
+        self.timeout = timeout
+
+    def _connect(self, create: bool = False) -> sqlite3.Connection:
+        """
+        Open a connection, transactions are managed explicitly.
+        Only the coordinator creates the database, a worker fails if it does not exist.
+        """
+        mode = "rwc" if create else "rw"
+        connection = sqlite3.connect(
+            f"{self.path.resolve().as_uri()}?mode={mode}",
+            timeout=self.timeout,
+            isolation_level=None,
+            uri=True
+        )
+        return connection
+
+    def exists(self) -> bool:
+        """Was the queue initialized (and not yet removed)."""
+        return self.path.exists()
+
+    def initialize(self, start: int, stop: int, range_size: int) -> None:
+        """
+        Create the ranges [start, stop) in steps of range_size.
+        A queue that was already initialized (e.g. a restarted coordinator) is kept as is.
+        """
+        if range_size <= 0:
+            raise ValueError(f"range_size must be positive: {range_size}")
+
+        connection = self._connect(create=True)
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS ranges ("
+                " range_id INTEGER PRIMARY KEY,"
+                " start INTEGER NOT NULL,"
+                " stop INTEGER NOT NULL,"
+                " state TEXT NOT NULL,"
+                " worker_id TEXT,"
+                " lease_expires REAL,"
+                " attempts INTEGER NOT NULL DEFAULT 0)"
+            )
+            count, = connection.execute("SELECT COUNT(*) FROM ranges").fetchone()
+            if count == 0:
+                rows = [
+                    (range_id, range_start, min(range_start + range_size, stop), self.PENDING)
+                    for range_id, range_start in enumerate(range(start, stop, range_size))
+                ]
+                connection.executemany(
+                    "INSERT INTO ranges (range_id, start, stop, state) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                logger.info("work queue %s: %d ranges created", self.path, len(rows))
+            else:
+                logger.info("work queue %s: already initialized (%d ranges)", self.path, count)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    def acquire(self, worker_id: str, lease_seconds: float) -> Optional[Lease]:
+        """
+        Lease the first pending (or expired) range.
+        Returns None when no range is available right now.
+        """
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT range_id, start, stop FROM ranges"
+                " WHERE state = ? OR (state = ? AND lease_expires < ?)"
+                " ORDER BY range_id LIMIT 1",
+                (self.PENDING, self.LEASED, now)
+            ).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+
+            range_id, start, stop = row
+            connection.execute(
+                "UPDATE ranges SET state = ?, worker_id = ?, lease_expires = ?,"
+                " attempts = attempts + 1 WHERE range_id = ?",
+                (self.LEASED, worker_id, now + lease_seconds, range_id)
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+        return Lease(range_id, start, stop, worker_id)
+
+    def renew(self, lease: Lease, lease_seconds: float) -> bool:
+        """
+        Extend a lease. Returns False if the lease was lost (expired and taken by another
+        worker), in which case the worker should abandon the range.
+        """
+        return self._update_owned(
+            lease,
+            "UPDATE ranges SET lease_expires = ?"
+            " WHERE range_id = ? AND worker_id = ? AND state = ?",
+            (time.time() + lease_seconds, lease.range_id, lease.worker_id, self.LEASED)
+        )
+
+    def complete(self, lease: Lease) -> bool:
+        """
+        Mark a leased range done. Returns False if the lease was lost.
+        """
+        return self._update_owned(
+            lease,
+            "UPDATE ranges SET state = ?, lease_expires = NULL"
+            " WHERE range_id = ? AND worker_id = ? AND state = ?",
+            (self.DONE, lease.range_id, lease.worker_id, self.LEASED)
+        )
+
+    def _update_owned(self, lease: Lease, sql: str, params: tuple) -> bool:
+        """Run an update that only applies if the lease is still owned by its worker."""
+        connection = self._connect()
+        try:
+            cursor = connection.execute(sql, params)
+            updated = cursor.rowcount == 1
+        finally:
+            connection.close()
+        if not updated:
+            logger.warning("lease lost: %s", lease)
+        return updated
+
+    def status(self) -> Dict[str, int]:
+        """The number of ranges per state."""
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                "SELECT state, COUNT(*) FROM ranges GROUP BY state").fetchall()
+        finally:
+            connection.close()
+        status = {self.PENDING: 0, self.LEASED: 0, self.DONE: 0}
+        status.update(dict(rows))
+        return status
+
+    def is_done(self) -> bool:
+        """Are all the ranges done."""
+        status = self.status()
+        return status[self.PENDING] == 0 and status[self.LEASED] == 0
+
+    def ranges(self) -> List[Tuple[int, int]]:
+        """All the ranges (start, stop), in segment order."""
+        connection = self._connect()
+        try:
+            rows = connection.execute("SELECT start, stop FROM ranges ORDER BY start").fetchall()
+        finally:
+            connection.close()
+        return rows
+
+    def remove(self) -> None:
+        """Remove the queue, once its shards are merged."""
+        self.path.unlink(missing_ok=True)
+
+    @staticmethod
+    def default_worker_id() -> str:
+        """hostname:pid, unique across the machines sharing the queue."""
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class EmbeddingShardStore:
+    """
+    One npz shard (uids, embeddings) per range of segment indexes.
+    """
+    def __init__(self, shard_dir: Path):
+        self.shard_dir = Path(shard_dir)
+
+    def get_shard_path(self, start: int, stop: int) -> Path:
+        """The path of the shard of the range [start, stop)."""
+        return self.shard_dir / f"shard_{start:012d}_{stop:012d}.npz"
+
+    def write_shard(self, start: int, stop: int, uids: NDArray, embeddings: NDArray) -> Path:
+        """
+        Write a shard atomically (a re-leased range may be written twice).
+        """
+        if len(uids) != stop - start or len(embeddings) != stop - start:
+            raise ValueError(f"shard [{start}, {stop}) got {len(uids)} uids, "
+                             f"{len(embeddings)} embeddings")
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+        path = self.get_shard_path(start, stop)
+        temp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npz")
+        np.savez(temp_path, uids=uids, embeddings=embeddings)
+        os.replace(temp_path, path)
+        return path
+
+    def iter_shards(self, ranges: List[Tuple[int, int]]) -> Iterator[Tuple[NDArray, NDArray]]:
+        """Load the shards of the ranges, in order."""
+        for start, stop in ranges:
+            path = self.get_shard_path(start, stop)
+            if not path.exists():
+                raise FileNotFoundError(f"missing shard {path}")
+            with np.load(path) as data:
+                yield data["uids"], data["embeddings"]
+
+    def merge(self, ranges: List[Tuple[int, int]], embedding_store: EmbeddingStore) -> int:
+        """
+        Merge the shards, in segment order, into the embedding store.
+        The shards are added one at a time, so only one shard is in memory next to the store.
+        The ranges are checked for gaps and missing shards before any is added.
+        Returns the number of merged embeddings.
+        """
+        expected_start = ranges[0][0] if ranges else 0
+        for start, stop in ranges:
+            if start != expected_start:
+                raise ValueError(f"gap in ranges: expected {expected_start}, got {start}")
+            expected_start = stop
+            path = self.get_shard_path(start, stop)
+            if not path.exists():
+                raise FileNotFoundError(f"missing shard {path}")
+
+        count = 0
+        for uids, embeddings in self.iter_shards(ranges):
+            embedding_store.extend_embeddings(uids, embeddings)
+            count += len(uids)
+            del uids, embeddings
+        return count
+
+    def remove_shards(self, ranges: List[Tuple[int, int]]) -> None:
+        """Remove the shards of the ranges, once they are merged."""
+        for start, stop in ranges:
+            self.get_shard_path(start, stop).unlink(missing_ok=True)
+        if self.shard_dir.exists() and not any(self.shard_dir.iterdir()):
+            self.shard_dir.rmdir()
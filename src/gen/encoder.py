@@ -3,7 +3,8 @@ Encoder class for encoding sentences.
 Abstracts working with SentenceTransformer.
 """
 import logging
-from typing import List
+from threading import Lock
+from typing import List, Optional
 from numpy.typing import NDArray
 
 __import__("gen.encoder_helper")
@@ -17,7 +18,22 @@ encoder_configs = {
 
     # max-token * raw2cln * tok2char * char2byte -> max-byte
     # 256 tokens -> 256 * 1.05 * 3.9 * 1.05 -> 1100
-    "small": {"model_id": "all-MiniLM-L6-v2", "max_len": 256}
+    "small": {"model_id": "all-MiniLM-L6-v2", "max_len": 256},
+
+    # CPU query encoding with ONNX Runtime, see gen/onnx_encoder.py
+    # the model is exported from the local HF cache on first use
+    "big-onnx": {
+        "model_id": "nomic-ai/nomic-embed-text-v1.5", "max_len": 8192,
+        "backend": "onnx"
+    },
+    "big-onnx-int8": {
+        "model_id": "nomic-ai/nomic-embed-text-v1.5", "max_len": 8192,
+        "backend": "onnx", "quantize": "int8"
+    },
+    "small-onnx-int8": {
+        "model_id": "all-MiniLM-L6-v2", "max_len": 256,
+        "backend": "onnx", "quantize": "int8"
+    },
 }
 
 
@@ -34,23 +50,43 @@ class Encoder:
         self.encoder_config = encoder_configs[config_id]
         self.batch_size: int = batch_size
         self._model = None
+        # the encoder may be shared (see search.services.corpus_registry), load the model once
+        self._model_lock = Lock()
 
     def encode(self, sentences: List[str]) -> NDArray:
         """Encode sentences into embeddings."""
         query_embedding = self.model.encode(sentences, batch_size=self.batch_size)
         return query_embedding
 
+    @property
+    def model_key(self) -> str:
+        """Identifies the embeddings the model produces, e.g. for embedding reuse."""
+        model_key = self.encoder_config["model_id"]
+        quantize = self.encoder_config.get("quantize")
+        if quantize is not None:
+            model_key = f"{model_key}:{quantize}"
+        return model_key
+
     @property
     def model(self):
         """Get and memoize the model."""
         if self._model is None:
-            self._model = self.get_model()
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self.get_model()
         return self._model
 
     def get_model(self):
-        """Get the SentenceTransformer model by model_id."""
+        """Get the model by model_id, using the backend of the encoder config."""
         model_id = self.encoder_config["model_id"]
-        model = self._get_model(model_id)
+        backend = self.encoder_config.get("backend", "torch")
+        if backend == "torch":
+            model = self._get_model(model_id)
+        elif backend == "onnx":
+            quantize = self.encoder_config.get("quantize")
+            model = self._get_onnx_model(model_id, quantize)
+        else:
+            raise ValueError(f"Unknown encoder backend: {backend}")
         return model
 
     def _get_model(self, model_id: str):
@@ -65,6 +101,13 @@ class Encoder:
         )
         return model
 
+    def _get_onnx_model(self, model_id: str, quantize: Optional[str]):
+        """Get the ONNX Runtime model by model_id."""
+        # delay the import, onnxruntime is only needed for the onnx backend
+        from gen.onnx_encoder import OnnxSentenceModel
+        model = OnnxSentenceModel(model_id, quantize=quantize)
+        return model
+
     @staticmethod
     def get_device():
         """Get the PyTorch device cuda/cpu."""
@@ -0,0 +1,9 @@
+"""
+Metrics of the embedding generation and its caches, exposed at /metrics (see web.metrics_router).
+"""
+from prometheus_client import Counter
+
+CACHE_REQUESTS_TOTAL = Counter(
+    "wiki_rag_cache_requests_total",
+    "Cache lookups by cache and result (hit/miss).",
+    ["cache", "result"])
@@ -16,13 +16,33 @@ class IndexBuilderPlots:
     PlotRecord holds the plot's index, title, offset, and byte length.
     """
     LOG_INTERVAL = 10000
+    END_OF_PLOT = b'<EOS>\n'
 
     def __init__(
         self,
-        plots_dir: Path
+        plots_dir: Path,
+        start_offset: int = 0,
+        start_index: int = 0
     ):
+        """
+        Args:
+            plots_dir: The directory of the plots and titles files.
+            start_offset: Index the plots from this offset, used to index plots appended
+                to already indexed plots (see get_end_offset).
+            start_index: The index of the first plot to index, the index of its title.
+        """
         super().__init__()
         self.plots_dir = plots_dir
+        self.start_offset = start_offset
+        self.start_index = start_index
+
+    @classmethod
+    def get_end_offset(cls, plot_record_list: List[PlotRecord]) -> int:
+        """The offset following the last indexed plot (and its end of plot line)."""
+        if not plot_record_list:
+            return 0
+        last = plot_record_list[-1]
+        return last.offset + last.byte_length + len(cls.END_OF_PLOT)
 
     def build_index(self) -> List[PlotRecord]:
         """
@@ -37,6 +57,8 @@ class IndexBuilderPlots:
             titles = titles_file.read().splitlines()
 
         with open(plots_file_path, "rb") as plots_handle:
+            if self.start_offset:
+                plots_handle.seek(self.start_offset)
             return self._build_index(titles, plots_handle)
 
     def _build_index(self, titles: List[str], plots_handle):
@@ -64,8 +86,8 @@ class IndexBuilderPlots:
             if not line:
                 break
 
-            elif line == b'<EOS>\n':
-                uid = len(plot_record_list)
+            elif line == self.END_OF_PLOT:
+                uid = self.start_index + len(plot_record_list)
                 title = titles[uid]
                 plot_record = PlotRecord(uid, title, offset, byte_length)
                 plot_record_list.append(plot_record)
@@ -84,9 +84,17 @@ class IndexBuilderWiki:
     PARAGRAPH_PATTERN = br'[\r\n]*[^\r\n]+[\r\n]+'
     PARAGRAPH_REGEX = re.compile(PARAGRAPH_PATTERN)
 
-    def __init__(self, args):
+    def __init__(self, args, start_offset: int = 0):
+        """
+        Args:
+            args: args.text is the path of the text file.
+            start_offset: Index the text from this offset, used to index text appended
+                to an already indexed file. It must be the start of an article.
+        """
         super().__init__()
+        assert is_non_negative_int(start_offset), 'start_offset must be an integer >= 0'
         self.args: argparse.Namespace = args
+        self.start_offset: int = start_offset
         self.articles: List[Article] = []
 
     def build_index(self):
@@ -158,6 +166,7 @@ class IndexBuilderWiki:
         Read the text file in chunks of bytes without splitting multi-byte characters.
         """
         with open(self.args.text, "rb") as inp:
+            inp.seek(self.start_offset)
             # buffer holds the leading bytes of a multi-byte Unicode character that
             # was split between chunks and couldn't be decoded in the previous chunk
             buffer = b""
@@ -0,0 +1,219 @@
+"""
+ONNX Runtime backend for the Encoder.
+
+Exports a (locally cached) SentenceTransformer model to ONNX, optionally applies dynamic
+int8 quantization, and runs it with ONNX Runtime on the CPU.
+
+The exported graph includes the SentenceTransformer pooling (and normalization, if the
+model has it), so OnnxSentenceModel.encode() returns the same embeddings as
+SentenceTransformer.encode() up to numerical precision.
+
+Layout of the export directory:
+    model.onnx          - the full precision graph
+    model_int8.onnx     - the dynamically quantized graph (if requested)
+    onnx_config.json    - input names and max sequence length
+    tokenizer files     - saved with tokenizer.save_pretrained()
+"""
+import os
+import json
+import inspect
+import logging
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+from numpy.typing import NDArray
+
+logger = logging.getLogger(__name__)
+
+ONNX_CONFIG_FILE_NAME = "onnx_config.json"
+DEFAULT_EXPORT_ROOT = Path(os.getenv("ONNX_EXPORT_DIR", "~/.cache/wiki-rag/onnx")).expanduser()
+
+
+class OnnxExporter:
+    """
+    Export a SentenceTransformer model to ONNX.
+    """
+    OPSET_VERSION = 17
+
+    def __init__(self, model_id: str, export_root: Path = DEFAULT_EXPORT_ROOT):
+        """
+        Initialize the exporter.
+        Args:
+            model_id: The SentenceTransformer model id, it must be in the local HF cache.
+            export_root: The directory under which the model is exported.
+        """
+        self.model_id = model_id
+        self.export_dir = Path(export_root) / model_id.replace("/", "__")
+
+    def get_model_path(self, quantize: Optional[str]) -> Path:
+        """The path of the onnx graph, full precision or quantized."""
+        if quantize is None:
+            file_name = "model.onnx"
+        elif quantize == "int8":
+            file_name = "model_int8.onnx"
+        else:
+            raise ValueError(f"Unknown quantization: {quantize}")
+        return self.export_dir / file_name
+
+    def ensure_exported(self, quantize: Optional[str]) -> Path:
+        """Export (and quantize) the model unless it was already exported."""
+        model_path = self.get_model_path(quantize)
+        if model_path.exists():
+            return model_path
+
+        full_precision_path = self.get_model_path(None)
+        if not full_precision_path.exists():
+            self.export()
+
+        if quantize == "int8":
+            self.quantize_int8(full_precision_path, model_path)
+
+        return model_path
+
+    def export(self) -> None:
+        """Export the SentenceTransformer model, pooling included, to ONNX."""
+        # delay the imports, they are only needed for the export
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        logger.info("exporting %s to %s", self.model_id, self.export_dir)
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+
+        model = SentenceTransformer(
+            model_name_or_path=self.model_id,
+            device="cpu",
+            trust_remote_code=True,
+            local_files_only=True,
+        )
+        model.eval()
+
+        tokenizer = model.tokenizer
+        max_seq_length = model.max_seq_length
+        sample = tokenizer(["search_query: export"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids")
+                       if name in sample]
+
+        class SentenceEmbedding(torch.nn.Module):
+            """Wraps the SentenceTransformer so the graph outputs the sentence embedding."""
+            def __init__(self, st_model):
+                super().__init__()
+                self.st_model = st_model
+
+            def forward(self, *inputs):
+                features = dict(zip(input_names, inputs))
+                return self.st_model(features)["sentence_embedding"]
+
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["sentence_embedding"] = {0: "batch"}
+        # newer torch versions default to the dynamo exporter, the (TorchScript) exporter
+        # handles the remote code models (nomic) and dynamic_axes
+        export_kwargs = {}
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            export_kwargs["dynamo"] = False
+        with torch.no_grad():
+            torch.onnx.export(
+                SentenceEmbedding(model),
+                tuple(sample[name] for name in input_names),
+                str(self.get_model_path(None)),
+                input_names=input_names,
+                output_names=["sentence_embedding"],
+                dynamic_axes=dynamic_axes,
+                opset_version=self.OPSET_VERSION,
+                **export_kwargs,
+            )
+
+        tokenizer.save_pretrained(str(self.export_dir))
+        onnx_config = {
+            "model_id": self.model_id,
+            "input_names": input_names,
+            "max_seq_length": max_seq_length,
+        }
+        with open(self.export_dir / ONNX_CONFIG_FILE_NAME, "w", encoding="utf-8") as file:
+            json.dump(onnx_config, file, indent=2)
+
+    @staticmethod
+    def quantize_int8(input_path: Path, output_path: Path) -> None:
+        """Apply dynamic (weights) int8 quantization."""
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        logger.info("quantizing %s to %s", input_path, output_path)
+        quantize_dynamic(
+            model_input=str(input_path),
+            model_output=str(output_path),
+            weight_type=QuantType.QInt8,
+        )
+
+
+class OnnxSentenceModel:
+    """
+    Runs an exported SentenceTransformer with ONNX Runtime.
+    Provides the subset of the SentenceTransformer interface used by the Encoder.
+    """
+    def __init__(
+        self,
+        model_id: str,
+        quantize: Optional[str] = None,
+        export_root: Path = DEFAULT_EXPORT_ROOT,
+        intra_op_num_threads: Optional[int] = None,
+    ):
+        """
+        Initialize the model, exporting it first if needed.
+        Args:
+            model_id: The SentenceTransformer model id, it must be in the local HF cache.
+            quantize: None for full precision, "int8" for dynamic int8 quantization.
+            export_root: The directory under which the model is exported.
+            intra_op_num_threads: ONNX Runtime threads (default: ONNX Runtime's choice).
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        exporter = OnnxExporter(model_id, export_root)
+        model_path = exporter.ensure_exported(quantize)
+
+        with open(exporter.export_dir / ONNX_CONFIG_FILE_NAME, "r", encoding="utf-8") as file:
+            onnx_config = json.load(file)
+        self.input_names: List[str] = onnx_config["input_names"]
+        self.max_seq_length: int = onnx_config["max_seq_length"]
+
+        self.tokenizer = AutoTokenizer.from_pretrained(str(exporter.export_dir))
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_num_threads is not None:
+            options.intra_op_num_threads = intra_op_num_threads
+        self.session = ort.InferenceSession(
+            str(model_path),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        logger.info("loaded onnx model %s", model_path)
+
+    def encode(self, sentences: List[str], batch_size: int = 32) -> NDArray:
+        """Encode sentences into embeddings (float32, shape (len(sentences), dim))."""
+        # sort by length so each batch pads to similar lengths, restore order at the end
+        order = np.argsort([-len(sentence) for sentence in sentences], kind="stable")
+        embeddings_list = []
+        for i in range(0, len(sentences), batch_size):
+            batch = [sentences[j] for j in order[i:i + batch_size]]
+            embeddings_list.append(self._encode_batch(batch))
+
+        if not embeddings_list:
+            return np.empty((0, 0), dtype=np.float32)
+
+        sorted_embeddings = np.concatenate(embeddings_list, axis=0)
+        embeddings = np.empty_like(sorted_embeddings)
+        embeddings[order] = sorted_embeddings
+        return embeddings
+
+    def _encode_batch(self, sentences: List[str]) -> NDArray:
+        """Tokenize and run a single batch."""
+        encoded = self.tokenizer(
+            sentences,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np",
+        )
+        inputs = {name: encoded[name].astype(np.int64) for name in self.input_names}
+        (embeddings,) = self.session.run(["sentence_embedding"], inputs)
+        return embeddings.astype(np.float32, copy=False)
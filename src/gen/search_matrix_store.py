@@ -0,0 +1,139 @@
+"""
+Persisted search-ready (morphed) embedding matrices.
+
+KNearestFinder morphs the store embeddings (reduce dim, normalize, quantize) before the first
+search. The morphed matrix is saved next to the embedding store, keyed by the full embedding
+config and the fingerprint of the store file, so later runs memory map it instead of morphing.
+
+    {store stem}_search_{config key}_{fingerprint key}.npy
+
+Derived matrices, e.g. the pooled article embeddings, are stored the same way under
+another kind than "search".
+
+Saving a matrix removes the matrices of the same config built from older versions of the store.
+"""
+import os
+import json
+import hashlib
+import logging
+import dataclasses
+from pathlib import Path
+from typing import Callable, List, Optional
+import numpy as np
+from numpy.typing import NDArray
+
+from xutils.utils import Utils
+from xutils.embedding_config import EmbeddingConfig
+from gen.gen_metrics import CACHE_REQUESTS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+MorphFunction = Callable[[NDArray], NDArray]
+
+
+class SearchMatrixStore:
+    """
+    A store of the search-ready matrix of an embedding store and an embedding config.
+    """
+
+    def __init__(self, embed_config: EmbeddingConfig, source_path: Path, kind: str = "search"):
+        """
+        Initialize the store.
+        Args:
+            embed_config: The config the embeddings are morphed with.
+            source_path: The path of the embedding store the embeddings are loaded from.
+            kind: The kind of the matrix, part of the file name.
+        """
+        self.embed_config = embed_config
+        self.source_path = Path(source_path)
+        self.kind = kind
+
+    @staticmethod
+    def make_key(value: str) -> str:
+        """A short stable key of a string."""
+        return hashlib.blake2b(value.encode("utf-8"), digest_size=8).hexdigest()
+
+    @property
+    def config_key(self) -> str:
+        """The key of the embedding config."""
+        config_json = json.dumps(dataclasses.asdict(self.embed_config), sort_keys=True)
+        return self.make_key(config_json)
+
+    def fingerprint(self) -> Optional[str]:
+        """The fingerprint of the source store file, None if it does not exist."""
+        return Utils.file_fingerprint(self.source_path)
+
+    def get_path(self) -> Optional[Path]:
+        """The path of the matrix for the current source store, None if it does not exist."""
+        fingerprint = self.fingerprint()
+        if fingerprint is None:
+            return None
+        name = f"{self.source_path.stem}_{self.kind}_{self.config_key}_" \
+               f"{self.make_key(fingerprint)}.npy"
+        return self.source_path.with_name(name)
+
+    def get_config_paths(self) -> List[Path]:
+        """The paths of the matrices of the config, for any version of the source store."""
+        pattern = f"{self.source_path.stem}_{self.kind}_{self.config_key}_*.npy"
+        return sorted(self.source_path.parent.glob(pattern))
+
+    def load(self, count: int) -> Optional[NDArray]:
+        """
+        Memory map the matrix of the current source store.
+        Returns None if there is none, or if its length is not count (a store that was
+        modified after its embeddings were loaded).
+        """
+        path = self.get_path()
+        if path is None or not path.exists():
+            return None
+
+        # copy on write, torch warns about tensors of read-only arrays
+        matrix = np.load(path, mmap_mode="c")
+        if len(matrix) != count:
+            logger.warning("%s matrix %s: %d rows, expected %d",
+                           self.kind, path, len(matrix), count)
+            return None
+
+        logger.info("%s matrix %s: loaded %d rows", self.kind, path, len(matrix))
+        return matrix
+
+    def save(self, matrix: NDArray) -> None:
+        """Save the matrix of the current source store, removing outdated matrices."""
+        path = self.get_path()
+        if path is None:
+            raise FileNotFoundError(f"Embedding store {self.source_path} does not exist")
+
+        temp_path = path.with_name(f"{path.stem}.tmp.npy")
+        np.save(temp_path, matrix)
+        os.replace(temp_path, path)
+        logger.info("%s matrix %s: saved %d rows", self.kind, path, len(matrix))
+
+        for config_path in self.get_config_paths():
+            if config_path != path:
+                config_path.unlink(missing_ok=True)
+                logger.info("%s matrix %s: removed outdated", self.kind, config_path)
+
+    def load_or_create(
+        self,
+        embeddings: NDArray,
+        morph: MorphFunction,
+        count: Optional[int] = None
+    ) -> NDArray:
+        """
+        Load the matrix of the embeddings, or morph and save it.
+        Failing to save is logged, the morphed matrix is still returned.
+        Args:
+            embeddings: The embeddings to morph.
+            morph: Morphs the embeddings to the matrix.
+            count: The expected number of rows, the number of embeddings by default.
+        """
+        matrix = self.load(len(embeddings) if count is None else count)
+        result = "hit" if matrix is not None else "miss"
+        CACHE_REQUESTS_TOTAL.labels(f"{self.kind}_matrix", result).inc()
+        if matrix is None:
+            matrix = morph(embeddings)
+            try:
+                self.save(matrix)
+            except OSError as e:
+                logger.warning("%s matrix: failed to save: %s", self.kind, e)
+        return matrix
@@ -0,0 +1,206 @@
+"""
+A pipelined segment encoder.
+
+- segments are processed in windows (the persistence unit of encode_segments.py)
+- within a window, segments are bucketed by length and batched by a token budget
+  (padded tokens = batch size * longest segment in the batch) rather than by a fixed count,
+  so batches of long segments are small and batches of short segments are large
+- a reader thread prefetches the text of the upcoming batches with ByteReader.read_many
+  while the model encodes the current batch
+- the embeddings of a window are restored to segment order before the window is yielded
+"""
+import math
+import logging
+from queue import Queue, Full
+from threading import Thread, Event
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from numpy.typing import NDArray
+
+from xutils.byte_reader import ByteReader
+from gen.data.segment_record import SegmentRecord
+
+logger = logging.getLogger(__name__)
+
+# max-token * raw2cln * tok2char * char2byte -> max-byte, see gen.encoder.encoder_configs
+BYTES_PER_TOKEN = 1.05 * 3.9 * 1.05
+
+EncodeFunction = Callable[[List[str]], NDArray]
+
+
+class TokenBudgetBatcher:
+    """
+    Bucket segments by length and batch them so the padded token count of each batch
+    stays within a token budget.
+    """
+
+    @staticmethod
+    def estimate_tokens(byte_length: int, bytes_per_token: float = BYTES_PER_TOKEN) -> int:
+        """Estimate the token count of a segment from its byte length."""
+        return max(1, math.ceil(byte_length / bytes_per_token))
+
+    @staticmethod
+    def make_batches(
+        byte_lengths: Sequence[int],
+        token_budget: int,
+        max_batch_size: Optional[int] = None,
+        bytes_per_token: float = BYTES_PER_TOKEN
+    ) -> List[List[int]]:
+        """
+        Group the segment indexes into batches.
+        Args:
+            byte_lengths: The byte length of each segment.
+            token_budget: The maximum padded token count (batch size * longest) of a batch.
+                A segment longer than the budget is a batch of its own.
+            max_batch_size: An optional cap on the number of segments in a batch.
+            bytes_per_token: Used to estimate token counts from byte lengths.
+        Returns:
+            A list of batches, each a list of indexes into byte_lengths.
+            Batches are ordered longest first.
+        """
+        order = sorted(range(len(byte_lengths)), key=lambda i: byte_lengths[i], reverse=True)
+
+        batches: List[List[int]] = []
+        batch: List[int] = []
+        longest = 0
+        for index in order:
+            tokens = TokenBudgetBatcher.estimate_tokens(byte_lengths[index], bytes_per_token)
+            # sorted longest first, the first segment of a batch sets its padded length
+            padded_length = max(longest, tokens)
+            over_budget = padded_length * (len(batch) + 1) > token_budget
+            over_size = max_batch_size is not None and len(batch) >= max_batch_size
+            if batch and (over_budget or over_size):
+                batches.append(batch)
+                batch = []
+                padded_length = tokens
+            batch.append(index)
+            longest = padded_length
+
+        if batch:
+            batches.append(batch)
+
+        return batches
+
+
+class SegmentEncodePipeline:
+    """
+    Encode segment records window by window with length bucketing and text prefetching.
+    """
+    _END_OF_WINDOW = None
+    _PUT_TIMEOUT = 0.1
+
+    def __init__(
+        self,
+        byte_reader: ByteReader,
+        encode: EncodeFunction,
+        token_budget: int,
+        max_batch_size: Optional[int] = None,
+        prefetch_batches: int = 4
+    ) -> None:
+        """
+        Initialize the pipeline.
+        Args:
+            byte_reader: Reads the segments' text.
+            encode: Encodes a list of texts into a (len(texts), dim) array.
+            token_budget: The padded token budget of a batch, see TokenBudgetBatcher.
+            max_batch_size: An optional cap on the number of segments in a batch.
+            prefetch_batches: How many batches of text the reader thread reads ahead.
+        """
+        self.byte_reader = byte_reader
+        self.encode = encode
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+        self.prefetch_batches = prefetch_batches
+
+    def encode_windows(
+        self,
+        segment_records: Sequence[SegmentRecord],
+        window_size: int
+    ) -> Iterator[Tuple[Sequence[SegmentRecord], NDArray]]:
+        """
+        Encode the segment records, window by window.
+        Yields (window records, window embeddings), the embeddings are in the records' order.
+        Closing the generator early (e.g. on a stop file) stops the reader thread.
+        """
+        windows = [segment_records[i:i + window_size]
+                   for i in range(0, len(segment_records), window_size)]
+        window_batches = [
+            TokenBudgetBatcher.make_batches(
+                [record.length for record in window],
+                self.token_budget,
+                self.max_batch_size
+            )
+            for window in windows
+        ]
+
+        queue: Queue = Queue(maxsize=self.prefetch_batches)
+        stop_event = Event()
+        reader = Thread(
+            target=self._read_batches,
+            args=(windows, window_batches, queue, stop_event),
+            daemon=True
+        )
+        reader.start()
+
+        try:
+            for window_index, window in enumerate(windows):
+                embeddings = self._encode_window(window_index, len(window), queue)
+                yield window, embeddings
+        finally:
+            stop_event.set()
+            reader.join()
+
+    def _encode_window(self, window_index: int, window_length: int, queue: Queue) -> NDArray:
+        """Encode the batches of a window as they arrive, restoring the segment order."""
+        embeddings: Optional[NDArray] = None
+        while True:
+            item = queue.get()
+            if isinstance(item, BaseException):
+                raise item
+            item_window_index, batch, texts = item
+            assert item_window_index == window_index, "windows are read in order"
+            if batch is self._END_OF_WINDOW:
+                break
+
+            batch_embeddings = np.asarray(self.encode(texts))
+            if embeddings is None:
+                dim = batch_embeddings.shape[1]
+                embeddings = np.empty((window_length, dim), dtype=batch_embeddings.dtype)
+            embeddings[batch] = batch_embeddings
+
+        if embeddings is None:
+            embeddings = np.empty((0, 0), dtype=np.float32)
+        return embeddings
+
+    def _read_batches(
+        self,
+        windows: List[Sequence[SegmentRecord]],
+        window_batches: List[List[List[int]]],
+        queue: Queue,
+        stop_event: Event
+    ) -> None:
+        """Reader thread: read the text of each batch, in processing order."""
+        try:
+            for window_index, (window, batches) in enumerate(zip(windows, window_batches)):
+                for batch in batches:
+                    ranges = [(window[i].offset, window[i].length) for i in batch]
+                    views = self.byte_reader.read_many(ranges)
+                    texts = [str(view, "utf-8") for view in views]
+                    if not self._put(queue, (window_index, batch, texts), stop_event):
+                        return
+                end_of_window = (window_index, self._END_OF_WINDOW, None)
+                if not self._put(queue, end_of_window, stop_event):
+                    return
+        except Exception as e:  # pylint: disable=broad-except
+            logger.exception("segment reader failed")
+            self._put(queue, e, stop_event)
+
+    def _put(self, queue: Queue, item, stop_event: Event) -> bool:
+        """Put an item unless stopped, returns False when stopped."""
+        while not stop_event.is_set():
+            try:
+                queue.put(item, timeout=self._PUT_TIMEOUT)
+                return True
+            except Full:
+                continue
+        return False
@@ -45,6 +45,9 @@ class SegmentOrchestrator:
         text_byte_reader: Optional[ByteReader],
         segment_dump_path: Optional[Path] = None,
         document_count: Optional[int] = None,
+        base_segment_index: int = 0,
+        base_document_index: int = 0,
+        append: bool = False,
     ) -> None:
         """
         Builds segments from the provided sentences, sets overlaps between segments,
@@ -65,6 +68,10 @@ class SegmentOrchestrator:
                 debugging.
             document_count (Optional[int]): The number of documents to process; if None,
                 all documents will be processed.
+            base_segment_index (int): The index of the first segment, when segmenting documents
+                appended to an already segmented corpus.
+            base_document_index (int): The index of the first document, likewise.
+            append (bool): Append the segment records to the store rather than overwrite it.
 
         Returns:
         None: This method does not return any value. It performs operations that affect the file
@@ -102,7 +109,37 @@ class SegmentOrchestrator:
                 segment_records
             )
 
-        segment_record_store.save_segment_records(segment_records)
+        segment_records = SegmentOrchestrator.offset_segment_records(
+            segment_records,
+            base_segment_index,
+            base_document_index
+        )
+
+        if append:
+            segment_record_store.append_segment_records(segment_records)
+        else:
+            segment_record_store.save_segment_records(segment_records)
+        # documents without segments count too, the next append starts after them
+        segment_record_store.save_document_count(
+            base_document_index + len(segment_buffers_per_document))
+
+    @staticmethod
+    def offset_segment_records(
+        segment_records: List[SegmentRecord],
+        base_segment_index: int,
+        base_document_index: int
+    ) -> List[SegmentRecord]:
+        """continue the segment and document indexes from the given bases"""
+        if base_segment_index == 0 and base_document_index == 0:
+            return segment_records
+        offset_records = [
+            record._replace(
+                segment_index=record.segment_index + base_segment_index,
+                document_index=record.document_index + base_document_index
+            )
+            for record in segment_records
+        ]
+        return offset_records
 
     @staticmethod
     def describe_segments(
@@ -1,10 +1,23 @@
 """
 Find the K-nearest segments or articles based on cosine similarity.
+
+With a binary shortlist, the query is first compared to 1-bit (sign) codes of the embeddings
+by Hamming distance, a scan over 1/32 of the float32 bytes, and only the shortlisted rows
+are scored by cosine similarity.
+
+With a cascade dim, the query is first compared to a contiguous low-dim (Matryoshka) copy of
+the embeddings, the leading dims as reduced by EmbeddingUtils.reduce_dim, and the shortlist
+is reranked with the full-dim embeddings.
+
+With a lexical (BM25) index, the segments matching the query terms are either added to the
+shortlist and scored by the similarity fused with their BM25 score, or are the only rows
+scanned (prefilter), so exact-term queries do not depend on the dense embeddings alone.
 """
 import copy
 import logging
 from uuid import UUID
-from typing import List, Tuple
+from threading import RLock
+from typing import List, Optional, Tuple
 from numpy.typing import NDArray
 import torch
 import numpy as np
@@ -12,12 +25,32 @@ import polars as pl
 
 from gen.encoder import Encoder
 from gen.embedding_utils import EmbeddingUtils
+from gen.search_matrix_store import SearchMatrixStore
+from gen.bm25_index import BM25Index
 from search.stores import Stores
+from search.search_filter import SearchFilter
+from search.search_metrics import (
+    ENCODE_QUERY_SECONDS, SIMILARITY_SECONDS, PICK_RESULTS_SECONDS
+)
 from xutils.timer import LoggingTimer, log_timeit
+from xutils.tracing import span, unobserved
 from xutils.embedding_config import EmbeddingConfig
 
 logger = logging.getLogger(__name__)
 
+# the number of set bits of each byte value, for numpy < 2.0 (no np.bitwise_count)
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def popcount(array: NDArray) -> NDArray:
+    """
+    The number of set bits of an unsigned integer array, per element (per byte with the
+    fallback), summing over the last axis gives the count per row.
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(array)
+    return _POPCOUNT_TABLE[array.view(np.uint8)]
+
 
 class KNearestFinder:
     """
@@ -27,25 +60,95 @@ class KNearestFinder:
     def __init__(
         self,
         stores: Stores,
-        embed_config: EmbeddingConfig
+        embed_config: EmbeddingConfig,
+        encoder_config_id: str = "big",
+        binary_shortlist: Optional[int] = None,
+        cascade_dim: Optional[int] = None,
+        cascade_shortlist: int = 1000,
+        persist_search_matrix: bool = False,
+        lexical_index: Optional[BM25Index] = None,
+        lexical_mode: str = "union",
+        lexical_candidates: int = 1000,
+        lexical_weight: float = 0.3,
+        article_pooling: Optional[str] = None,
+        article_drill_down: Optional[int] = None,
+        encoder: Optional[Encoder] = None
     ):
         """
         Initialize the K-nearest finder.
         Args:
             stores: Source of the embeddings and segment/document mapping.
             embed_config: The embedding config - used to encode the query.
+            encoder_config_id: The encoder config (see gen.encoder.encoder_configs)
+                used to encode the query.
+            binary_shortlist: If set, pre-filter by the Hamming distance of binary codes and
+                rerank a shortlist of (at least) this many segments by the search matrix
+                of the embed_config stype (binary is not a search matrix stype).
+            cascade_dim: If set, pre-filter by the similarity of the leading cascade_dim
+                dimensions and rerank a shortlist of (at least) cascade_shortlist segments.
+            cascade_shortlist: The cascade shortlist size.
+            persist_search_matrix: Save the morphed embeddings next to the embedding store
+                and load them on later runs (see gen.search_matrix_store).
+            lexical_index: If set, hybrid retrieval with the BM25 index of the segments.
+            lexical_mode: "union" adds the top lexical candidates to the dense shortlist and
+                scores by the similarity fused with the BM25 score, "prefilter" scans only
+                the top lexical candidates (every row for queries without lexical hits).
+            lexical_candidates: The number of top lexical candidates.
+            lexical_weight: The weight of the normalized BM25 score in the fused score.
+            article_pooling: If set ("mean" or "max"), find_k_nearest_articles scans a matrix
+                of the pooled segment embeddings of each article instead of the segments.
+            article_drill_down: If set, with article_pooling, the segments of this many top
+                articles are scored and averaged per article, as without article_pooling.
+            encoder: If set, the (shared) encoder of the queries, encoder_config_id is
+                then ignored.
         """
+        if binary_shortlist is not None and cascade_dim is not None:
+            raise ValueError("binary_shortlist and cascade_dim are mutually exclusive")
+        if lexical_mode not in ("union", "prefilter"):
+            raise ValueError(f"Invalid lexical mode: {lexical_mode}")
+        if article_pooling not in (None, "mean", "max"):
+            raise ValueError(f"Invalid article pooling: {article_pooling}")
+        if embed_config.stype == "binary":
+            # packed codes would be scored as uint8 vectors, they only shortlist
+            raise ValueError("Binary codes are the binary_shortlist, not a search matrix stype")
+
         self.stores = stores
         self.input_embed_config = embed_config
         self.query_embed_config = copy.copy(embed_config)
         self.query_embed_config.l2_normalize = True
 
-        self.encoder = Encoder(1)
+        self.encoder = encoder if encoder is not None else Encoder(1, encoder_config_id)
+        self.search_matrix_store = None
+        if persist_search_matrix:
+            self.search_matrix_store = \
+                SearchMatrixStore(embed_config, stores.embedding_store.path)
+        self.binary_shortlist = binary_shortlist
+        self.cascade_dim = cascade_dim
+        self.cascade_shortlist = cascade_shortlist
+        self.cascade_embed_config = copy.copy(self.query_embed_config)
+        self.cascade_embed_config.dim = cascade_dim
+        self.lexical_index = lexical_index
+        self.lexical_mode = lexical_mode
+        self.lexical_candidates = lexical_candidates
+        self.lexical_weight = lexical_weight
+        self.article_pooling = article_pooling
+        self.article_drill_down = article_drill_down
+        self.article_matrix_store = None
+        if persist_search_matrix and article_pooling is not None:
+            self.article_matrix_store = SearchMatrixStore(
+                embed_config, stores.embedding_store.path, kind=f"articles_{article_pooling}")
+
+        # guards the consistency of the uids and the (normalized) embeddings across refresh()
+        self._lock = RLock()
 
         # lazy loaded
         self._uids = None
         self._embeddings = None
         self._normalized_embeddings = None
+        self._binary_codes = None
+        self._cascade_embeddings = None
+        self._article_indexes = None
+        self._article_embeddings = None
 
     @property
     def uids_and_embeddings(self) -> Tuple[List[UUID], NDArray]:
@@ -62,18 +165,251 @@ class KNearestFinder:
         """
         A list of the segments' uids and their normalized embeddings.
         """
-        if self._normalized_embeddings is None:
-            _, embeddings = self.uids_and_embeddings
-            self._normalized_embeddings = \
-                EmbeddingUtils.morph_embeddings(embeddings, self.input_embed_config)
-        return self._uids, self._normalized_embeddings
+        with self._lock:
+            if self._normalized_embeddings is None:
+                _, embeddings = self.uids_and_embeddings
+                self._normalized_embeddings = self.morph_search_embeddings(embeddings)
+            return self._uids, self._normalized_embeddings
+
+    def morph_search_embeddings(self, embeddings: NDArray) -> NDArray:
+        """
+        Morph the embeddings for search, or load them if persisted.
+        """
+        def morph(embeddings: NDArray) -> NDArray:
+            return EmbeddingUtils.morph_embeddings(embeddings, self.input_embed_config)
+
+        if self.search_matrix_store is None:
+            return morph(embeddings)
+        return self.search_matrix_store.load_or_create(embeddings, morph)
+
+    @property
+    @log_timeit(logger=logger)
+    def uids_and_binary_codes(self) -> Tuple[List[UUID], NDArray]:
+        """
+        A list of the segments' uids and the binary codes of their normalized embeddings.
+        """
+        with self._lock:
+            if self._binary_codes is None:
+                _, normalized_embeddings = self.uids_and_normalized_embeddings
+                self._binary_codes = EmbeddingUtils.binarize_embeddings(normalized_embeddings)
+            return self._uids, self._binary_codes
+
+    @property
+    @log_timeit(logger=logger)
+    def uids_and_cascade_embeddings(self) -> Tuple[List[UUID], NDArray]:
+        """
+        A list of the segments' uids and their low-dim cascade embeddings.
+        """
+        with self._lock:
+            if self._cascade_embeddings is None:
+                _, embeddings = self.uids_and_embeddings
+                self._cascade_embeddings = self.morph_cascade_embeddings(embeddings)
+            return self._uids, self._cascade_embeddings
+
+    def morph_cascade_embeddings(self, embeddings: NDArray, batch_size: int = 100000) -> NDArray:
+        """
+        Morph the embeddings to the (normalized, quantized) leading cascade_dim dimensions.
+        Quantized embeddings are dequantized in batches, bounding the float copy.
+        """
+        if len(embeddings) == 0:
+            return EmbeddingUtils.morph_embeddings(
+                EmbeddingUtils.dequantize_embeddings(embeddings), self.cascade_embed_config)
+        batches = [
+            EmbeddingUtils.morph_embeddings(
+                EmbeddingUtils.dequantize_embeddings(embeddings[i:i + batch_size]),
+                self.cascade_embed_config)
+            for i in range(0, len(embeddings), batch_size)
+        ]
+        return np.concatenate(batches)
+
+    @property
+    @log_timeit(logger=logger)
+    def article_indexes_and_embeddings(self) -> Tuple[NDArray, NDArray]:
+        """
+        The ascending indexes of the articles (documents) with embedded segments and their
+        pooled embeddings (see article_pooling).
+        """
+        with self._lock:
+            if self._article_embeddings is None:
+                uids, embeddings = self.uids_and_embeddings
+                document_indexes = self.stores.get_segment_document_indexes()[:len(uids)]
+                article_indexes = np.unique(document_indexes)
+
+                def morph(embeddings: NDArray) -> NDArray:
+                    return self.morph_article_embeddings(
+                        embeddings, document_indexes, self.input_embed_config,
+                        self.article_pooling)
+
+                if self.article_matrix_store is None:
+                    article_embeddings = morph(embeddings)
+                else:
+                    article_embeddings = self.article_matrix_store.load_or_create(
+                        embeddings, morph, count=len(article_indexes))
+                self._article_indexes = article_indexes
+                self._article_embeddings = article_embeddings
+            return self._article_indexes, self._article_embeddings
+
+    @staticmethod
+    def morph_article_embeddings(
+        embeddings: NDArray,
+        document_indexes: NDArray,
+        embed_config: EmbeddingConfig,
+        pooling: str,
+        batch_size: int = 100000
+    ) -> NDArray:
+        """
+        Pool the segment embeddings of each article into the article search matrix, the rows
+        of the ascending unique document indexes.
+        The segment embeddings are reduced and normalized in batches, pooled, and the pooled
+        embeddings are normalized and quantized as the search embeddings. The normalized mean
+        is the normalized sum, so batches are summed.
+        Args:
+            embeddings: The segment embeddings.
+            document_indexes: The document index of each segment embedding.
+            embed_config: The config of the search embeddings.
+            pooling: "mean" or "max".
+            batch_size: The number of segment embeddings morphed at once.
+        """
+        segment_config = copy.copy(embed_config)
+        segment_config.stype = None
+        article_config = copy.copy(embed_config)
+        article_config.dim = None
+        article_config.l2_normalize = True
+
+        article_indexes = np.unique(document_indexes)
+        pooled = None
+        batch_pooling = "max" if pooling == "max" else "sum"
+        for start in range(0, len(embeddings), batch_size):
+            batch = EmbeddingUtils.morph_embeddings(
+                EmbeddingUtils.dequantize_embeddings(embeddings[start:start + batch_size]),
+                segment_config)
+            batch_indexes, batch_pooled = EmbeddingUtils.pool_embeddings(
+                batch, document_indexes[start:start + batch_size], batch_pooling)
+            if pooled is None:
+                pooled = np.zeros((len(article_indexes), batch.shape[1]), dtype=np.float32)
+                if batch_pooling == "max":
+                    pooled[:] = -np.inf
+            positions = np.searchsorted(article_indexes, batch_indexes)
+            if batch_pooling == "max":
+                pooled[positions] = np.maximum(pooled[positions], batch_pooled)
+            else:
+                pooled[positions] += batch_pooled
+        if pooled is None:
+            pooled = np.empty((0, embeddings.shape[1]), dtype=np.float32)
+        return EmbeddingUtils.morph_embeddings(pooled, article_config)
+
+    def refresh(self) -> int:
+        """
+        Pick up the segments appended and encoded since the embeddings were loaded.
+        Only the new embeddings are morphed, they are appended to the search embeddings.
+        Returns the number of new segments.
+        """
+        with self._lock:
+            old_count = len(self._uids) if self._uids is not None else 0
+            self.stores.refresh()
+            if self._uids is None:
+                # not loaded yet, will be loaded on first use
+                return 0
+
+            uids, embeddings = self.stores.uids_and_embeddings
+            new_count = len(uids) - old_count
+            normalized_embeddings = self._normalized_embeddings
+            binary_codes = self._binary_codes
+            cascade_embeddings = self._cascade_embeddings
+            if new_count < 0:
+                # the store was rebuilt, morph everything on first use
+                logger.warning("refresh: store shrunk from %d to %d", old_count, len(uids))
+                normalized_embeddings = None
+                binary_codes = None
+                cascade_embeddings = None
+            elif new_count > 0:
+                new_embeddings = embeddings[old_count:]
+                if normalized_embeddings is not None:
+                    new_normalized_embeddings = EmbeddingUtils.morph_embeddings(
+                        new_embeddings, self.input_embed_config)
+                    normalized_embeddings = np.concatenate(
+                        (normalized_embeddings, new_normalized_embeddings))
+                    if binary_codes is not None:
+                        new_binary_codes = EmbeddingUtils.binarize_embeddings(
+                            new_normalized_embeddings)
+                        binary_codes = np.concatenate((binary_codes, new_binary_codes))
+                if cascade_embeddings is not None:
+                    cascade_embeddings = np.concatenate(
+                        (cascade_embeddings, self.morph_cascade_embeddings(new_embeddings)))
+
+            self._uids, self._embeddings = uids, embeddings
+            self._normalized_embeddings = normalized_embeddings
+            self._binary_codes = binary_codes
+            self._cascade_embeddings = cascade_embeddings
+            if new_count != 0:
+                # appended segments change the pooled embeddings, pooled again on first use
+                self._article_indexes = None
+                self._article_embeddings = None
+            logger.info("refresh: %d new segments, %d total", max(new_count, 0), len(uids))
+
+        return max(new_count, 0)
+
+    @log_timeit(logger=logger)
+    def share_search_matrices(self, other: "KNearestFinder") -> bool:
+        """
+        Use the search matrices of another generation of the finder, with the same options,
+        morphed from the embeddings of the stores (see Stores.share_embeddings).
+        Returns whether they were shared.
+        """
+        with other._lock:
+            uids, embeddings = other._uids, other._embeddings
+            matrices = (other._normalized_embeddings, other._binary_codes,
+                        other._cascade_embeddings)
+        if embeddings is None or self.stores.uids_and_embeddings[1] is not embeddings:
+            return False
+        with self._lock:
+            self._uids, self._embeddings = uids, embeddings
+            self._normalized_embeddings, self._binary_codes, self._cascade_embeddings = matrices
+        return True
+
+    def memory_bytes(self) -> int:
+        """
+        The bytes of the search matrices derived from the embeddings (not of the embeddings
+        themselves, see Stores.memory_bytes), and of the lexical index.
+        Reads the search matrices without the lock, which is held while morphing them.
+        """
+        arrays = [self._binary_codes, self._cascade_embeddings, self._article_embeddings]
+        normalized_embeddings = self._normalized_embeddings
+        if normalized_embeddings is not self._embeddings:
+            arrays.append(normalized_embeddings)
+        memory_bytes = sum(array.nbytes for array in arrays if array is not None)
+        if self.lexical_index is not None:
+            memory_bytes += self.lexical_index.nbytes
+        return memory_bytes
+
+    def warm_up(self, query: str = "warm up") -> None:
+        """
+        Load the encoder and the search matrices ahead of the first query:
+        pre-touch the pages of the search embeddings and run a search, not observed by the
+        stage histograms.
+        """
+        with self._lock:
+            _, normalized_embeddings = self.uids_and_normalized_embeddings
+        self.touch_pages(normalized_embeddings)
+        with unobserved():
+            self.find_k_nearest_segments(query, k=1, max_results=1)
+
+    @staticmethod
+    def touch_pages(array: NDArray, page_size: int = 4096) -> int:
+        """
+        Read a byte of every page of the array, faulting in the pages of a memory mapped array.
+        Returns the sum of the bytes read.
+        """
+        flat_bytes = np.ascontiguousarray(array).reshape(-1).view(np.uint8)
+        return int(flat_bytes[::page_size].sum())
 
     def find_k_nearest_segments(
         self,
         query: str,
         k: int = 5,
         threshold: float = 0.3,
-        max_results: int = 10
+        max_results: int = 10,
+        search_filter: Optional[SearchFilter] = None
     ) -> List[Tuple[UUID, float]]:
         """
         Find the K-nearest segments based on cosine similarity.
@@ -84,10 +420,14 @@ class KNearestFinder:
             k: The number of nearest segments to find (not filtered by threshold).
             threshold: The threshold for the similarity score.
             max_results: The maximum number of above-threshold results to return.
+            search_filter: Restricts the search to the segments of the matching documents.
         Returns:
             A list of tuples, each containing a segment id and a similarity score.
         """
-        uids, similarities = self.get_similarities(query)
+        uids, similarities, _ = self.get_scored_rows(
+            query, min_rows=max(k, max_results), search_filter=search_filter)
+        if len(uids) == 0:
+            return []
 
         # Create a DataFrame for aggregation
         timer = LoggingTimer('find_k_nearest_articles', logger=logger, level="DEBUG")
@@ -107,7 +447,8 @@ class KNearestFinder:
         query: str,
         k: int = 5,
         threshold: float = 0.3,
-        max_results: int = 10
+        max_results: int = 10,
+        search_filter: Optional[SearchFilter] = None
     ) -> List[Tuple[UUID, float]]:
         """
         Find the K-nearest articles based on cosine similarity.
@@ -118,16 +459,97 @@ class KNearestFinder:
             k: The number of nearest articles to find (not filtered by threshold).
             threshold: The threshold for the similarity score.
             max_results: The maximum number of above-threshold results to return.
+            search_filter: Restricts the search to the segments of the matching documents.
+        With a binary shortlist, an article's similarity is the mean over its shortlisted
+        segments. With article pooling, see find_k_nearest_pooled_articles.
         """
-        uids, similarities = self.get_similarities(query)
+        if self.article_pooling is not None:
+            return self.find_k_nearest_pooled_articles(
+                query, k, threshold, max_results, search_filter)
+
+        uids, similarities, rows = self.get_scored_rows(
+            query, min_rows=max(k, max_results), search_filter=search_filter)
+        if len(uids) == 0:
+            return []
 
         # Get article ids - for aggregation by article
         article_indexes = self.stores.get_embeddings_article_indexes()
+        if rows is None:
+            # segments appended but not encoded yet have records but no embeddings
+            article_indexes = article_indexes[:len(uids)]
+        else:
+            article_indexes = np.asarray(article_indexes)[rows]
 
+        return self.pick_article_results(k, threshold, max_results, article_indexes,
+                                         similarities)
+
+    def find_k_nearest_pooled_articles(
+        self,
+        query: str,
+        k: int,
+        threshold: float,
+        max_results: int,
+        search_filter: Optional[SearchFilter] = None
+    ) -> List[Tuple[UUID, float]]:
+        """
+        Find the K-nearest articles by the similarity of their pooled segment embeddings,
+        a scan of the articles rather than of the segments.
+        With a drill down, the segments of the top articles are scored and an article's
+        similarity is the mean over its segments.
+        """
+        filter_rows = self.filter_rows(search_filter)
+        if filter_rows is not None and len(filter_rows) == 0:
+            return []
+        article_indexes, article_embeddings = self.article_indexes_and_embeddings
+        with span("encode_query", observe=ENCODE_QUERY_SECONDS):
+            query_embeddings = self.encode_query(query)
+
+        with span("similarity", observe=SIMILARITY_SECONDS):
+            if filter_rows is None:
+                similarities = self.torch_batched_similarity(
+                    article_embeddings,
+                    query_embeddings,
+                ).flatten()
+            else:
+                filtered_indexes = np.unique(
+                    self.stores.get_segment_document_indexes()[filter_rows])
+                positions = np.searchsorted(article_indexes, filtered_indexes)
+                similarities = self.rerank(article_embeddings, query_embeddings, positions)
+                article_indexes = filtered_indexes
+
+        if self.article_drill_down is None:
+            # one row per article, nothing to aggregate
+            df = pl.DataFrame({'art_id': article_indexes, 'similarity': similarities})
+            return self.pick_results(k, threshold, max_results, df, by='similarity')
+
+        with span("drill_down", observe=SIMILARITY_SECONDS):
+            top_size = max(self.article_drill_down, k, max_results)
+            top_indexes = article_indexes[self.top_rows(-similarities, top_size)]
+            uids, normalized_embeddings = self.uids_and_normalized_embeddings
+            rows = self.stores.get_document_segment_rows(top_indexes)
+            rows = rows[rows < len(uids)]
+            if filter_rows is not None:
+                rows = np.intersect1d(rows, filter_rows, assume_unique=True)
+            similarities = self.rerank(normalized_embeddings, query_embeddings, rows)
+            article_indexes = self.stores.get_segment_document_indexes()[rows]
+
+        return self.pick_article_results(k, threshold, max_results, article_indexes,
+                                         similarities)
+
+    def pick_article_results(
+        self,
+        k: int,
+        threshold: float,
+        max_results: int,
+        article_indexes: NDArray,
+        similarities: NDArray
+    ) -> List[Tuple[int, float]]:
+        """
+        Pick the articles by the mean similarity of their scored rows (see pick_results).
+        """
         # Create a DataFrame for aggregation
         timer = LoggingTimer('find_k_nearest_articles', logger=logger, level="DEBUG")
         df_data = {
-            'seg_id': uids,
             'art_id': article_indexes,
             'similarity': similarities
         }
@@ -149,16 +571,185 @@ class KNearestFinder:
         Get cosine similarities for a given query.
         Encode the query and get the similarities.
         """
-        uids, normalized_embeddings = self.uids_and_normalized_embeddings
-        query_embeddings = self.encode_query(query)
+        uids, similarities, _ = self.get_scored_rows(query)
+        return uids, similarities
+
+    def get_scored_rows(
+        self,
+        query: str,
+        min_rows: int = 0,
+        search_filter: Optional[SearchFilter] = None
+    ) -> Tuple[List[UUID], NDArray, Optional[NDArray]]:
+        """
+        Get the cosine similarities of the scored rows for a given query.
+        Without a binary shortlist or a cascade every row is scored, or, with a search
+        filter, every row of the filter.
+        Args:
+            query: The query to score the segments by.
+            min_rows: The minimum size of the shortlist.
+            search_filter: Restricts the scored rows to the segments of the matching
+                documents, only those rows are scanned.
+        Returns:
+            The uids and similarities of the scored rows, and their row indexes
+            (None if every row is scored).
+        """
+        filter_rows = self.filter_rows(search_filter)
+        if filter_rows is not None and len(filter_rows) == 0:
+            return [], np.empty(0, dtype=np.float32), filter_rows
+
+        lexical = self.score_lexical(query, filter_rows)
+        if lexical is not None and self.lexical_mode == "prefilter":
+            # the dense scan of the lexical candidates only, all rows without lexical hits
+            if len(lexical[0]) > 0:
+                candidate_rows, _ = BM25Index.top(*lexical, self.lexical_candidates)
+                filter_rows = np.sort(candidate_rows)
+            lexical = None
+
+        if self.binary_shortlist is None and self.cascade_dim is None:
+            uids, normalized_embeddings = self.uids_and_normalized_embeddings
+            with span("encode_query", observe=ENCODE_QUERY_SECONDS):
+                query_embeddings = self.encode_query(query)
+
+            with span("similarity", observe=SIMILARITY_SECONDS):
+                if filter_rows is not None:
+                    similarities = self.rerank(normalized_embeddings, query_embeddings,
+                                               filter_rows)
+                else:
+                    similarities = self.torch_batched_similarity(
+                        normalized_embeddings,
+                        query_embeddings,
+                    )
+                    similarities = similarities.flatten()
+            similarities = self.fuse_lexical(similarities, filter_rows, lexical)
+            if filter_rows is not None:
+                return [uids[row] for row in filter_rows], similarities, filter_rows
+            return uids, similarities, None
+
+        if self.binary_shortlist is not None:
+            with self._lock:
+                uids, binary_codes = self.uids_and_binary_codes
+                normalized_embeddings = self._normalized_embeddings
+            if filter_rows is not None:
+                binary_codes = binary_codes[filter_rows]
+            with span("encode_query", observe=ENCODE_QUERY_SECONDS):
+                query_embeddings = self.encode_query(query)
+
+            with span("similarity", observe=SIMILARITY_SECONDS):
+                query_code = EmbeddingUtils.binarize_embeddings(query_embeddings)
+                shortlist_size = max(self.binary_shortlist, min_rows)
+                rows = self.hamming_shortlist(binary_codes, query_code, shortlist_size)
+                if filter_rows is not None:
+                    rows = filter_rows[rows]
+                rows = self.union_lexical(rows, lexical)
+                similarities = self.rerank(normalized_embeddings, query_embeddings, rows)
+        else:
+            with self._lock:
+                uids, cascade_embeddings = self.uids_and_cascade_embeddings
+                _, normalized_embeddings = self.uids_and_normalized_embeddings
+            if filter_rows is not None:
+                cascade_embeddings = cascade_embeddings[filter_rows]
+            with span("encode_query", observe=ENCODE_QUERY_SECONDS):
+                cascade_query_embeddings, query_embeddings = self.encode_cascade_query(query)
+
+            with span("similarity", observe=SIMILARITY_SECONDS):
+                cascade_similarities = self.torch_batched_similarity(
+                    cascade_embeddings,
+                    cascade_query_embeddings,
+                ).flatten()
+                shortlist_size = max(self.cascade_shortlist, min_rows)
+                rows = self.top_rows(-cascade_similarities, shortlist_size)
+                if filter_rows is not None:
+                    rows = filter_rows[rows]
+                rows = self.union_lexical(rows, lexical)
+                similarities = self.rerank(normalized_embeddings, query_embeddings, rows)
+
+        similarities = self.fuse_lexical(similarities, rows, lexical)
+        shortlist_uids = [uids[row] for row in rows]
+        return shortlist_uids, similarities, rows
+
+    def filter_rows(self, search_filter: Optional[SearchFilter]) -> Optional[NDArray]:
+        """
+        Compile the search filter to the ascending embedding rows it matches, None for
+        no filter (every row).
+        """
+        if search_filter is None or search_filter.is_empty():
+            return None
+        with self._lock:
+            uids, _ = self.uids_and_embeddings
+        with span("filter"):
+            return search_filter.segment_rows(self.stores, len(uids))
+
+    def score_lexical(
+        self,
+        query: str,
+        filter_rows: Optional[NDArray]
+    ) -> Optional[Tuple[NDArray, NDArray]]:
+        """
+        Get the ascending rows of the segments matching the query terms and their BM25
+        scores, restricted to the filter rows. None without a lexical index.
+        """
+        if self.lexical_index is None:
+            return None
+        with self._lock:
+            uids, _ = self.uids_and_embeddings
+        with span("lexical"):
+            rows, scores = self.lexical_index.score(query, filter_rows)
+            # the index and the embeddings may be of different versions of the segments
+            selected = rows < len(uids)
+            return rows[selected], scores[selected]
+
+    def union_lexical(
+        self,
+        rows: NDArray,
+        lexical: Optional[Tuple[NDArray, NDArray]]
+    ) -> NDArray:
+        """
+        Add the top lexical candidates to the shortlist rows.
+        """
+        if lexical is None or len(lexical[0]) == 0:
+            return rows
+        candidate_rows, _ = BM25Index.top(*lexical, self.lexical_candidates)
+        return np.union1d(rows, candidate_rows)
+
+    def fuse_lexical(
+        self,
+        similarities: NDArray,
+        rows: Optional[NDArray],
+        lexical: Optional[Tuple[NDArray, NDArray]]
+    ) -> NDArray:
+        """
+        Combine the cosine similarities of the rows (every row if None) with the BM25
+        scores, normalized by the best one:
+            (1 - lexical_weight) * similarity + lexical_weight * score / max score
+        Rows without lexical hits score 0, queries without hits keep their similarities.
+        """
+        if lexical is None or len(lexical[0]) == 0:
+            return similarities
+        lexical_rows, lexical_scores = lexical
+        normalized_scores = lexical_scores / lexical_scores.max()
+        fused = (1 - self.lexical_weight) * similarities
+        if rows is None:
+            fused[lexical_rows] += self.lexical_weight * normalized_scores
+        else:
+            positions = np.minimum(np.searchsorted(lexical_rows, rows), len(lexical_rows) - 1)
+            matched = lexical_rows[positions] == rows
+            fused[matched] += self.lexical_weight * normalized_scores[positions[matched]]
+        return fused
 
+    def rerank(
+        self,
+        normalized_embeddings: NDArray,
+        query_embeddings: NDArray,
+        rows: NDArray
+    ) -> NDArray:
+        """
+        Rerank the shortlist rows by the cosine similarity of the search embeddings.
+        """
         similarities = self.torch_batched_similarity(
-            normalized_embeddings,
+            normalized_embeddings[rows],
             query_embeddings,
         )
-        similarities = similarities.flatten()
-
-        return uids, similarities
+        return similarities.flatten()
 
     def pick_results(
         self,
@@ -179,25 +770,26 @@ class KNearestFinder:
         Returns:
             A list of tuples, each containing a segment id and a similarity score.
         """
-        timer = LoggingTimer('pick_results', logger=logger, level="DEBUG")
+        with span("pick_results", observe=PICK_RESULTS_SECONDS):
+            timer = LoggingTimer('pick_results', logger=logger, level="DEBUG")
 
-        q = max(k, max_results)
-        top_q = polars_df.top_k(q, by=by)
-        timer.restart("top k")
+            q = max(k, max_results)
+            top_q = polars_df.top_k(q, by=by)
+            timer.restart("top k")
 
-        filtered_top_q = top_q.filter(pl.col(by) > threshold)
-        timer.restart("filtered top k")
+            filtered_top_q = top_q.filter(pl.col(by) > threshold)
+            timer.restart("filtered top k")
 
-        if len(filtered_top_q) >= k:
-            # if filtered results has enough elements, use them
-            polars_result_df = filtered_top_q.head(q)
-        else:
-            # otherwise, use unfiltered top k
-            polars_result_df = top_q.head(k)
-        timer.restart("picked results")
+            if len(filtered_top_q) >= k:
+                # if filtered results has enough elements, use them
+                polars_result_df = filtered_top_q.head(q)
+            else:
+                # otherwise, use unfiltered top k
+                polars_result_df = top_q.head(k)
+            timer.restart("picked results")
 
-        result_tuples = polars_result_df.rows()
-        timer.restart("selected results")
+            result_tuples = polars_result_df.rows()
+            timer.restart("selected results")
 
         return result_tuples
 
@@ -210,22 +802,157 @@ class KNearestFinder:
     ) -> NDArray:
         """
         Get the cosine similarities for a given query.
+        The embeddings and the query share a stype (see EmbeddingUtils.quantize_embeddings),
+        the kernel is picked by that stype and the similarities are on the float scale.
         Args:
             normalized_embeddings: The normalized embeddings to compare to the query.
             query_embedding: The query embedding to compare to the normalized embeddings.
             batch_size: The batch size for the similarity calculation.
         Returns:
-            A numpy array of the cosine similarities.
+            A float32 numpy array of the cosine similarities.
         """
-        similarities = []
+        dtype = normalized_embeddings.dtype
+        if dtype == np.int8:
+            kernel = KNearestFinder.int8_similarity
+        elif dtype == np.uint8:
+            kernel = KNearestFinder.uint8_similarity
+        elif dtype == np.float16:
+            kernel = KNearestFinder.float16_similarity
+        else:
+            kernel = KNearestFinder.float_similarity
+
+        similarities = np.empty((len(normalized_embeddings), len(query_embedding)),
+                                dtype=np.float32)
         for i in range(0, len(normalized_embeddings), batch_size):
             batch = normalized_embeddings[i:i + batch_size]
-            batch_similarities = torch.matmul(
-                torch.from_numpy(batch),
-                torch.from_numpy(query_embedding.T)
-            )
-            similarities.append(batch_similarities.numpy())
-        return np.concatenate(similarities, axis=0)
+            similarities[i:i + len(batch)] = kernel(batch, query_embedding)
+        return similarities
+
+    @staticmethod
+    def float_similarity(batch: NDArray, query_embedding: NDArray) -> NDArray:
+        """The dot products of float embeddings."""
+        batch_similarities = torch.matmul(
+            torch.from_numpy(batch),
+            torch.from_numpy(query_embedding.T)
+        )
+        return batch_similarities.numpy()
+
+    @staticmethod
+    def float16_similarity(batch: NDArray, query_embedding: NDArray) -> NDArray:
+        """
+        The dot products of float16 embeddings.
+        Torch builds without a CPU half matmul get the batch upcast to float32, the
+        scratch memory is bounded by the batch size.
+        """
+        batch_tensor = torch.from_numpy(batch)
+        query_tensor = torch.from_numpy(query_embedding.T)
+        try:
+            batch_similarities = torch.matmul(batch_tensor, query_tensor)
+        except RuntimeError:
+            batch_similarities = torch.matmul(batch_tensor.float(), query_tensor.float())
+        return batch_similarities.float().numpy()
+
+    @staticmethod
+    def int8_similarity(batch: NDArray, query_embedding: NDArray) -> NDArray:
+        """The dot products of int8 embeddings (x * 127), accumulated in int32."""
+        products = KNearestFinder.int8_matmul(batch, query_embedding.T)
+        return products.astype(np.float32) / np.float32(127 * 127)
+
+    @staticmethod
+    def uint8_similarity(
+        batch: NDArray,
+        query_embedding: NDArray,
+        block_size: int = 4096
+    ) -> NDArray:
+        """
+        The dot products of uint8 embeddings ((x + 1) * 127.5), accumulated in int32.
+        With s = u - 128 as int8, x = (s + 0.5) / 127.5, so
+        x . y = (s . t + 0.5 * (sum(s) + sum(t)) + 0.25 * dim) / 127.5^2
+        The batch is shifted in cache sized blocks through a scratch buffer.
+        """
+        # flipping the top bit maps u to the int8 u - 128
+        signed_query = (query_embedding ^ np.uint8(0x80)).view(np.int8)
+        # a column of ones gets sum(s) from the same product
+        ones = np.ones((batch.shape[1], 1), dtype=np.int8)
+        query_columns = np.hstack((signed_query.T, ones))
+
+        products = np.empty((len(batch), query_columns.shape[1]), dtype=np.int32)
+        scratch = np.empty((min(block_size, len(batch)), batch.shape[1]), dtype=np.uint8)
+        for i in range(0, len(batch), block_size):
+            block = batch[i:i + block_size]
+            signed_block = scratch[:len(block)]
+            np.bitwise_xor(block, np.uint8(0x80), out=signed_block)
+            products[i:i + len(block)] = KNearestFinder.int8_matmul(
+                signed_block.view(np.int8), query_columns)
+
+        products = products.astype(np.float32)
+        batch_sums = products[:, -1:]
+        query_sums = signed_query.sum(axis=1, dtype=np.int32).astype(np.float32)
+
+        similarities = products[:, :-1]
+        similarities += 0.5 * (batch_sums + query_sums[np.newaxis, :])
+        similarities += 0.25 * batch.shape[1]
+        return similarities / np.float32(127.5 * 127.5)
+
+    @staticmethod
+    def int8_matmul(a: NDArray, b: NDArray) -> NDArray:
+        """The int32 matrix product of int8 matrices."""
+        a = np.ascontiguousarray(a)
+        b = np.ascontiguousarray(b)
+        if hasattr(torch, "_int_mm"):
+            try:
+                return torch._int_mm(torch.from_numpy(a), torch.from_numpy(b)).numpy()
+            except RuntimeError:
+                # shapes or device not supported by this torch version
+                pass
+        return a.astype(np.int32) @ b.astype(np.int32)
+
+    @staticmethod
+    def hamming_distances(
+        binary_codes: NDArray,
+        query_code: NDArray,
+        batch_size: int = 1000000
+    ) -> NDArray:
+        """
+        Get the Hamming distances of the binary codes to the query code.
+        Args:
+            binary_codes: The (n, bytes) packed binary codes.
+            query_code: The (1, bytes) packed binary code of the query.
+            batch_size: The batch size, bounds the temporary XOR array.
+        Returns:
+            A numpy array of the n Hamming distances.
+        """
+        binary_codes = np.ascontiguousarray(binary_codes)
+        query_code = np.ascontiguousarray(query_code)
+        if binary_codes.shape[1] % 8 == 0:
+            # popcount 64 bits at a time
+            binary_codes = binary_codes.view(np.uint64)
+            query_code = query_code.view(np.uint64)
+
+        distances = np.empty(len(binary_codes), dtype=np.int32)
+        for i in range(0, len(binary_codes), batch_size):
+            batch = binary_codes[i:i + batch_size]
+            xor = np.bitwise_xor(batch, query_code)
+            distances[i:i + len(batch)] = popcount(xor).sum(axis=1)
+        return distances
+
+    @staticmethod
+    @log_timeit(logger=logger)
+    def hamming_shortlist(binary_codes: NDArray, query_code: NDArray, size: int) -> NDArray:
+        """
+        Get the row indexes of the (up to) size binary codes nearest to the query code.
+        """
+        distances = KNearestFinder.hamming_distances(binary_codes, query_code)
+        return KNearestFinder.top_rows(distances, size)
+
+    @staticmethod
+    def top_rows(distances: NDArray, size: int) -> NDArray:
+        """
+        Get the row indexes of the (up to) size smallest distances, in no particular order.
+        """
+        if size >= len(distances):
+            return np.arange(len(distances))
+        return np.argpartition(distances, size - 1)[:size]
 
     @log_timeit(logger=logger)
     def encode_query(self, query: str) -> np.ndarray:
@@ -246,3 +973,25 @@ class KNearestFinder:
         )
 
         return adjusted_embeddings
+
+    @log_timeit(logger=logger)
+    def encode_cascade_query(self, query: str) -> Tuple[NDArray, NDArray]:
+        """
+        Encode the query once and morph it for both stages of the cascade.
+        Args:
+            query: The query to encode.
+        Returns:
+            The low-dim cascade and the full-dim encoded query.
+        """
+        query_embeddings = self.encoder.encode([query])
+
+        cascade_embeddings = EmbeddingUtils.morph_embeddings(
+            query_embeddings,
+            self.cascade_embed_config
+        )
+        adjusted_embeddings = EmbeddingUtils.morph_embeddings(
+            query_embeddings,
+            self.query_embed_config
+        )
+
+        return cascade_embeddings, adjusted_embeddings
@@ -0,0 +1,361 @@
+"""
+Recall of candidate search configurations against exact float32 search.
+
+A candidate is a search matrix configuration (dim x stype, as morphed by EmbeddingUtils) and
+a search backend of KNearestFinder:
+
+    exact     score every row (torch_batched_similarity, dtype-aware kernels)
+    binary    Hamming shortlist of the sign codes, reranked by the search matrix
+    cascade   shortlist by the leading cascade_dim dimensions, reranked by the search matrix
+
+The ground truth is the top k of the exact cosine similarities of the float32 embeddings,
+computed by blocked matrix products. Queries are either a query set (query-side recall) or
+a sample of the corpus rows, each excluding itself (corpus-side similarity preservation).
+
+Per candidate: recall@k, nDCG@k (graded by the exact similarity) and the overlap (Jaccard
+index) of the top k sets, averaged over the queries, and the search time per query.
+"""
+import time
+import logging
+import dataclasses
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from numpy.typing import NDArray
+
+from gen.embedding_utils import EmbeddingUtils
+from search.k_nearest_finder import KNearestFinder
+from xutils.embedding_config import EmbeddingConfig
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("exact", "binary", "cascade")
+
+# the float32 elements of a (queries x rows) block of similarities, bounds the scratch memory
+BLOCK_ELEMENTS = 1 << 25
+
+
+@dataclass(frozen=True)
+class Candidate:
+    """
+    A search configuration to evaluate.
+    """
+    dim: Optional[int] = None
+    stype: str = "float32"
+    backend: str = "exact"
+    # the binary / cascade shortlist size
+    shortlist: Optional[int] = None
+    cascade_dim: Optional[int] = None
+
+    def __post_init__(self):
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {self.backend}")
+        if self.stype == "binary":
+            raise ValueError("Binary codes are the binary backend, not a search matrix stype")
+        if self.backend != "exact" and not self.shortlist:
+            raise ValueError(f"The {self.backend} backend requires a shortlist size")
+        if self.backend == "cascade" and self.cascade_dim is None:
+            raise ValueError("The cascade backend requires a cascade_dim")
+
+    @property
+    def name(self) -> str:
+        """A short name, e.g. 768/int8/cascade:128@1000."""
+        name = f"{self.dim or 'full'}/{self.stype}/{self.backend}"
+        if self.backend == "cascade":
+            name += f":{self.cascade_dim}"
+        if self.shortlist:
+            name += f"@{self.shortlist}"
+        return name
+
+    def embed_config(self, dim: Optional[int] = None) -> EmbeddingConfig:
+        """The morph config of the search matrix (or of the cascade matrix given its dim)."""
+        return EmbeddingConfig(prefix="", max_len=0, dim=dim or self.dim, stype=self.stype,
+                               l2_normalize=True)
+
+
+def make_candidates(
+    dims: Sequence[Optional[int]],
+    stypes: Sequence[str],
+    backends: Sequence[str],
+    shortlists: Sequence[int] = (100,),
+    cascade_dims: Sequence[int] = (128,)
+) -> List[Candidate]:
+    """
+    The candidates of the dim x stype x backend grid; shortlist sizes and cascade dims
+    multiply the binary and cascade backends. Cascades not below the dim are skipped.
+    """
+    candidates = []
+    for dim in dims:
+        for stype in stypes:
+            for backend in backends:
+                if backend == "exact":
+                    candidates.append(Candidate(dim, stype, backend))
+                    continue
+                for shortlist in shortlists:
+                    if backend == "binary":
+                        candidates.append(Candidate(dim, stype, backend, shortlist))
+                        continue
+                    for cascade_dim in cascade_dims:
+                        if dim is None or cascade_dim < dim:
+                            candidates.append(
+                                Candidate(dim, stype, backend, shortlist, cascade_dim))
+    return candidates
+
+
+def normalize(embeddings: NDArray) -> NDArray:
+    """The L2 normalized float32 embeddings, quantized embeddings are dequantized."""
+    embeddings = EmbeddingUtils.dequantize_embeddings(embeddings)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, np.finfo(np.float32).tiny)
+
+
+def block_rows(row_count: int, block_elements: int = BLOCK_ELEMENTS) -> int:
+    """The number of queries per block, for blocks of about block_elements similarities."""
+    return max(1, block_elements // max(1, row_count))
+
+
+def clamp_k(k: int, row_count: int, exclude: Optional[NDArray] = None) -> int:
+    """The number of rows found per query: k, at most the rows (but the excluded query)."""
+    return max(0, min(k, row_count - (1 if exclude is not None else 0)))
+
+
+def top_k_rows(similarities: NDArray, k: int) -> NDArray:
+    """The column indexes of the k largest similarities of each row, in descending order."""
+    k = min(k, similarities.shape[1])
+    if k < similarities.shape[1]:
+        top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    else:
+        top = np.tile(np.arange(similarities.shape[1]), (len(similarities), 1))
+    top_similarities = np.take_along_axis(similarities, top, axis=1)
+    order = np.argsort(-top_similarities, axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1)
+
+
+def exact_top_k(
+    corpus: NDArray,
+    queries: NDArray,
+    k: int,
+    exclude: Optional[NDArray] = None,
+    block_elements: int = BLOCK_ELEMENTS
+) -> NDArray:
+    """
+    The rows of the k most similar (dot product) corpus rows of each query, by blocked
+    matrix products.
+    Args:
+        corpus: The (n, dim) normalized corpus.
+        queries: The (q, dim) normalized queries.
+        k: The number of rows per query, clamped by clamp_k.
+        exclude: A corpus row per query to leave out (the query itself), None to keep all.
+        block_elements: The similarities per block.
+    Returns:
+        The (q, k) row indexes, most similar first.
+    """
+    k = clamp_k(k, len(corpus), exclude)
+    result = np.empty((len(queries), k), dtype=np.int64)
+    step = block_rows(len(corpus), block_elements)
+    for start in range(0, len(queries), step):
+        stop = min(start + step, len(queries))
+        similarities = queries[start:stop] @ corpus.T
+        if exclude is not None:
+            similarities[np.arange(stop - start), exclude[start:stop]] = -np.inf
+        result[start:stop] = top_k_rows(similarities, k)
+    return result
+
+
+def recall_at_k(truth: NDArray, found: NDArray) -> NDArray:
+    """The fraction of the true top k found (rows of -1 are none), per query."""
+    return np.array([len(set(t) & set(f[f >= 0])) / len(t) for t, f in zip(truth, found)])
+
+
+def overlap_at_k(truth: NDArray, found: NDArray) -> NDArray:
+    """The Jaccard index of the true and found top k sets (rows of -1 are none), per query."""
+    return np.array([len(set(t) & set(f[f >= 0])) / len(set(t) | set(f[f >= 0]))
+                     for t, f in zip(truth, found)])
+
+
+def ndcg_at_k(
+    corpus: NDArray,
+    queries: NDArray,
+    truth: NDArray,
+    found: NDArray
+) -> NDArray:
+    """
+    The nDCG of the found rows, per query. The gain of a row is its exact (non-negative)
+    similarity to the query, the ideal ranking is the true top k.
+    """
+    k = truth.shape[1]
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+
+    def dcg(rows: NDArray) -> NDArray:
+        # rows of -1 (fewer found than k) have no gain
+        gains = np.einsum("qd,qkd->qk", queries, corpus[np.maximum(rows, 0)])
+        gains = np.where(rows >= 0, np.maximum(gains, 0.0), 0.0)
+        return gains @ discounts[:rows.shape[1]]
+
+    ideal = dcg(truth)
+    actual = dcg(found[:, :k])
+    return np.divide(actual, ideal, out=np.ones_like(ideal), where=ideal > 0)
+
+
+class RecallEvaluator:
+    """
+    Evaluate candidate search configurations against exact float32 search of the embeddings.
+    """
+
+    def __init__(self, embeddings: NDArray, k: int = 10) -> None:
+        """
+        Initialize the evaluator.
+        Args:
+            embeddings: The (float32) store embeddings, the source of the ground truth and of
+                the candidates' search matrices.
+            k: The number of nearest rows compared.
+        """
+        self.embeddings = EmbeddingUtils.dequantize_embeddings(embeddings)
+        self.normalized = normalize(self.embeddings)
+        self.k = k
+        # search matrices by morph config (dim, stype)
+        self._matrices: Dict[Tuple[Optional[int], str], NDArray] = {}
+
+    def sample_queries(self, sample_size: int, seed: int = 42) -> Tuple[NDArray, NDArray]:
+        """
+        A sample of the corpus rows as queries.
+        Returns the query embeddings and their rows (to exclude from their results).
+        """
+        if sample_size <= 0 or sample_size > len(self.embeddings):
+            sample_size = len(self.embeddings)
+        rng = np.random.default_rng(seed=seed)
+        rows = np.sort(rng.choice(len(self.embeddings), size=sample_size, replace=False))
+        return self.embeddings[rows], rows
+
+    def search_matrix(self, candidate: Candidate, dim: Optional[int] = None) -> NDArray:
+        """The (memoized) morphed search matrix of the candidate config, or of a given dim."""
+        config = candidate.embed_config(dim)
+        key = (config.dim, config.stype)
+        if key not in self._matrices:
+            self._matrices[key] = EmbeddingUtils.morph_embeddings(self.embeddings, config)
+        return self._matrices[key]
+
+    def search(
+        self,
+        candidate: Candidate,
+        queries: NDArray,
+        exclude: Optional[NDArray] = None
+    ) -> NDArray:
+        """
+        Search the candidate's way, as KNearestFinder does.
+        Returns the (q, <= k) rows found per query, most similar first.
+        """
+        matrix = self.search_matrix(candidate)
+        query_matrix = EmbeddingUtils.morph_embeddings(queries, candidate.embed_config())
+        k = clamp_k(self.k, len(matrix), exclude)
+
+        if candidate.backend == "exact":
+            result = np.empty((len(queries), k), dtype=np.int64)
+            step = block_rows(len(matrix))
+            for start in range(0, len(queries), step):
+                stop = min(start + step, len(queries))
+                similarities = KNearestFinder.torch_batched_similarity(
+                    matrix, query_matrix[start:stop]).T
+                if exclude is not None:
+                    similarities[np.arange(stop - start), exclude[start:stop]] = -np.inf
+                result[start:stop] = top_k_rows(similarities, k)
+            return result
+
+        if candidate.backend == "binary":
+            codes = EmbeddingUtils.binarize_embeddings(matrix)
+            query_codes = EmbeddingUtils.binarize_embeddings(query_matrix)
+        else:
+            cascade_matrix = self.search_matrix(candidate, candidate.cascade_dim)
+            cascade_queries = EmbeddingUtils.morph_embeddings(
+                queries, candidate.embed_config(candidate.cascade_dim))
+
+        found = np.full((len(queries), k), -1, dtype=np.int64)
+        extra = 1 if exclude is not None else 0
+        for index in range(len(queries)):
+            if candidate.backend == "binary":
+                rows = KNearestFinder.hamming_shortlist(
+                    codes, query_codes[index:index + 1], candidate.shortlist + extra)
+            else:
+                cascade_similarities = KNearestFinder.torch_batched_similarity(
+                    cascade_matrix, cascade_queries[index:index + 1]).flatten()
+                rows = KNearestFinder.top_rows(-cascade_similarities,
+                                               candidate.shortlist + extra)
+            if exclude is not None:
+                rows = rows[rows != exclude[index]][:candidate.shortlist]
+            similarities = KNearestFinder.torch_batched_similarity(
+                matrix[rows], query_matrix[index:index + 1]).flatten()
+            top = rows[np.argsort(-similarities, kind="stable")[:k]]
+            found[index, :len(top)] = top
+        return found
+
+    def evaluate(
+        self,
+        candidates: Sequence[Candidate],
+        queries: Optional[NDArray] = None,
+        sample_size: int = 1000,
+        seed: int = 42
+    ) -> List[Dict[str, Any]]:
+        """
+        Evaluate the candidates on the query set, or on a sample of the corpus rows.
+        Returns a row of metrics per candidate.
+        """
+        if queries is None:
+            queries, exclude = self.sample_queries(sample_size, seed)
+        else:
+            queries, exclude = EmbeddingUtils.dequantize_embeddings(queries), None
+        normalized_queries = normalize(queries)
+        truth = exact_top_k(self.normalized, normalized_queries, self.k, exclude)
+
+        rows = []
+        for candidate in candidates:
+            # morph the corpus outside the timing, like a loaded app
+            self.search_matrix(candidate)
+            start = time.perf_counter()
+            found = self.search(candidate, queries, exclude)
+            seconds = time.perf_counter() - start
+            rows.append({
+                "candidate": candidate.name,
+                **dataclasses.asdict(candidate),
+                "queries": len(queries),
+                "k": self.k,
+                "recall": round(float(recall_at_k(truth, found).mean()), 4),
+                "ndcg": round(float(ndcg_at_k(self.normalized, normalized_queries,
+                                              truth, found).mean()), 4),
+                "overlap": round(float(overlap_at_k(truth, found).mean()), 4),
+                "query_ms": round(seconds * 1000 / max(1, len(queries)), 3),
+            })
+            logger.info("%s: recall@%d %.4f", candidate.name, self.k, rows[-1]["recall"])
+        return rows
+
+
+def format_rows(rows: Sequence[Dict[str, Any]]) -> str:
+    """Format the evaluation rows as a table."""
+    lines = [f"{'candidate':<32} {'recall':>7} {'ndcg':>7} {'overlap':>8} {'ms/query':>9}"]
+    for row in rows:
+        lines.append(f"{row['candidate']:<32} {row['recall']:>7.4f} {row['ndcg']:>7.4f} "
+                     f"{row['overlap']:>8.4f} {row['query_ms']:>9.3f}")
+    return "\n".join(lines)
+
+
+def similarity_preservation(
+    orig_emb: NDArray,
+    trans_emb: NDArray,
+    sample_size: int = 1000,
+    top_k: int = 10,
+    seed: int = 42
+) -> float:
+    """
+    The mean overlap of the top_k nearest neighbors, within a sample of the rows, of the
+    original and the transformed embeddings (0-1, higher is better).
+    """
+    if sample_size <= 0 or sample_size > len(orig_emb):
+        sample_size = len(orig_emb)
+    rng = np.random.default_rng(seed=seed)
+    sample = rng.choice(len(orig_emb), size=sample_size, replace=False)
+    # neighbors among the sample, excluding each row itself
+    orig_sample = normalize(orig_emb[sample])
+    trans_sample = normalize(trans_emb[sample])
+    exclude = np.arange(sample_size)
+    orig_top_k = exact_top_k(orig_sample, orig_sample, top_k, exclude)
+    trans_top_k = exact_top_k(trans_sample, trans_sample, top_k, exclude)
+    return float(recall_at_k(orig_top_k, trans_top_k).mean())
@@ -0,0 +1,65 @@
+"""
+Restrict a search to the segments of a subset of the documents.
+
+The filter compiles to a boolean mask over the documents, then, through the document ->
+segment rows index of the stores, to the (ascending) rows of their segments. The finder
+scores only those rows, so the cost of a selective query scales with the subset size.
+"""
+from dataclasses import dataclass
+from typing import List, Optional
+import numpy as np
+from numpy.typing import NDArray
+
+from search.stores import Stores
+
+
+@dataclass
+class SearchFilter:
+    """
+    The documents to search within, the conditions are combined (and).
+    """
+    # document (article / plot) indexes, as returned by find_k_nearest_articles
+    document_indexes: Optional[List[int]] = None
+    # a case-insensitive substring of the document title
+    title: Optional[str] = None
+    # the most recently added (last) documents
+    recent: Optional[int] = None
+
+    def __post_init__(self):
+        if self.recent is not None and self.recent < 1:
+            raise ValueError(f"recent must be at least 1: {self.recent}")
+
+    def is_empty(self) -> bool:
+        """Whether the filter has no conditions (matches every document)."""
+        return self.document_indexes is None and not self.title and self.recent is None
+
+    def document_mask(self, stores: Stores) -> NDArray:
+        """The boolean mask of the matching documents."""
+        document_count = len(stores.documents)
+        mask = np.ones(document_count, dtype=bool)
+        if self.document_indexes is not None:
+            indexes = np.asarray(self.document_indexes, dtype=np.int64)
+            indexes = indexes[(indexes >= 0) & (indexes < document_count)]
+            selected = np.zeros(document_count, dtype=bool)
+            selected[indexes] = True
+            mask &= selected
+        if self.recent is not None:
+            mask[:max(0, document_count - self.recent)] = False
+        if self.title:
+            needle = self.title.casefold()
+            titles = stores.get_document_titles()
+            mask &= np.fromiter((needle in title for title in titles), dtype=bool,
+                                count=len(titles))
+        return mask
+
+    def segment_rows(self, stores: Stores, row_count: int) -> NDArray:
+        """
+        The ascending rows of the segments of the matching documents.
+        Args:
+            stores: The stores of the documents and the segment records.
+            row_count: The number of embedding rows, segments beyond (not encoded yet)
+                are left out.
+        """
+        document_indexes = np.flatnonzero(self.document_mask(stores))
+        rows = stores.get_document_segment_rows(document_indexes)
+        return rows[rows < row_count]
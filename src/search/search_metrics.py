@@ -0,0 +1,62 @@
+"""
+Metrics of the search and RAG service, exposed at /metrics (see web.metrics_router).
+"""
+from prometheus_client import Counter, Gauge, Histogram
+
+# seconds, from the sub-millisecond stages to the RAG completions
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = Histogram(
+    "wiki_rag_stage_seconds",
+    "Latency of the search and RAG stages in seconds.",
+    ["stage"],
+    buckets=LATENCY_BUCKETS)
+
+SPLIT_QUERY_SECONDS = STAGE_SECONDS.labels("split_query")
+ENCODE_QUERY_SECONDS = STAGE_SECONDS.labels("encode_query")
+SIMILARITY_SECONDS = STAGE_SECONDS.labels("similarity")
+PICK_RESULTS_SECONDS = STAGE_SECONDS.labels("pick_results")
+SEGMENT_FETCH_SECONDS = STAGE_SECONDS.labels("segment_fetch")
+RAG_COMPLETION_SECONDS = STAGE_SECONDS.labels("rag_completion")
+
+REQUESTS_TOTAL = Counter(
+    "wiki_rag_requests_total",
+    "Combined requests by action, kind and status (ok/error).",
+    ["action", "kind", "status"])
+
+REQUEST_SECONDS = Histogram(
+    "wiki_rag_request_seconds",
+    "Latency of the combined requests in seconds.",
+    ["action"],
+    buckets=LATENCY_BUCKETS)
+
+REQUESTS_IN_FLIGHT = Gauge(
+    "wiki_rag_requests_in_flight",
+    "Combined requests in progress.")
+
+STORE_LOAD_SECONDS = Histogram(
+    "wiki_rag_store_load_seconds",
+    "Load (and reload) time of the stores in seconds.",
+    ["part"],
+    buckets=(0.01, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0))
+
+CORPUS_LOADS_TOTAL = Counter(
+    "wiki_rag_corpus_loads_total",
+    "Corpora loaded by the corpus registry.",
+    ["corpus"])
+
+CORPUS_EVICTIONS_TOTAL = Counter(
+    "wiki_rag_corpus_evictions_total",
+    "Corpora unloaded to keep the loaded corpora within the memory budget.",
+    ["corpus"])
+
+CORPUS_MEMORY_BYTES = Gauge(
+    "wiki_rag_corpus_memory_bytes",
+    "Estimated memory of the loaded corpora in bytes.",
+    ["corpus"])
+
+RELOADS_TOTAL = Counter(
+    "wiki_rag_reloads_total",
+    "Reloads of the stores and the finder by status (ok/error).",
+    ["status"])
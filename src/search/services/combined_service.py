@@ -1,18 +1,30 @@
 """
 Combined service abstracts the access to the search and RAG services.
+
+The stores and the finder of the service are a generation, which a reload (see
+search.services.reloader) replaces as a whole. A request uses the generation that is current
+when it starts to its end, so requests in flight during a swap finish on the old generation.
 """
 import os
+import time
 import logging
 import json
 from enum import Enum
 from uuid import UUID
-from typing import List, Tuple, Any, Optional
+from contextlib import contextmanager
+from threading import Condition, local
+from typing import Iterator, List, Tuple, Any, Optional
 from openai import OpenAI
 from pydantic.dataclasses import dataclass
-from xutils.timer import LoggingTimer
+from xutils.tracing import span
 from xutils.embedding_config import EmbeddingConfig
 from search.stores import Stores
 from search.k_nearest_finder import KNearestFinder
+from search.search_filter import SearchFilter
+from search.search_metrics import (
+    SPLIT_QUERY_SECONDS, SEGMENT_FETCH_SECONDS, RAG_COMPLETION_SECONDS,
+    REQUESTS_TOTAL, REQUEST_SECONDS, REQUESTS_IN_FLIGHT
+)
 
 logger = logging.getLogger(__name__)
 
@@ -70,6 +82,11 @@ class CombinedRequest:
 
     search_query: Optional[str] = None
     rag_query: Optional[str] = None
+    # restricts the search to the segments of the matching documents
+    search_filter: Optional[SearchFilter] = None
+    # read the texts and captions of the results, a search for the ids only skips them
+    # (rag needs them)
+    with_text: bool = True
 
     def __str__(self):
         return f"CombinedRequest(action={self.action}, kind={self.kind}, " \
@@ -91,6 +108,19 @@ class CombinedResponse:
     total_length: int
 
 
+class ServiceGeneration:
+    """
+    The stores and the finder of the combined service, swapped as a whole by a reload.
+    """
+
+    def __init__(self, stores: Stores, finder: KNearestFinder, number: int = 0) -> None:
+        self.stores = stores
+        self.finder = finder
+        self.number = number
+        # the requests using the generation, guarded by the service's generation condition
+        self.in_flight = 0
+
+
 class CombinedService:
     """
     The combined service.
@@ -111,12 +141,83 @@ class CombinedService:
             embed_config (EmbeddingConfig): The configuration for embeddings.
             finder (KNearestFinder): The K-nearest finder for searching elements.
         """
-        self.stores = stores
         self.embed_config = embed_config
-        self.finder = finder
+
+        self._generation = ServiceGeneration(stores, finder)
+        # guards the current generation and the in flight counts, notified when they drop
+        self._generation_condition = Condition()
+        # the generation of the request of the calling thread
+        self._request_generation = local()
 
         self._client = None
 
+    @property
+    def generation(self) -> ServiceGeneration:
+        """The generation of the request of the calling thread, else the current one."""
+        generation = getattr(self._request_generation, "generation", None)
+        if generation is None:
+            generation = self._generation
+        return generation
+
+    @property
+    def stores(self) -> Stores:
+        """The stores of the generation, see generation."""
+        return self.generation.stores
+
+    @property
+    def finder(self) -> KNearestFinder:
+        """The finder of the generation, see generation."""
+        return self.generation.finder
+
+    @contextmanager
+    def use_generation(self) -> Iterator[ServiceGeneration]:
+        """
+        Use the current generation for the calling thread until the context exits,
+        e.g. for a request, even if a reload swaps in a new generation meanwhile.
+        """
+        generation = getattr(self._request_generation, "generation", None)
+        if generation is not None:
+            # nested, already counted
+            yield generation
+            return
+
+        with self._generation_condition:
+            generation = self._generation
+            generation.in_flight += 1
+        self._request_generation.generation = generation
+        try:
+            yield generation
+        finally:
+            self._request_generation.generation = None
+            with self._generation_condition:
+                generation.in_flight -= 1
+                self._generation_condition.notify_all()
+
+    def swap_generation(self, stores: Stores, finder: KNearestFinder) -> ServiceGeneration:
+        """
+        Make the stores and the finder the current generation, new requests use them.
+        Returns the previous generation, the requests in flight still use it (see wait_drained).
+        """
+        with self._generation_condition:
+            old_generation = self._generation
+            self._generation = ServiceGeneration(stores, finder, old_generation.number + 1)
+        logger.info("generation %d swapped in", old_generation.number + 1)
+        return old_generation
+
+    def wait_drained(self, generation: ServiceGeneration, timeout: Optional[float] = None) -> bool:
+        """Wait for the requests using the generation to complete, returns whether they did."""
+        with self._generation_condition:
+            return self._generation_condition.wait_for(
+                lambda: generation.in_flight == 0, timeout)
+
+    def refresh(self) -> int:
+        """
+        Pick up documents and segments appended to the corpus since they were loaded.
+        Returns the number of new segments.
+        """
+        new_segment_count = self.finder.refresh()
+        return new_segment_count
+
     def get_openai_client(self):
         """Get the OpenAI client."""
         # project_id is optional
@@ -130,41 +231,63 @@ class CombinedService:
         combined_request: CombinedRequest
     ) -> CombinedResponse:
         """Process the combined request."""
+        action = combined_request.action
+        kind = combined_request.kind
+        status = "error"
+        start = time.perf_counter()
+        try:
+            with REQUESTS_IN_FLIGHT.track_inprogress(), self.use_generation():
+                combined_response = self._combined(combined_request)
+            status = "ok"
+        finally:
+            elapsed = time.perf_counter() - start
+            REQUESTS_TOTAL.labels(action.value, kind.value, status).inc()
+            REQUEST_SECONDS.labels(action.value).observe(elapsed)
+            logger.info("combined: %s: total: %.4fs [%s]", status, elapsed, combined_request.id)
+        return combined_response
+
+    def _combined(
+        self,
+        combined_request: CombinedRequest
+    ) -> CombinedResponse:
+        """Process the combined request, see combined()."""
         request_id = combined_request.id
         action = combined_request.action
         query = combined_request.query
 
-        timer = LoggingTimer('combined', logger=logger, level="INFO")
-
-        search_query, rag_query = self.split_query(query)
+        with span("split_query", observe=SPLIT_QUERY_SECONDS, logger=logger, level=logging.INFO):
+            search_query, rag_query = self.split_query(query)
         combined_request.search_query = search_query
         combined_request.rag_query = rag_query
 
-        element_id_similarity_tuple_list = self.find_nearest_elements(combined_request)
-        timer.restart(f"Found {len(element_id_similarity_tuple_list)} results")
+        with span("search", logger=logger, level=logging.INFO) as search_span:
+            element_id_similarity_tuple_list = self.find_nearest_elements(combined_request)
+            search_span.set("results", len(element_id_similarity_tuple_list))
 
-        element_results = self.get_element_results(
-            combined_request.kind, element_id_similarity_tuple_list)
-        timer.restart(f"got element results (len: {len(element_results)})")
+        with span("segment_fetch", observe=SEGMENT_FETCH_SECONDS,
+                  logger=logger, level=logging.INFO) as fetch_span:
+            with_text = combined_request.action != Action.SEARCH or combined_request.with_text
+            element_results = self.get_element_results(
+                combined_request.kind, element_id_similarity_tuple_list, with_text)
 
-        # TODO: remove, let the client handle this
-        total_length = 0
-        for element_result in element_results:
-            total_length += len(element_result.text)
-        timer.restart(f"total length: {total_length}")
+            # TODO: remove, let the client handle this
+            total_length = 0
+            for element_result in element_results:
+                total_length += len(element_result.text)
+            fetch_span.set("results", len(element_results))
+            fetch_span.set("total_length", total_length)
 
         if combined_request.action == Action.RAG:
             search_query = combined_request.search_query
             rag_query = combined_request.rag_query
-            prompt, answer = self.do_rag(search_query, rag_query, element_results)
+            with span("rag", logger=logger, level=logging.INFO) as rag_span:
+                prompt, answer = self.do_rag(search_query, rag_query, element_results)
+                rag_span.set("prompt_length", len(prompt))
+                rag_span.set("answer_length", len(answer))
         elif combined_request.action == Action.SEARCH:
             prompt, answer = "na", "na"
         else:
             raise ValueError(f"Invalid action: {combined_request.action}")
-        timer.restart(f"did rag (prompt len: {len(prompt)}, answer len: {len(answer)})")
-
-        total_elapsed = timer.total_time()
-        timer.total(total_elapsed)
 
         combined_response = CombinedResponse(
             id=request_id,
@@ -256,7 +379,6 @@ If you are unsure about a part, include the full input for that property.
         Returns:
             Tuple[str, str]: A tuple containing the constructed prompt and the generated answer.
         """
-        timer = LoggingTimer('do_rag', logger=logger, level="INFO")
         elements_text = self.get_elements_text(element_results)
 
         prompt = f'''
@@ -302,14 +424,14 @@ Format your response in Markdown.
                 "content": prompt}
         ]
 
-        timer.restart("calling openai")
-        completion = self.get_openai_client().chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0.4,
-            max_completion_tokens=1200
-        )
-        timer.restart("completion created")
+        with span("rag_completion", observe=RAG_COMPLETION_SECONDS,
+                  logger=logger, level=logging.INFO):
+            completion = self.get_openai_client().chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                temperature=0.4,
+                max_completion_tokens=1200
+            )
         answer = completion.choices[0].message.content
 
         return prompt, answer
@@ -329,10 +451,12 @@ Format your response in Markdown.
 
         if kind is Kind.ARTICLE:
             element_id_similarity_tuple_list = self.finder.find_k_nearest_articles(
-                query, k=k, threshold=threshold, max_results=max_results)
+                query, k=k, threshold=threshold, max_results=max_results,
+                search_filter=combined_request.search_filter)
         elif kind is Kind.SEGMENT:
             element_id_similarity_tuple_list = self.finder.find_k_nearest_segments(
-                query, k=k, threshold=threshold, max_results=max_results)
+                query, k=k, threshold=threshold, max_results=max_results,
+                search_filter=combined_request.search_filter)
         else:
             raise ValueError(f"Invalid kind: {kind}")
 
@@ -341,16 +465,19 @@ Format your response in Markdown.
     def get_element_results(
         self,
         kind: Kind,
-        element_id_similarity_tuple_list: List[Tuple[UUID, float]]
+        element_id_similarity_tuple_list: List[Tuple[UUID, float]],
+        with_text: bool = True
     ) -> List[ResultElement]:
         """
-        Get the element results based on the kind.
+        Get the element results based on the kind, with empty texts and captions unless
+        with_text.
         """
 
         # TODO: if kind is Kind.ARTICLE:
         #     element_results = self.get_article_results(element_id_similarity_tuple_list)
         if kind is Kind.SEGMENT:
-            element_results = self.get_segment_results(element_id_similarity_tuple_list)
+            element_results = self.get_segment_results(
+                element_id_similarity_tuple_list, with_text)
         else:
             raise ValueError(f"Invalid kind: {kind}")
 
@@ -375,19 +502,30 @@ Format your response in Markdown.
 
     def get_segment_results(
         self,
-        segment_id_similarity_tuple_list: List[Tuple[UUID, float]]
+        segment_id_similarity_tuple_list: List[Tuple[UUID, float]],
+        with_text: bool = True
     ) -> List[ResultElement]:
         """
-        Get the segment results.
+        Get the segment results, with empty texts and captions unless with_text.
         """
+        segment_records = [
+            self.stores.get_segment_record_by_index(segment_ind)
+            for segment_ind, _ in segment_id_similarity_tuple_list
+        ]
+        if with_text:
+            # fetch the text of all the hits with one batched read
+            segment_texts = self.stores.get_segment_texts(segment_records)
+        else:
+            segment_texts = [""] * len(segment_records)
+
         results = []
-        for segment_ind, similarity in segment_id_similarity_tuple_list:
-            segment_record = self.stores.get_segment_record_by_index(segment_ind)
-            segment_text = self.stores.get_segment_text(segment_record)
-            document_index = segment_record.document_index
-            article = self.stores.get_document_by_index(document_index)
-            header_text = article.header.text
-            caption_text = header_text
+        for (_, similarity), segment_record, segment_text in zip(
+                segment_id_similarity_tuple_list, segment_records, segment_texts):
+            caption_text = ""
+            if with_text:
+                document_index = segment_record.document_index
+                article = self.stores.get_document_by_index(document_index)
+                caption_text = article.header.text
             results.append(ResultElement(similarity, segment_record, caption_text, segment_text))
         return results
 
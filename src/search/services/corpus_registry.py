@@ -0,0 +1,182 @@
+"""
+Serve several corpora (a domain + an embedding config each) from one process.
+
+The registry creates the combined service of a corpus on its first request, the stores and
+the search matrices of the service then load lazily as usual. The corpora share one encoder
+per encoder config, so the model (and its caches) is loaded once for all of them.
+
+The estimated memory of the loaded corpora (see Stores.memory_bytes and
+KNearestFinder.memory_bytes) is kept within a budget by unloading the least recently used
+corpora after each request. An unloaded corpus is loaded again by its next request; requests
+in flight keep their service until they complete, its text file is closed when the service
+is garbage collected.
+"""
+import logging
+import weakref
+from collections import OrderedDict
+from threading import RLock
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from gen.encoder import Encoder
+from xutils.app_config import CorpusConfig
+from search.services.combined_service import CombinedService
+from search.search_metrics import CORPUS_LOADS_TOTAL, CORPUS_EVICTIONS_TOTAL, CORPUS_MEMORY_BYTES
+
+logger = logging.getLogger(__name__)
+
+# creates the combined service of a corpus config with the shared encoder
+ServiceFactory = Callable[[CorpusConfig, Encoder], CombinedService]
+
+
+class CorpusRegistry:
+    """
+    The corpora of the app by corpus id, loaded lazily and evicted least recently used.
+    """
+
+    def __init__(
+        self,
+        corpora: Iterable[CorpusConfig],
+        create_service: ServiceFactory,
+        memory_budget: Optional[int] = None,
+        pinned: Iterable[str] = ()
+    ) -> None:
+        """
+        Initialize the registry.
+        Args:
+            corpora: The corpus configs, with unique corpus ids.
+            create_service: Creates the service of a corpus, given the shared encoder.
+            memory_budget: The bytes the loaded corpora may take, None for no limit.
+            pinned: The ids of the corpora that are never evicted (e.g. the default one).
+        """
+        self.corpora: Dict[str, CorpusConfig] = {}
+        for corpus in corpora:
+            if corpus.corpus_id in self.corpora:
+                raise ValueError(f"Duplicate corpus id: {corpus.corpus_id}")
+            self.corpora[corpus.corpus_id] = corpus
+        self.pinned = set(pinned)
+        unknown = self.pinned - self.corpora.keys()
+        if unknown:
+            raise ValueError(f"Unknown pinned corpora: {sorted(unknown)}")
+        self.create_service = create_service
+        self.memory_budget = memory_budget
+
+        self._lock = RLock()
+        self._encoders: Dict[str, Encoder] = {}
+        # the loaded services, least recently used first
+        self._services: "OrderedDict[str, CombinedService]" = OrderedDict()
+
+    def __contains__(self, corpus_id: str) -> bool:
+        return corpus_id in self.corpora
+
+    def get_encoder(self, encoder_config_id: str) -> Encoder:
+        """Get the encoder shared by the corpora of an encoder config."""
+        with self._lock:
+            encoder = self._encoders.get(encoder_config_id)
+            if encoder is None:
+                encoder = Encoder(1, encoder_config_id)
+                self._encoders[encoder_config_id] = encoder
+            return encoder
+
+    def get(self, corpus_id: str) -> CombinedService:
+        """
+        Get the service of a corpus, creating it if it is not loaded,
+        and mark it as the most recently used.
+        Raises KeyError for an unknown corpus id.
+        """
+        corpus = self.corpora[corpus_id]
+        with self._lock:
+            service = self._services.get(corpus_id)
+            if service is None:
+                logger.info("loading corpus %s (%s)", corpus_id, corpus.domain.value)
+                encoder = self.get_encoder(corpus.encoder_config_id)
+                service = self.create_service(corpus, encoder)
+                # close the text file once the requests in flight let go of the service
+                weakref.finalize(service, service.stores.text_byte_reader.cleanup)
+                self._services[corpus_id] = service
+                CORPUS_LOADS_TOTAL.labels(corpus_id).inc()
+            self._services.move_to_end(corpus_id)
+            return service
+
+    def is_loaded(self, corpus_id: str) -> bool:
+        """Whether the service of the corpus is loaded."""
+        with self._lock:
+            return corpus_id in self._services
+
+    @staticmethod
+    def service_memory_bytes(service: CombinedService) -> int:
+        """The estimated bytes of the loaded stores and search matrices of a service."""
+        return service.stores.memory_bytes() + service.finder.memory_bytes()
+
+    def memory_bytes(self) -> Dict[str, int]:
+        """The estimated bytes of each loaded corpus, least recently used first."""
+        with self._lock:
+            services = list(self._services.items())
+        memory_bytes = {
+            corpus_id: self.service_memory_bytes(service) for corpus_id, service in services
+        }
+        for corpus_id, corpus_bytes in memory_bytes.items():
+            CORPUS_MEMORY_BYTES.labels(corpus_id).set(corpus_bytes)
+        return memory_bytes
+
+    def evict(self, keep: Optional[str] = None) -> List[str]:
+        """
+        Unload the least recently used corpora until the loaded ones fit the memory budget.
+        Args:
+            keep: A corpus that is not evicted, e.g. the one of the current request.
+        Returns:
+            The ids of the evicted corpora.
+        """
+        if self.memory_budget is None:
+            return []
+
+        evicted = []
+        with self._lock:
+            memory_bytes = self.memory_bytes()
+            total = sum(memory_bytes.values())
+            for corpus_id, corpus_bytes in memory_bytes.items():
+                if total <= self.memory_budget:
+                    break
+                if corpus_id == keep or corpus_id in self.pinned:
+                    continue
+                self._unload(corpus_id)
+                CORPUS_EVICTIONS_TOTAL.labels(corpus_id).inc()
+                total -= corpus_bytes
+                evicted.append(corpus_id)
+
+        if evicted:
+            logger.info("evicted corpora %s, %.1f MB loaded (budget: %.1f MB)",
+                        evicted, total / 2 ** 20, self.memory_budget / 2 ** 20)
+        if total > self.memory_budget:
+            logger.warning("loaded corpora take %.1f MB, over the budget of %.1f MB",
+                           total / 2 ** 20, self.memory_budget / 2 ** 20)
+        return evicted
+
+    def unload(self, corpus_id: str) -> bool:
+        """Unload the service of a corpus, returns whether it was loaded."""
+        with self._lock:
+            if corpus_id not in self._services:
+                return False
+            self._unload(corpus_id)
+            return True
+
+    def _unload(self, corpus_id: str) -> None:
+        del self._services[corpus_id]
+        CORPUS_MEMORY_BYTES.labels(corpus_id).set(0)
+        logger.info("unloaded corpus %s", corpus_id)
+
+    def status(self) -> Dict[str, Any]:
+        """The state of each corpus, for the corpora listing."""
+        memory_bytes = self.memory_bytes()
+        return {
+            "memory_budget": self.memory_budget,
+            "memory_bytes": sum(memory_bytes.values()),
+            "corpora": {
+                corpus_id: {
+                    "domain": corpus.domain.value,
+                    "max_len": corpus.embed_config.max_len,
+                    "loaded": corpus_id in memory_bytes,
+                    "memory_bytes": memory_bytes.get(corpus_id, 0),
+                }
+                for corpus_id, corpus in self.corpora.items()
+            },
+        }
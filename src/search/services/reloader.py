@@ -0,0 +1,228 @@
+"""
+Hot reload of the stores and the finder of the combined service, e.g. after an encode run.
+
+A reload builds a new generation (see CombinedService) in a background thread and warms it
+(loads the stores, morphs the search matrices, runs a search) while the old generation serves,
+then swaps it in. Requests in flight finish on the old generation, released once they are done,
+and its text file is closed once it drained.
+
+Peak memory is bounded to two generations: one thread reloads, and the reloads requested
+meanwhile are coalesced into one more reload, which starts once the old generation drained.
+The generations share the encoder, and an unchanged embedding store shares its embeddings and
+search matrices with the new generation. Persisted search matrices (persist_search_matrix) are
+memory mapped, so their pages are file backed rather than duplicated.
+
+A reload is requested by the admin endpoint (see web.combined_router) or, with a poll interval,
+by a change of the watched store files that is stable for one interval (not half written).
+"""
+import time
+import logging
+import weakref
+from enum import Enum
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from gen.encoder import Encoder
+from xutils.utils import Utils
+from search.stores import Stores
+from search.k_nearest_finder import KNearestFinder
+from search.services.combined_service import CombinedService
+from search.search_metrics import RELOADS_TOTAL, STORE_LOAD_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# creates the stores and the finder of a new generation with the (shared) encoder
+GenerationFactory = Callable[[Encoder], Tuple[Stores, KNearestFinder]]
+
+
+class ReloadState(Enum):
+    """
+    The state of the reloader.
+    """
+    IDLE = "idle"
+    RELOADING = "reloading"
+    FAILED = "failed"
+
+
+class Reloader:
+    """
+    Reload the stores and the finder of the combined service, swapping generations.
+    """
+
+    def __init__(
+        self,
+        service: CombinedService,
+        create_generation: GenerationFactory,
+        watch_paths: Sequence[Path] = (),
+        poll_seconds: Optional[float] = None,
+        drain_seconds: float = 60.0
+    ) -> None:
+        """
+        Initialize the reloader.
+        Args:
+            service: The service whose generation is reloaded.
+            create_generation: Creates the stores and the finder of a new generation.
+            watch_paths: The store files whose changes request a reload.
+            poll_seconds: The interval of polling the watched files, None to not watch them.
+            drain_seconds: How long to wait for the requests in flight on the old generation
+                before the next reload may start.
+        """
+        self.service = service
+        self.create_generation = create_generation
+        self.watch_paths = list(watch_paths)
+        self.poll_seconds = poll_seconds
+        self.drain_seconds = drain_seconds
+
+        self._lock = Lock()
+        self._thread: Optional[Thread] = None
+        self._pending = False
+        self._stop = Event()
+        self._state = ReloadState.IDLE
+        self._reloads = 0
+        self._seconds: Optional[float] = None
+        self._error: Optional[str] = None
+
+        # the store files the current generation was built from
+        self._embeddings_fingerprint = self.embeddings_fingerprint()
+        self._fingerprints = self.fingerprints()
+        # the fingerprints of the last poll, a change is picked up once stable
+        self._polled_fingerprints = self._fingerprints
+
+    def embeddings_fingerprint(self) -> Optional[str]:
+        """The fingerprint of the embedding store file of the current generation."""
+        return Utils.file_fingerprint(self.service.stores.embedding_store.path)
+
+    def fingerprints(self) -> Dict[str, Optional[str]]:
+        """The fingerprints of the watched files."""
+        return {str(path): Utils.file_fingerprint(path) for path in self.watch_paths}
+
+    @property
+    def reloading(self) -> bool:
+        """Whether a reload is running or requested."""
+        with self._lock:
+            return self._thread is not None
+
+    def request_reload(self) -> bool:
+        """
+        Reload in a background thread, or once more after the running reload.
+        Returns whether a reload was started (False if one was queued).
+        """
+        with self._lock:
+            if self._thread is not None:
+                self._pending = True
+                return False
+            self._thread = Thread(target=self._run, daemon=True, name="reloader")
+            self._thread.start()
+            return True
+
+    def _run(self) -> None:
+        """Reload until no reload is pending."""
+        while True:
+            self.reload()
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+                self._pending = False
+
+    def reload(self) -> bool:
+        """
+        Build and warm a new generation, swap it in and wait for the old one to drain.
+        Returns whether the new generation was swapped in.
+        """
+        self._state = ReloadState.RELOADING
+        start = time.perf_counter()
+        try:
+            old_generation = self.service.generation
+            # stat before loading, a file changed while loading is reloaded again
+            embeddings_fingerprint = self.embeddings_fingerprint()
+            fingerprints = self.fingerprints()
+
+            stores, finder = self.create_generation(old_generation.finder.encoder)
+            shared = embeddings_fingerprint is not None and \
+                embeddings_fingerprint == self._embeddings_fingerprint and \
+                stores.share_embeddings(old_generation.stores)
+            if shared:
+                finder.share_search_matrices(old_generation.finder)
+            self.warm_up(stores, finder)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.exception("reload failed, generation %d keeps serving",
+                             self.service.generation.number)
+            self._state = ReloadState.FAILED
+            self._error = f"{type(e).__name__}: {e}"
+            RELOADS_TOTAL.labels("error").inc()
+            return False
+
+        old_generation = self.service.swap_generation(stores, finder)
+        self._embeddings_fingerprint = embeddings_fingerprint
+        self._fingerprints = fingerprints
+        seconds = time.perf_counter() - start
+        STORE_LOAD_SECONDS.labels("generation").observe(seconds)
+        RELOADS_TOTAL.labels("ok").inc()
+        logger.info("reloaded generation %d in %.1fs (embeddings %s)",
+                    old_generation.number + 1, seconds, "shared" if shared else "loaded")
+
+        text_byte_reader = old_generation.stores.text_byte_reader
+        if self.service.wait_drained(old_generation, self.drain_seconds):
+            text_byte_reader.cleanup()
+        else:
+            logger.warning("generation %d: %d requests still in flight after %.0fs",
+                           old_generation.number, old_generation.in_flight, self.drain_seconds)
+            # close the text file once the requests in flight let go of the stores
+            weakref.finalize(old_generation.stores, text_byte_reader.cleanup)
+        self._reloads += 1
+        self._seconds = seconds
+        self._error = None
+        self._state = ReloadState.IDLE
+        return True
+
+    @staticmethod
+    def warm_up(stores: Stores, finder: KNearestFinder) -> None:
+        """Load the stores and the search matrices of a generation, and run a search."""
+        _ = stores.documents
+        _ = stores.segment_records
+        _ = stores.uids_and_embeddings
+        finder.warm_up()
+
+    def poll(self) -> bool:
+        """
+        Request a reload if the watched files changed since the current generation was built,
+        and did not change since the last poll. Returns whether a reload was requested.
+        """
+        fingerprints = self.fingerprints()
+        stable = fingerprints == self._polled_fingerprints
+        self._polled_fingerprints = fingerprints
+        if not stable or fingerprints == self._fingerprints or self.reloading:
+            return False
+        logger.info("store files changed, reloading")
+        self.request_reload()
+        return True
+
+    def start_watching(self) -> None:
+        """Poll the watched files in a background thread, if a poll interval is set."""
+        if self.poll_seconds is None or not self.watch_paths:
+            return
+        Thread(target=self._watch, daemon=True, name="store-watcher").start()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.poll()
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("polling the store files failed")
+
+    def stop_watching(self) -> None:
+        """Stop polling the watched files."""
+        self._stop.set()
+
+    def status(self) -> Dict[str, Any]:
+        """The state of the reloader and the current generation."""
+        return {
+            "state": self._state.value,
+            "generation": self.service.generation.number,
+            "reloads": self._reloads,
+            "reloading": self.reloading,
+            "seconds": self._seconds,
+            "error": self._error,
+        }
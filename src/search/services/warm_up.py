@@ -0,0 +1,140 @@
+"""
+Startup warm-up and readiness of the combined service.
+
+The stores, the encoder model, the search matrices and the OpenAI client are otherwise loaded
+by the first requests. WarmUp loads them in order in a background thread, tracking the state
+of each component, so /readyz (see web.health_router) routes traffic only to warmed workers.
+The OpenAI client is optional: search works without it, so its failure (e.g. no API key) is
+reported but does not hold back readiness.
+"""
+import time
+import logging
+from enum import Enum
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from xutils.utils import Utils
+from search.services.combined_service import CombinedService
+
+logger = logging.getLogger(__name__)
+
+
+class ComponentState(Enum):
+    """
+    The load state of a component.
+    """
+    PENDING = "pending"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class WarmUp:
+    """
+    Warm up the components of the combined service and report their state.
+    """
+
+    def __init__(self, service: CombinedService) -> None:
+        """
+        Initialize the warm-up.
+        Args:
+            service: The service to warm up, along with its stores and finder.
+        """
+        self.service = service
+
+        # in dependency order, through the service to not hold on to a reloaded generation
+        self.steps: List[Tuple[str, Callable[[], Any]]] = [
+            ("documents", lambda: service.stores.documents),
+            ("segment_records", lambda: service.stores.segment_records),
+            ("embeddings", lambda: service.stores.uids_and_embeddings),
+            ("encoder", lambda: service.finder.encoder.model),
+            ("search", lambda: service.finder.warm_up()),
+            ("openai_client", service.get_openai_client),
+        ]
+        # a failure is reported, the warm-up goes on and the service is ready without them
+        self.optional = {"openai_client"}
+
+        self._lock = Lock()
+        self._states: Dict[str, ComponentState] = \
+            {name: ComponentState.PENDING for name, _ in self.steps}
+        self._seconds: Dict[str, float] = {}
+        self._errors: Dict[str, str] = {}
+
+    def _set_state(
+        self,
+        name: str,
+        state: ComponentState,
+        seconds: Optional[float] = None,
+        error: Optional[str] = None
+    ) -> None:
+        with self._lock:
+            self._states[name] = state
+            if seconds is not None:
+                self._seconds[name] = seconds
+            if error is not None:
+                self._errors[name] = error
+
+    def run(self) -> bool:
+        """
+        Run the warm-up steps in order, stopping at the first failure of a required step.
+        Returns whether the service is ready.
+        """
+        logger.info("warm-up starts")
+        for name, step in self.steps:
+            self._set_state(name, ComponentState.LOADING)
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                seconds = time.perf_counter() - start
+                self._set_state(name, ComponentState.FAILED, seconds, f"{type(e).__name__}: {e}")
+                if name in self.optional:
+                    logger.warning("warm-up: optional %s failed: %s", name, e)
+                    continue
+                logger.exception("warm-up: %s failed", name)
+                return False
+            seconds = time.perf_counter() - start
+            logger.info("warm-up: %s ready in %.2fs", name, seconds)
+            self._set_state(name, ComponentState.READY, seconds)
+
+        logger.info("warm-up done")
+        return self.ready
+
+    def background_run(self) -> None:
+        """
+        Run the warm-up in the background.
+        """
+        if Utils.is_env_var_truthy("UNIT_TESTING"):
+            return
+
+        thread = Thread(target=self.run, daemon=True)
+        thread.start()
+
+    def _is_ready(self) -> bool:
+        """Whether the required components are ready and the optional ones are done."""
+        for name, state in self._states.items():
+            if state == ComponentState.READY:
+                continue
+            if name in self.optional and state == ComponentState.FAILED:
+                continue
+            return False
+        return True
+
+    @property
+    def ready(self) -> bool:
+        """Whether the required components are ready (and the optional ones tried)."""
+        with self._lock:
+            return self._is_ready()
+
+    def status(self) -> Dict[str, Any]:
+        """The readiness and the per component state, load seconds and error."""
+        with self._lock:
+            components = {}
+            for name, state in self._states.items():
+                component: Dict[str, Any] = {"state": state.value}
+                if name in self._seconds:
+                    component["seconds"] = round(self._seconds[name], 3)
+                if name in self._errors:
+                    component["error"] = self._errors[name]
+                components[name] = component
+            ready = self._is_ready()
+        return {"ready": ready, "components": components}
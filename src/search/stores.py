@@ -5,6 +5,7 @@ import logging
 from uuid import UUID
 from threading import RLock, Thread
 from typing import List, Tuple, Optional
+import numpy as np
 from numpy.typing import NDArray
 
 
@@ -16,8 +17,12 @@ from gen.data.segment_record_store import SegmentRecordStore
 from gen.data.document import Document
 from gen.data.document_store import DocumentStore
 from gen.embedding_store import EmbeddingStore
+from search.search_metrics import STORE_LOAD_SECONDS
 logger = logging.getLogger(__name__)
 
+# a rough size of a loaded document, segment record or uid, for the memory accounting
+OBJECT_BYTES = 200
+
 
 class Stores:
     """
@@ -52,6 +57,11 @@ class Stores:
         self._segment_records: Optional[List[SegmentRecord]] = None
         self._uids_and_embeddings: Optional[Tuple[List[UUID], NDArray]] = None
 
+        # derived, reset when the documents / segment records are (re)loaded
+        self._document_titles: Optional[List[str]] = None
+        self._segment_document_indexes: Optional[NDArray] = None
+        self._document_segment_index: Optional[Tuple[NDArray, NDArray]] = None
+
     def background_load(self):
         """
         Pre-load the documents, segment records, and embeddings in the background.
@@ -77,6 +87,26 @@ class Stores:
         thread = Thread(target=load, daemon=True)
         thread.start()
 
+    def refresh(self) -> None:
+        """
+        Reload what was already loaded, picking up documents, segment records and embeddings
+        appended since (see the --append / --incremental modes of the gen scripts).
+        Loaded in dependency order, so an embedding's record and document are always there.
+        """
+        with self._lock:
+            timer = LoggingTimer('refresh', logger=logger, level="DEBUG")
+            if self._documents is not None:
+                self._load_documents()
+                timer.restart("documents reloaded")
+
+            if self._segment_records is not None:
+                self._load_segment_records()
+                timer.restart("segment records reloaded")
+
+            if self._uids_and_embeddings is not None:
+                self._load_uids_and_embeddings()
+                timer.restart("embeddings reloaded")
+
     def get_segment_text(self, segment_record: SegmentRecord) -> str:
         """Get the text of a segment."""
         _bytes = self.text_byte_reader.read_bytes(
@@ -85,6 +115,13 @@ class Stores:
         text = _bytes.decode("utf-8")
         return text
 
+    def get_segment_texts(self, segment_records: List[SegmentRecord]) -> List[str]:
+        """Get the text of several segments with one batched read."""
+        ranges = [(record.offset, record.length) for record in segment_records]
+        views = self.text_byte_reader.read_many(ranges)
+        texts = [str(view, "utf-8") for view in views]
+        return texts
+
     def get_document_by_index(self, document_index: int) -> Document:
         """Get a document by index."""
         documents = self.documents
@@ -103,6 +140,76 @@ class Stores:
         document_indexes = [record.document_index for record in segment_records]
         return document_indexes
 
+    def get_document_titles(self) -> List[str]:
+        """Get the casefolded titles (header texts) of the documents, for matching."""
+        with self._lock:
+            if self._document_titles is None:
+                self._document_titles = [
+                    document.header.text.casefold() for document in self.documents]
+            return self._document_titles
+
+    def get_segment_document_indexes(self) -> NDArray:
+        """Get the document indexes of the segments, by segment row."""
+        with self._lock:
+            if self._segment_document_indexes is None:
+                self._segment_document_indexes = np.array(
+                    [record.document_index for record in self.segment_records], dtype=np.int64)
+            return self._segment_document_indexes
+
+    def get_document_segment_rows(self, document_indexes: NDArray) -> NDArray:
+        """
+        Get the ascending segment rows of the documents, in time proportional to the number
+        of segments found (see the document -> segment rows index).
+        """
+        with self._lock:
+            if self._document_segment_index is None:
+                segment_document_indexes = self.get_segment_document_indexes()
+                order = np.argsort(segment_document_indexes, kind="stable")
+                counts = np.bincount(segment_document_indexes)
+                starts = np.concatenate(([0], np.cumsum(counts)))
+                self._document_segment_index = (order, starts)
+            order, starts = self._document_segment_index
+
+        document_indexes = np.asarray(document_indexes, dtype=np.int64)
+        document_indexes = document_indexes[document_indexes < len(starts) - 1]
+        counts = starts[document_indexes + 1] - starts[document_indexes]
+        # the positions in order of each document's segments, concatenated
+        positions = np.repeat(starts[document_indexes] - np.cumsum(counts) + counts, counts)
+        positions += np.arange(len(positions))
+        return np.sort(order[positions])
+
+    def share_embeddings(self, other: "Stores") -> bool:
+        """
+        Use the loaded uids and embeddings of another generation of the stores, when the
+        embedding store is unchanged, so the generations share their memory.
+        Returns whether the other stores had them loaded.
+        """
+        uids_and_embeddings = other._uids_and_embeddings
+        if uids_and_embeddings is None:
+            return False
+        with self._lock:
+            self._uids_and_embeddings = uids_and_embeddings
+        return True
+
+    def memory_bytes(self) -> int:
+        """
+        An estimate of the bytes of the loaded stores: the embeddings and their derived
+        indexes, and OBJECT_BYTES per document, segment record and uid.
+        Reads the loaded attributes without the lock, which is held while loading.
+        """
+        object_count = len(self._documents or ()) + len(self._segment_records or ())
+        arrays = [self._segment_document_indexes]
+        document_segment_index = self._document_segment_index
+        if document_segment_index is not None:
+            arrays.extend(document_segment_index)
+        uids_and_embeddings = self._uids_and_embeddings
+        if uids_and_embeddings is not None:
+            uids, embeddings = uids_and_embeddings
+            object_count += len(uids)
+            arrays.append(embeddings)
+        return object_count * OBJECT_BYTES + \
+            sum(array.nbytes for array in arrays if array is not None)
+
     @property
     def documents(self) -> List[Document]:
         """Get the documents."""
@@ -133,17 +240,23 @@ class Stores:
     def _load_documents(self) -> None:
         """Load the documents."""
         document_store = self.document_store
-        documents = document_store.load_documents()
+        with STORE_LOAD_SECONDS.labels("documents").time():
+            documents = document_store.load_documents()
         self._documents = documents
+        self._document_titles = None
 
     def _load_segment_records(self) -> None:
         """Load the segment records from a csv file."""
         segment_record_store = self.segment_record_store
-        segment_records = segment_record_store.load_segment_records()
+        with STORE_LOAD_SECONDS.labels("segment_records").time():
+            segment_records = segment_record_store.load_segment_records()
         self._segment_records = segment_records
+        self._segment_document_indexes = None
+        self._document_segment_index = None
 
     def _load_uids_and_embeddings(self) -> None:
         """Load the uids and embeddings."""
         embedding_store = self.embedding_store
-        uids_and_embeddings = embedding_store.load_embeddings()
+        with STORE_LOAD_SECONDS.labels("embeddings").time():
+            uids_and_embeddings = embedding_store.load_embeddings()
         self._uids_and_embeddings = uids_and_embeddings
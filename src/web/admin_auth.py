@@ -0,0 +1,36 @@
+"""
+Protection of the admin routes (/api/admin/...).
+
+With an admin token (the ADMIN_TOKEN environment variable, see scripts/run/run_app.py) the
+requests must send it as "Authorization: Bearer <token>", without one only loopback clients
+may call the admin routes.
+"""
+import secrets
+from typing import Callable, Optional
+from fastapi import HTTPException, Request
+
+ADMIN_TOKEN_ENV = "ADMIN_TOKEN"
+LOOPBACK_HOSTS = frozenset(("127.0.0.1", "::1", "localhost"))
+
+
+def create_admin_guard(admin_token: Optional[str]) -> Callable[[Request], None]:
+    """
+    Create the dependency of the admin routes, e.g. dependencies=[Depends(require_admin)].
+    Args:
+        admin_token: The bearer token of the admin requests, None to allow loopback clients.
+    """
+    def require_admin(request: Request) -> None:
+        """Reject the request unless it is authorized for the admin routes."""
+        if admin_token is None:
+            client = request.client
+            if client is None or client.host not in LOOPBACK_HOSTS:
+                raise HTTPException(status_code=403,
+                                    detail="Admin routes are limited to loopback clients")
+            return
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or \
+                not secrets.compare_digest(token.encode("utf-8"), admin_token.encode("utf-8")):
+            raise HTTPException(status_code=401, detail="Invalid admin token",
+                                headers={"WWW-Authenticate": "Bearer"})
+
+    return require_admin
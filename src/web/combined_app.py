@@ -3,25 +3,37 @@ Creates the Combined (Search + RAG) FastAPI app.
 Creates a CombinedService and CombinedRouter.
 CombinedService provides the core logic for the combined search and RAG service.
 CombinedRouter provides the routes for the combined search and RAG service.
+With more corpora, a CorpusRegistry serves them by corpus id next to the default corpus
+(see web.corpora_router). A Reloader swaps in reloaded stores of the default corpus.
 """
 import re
 import logging
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
-from xutils.app_config import AppConfig
-from xutils.byte_reader import ByteReader
+from xutils.app_config import AppConfig, CorpusConfig
+from xutils.byte_reader import ByteReader, create_byte_reader
 from xutils.app_config import Domain
+from xutils.tracing import TraceSink
 from search.stores import Stores
 from search.k_nearest_finder import KNearestFinder
 from search.services.combined_service import CombinedService
+from search.services.warm_up import WarmUp
+from search.services.corpus_registry import CorpusRegistry
+from search.services.reloader import GenerationFactory, Reloader
 from search.stores import DocumentStore
 from web.combined_router import create_combined_router
+from web.corpora_router import create_corpora_router
+from web.health_router import create_health_router
+from web.metrics_router import create_metrics_router
+from gen.encoder import Encoder
 from gen.embedding_store import EmbeddingStore, StoreMode
-from gen.element.flat.flat_article_store import FlatArticleStore
+from gen.bm25_index import BM25Index
+from gen.element.flat.flat_article_array_store import FlatArticleArrayStore
 from gen.data.plot_store import PlotStore
 from gen.data.segment_record_store import SegmentRecordStore
 
@@ -33,8 +45,62 @@ def clean_header(text):
     return re.sub(r'(^\s*=\s+)|(\s+=\s*$)', '', text)
 
 
-def create_combined_app(app_config: AppConfig) -> FastAPI:
-    """Creates the FastAPI app for the combined search and RAG service."""
+def create_combined_app(
+    app_config: AppConfig,
+    encoder_config_id: str = "big",
+    binary_shortlist: Optional[int] = None,
+    cascade_dim: Optional[int] = None,
+    cascade_shortlist: int = 1000,
+    persist_search_matrix: bool = False,
+    lexical_mode: Optional[str] = None,
+    lexical_candidates: int = 1000,
+    lexical_weight: float = 0.3,
+    article_pooling: Optional[str] = None,
+    article_drill_down: Optional[int] = None,
+    trace_file: Optional[str] = None,
+    trace_sample_rate: float = 0.1,
+    trace_slow_seconds: Optional[float] = None,
+    default_corpus_id: str = "default",
+    corpora: Optional[List[CorpusConfig]] = None,
+    corpus_memory_budget_mb: Optional[int] = None,
+    reload_poll_seconds: Optional[float] = None,
+    admin_token: Optional[str] = None
+) -> FastAPI:
+    """
+    Creates the FastAPI app for the combined search and RAG service.
+    Args:
+        app_config: The app config.
+        encoder_config_id: The encoder config used to encode queries
+            (see gen.encoder.encoder_configs).
+        binary_shortlist: The Hamming pre-filter shortlist size (see KNearestFinder),
+            None searches the embeddings exhaustively.
+        cascade_dim: The Matryoshka cascade first stage dim (see KNearestFinder),
+            None disables the cascade.
+        cascade_shortlist: The Matryoshka cascade shortlist size.
+        persist_search_matrix: Persist the morphed search embeddings
+            (see gen.search_matrix_store).
+        lexical_mode: Hybrid retrieval with the BM25 index of the segments, "union" or
+            "prefilter" (see KNearestFinder), None disables it.
+        lexical_candidates: The number of top lexical candidates.
+        lexical_weight: The weight of the BM25 score in the fused score.
+        article_pooling: Search articles by their pooled segment embeddings, "mean" or "max"
+            (see KNearestFinder), None scans the segments.
+        article_drill_down: The number of top articles whose segments are scored.
+        trace_file: The JSON lines file to append sampled request traces to
+            (see xutils.tracing), None to not write them.
+        trace_sample_rate: The fraction of the request traces to write.
+        trace_slow_seconds: Always write the traces of requests at least this slow.
+        default_corpus_id: The corpus id of the app config, with more corpora.
+        corpora: More corpora, served by corpus id at /api/corpora/{corpus_id}/...
+            (see web.corpora_router) and sharing the encoder of the default corpus.
+        corpus_memory_budget_mb: The memory the loaded corpora may take, the least recently
+            used ones are unloaded beyond it, None for no limit.
+        reload_poll_seconds: Reload the stores when the embedding store or the segment
+            records file change, polled at this interval (see search.services.reloader),
+            None reloads only on POST /api/admin/reload.
+        admin_token: The bearer token of the /api/admin routes, None limits them to loopback
+            clients (see web.admin_auth).
+    """
 
     app = FastAPI()
 
@@ -48,9 +114,123 @@ def create_combined_app(app_config: AppConfig) -> FastAPI:
 
     app.mount("/static", StaticFiles(directory="web-ui/static"), name="static")
 
+    finder_options = {
+        "binary_shortlist": binary_shortlist,
+        "cascade_dim": cascade_dim,
+        "cascade_shortlist": cascade_shortlist,
+        "persist_search_matrix": persist_search_matrix,
+        "lexical_mode": lexical_mode,
+        "lexical_candidates": lexical_candidates,
+        "lexical_weight": lexical_weight,
+        "article_pooling": article_pooling,
+        "article_drill_down": article_drill_down,
+    }
+    registry = None
+    if corpora:
+        default_corpus = CorpusConfig(
+            domain=app_config.domain,
+            text_file_path=app_config.text_file_path,
+            embed_config=app_config.embed_config,
+            corpus_id=default_corpus_id,
+            encoder_config_id=encoder_config_id,
+            finder_options=finder_options,
+        )
+        memory_budget = None
+        if corpus_memory_budget_mb is not None:
+            memory_budget = corpus_memory_budget_mb * 2 ** 20
+        registry = CorpusRegistry([default_corpus, *corpora], create_corpus_service,
+                                  memory_budget, pinned=[default_corpus_id])
+        service = registry.get(default_corpus_id)
+    else:
+        service = create_combined_service(app_config, encoder_config_id, **finder_options)
+
+    trace_sink = None
+    if trace_file is not None:
+        trace_sink = TraceSink(trace_file, trace_sample_rate, trace_slow_seconds)
+    stores = service.stores
+    reloader = Reloader(
+        service,
+        create_generation_factory(app_config, encoder_config_id, finder_options),
+        watch_paths=[stores.embedding_store.path,
+                     stores.segment_record_store.get_segment_record_store_path()],
+        poll_seconds=reload_poll_seconds,
+    )
+    reloader.start_watching()
+
+    combined_router = create_combined_router(app_config, service, trace_sink, reloader,
+                                             admin_token)
+    app.include_router(combined_router)
+    if registry is not None:
+        app.include_router(create_corpora_router(registry, trace_sink, admin_token))
+
+    # load the model and the search matrices before /readyz lets traffic in
+    warm_up = WarmUp(service)
+    warm_up.background_run()
+    app.include_router(create_health_router(warm_up))
+    app.include_router(create_metrics_router())
+
+    return app
+
+
+def create_combined_service(
+    app_config: AppConfig,
+    encoder_config_id: str = "big",
+    binary_shortlist: Optional[int] = None,
+    cascade_dim: Optional[int] = None,
+    cascade_shortlist: int = 1000,
+    persist_search_matrix: bool = False,
+    lexical_mode: Optional[str] = None,
+    lexical_candidates: int = 1000,
+    lexical_weight: float = 0.3,
+    article_pooling: Optional[str] = None,
+    article_drill_down: Optional[int] = None,
+    encoder: Optional[Encoder] = None
+) -> CombinedService:
+    """
+    Creates the combined service of a corpus (app config), its stores start loading in the
+    background. The search options are those of create_combined_app, the encoder is shared
+    if given.
+    """
+    stores, finder = create_search_generation(
+        app_config,
+        encoder_config_id=encoder_config_id,
+        binary_shortlist=binary_shortlist,
+        cascade_dim=cascade_dim,
+        cascade_shortlist=cascade_shortlist,
+        persist_search_matrix=persist_search_matrix,
+        lexical_mode=lexical_mode,
+        lexical_candidates=lexical_candidates,
+        lexical_weight=lexical_weight,
+        article_pooling=article_pooling,
+        article_drill_down=article_drill_down,
+        encoder=encoder,
+    )
+    stores.background_load()
+    service = CombinedService(stores, app_config.embed_config, finder)
+    return service
+
+
+def create_search_generation(
+    app_config: AppConfig,
+    encoder_config_id: str = "big",
+    binary_shortlist: Optional[int] = None,
+    cascade_dim: Optional[int] = None,
+    cascade_shortlist: int = 1000,
+    persist_search_matrix: bool = False,
+    lexical_mode: Optional[str] = None,
+    lexical_candidates: int = 1000,
+    lexical_weight: float = 0.3,
+    article_pooling: Optional[str] = None,
+    article_drill_down: Optional[int] = None,
+    encoder: Optional[Encoder] = None
+) -> Tuple[Stores, KNearestFinder]:
+    """
+    Creates the stores and the finder of a corpus (app config), not loaded yet,
+    for a new service or a reload (see search.services.reloader).
+    """
     embed_config = app_config.embed_config
 
-    text_byte_reader = ByteReader(app_config.text_file_path)
+    text_byte_reader = create_byte_reader(app_config.text_file_path)
     path_prefix = embed_config.prefix
 
     document_store = create_document_store(app_config, text_byte_reader)
@@ -64,15 +244,49 @@ def create_combined_app(app_config: AppConfig) -> FastAPI:
     segment_record_store = SegmentRecordStore(path_prefix, max_len)
 
     stores = Stores(text_byte_reader, document_store, segment_record_store, embedding_store)
-    stores.background_load()
 
-    finder = KNearestFinder(stores, embed_config)
-    service = CombinedService(stores, embed_config, finder)
+    lexical_index = None
+    if lexical_mode is not None:
+        lexical_index = BM25Index.load(BM25Index.get_path(path_prefix, max_len))
 
-    combined_router = create_combined_router(app_config, service)
-    app.include_router(combined_router)
+    finder = KNearestFinder(
+        stores,
+        embed_config,
+        encoder_config_id=encoder_config_id,
+        binary_shortlist=binary_shortlist,
+        cascade_dim=cascade_dim,
+        cascade_shortlist=cascade_shortlist,
+        persist_search_matrix=persist_search_matrix,
+        lexical_index=lexical_index,
+        lexical_mode=lexical_mode or "union",
+        lexical_candidates=lexical_candidates,
+        lexical_weight=lexical_weight,
+        article_pooling=article_pooling,
+        article_drill_down=article_drill_down,
+        encoder=encoder,
+    )
+    return stores, finder
 
-    return app
+
+def create_generation_factory(
+    app_config: AppConfig,
+    encoder_config_id: str,
+    finder_options: Dict[str, Any]
+) -> GenerationFactory:
+    """
+    Creates the factory of the reloaded generations of a corpus (app config), given the
+    encoder of the current generation (see search.services.reloader).
+    """
+    def create_generation(encoder: Encoder) -> Tuple[Stores, KNearestFinder]:
+        return create_search_generation(app_config, encoder_config_id, encoder=encoder,
+                                        **finder_options)
+    return create_generation
+
+
+def create_corpus_service(corpus: CorpusConfig, encoder: Encoder) -> CombinedService:
+    """Creates the combined service of a corpus of the corpus registry."""
+    return create_combined_service(corpus, corpus.encoder_config_id, encoder=encoder,
+                                   **corpus.finder_options)
 
 
 def create_document_store(app_config: AppConfig, text_byte_reader: ByteReader) -> DocumentStore:
@@ -80,7 +294,7 @@ def create_document_store(app_config: AppConfig, text_byte_reader: ByteReader) -
     path_prefix = app_config.embed_config.prefix
     domain = app_config.domain
     if domain == Domain.WIKI:
-        document_store = FlatArticleStore(path_prefix, text_byte_reader)
+        document_store = FlatArticleArrayStore(path_prefix, text_byte_reader)
     elif domain == Domain.PLOTS:
         plots_dir = Path(path_prefix).parent
         document_store = PlotStore(plots_dir)
@@ -7,21 +7,25 @@ import os
 import logging
 import datetime
 from dataclasses import dataclass
-from typing import List
-from pydantic import BaseModel
-from fastapi.responses import HTMLResponse
-from fastapi import Request, APIRouter, Depends, Form
+from typing import Any, Dict, List, Optional, Tuple, Union
+from pydantic import BaseModel, Field
+from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import Request, Response, APIRouter, Depends, Form
 from fastapi.templating import Jinja2Templates
 
 from xutils.app_config import AppConfig
+from xutils.tracing import Trace, TraceSink, start_trace
 from search.services.combined_service import (
     CombinedService,
     CombinedRequest,
     CombinedResponse,
     Kind,
-    Action,
-    ResultElement
+    Action
 )
+from search.services.reloader import Reloader
+from search.search_filter import SearchFilter
+from web.response_encoding import ResultFields, results_to_dicts, json_response
+from web.admin_auth import create_admin_guard
 
 
 logger = logging.getLogger(__name__)
@@ -52,6 +56,14 @@ class CombinedRequestModel(BaseModel):
     k: int = 5
     threshold: float = 0.3
     max: int = 10
+    # include the span tree of the request in the response meta
+    trace: bool = False
+    # restrict the search to documents: document_indexes, title (substring), recent (last N)
+    filter: Optional[SearchFilter] = None  # pylint: disable=redefined-builtin
+    # the fields of the results: ids (and similarities), snippets or full (texts and prompt)
+    fields: ResultFields = ResultFields.FULL
+    # the maximum length of the snippets
+    snippet_length: int = Field(200, ge=1)
 
     def to_combined_request(self) -> CombinedRequest:
         """
@@ -66,6 +78,8 @@ class CombinedRequestModel(BaseModel):
             k=self.k,
             threshold=self.threshold,
             max=self.max,
+            search_filter=self.filter,
+            with_text=ResultFields(self.fields) is not ResultFields.IDS,
         )
 
     # pylint: disable=too-few-public-methods
@@ -74,16 +88,33 @@ class CombinedRequestModel(BaseModel):
         use_enum_values = True
 
 
+class ResultModel(BaseModel):
+    """
+    Pydantic model for a result of the api response, with the selected fields
+    (see web.response_encoding.ResultFields).
+    """
+    similarity: float
+    # the segment record: segment and document indexes, offset, length
+    record: Any
+    # snippets and full only
+    caption: Optional[str] = None
+    # snippets (truncated to snippet_length) and full only
+    text: Optional[str] = None
+
+
 class CombinedAppResponseModel(BaseModel):
     """
     Pydantic model for the result of the combined service.
+    The api responses are encoded by web.response_encoding, prompt is left out and the
+    results are trimmed to the selected fields unless they are full.
     """
     id: str
     action: Action
     search_query: str
     rag_query: str
-    prompt: str
-    results: List[ResultElement]
+    # full only
+    prompt: Optional[str] = None
+    results: List[ResultModel]
     answer: str
     total_length: int
 
@@ -101,7 +132,11 @@ class CombinedAppResponseModel(BaseModel):
             search_query=combined_response.search_query,
             rag_query=combined_response.rag_query,
             prompt=combined_response.prompt,
-            results=combined_response.results,
+            results=[
+                ResultModel(similarity=result.similarity, record=result.record,
+                            caption=result.caption, text=result.text)
+                for result in combined_response.results
+            ],
             answer=combined_response.answer,
             total_length=combined_response.total_length,
         )
@@ -116,11 +151,13 @@ class CombinedMetaModel(BaseModel):
     received: datetime.datetime
     completed: datetime.datetime
     duration: datetime.timedelta
+    trace: Optional[Dict[str, Any]] = None
 
 
 class CombinedResponseModel(BaseModel):
     """
     Pydantic model for the response that includes the results and the meta data.
+    Documents the api responses, which are encoded by web.response_encoding.
     """
     data: CombinedAppResponseModel
     meta: CombinedMetaModel
@@ -154,12 +191,101 @@ def clean_header(text):
     return re.sub(r'(^\s*=\s+)|(\s+=\s*$)', '', text)
 
 
+def traced_combined(
+    service: CombinedService,
+    combined_request: CombinedRequest,
+    trace_sink: Optional[TraceSink] = None
+) -> Tuple[CombinedResponse, Trace]:
+    """Process the combined request in a trace, the trace is written even on failure."""
+    trace = None
+    try:
+        with start_trace(combined_request.id, "combined") as trace:
+            combined_response = service.combined(combined_request)
+    finally:
+        if trace_sink is not None and trace is not None:
+            trace_sink.write(trace)
+    return combined_response, trace
+
+
+def combined_api_response(
+    app_config: AppConfig,
+    service: CombinedService,
+    request: CombinedRequestModel,
+    accept_encoding: Optional[str] = None,
+    trace_sink: Optional[TraceSink] = None
+) -> Response:
+    """
+    Process the combined api request of a corpus (app config) and build the response
+    (a CombinedResponseModel) with the selected result fields, encoded by
+    web.response_encoding rather than validated and serialized by pydantic.
+    """
+    received = datetime.datetime.now()
+
+    combined_request = request.to_combined_request()
+
+    combined_response, trace = traced_combined(service, combined_request, trace_sink)
+
+    text_file_name = os.path.basename(app_config.text_file_path)
+    max_len = app_config.embed_config.max_len
+    completed = datetime.datetime.now()
+
+    fields = ResultFields(request.fields)
+    data = {
+        "id": combined_response.id,
+        "action": combined_response.action.value,
+        "search_query": combined_response.search_query,
+        "rag_query": combined_response.rag_query,
+        "results": results_to_dicts(combined_response.results, fields, request.snippet_length),
+        "answer": combined_response.answer,
+        "total_length": combined_response.total_length,
+    }
+    if fields is ResultFields.FULL:
+        data["prompt"] = combined_response.prompt
+    meta = CombinedMetaModel(
+        text_file=text_file_name,
+        max_len=max_len,
+        received=received.isoformat(),
+        completed=completed.isoformat(),
+        duration=completed - received,
+        trace=trace.to_dict() if request.trace else None,
+    )
+    content = {"data": data, "meta": meta.model_dump(mode="json")}
+    return json_response(content, accept_encoding,
+                         headers={"Server-Timing": trace.server_timing()})
+
+
+# the api responses are built by combined_api_response, the model documents them
+COMBINED_API_RESPONSES: Dict[Union[int, str], Dict[str, Any]] = {
+    200: {
+        "model": CombinedResponseModel,
+        "description": "The results with the fields selected by the request fields: ids "
+                       "(similarity and record), snippets (and the caption and the text "
+                       "truncated to snippet_length) or full (and the full text, and the "
+                       "prompt). Compressed per Accept-Encoding.",
+    },
+}
+
+
 def create_combined_router(
     app_config: AppConfig,
-    service: CombinedService
+    service: CombinedService,
+    trace_sink: Optional[TraceSink] = None,
+    reloader: Optional[Reloader] = None,
+    admin_token: Optional[str] = None
 ) -> APIRouter:
-    """Create the FastAPI router for the combined service."""
+    """
+    Create the FastAPI router for the combined service.
+    Args:
+        app_config: The app config.
+        service: The combined service.
+        trace_sink: Where to write the sampled request traces, None to not write them.
+        reloader: Reloads the stores of the service on POST /api/admin/reload,
+            None to not add the reload routes.
+        admin_token: The bearer token of the admin routes, None limits them to loopback
+            clients (see web.admin_auth).
+    """
     router = APIRouter()
+    admin = [Depends(create_admin_guard(admin_token))]
 
     templates = Jinja2Templates(directory="web-ui/templates")
     templates.env.filters['clean_header'] = clean_header
@@ -201,7 +327,7 @@ def create_combined_router(
         logger.info("Query: %s", query)
         logger.info("Received request: %s", combined_request)
 
-        combined_response = service.combined(combined_request)
+        combined_response, trace = traced_combined(service, combined_request, trace_sink)
 
         text_file_name = os.path.basename(app_config.text_file_path)
         completed = datetime.datetime.now()
@@ -218,34 +344,41 @@ def create_combined_router(
         }
 
         response = templates.TemplateResponse("combined.html", template_vars)
+        response.headers["Server-Timing"] = trace.server_timing()
         return response
 
-    @router.post("/api/combined", response_model=CombinedResponseModel)
-    async def combined_api(request: CombinedRequestModel):
-        """Process the combined api request and return the response."""
-
-        received = datetime.datetime.now()
-
-        combined_request = request.to_combined_request()
-
-        combined_response = service.combined(combined_request)
-
-        text_file_name = os.path.basename(app_config.text_file_path)
-        max_len = app_config.embed_config.max_len
-        completed = datetime.datetime.now()
+    @router.post("/api/combined", response_class=JSONResponse,
+                 responses=COMBINED_API_RESPONSES)
+    async def combined_api(request: CombinedRequestModel, http_request: Request):
+        """
+        Process the combined api request and return the response, with the result fields
+        selected by fields: ids, snippets or full (the default).
+        """
+        return combined_api_response(app_config, service, request,
+                                     http_request.headers.get("accept-encoding"), trace_sink)
 
-        response = CombinedAppResponseModel.from_combined_response(combined_response)
-        meta = CombinedMetaModel(
-            text_file=text_file_name,
-            max_len=max_len,
-            received=received.isoformat(),
-            completed=completed.isoformat(),
-            duration=completed - received,
-        )
-        combined_response_model = CombinedResponseModel(
-            data=response,
-            meta=meta,
-        )
-        return combined_response_model
+    @router.post("/api/admin/refresh", dependencies=admin)
+    def refresh_api():
+        """
+        Pick up documents and segments appended to the corpus since they were loaded.
+        Reads the stores, so it runs in the thread pool rather than on the event loop.
+        """
+        new_segment_count = service.refresh()
+        return {"new_segments": new_segment_count}
+
+    if reloader is not None:
+        @router.post("/api/admin/reload", dependencies=admin)
+        async def reload_api():
+            """
+            Reload the stores and the finder in the background and swap them in,
+            GET reports the progress.
+            """
+            started = reloader.request_reload()
+            return {"started": started, **reloader.status()}
+
+        @router.get("/api/admin/reload", dependencies=admin)
+        async def reload_status_api():
+            """The reload state and the current generation."""
+            return reloader.status()
 
     return router
@@ -0,0 +1,87 @@
+"""
+Routes for the corpora of a multi-corpus app, by corpus id (see search.services.corpus_registry).
+"""
+import logging
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from xutils.tracing import TraceSink
+from search.services.corpus_registry import CorpusRegistry
+from search.services.combined_service import CombinedService
+from web.admin_auth import create_admin_guard
+from web.combined_router import (
+    COMBINED_API_RESPONSES,
+    CombinedRequestModel,
+    combined_api_response
+)
+
+logger = logging.getLogger(__name__)
+
+
+def create_corpora_router(
+    registry: CorpusRegistry,
+    trace_sink: Optional[TraceSink] = None,
+    admin_token: Optional[str] = None
+) -> APIRouter:
+    """
+    Create the FastAPI router of the corpora.
+    Args:
+        registry: The corpora by corpus id.
+        trace_sink: Where to write the sampled request traces, None to not write them.
+        admin_token: The bearer token of the admin routes (refresh, unload), None limits
+            them to loopback clients (see web.admin_auth).
+    """
+    router = APIRouter()
+    admin = [Depends(create_admin_guard(admin_token))]
+
+    def get_service(corpus_id: str) -> CombinedService:
+        """Get the (loaded) service of a corpus, 404 for an unknown corpus."""
+        if corpus_id not in registry:
+            raise HTTPException(status_code=404, detail=f"Unknown corpus: {corpus_id}")
+        return registry.get(corpus_id)
+
+    @router.get("/api/corpora")
+    async def corpora_api():
+        """List the corpora, whether they are loaded and their estimated memory."""
+        return registry.status()
+
+    @router.post("/api/corpora/{corpus_id}/combined", response_class=JSONResponse,
+                 responses=COMBINED_API_RESPONSES)
+    async def corpus_combined_api(
+        corpus_id: str,
+        request: CombinedRequestModel,
+        http_request: Request
+    ):
+        """Process the combined api request with a corpus and return the response."""
+        service = get_service(corpus_id)
+        try:
+            return combined_api_response(registry.corpora[corpus_id], service, request,
+                                         http_request.headers.get("accept-encoding"),
+                                         trace_sink)
+        finally:
+            # the corpus may have grown loading its stores and search matrices
+            registry.evict(keep=corpus_id)
+
+    @router.post("/api/admin/corpora/{corpus_id}/refresh", dependencies=admin)
+    def corpus_refresh_api(corpus_id: str):
+        """
+        Pick up documents and segments appended to the corpus since they were loaded,
+        in the thread pool.
+        """
+        if corpus_id in registry and not registry.is_loaded(corpus_id):
+            # loaded up to date on its next request
+            return {"new_segments": 0}
+        new_segment_count = get_service(corpus_id).refresh()
+        return {"new_segments": new_segment_count}
+
+    @router.delete("/api/admin/corpora/{corpus_id}", dependencies=admin)
+    async def corpus_unload_api(corpus_id: str):
+        """Unload a corpus, it is loaded again by its next request."""
+        if corpus_id not in registry:
+            raise HTTPException(status_code=404, detail=f"Unknown corpus: {corpus_id}")
+        if corpus_id in registry.pinned:
+            raise HTTPException(status_code=409, detail=f"Pinned corpus: {corpus_id}")
+        return {"unloaded": registry.unload(corpus_id)}
+
+    return router
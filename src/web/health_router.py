@@ -0,0 +1,26 @@
+"""
+Health and readiness routes for load balancers and orchestrators.
+"""
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from search.services.warm_up import WarmUp
+
+
+def create_health_router(warm_up: WarmUp) -> APIRouter:
+    """Create the FastAPI router for the health and readiness probes."""
+    router = APIRouter()
+
+    @router.get("/healthz")
+    async def healthz() -> JSONResponse:
+        """Liveness: the process serves requests, whatever the warm-up state."""
+        return JSONResponse({"status": "ok", **warm_up.status()})
+
+    @router.get("/readyz")
+    async def readyz() -> JSONResponse:
+        """Readiness: 200 once every component is warmed up, 503 until then."""
+        status = warm_up.status()
+        status_code = 200 if status["ready"] else 503
+        return JSONResponse(status, status_code=status_code)
+
+    return router
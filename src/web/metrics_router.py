@@ -0,0 +1,19 @@
+"""
+Metrics route, the Prometheus text exposition of the prometheus_client registry
+(see search.search_metrics and gen.gen_metrics).
+"""
+from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+
+
+def create_metrics_router(registry: CollectorRegistry = REGISTRY) -> APIRouter:
+    """Create the FastAPI router for the /metrics scrape endpoint."""
+    router = APIRouter()
+
+    @router.get("/metrics")
+    async def metrics() -> Response:
+        """The metrics in the Prometheus text format."""
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+    return router
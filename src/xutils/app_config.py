@@ -2,8 +2,8 @@
 Application configuration.
 """
 
-from typing import Optional
-from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from dataclasses import dataclass, field
 from enum import Enum
 from xutils.embedding_config import EmbeddingConfig
 
@@ -36,6 +36,21 @@ class RunConfig:
     log_level: str
 
 
+@dataclass
+class CorpusConfig(AppConfig):
+    """
+    A corpus of a multi-corpus app (see search.services.corpus_registry):
+    app config + corpus id + query encoder and search options.
+    """
+    corpus_id: str
+
+    # the encoder config used to encode queries, corpora of an encoder config share it
+    encoder_config_id: str = "big"
+
+    # the KNearestFinder options (binary_shortlist, lexical_mode, ...) as in CombinedConfig
+    finder_options: Dict[str, Any] = field(default_factory=dict)
+
+
 @dataclass
 class CombinedConfig(AppConfig):
     """
@@ -47,3 +62,43 @@ class CombinedConfig(AppConfig):
     max_documents: int
 
     run_config: RunConfig
+
+    # the encoder config used to encode queries, see gen.encoder.encoder_configs
+    encoder_config_id: str = "big"
+
+    # the Hamming pre-filter shortlist size, None searches the embeddings exhaustively
+    binary_shortlist: Optional[int] = None
+
+    # the Matryoshka cascade first stage dim and shortlist size, None disables the cascade
+    cascade_dim: Optional[int] = None
+    cascade_shortlist: int = 1000
+
+    # save the morphed search embeddings next to the embedding store, load them on restart
+    persist_search_matrix: bool = False
+
+    # hybrid retrieval with the BM25 index of the segments (see gen.bm25_index):
+    # "union" or "prefilter" (see KNearestFinder), None disables it
+    lexical_mode: Optional[str] = None
+    lexical_candidates: int = 1000
+    lexical_weight: float = 0.3
+
+    # article search by the pooled segment embeddings of each article, "mean" or "max",
+    # None scans the segments; drill down scores the segments of this many top articles
+    article_pooling: Optional[str] = None
+    article_drill_down: Optional[int] = None
+
+    # append sampled request traces to a JSON lines file, None disables the sink;
+    # traces of at least trace_slow_seconds are always written
+    trace_file: Optional[str] = None
+    trace_sample_rate: float = 0.1
+    trace_slow_seconds: Optional[float] = None
+
+    # more corpora served by corpus id next to this one (the default corpus), loaded on
+    # demand and evicted least recently used beyond the memory budget (None: no limit)
+    default_corpus_id: str = "default"
+    corpora: List[CorpusConfig] = field(default_factory=list)
+    corpus_memory_budget_mb: Optional[int] = None
+
+    # reload the stores when the store files change, polled at this interval, None reloads
+    # only on the admin endpoint
+    reload_poll_seconds: Optional[float] = None
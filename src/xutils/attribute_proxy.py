@@ -11,6 +11,8 @@ class AttributeProxy:
     maintaining a cleaner interface while encapsulating the underlying attribute naming
     conventions.
     """
+    __slots__ = ("parent", "prefix")
+
     def __init__(self, parent, prefix):
         self.parent = parent
         self.prefix = prefix
@@ -1,13 +1,20 @@
 """
 Byte reader for reading bytes from a file at a given offset.
 """
+import os
+import weakref
 from pathlib import Path
-from typing import Union
+from threading import Lock
+from typing import List, Optional, Sequence, Tuple, Union
+
+# (offset, size) of a range of bytes
+ByteRange = Tuple[int, int]
 
 
 class ByteReader:
     """
     Reads a length of bytes from a file at a given offset.
+    Shares one file handle (seek + read) guarded by a lock.
     """
     def __init__(self, path: Union[Path, str]):
         """
@@ -17,6 +24,7 @@ class ByteReader:
         """
         self.path = path
         self._file = None
+        self._lock = Lock()
 
     @property
     def file(self):
@@ -34,10 +42,21 @@ class ByteReader:
         Returns:
             bytes: The bytes read from the file.
         """
-        self.file.seek(offset)
-        _bytes = self.file.read(size)
+        with self._lock:
+            self.file.seek(offset)
+            _bytes = self.file.read(size)
         return _bytes
 
+    def read_many(self, ranges: Sequence[ByteRange]) -> List[memoryview]:
+        """
+        Reads several ranges of bytes.
+        Args:
+            ranges (Sequence[ByteRange]): (offset, size) tuples.
+        Returns:
+            List[memoryview]: The bytes of each range, in the order of the ranges.
+        """
+        return [memoryview(self.read_bytes(offset, size)) for offset, size in ranges]
+
     def cleanup(self):
         """
         Closes the file if it is open.
@@ -46,3 +65,136 @@ class ByteReader:
         if self._file is not None:
             self._file.close()
             self._file = None
+
+
+class PreadByteReader(ByteReader):
+    """
+    A ByteReader that reads with os.pread.
+
+    pread does not use the shared file position so concurrent reads (FastAPI thread pool,
+    background loads) do not need a lock and each read is a single syscall.
+    read_many sorts the ranges and coalesces nearby ones into a single read.
+    """
+    # ranges separated by up to this many bytes are read together
+    DEFAULT_MAX_GAP = 4096
+
+    def __init__(self, path: Union[Path, str], max_gap: int = DEFAULT_MAX_GAP):
+        """
+        Initialize the PreadByteReader.
+        Args:
+            path (Union[Path, str]): The path to the file to read.
+            max_gap (int): Coalesce ranges that are at most max_gap bytes apart.
+        """
+        super().__init__(path)
+        self.max_gap = max_gap
+        self._fd: Optional[int] = None
+        # closes the descriptor if the reader is garbage collected without cleanup()
+        self._fd_finalizer: Optional[weakref.finalize] = None
+
+    @property
+    def fd(self) -> int:
+        """Get the memoized file descriptor."""
+        if self._fd is None:
+            with self._lock:
+                if self._fd is None:
+                    fd = os.open(self.path, os.O_RDONLY)
+                    self._fd_finalizer = weakref.finalize(self, os.close, fd)
+                    self._fd = fd
+        return self._fd
+
+    def read_bytes(self, offset: int, size: int) -> bytes:
+        """
+        Reads the bytes from the file at the given offset.
+        Args:
+            offset (int): The offset to read from.
+            size (int): The number of bytes to read.
+        Returns:
+            bytes: The bytes read from the file.
+        """
+        return self._pread(offset, size)
+
+    def read_many(self, ranges: Sequence[ByteRange]) -> List[memoryview]:
+        """
+        Reads several ranges of bytes with as few reads as possible.
+        Ranges are sorted by offset and ranges that are at most max_gap apart are read
+        together. The returned memoryviews are zero-copy slices of the coalesced reads.
+        Args:
+            ranges (Sequence[ByteRange]): (offset, size) tuples.
+        Returns:
+            List[memoryview]: The bytes of each range, in the order of the ranges.
+        """
+        views: List[Optional[memoryview]] = [None] * len(ranges)
+        for span_offset, span_size, members in self.coalesce_ranges(ranges, self.max_gap):
+            span_view = memoryview(self._pread(span_offset, span_size))
+            for index in members:
+                offset, size = ranges[index]
+                start = offset - span_offset
+                views[index] = span_view[start:start + size]
+        return views
+
+    @staticmethod
+    def coalesce_ranges(
+        ranges: Sequence[ByteRange],
+        max_gap: int
+    ) -> List[Tuple[int, int, List[int]]]:
+        """
+        Sort the ranges by offset and merge ranges that overlap or are at most max_gap apart.
+        Args:
+            ranges (Sequence[ByteRange]): (offset, size) tuples.
+            max_gap (int): The maximum gap between merged ranges.
+        Returns:
+            A list of (span_offset, span_size, member indexes) tuples.
+        """
+        order = sorted(range(len(ranges)), key=lambda index: ranges[index][0])
+
+        spans = []
+        span_start = span_end = None
+        members: List[int] = []
+        for index in order:
+            offset, size = ranges[index]
+            if members and offset - span_end <= max_gap:
+                span_end = max(span_end, offset + size)
+                members.append(index)
+            else:
+                if members:
+                    spans.append((span_start, span_end - span_start, members))
+                span_start, span_end, members = offset, offset + size, [index]
+        if members:
+            spans.append((span_start, span_end - span_start, members))
+
+        return spans
+
+    def _pread(self, offset: int, size: int) -> bytes:
+        """Read size bytes at offset, repeating on short reads."""
+        _bytes = os.pread(self.fd, size, offset)
+        if len(_bytes) == size or not _bytes:
+            return _bytes
+
+        chunks = [_bytes]
+        read = len(_bytes)
+        while read < size:
+            chunk = os.pread(self.fd, size - read, offset + read)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            read += len(chunk)
+        return b"".join(chunks)
+
+    def cleanup(self):
+        """
+        Closes the file descriptor (and file) if open.
+        Handles multiple calls.
+        """
+        super().cleanup()
+        if self._fd is not None:
+            self._fd_finalizer.detach()
+            self._fd_finalizer = None
+            os.close(self._fd)
+            self._fd = None
+
+
+def create_byte_reader(path: Union[Path, str]) -> ByteReader:
+    """Create a PreadByteReader where os.pread is available, a ByteReader otherwise."""
+    if hasattr(os, "pread"):
+        return PreadByteReader(path)
+    return ByteReader(path)  # pragma: no cover
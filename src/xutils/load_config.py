@@ -5,8 +5,11 @@ import os
 import logging
 import argparse
 import configparser
+from typing import Any, Dict, List
 
-from xutils.app_config import CombinedConfig, AppConfig, RunConfig, EmbeddingConfig, Domain
+from xutils.app_config import (
+    CombinedConfig, CorpusConfig, AppConfig, RunConfig, EmbeddingConfig, Domain
+)
 from search.services.combined_service import Action
 
 
@@ -94,6 +97,15 @@ def load_app_config(logger) -> AppConfig:
     k = search_sec.getint("k")
     threshold = search_sec.getfloat("threshold")
     max_documents = search_sec.getint("max-documents")
+    encoder_config_id = search_sec.get("encoder-config", "big")
+    finder_options = load_finder_options(search_sec)
+    trace_file = search_sec.get("trace-file", None)
+    trace_sample_rate = search_sec.getfloat("trace-sample-rate", 0.1)
+    trace_slow_seconds = search_sec.getfloat("trace-slow-seconds", None)
+    default_corpus_id = search_sec.get("default-corpus", "default")
+    corpus_memory_budget_mb = search_sec.getint("corpus-memory-budget-mb", None)
+    corpora = load_corpus_configs(config)
+    reload_poll_seconds = search_sec.getfloat("reload-poll-seconds", None)
 
     combined_config = CombinedConfig(
         domain=domain,
@@ -103,20 +115,81 @@ def load_app_config(logger) -> AppConfig:
         max_documents=max_documents,
         embed_config=embed_config,
         run_config=run_config,
+        encoder_config_id=encoder_config_id,
+        **finder_options,
+        trace_file=trace_file,
+        trace_sample_rate=trace_sample_rate,
+        trace_slow_seconds=trace_slow_seconds,
+        default_corpus_id=default_corpus_id,
+        corpora=corpora,
+        corpus_memory_budget_mb=corpus_memory_budget_mb,
+        reload_poll_seconds=reload_poll_seconds,
     )
 
     return combined_config
 
 
-def load_embed_config(config: configparser.ConfigParser) -> EmbeddingConfig:
+def load_finder_options(section: configparser.SectionProxy) -> Dict[str, Any]:
+    """
+    Load the KNearestFinder options of a SEARCH-APP or CORPUS.<id> section.
+    Args:
+        section: The config section to read.
+    Returns:
+        The options by the KNearestFinder (and CombinedConfig) argument names.
+    """
+    return {
+        "binary_shortlist": section.getint("binary-shortlist", None),
+        "cascade_dim": section.getint("cascade-dim", None),
+        "cascade_shortlist": section.getint("cascade-shortlist", 1000),
+        "persist_search_matrix": section.getboolean("persist-search-matrix", False),
+        "lexical_mode": section.get("lexical-mode", None),
+        "lexical_candidates": section.getint("lexical-candidates", 1000),
+        "lexical_weight": section.getfloat("lexical-weight", 0.3),
+        "article_pooling": section.get("article-pooling", None),
+        "article_drill_down": section.getint("article-drill-down", None),
+    }
+
+
+def load_corpus_configs(config: configparser.ConfigParser) -> List[CorpusConfig]:
+    """
+    Load the configs of the CORPUS.<id> sections (with a CORPUS.<id>.EMBEDDINGS section each)
+    of a multi-corpus app.
+    Args:
+        config: The config parser to use.
+    Returns:
+        The corpus configs, in the order of the sections.
+    """
+    corpora = []
+    for section_name in config.sections():
+        parts = section_name.split(".")
+        if len(parts) != 2 or parts[0] != "CORPUS":
+            continue
+        corpus_sec = config[section_name]
+        corpus_config = CorpusConfig(
+            domain=Domain[corpus_sec.get("domain", "wiki").upper()],
+            text_file_path=corpus_sec.get("text-file-path"),
+            embed_config=load_embed_config(config, f"{section_name}.EMBEDDINGS"),
+            corpus_id=parts[1],
+            encoder_config_id=corpus_sec.get("encoder-config", "big"),
+            finder_options=load_finder_options(corpus_sec),
+        )
+        corpora.append(corpus_config)
+    return corpora
+
+
+def load_embed_config(
+    config: configparser.ConfigParser,
+    section_name: str = "SEARCH-APP.EMBEDDINGS"
+) -> EmbeddingConfig:
     """
     Load the embed config from a file.
     Args:
         config: The config parser to use.
+        section_name: The embeddings section, e.g. of a corpus.
     Returns:
         The embed config.
     """
-    embed_sec = config["SEARCH-APP.EMBEDDINGS"]
+    embed_sec = config[section_name]
     prefix = embed_sec.get("prefix")
     max_len = embed_sec.getint("max-len")
     dim = embed_sec.getint("dim", None)
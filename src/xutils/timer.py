@@ -5,6 +5,7 @@ import os
 import time
 import logging
 from typing import Optional, Union
+from xutils.tracing import record_span, span
 
 
 class Timer:
@@ -187,7 +188,12 @@ class LoggingTimer(Timer):
         Returns:
             str: The elapsed time.
         """
+        start = self._start_time
         msg = super().step(title, restart)
+        if self._time_type == 'performance':
+            # a step of a traced request is a span of the current span
+            end = self._start_time if restart else self._time()
+            record_span(title or self._caption or "step", start, end)
         self.logger.log(level=self.level, msg=msg)
         return msg
 
@@ -248,7 +254,7 @@ def log_timeit(caption: Optional[str] = None, logger=None, level="DEBUG"):
             nonlocal caption
             if caption is None:
                 caption = func.__name__
-            with LoggingTimer(caption, logger=logger, level=level):
+            with span(caption), LoggingTimer(caption, logger=logger, level=level):
                 return func(*args, **kwargs)
         return wrapper
 
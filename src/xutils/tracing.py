@@ -0,0 +1,250 @@
+"""
+Per-request trace spans.
+
+A trace is a tree of timed spans tied to a request id. The web layer starts a trace around
+a request, the code on the request path opens nested spans; without a current trace a span
+only measures (and optionally logs and observes) its duration. The current span is a context
+variable, threads started outside the request (e.g. background loads) are not traced.
+
+    with start_trace(request_id) as trace:
+        with span("encode_query", observe=ENCODE_QUERY_SECONDS):
+            ...
+    trace.to_dict()         # the span tree, durations in ms
+    trace.server_timing()   # the Server-Timing header value
+
+LoggingTimer steps are recorded as spans of the current span (see xutils.timer).
+The spans of an unobserved() block (e.g. a warm-up query) do not observe their histograms.
+"""
+import re
+import json
+import time
+import random
+import logging
+from pathlib import Path
+from threading import Lock
+from contextvars import ContextVar
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """
+    A timed operation and its child operations.
+    """
+    __slots__ = ("name", "start", "end", "attributes", "children")
+
+    def __init__(self, name: str, start: Optional[float] = None) -> None:
+        self.name = name
+        self.start = time.perf_counter() if start is None else start
+        self.end: Optional[float] = None
+        self.attributes: Dict[str, Any] = {}
+        self.children: List["Span"] = []
+
+    def finish(self, end: Optional[float] = None) -> None:
+        """End the span, now by default."""
+        self.end = time.perf_counter() if end is None else end
+
+    def set(self, key: str, value: Any) -> None:
+        """Set an attribute, e.g. the number of results."""
+        self.attributes[key] = value
+
+    @property
+    def duration(self) -> float:
+        """The duration in seconds, up to now if the span is not finished."""
+        end = time.perf_counter() if self.end is None else self.end
+        return end - self.start
+
+    def to_dict(self, origin: Optional[float] = None) -> Dict[str, Any]:
+        """
+        The span tree as a dict.
+        Args:
+            origin: The time the start offsets are relative to, the span start by default.
+        """
+        origin = self.start if origin is None else origin
+        result: Dict[str, Any] = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+        }
+        if self.attributes:
+            result["attributes"] = dict(self.attributes)
+        if self.children:
+            result["children"] = [child.to_dict(origin) for child in self.children]
+        return result
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_observing: ContextVar[bool] = ContextVar("observing", default=True)
+
+# Server-Timing metric names are HTTP tokens
+_NON_TOKEN_RE = re.compile(r"[^!#$%&'*+\-.^_`|~0-9A-Za-z]+")
+
+
+class Trace:
+    """
+    The span tree of a request.
+    """
+
+    def __init__(self, trace_id: str, name: str = "request") -> None:
+        """
+        Initialize the trace.
+        Args:
+            trace_id: The id of the traced request.
+            name: The name of the root span.
+        """
+        self.trace_id = trace_id
+        self.root = Span(name)
+        self.timestamp = time.time()
+
+    @property
+    def duration(self) -> float:
+        """The duration of the root span in seconds."""
+        return self.root.duration
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The trace id, the wall clock start and the span tree."""
+        return {
+            "trace_id": self.trace_id,
+            "timestamp": self.timestamp,
+            "root": self.root.to_dict(),
+        }
+
+    def server_timing(self) -> str:
+        """
+        The Server-Timing header value: the top level spans and the total, in ms.
+        Repeated top level names are summed.
+        """
+        durations: Dict[str, float] = {}
+        for child in self.root.children:
+            name = _NON_TOKEN_RE.sub("_", child.name)
+            durations[name] = durations.get(name, 0.0) + child.duration
+        durations["total"] = self.root.duration
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}"
+                         for name, seconds in durations.items())
+
+
+@contextmanager
+def start_trace(trace_id: str, name: str = "request") -> Iterator[Trace]:
+    """Trace the block, its spans are children of the trace root."""
+    trace = Trace(trace_id, name)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+    try:
+        yield trace
+    finally:
+        trace.root.finish()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+
+def current_trace() -> Optional[Trace]:
+    """The trace of the current request, None outside a trace."""
+    return _current_trace.get()
+
+
+@contextmanager
+def span(  # pylint: disable=redefined-outer-name
+    name: str,
+    observe: Any = None,
+    logger: Optional[logging.Logger] = None,
+    level: int = logging.DEBUG
+) -> Iterator[Span]:
+    """
+    Time the block as a child span of the current span.
+    Args:
+        name: The span name.
+        observe: An object with an observe(seconds) method, e.g. a histogram child.
+        logger: A logger to log the duration to, along with the trace id.
+        level: The logging level.
+    """
+    parent = _current_span.get()
+    current = Span(name)
+    if parent is not None:
+        parent.children.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        current.finish()
+        _current_span.reset(token)
+        if observe is not None and _observing.get():
+            observe.observe(current.duration)
+        if logger is not None and logger.isEnabledFor(level):
+            trace = _current_trace.get()
+            trace_id = trace.trace_id if trace is not None else "-"
+            logger.log(level, "%s: %.4fs [%s] %s", name, current.duration, trace_id,
+                       current.attributes or "")
+
+
+@contextmanager
+def unobserved() -> Iterator[None]:
+    """Do not observe the durations of the spans of the block, e.g. of a warm-up query."""
+    token = _observing.set(False)
+    try:
+        yield
+    finally:
+        _observing.reset(token)
+
+
+def record_span(name: str, start: float, end: float) -> None:
+    """Record a finished (perf_counter) interval as a child of the current span, if traced."""
+    parent = _current_span.get()
+    if parent is None:
+        return
+    child = Span(name, start)
+    child.finish(end)
+    parent.children.append(child)
+
+
+class TraceSink:
+    """
+    Append sampled traces to a JSON lines file, one trace per line.
+    Traces slower than slow_seconds are always written.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        sample_rate: float = 1.0,
+        slow_seconds: Optional[float] = None
+    ) -> None:
+        """
+        Initialize the sink.
+        Args:
+            path: The JSON lines file, created (with its directory) on the first write.
+            sample_rate: The fraction of the traces to write.
+            slow_seconds: Write the traces at least this slow regardless of the sampling.
+        """
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"sample_rate must be in [0, 1], got {sample_rate}")
+        self.path = Path(path)
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self._lock = Lock()
+
+    def sampled(self, trace: Trace) -> bool:
+        """Whether to write the trace."""
+        if self.slow_seconds is not None and trace.duration >= self.slow_seconds:
+            return True
+        return random.random() < self.sample_rate
+
+    def write(self, trace: Trace) -> bool:
+        """
+        Write the trace if sampled. Failing to write is logged.
+        Returns whether the trace was written.
+        """
+        if not self.sampled(trace):
+            return False
+        line = json.dumps(trace.to_dict(), default=str)
+        try:
+            with self._lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as file:
+                    file.write(line + "\n")
+        except OSError as e:
+            logger.warning("trace sink %s: failed to write: %s", self.path, e)
+            return False
+        return True
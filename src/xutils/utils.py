@@ -3,6 +3,7 @@ Utility functions.
 """
 import os
 import logging
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
@@ -51,3 +52,15 @@ class Utils:
         else:
             raise ValueError(f"Invalid truth value '{val}'")
         return result
+
+    @staticmethod
+    def file_fingerprint(path) -> Optional[str]:
+        """
+        The size and modification time of a file, to detect a changed file,
+        None if it does not exist.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
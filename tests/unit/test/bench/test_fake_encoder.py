@@ -0,0 +1,30 @@
+import unittest
+import numpy as np
+import numpy.testing as npt
+
+from bench.fake_encoder import FakeEncoder
+
+
+class TestFakeEncoder(unittest.TestCase):
+
+    def test_encode_is_deterministic(self):
+        sentences = ["the quick brown fox", "jumps over the lazy dog"]
+        embeddings = FakeEncoder(dim=16).encode(sentences)
+        self.assertEqual(embeddings.shape, (2, 16))
+        self.assertEqual(embeddings.dtype, np.float32)
+        npt.assert_array_equal(embeddings, FakeEncoder(dim=16).encode(sentences))
+        self.assertFalse(np.array_equal(embeddings, FakeEncoder(dim=16, seed=1).encode(sentences)))
+
+    def test_shared_words_are_similar(self):
+        embeddings = FakeEncoder(dim=256).encode(
+            ["red apple pie", "red apple tart", "quantum field theory"])
+        normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        similarities = normalized @ normalized[0]
+        self.assertGreater(similarities[1], similarities[2])
+
+    def test_model_key(self):
+        self.assertEqual(FakeEncoder(dim=16, seed=3).model_key, "fake-16:3")
+
+
+if __name__ == "__main__":
+    unittest.main()
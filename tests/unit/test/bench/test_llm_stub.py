@@ -0,0 +1,45 @@
+import unittest
+from fastapi.testclient import TestClient
+from openai import OpenAI
+
+from bench.llm_stub import StubConfig, create_llm_stub_app
+from search.services.combined_service import CombinedService
+
+
+class TestLlmStub(unittest.TestCase):
+
+    def create_client(self, **kwargs):
+        config = StubConfig(latency=0.0, jitter=0.0, split_latency=0.0, **kwargs)
+        return TestClient(create_llm_stub_app(config))
+
+    def test_split_query(self):
+        # CombinedService.split_query parses the stub's answer
+        test_client = self.create_client()
+        service = CombinedService(stores=None, embed_config=None, finder=None)
+        service._client = OpenAI(api_key="stub", base_url="http://testserver/v1",
+                                 http_client=test_client)
+        search_query, question = service.split_query("a boy meets a girl")
+        self.assertEqual(search_query, "a boy meets a girl")
+        self.assertEqual(question, "a boy meets a girl")
+
+    def test_answer(self):
+        response = self.create_client(answer_chars=100).post("/v1/chat/completions", json={
+            "model": "gpt-4o-mini",
+            "messages": [{"role": "user", "content": "question"}],
+        })
+        self.assertEqual(response.status_code, 200)
+        content = response.json()["choices"][0]["message"]["content"]
+        self.assertEqual(len(content), 100)
+
+    def test_errors(self):
+        client = self.create_client(error_rate=1.0)
+        response = client.post("/v1/chat/completions", json={"messages": []})
+        self.assertEqual(response.status_code, 500)
+
+        client = self.create_client(rate_limit_rate=1.0)
+        response = client.post("/v1/chat/completions", json={"messages": []})
+        self.assertEqual(response.status_code, 429)
+
+
+if __name__ == "__main__":
+    unittest.main()
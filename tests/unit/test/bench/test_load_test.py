@@ -0,0 +1,76 @@
+import json
+import asyncio
+import unittest
+import tempfile
+from pathlib import Path
+import httpx
+
+from bench.load_test import LoadGenerator, LoadRequest, LoadResult, load_requests, summarize
+
+
+class TestLoadTest(unittest.TestCase):
+
+    def test_load_requests(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "queries.txt"
+            path.write_text("first query\n\n" + json.dumps({"query": "second", "k": 3}) + "\n"
+                            + json.dumps({"query": "third", "action": "search"}) + "\n")
+            requests = load_requests(path, actions=["search", "rag"], kinds=["segment"])
+
+        self.assertEqual([request.query for request in requests],
+                         ["first query", "second", "third"])
+        self.assertEqual([request.action for request in requests], ["search", "rag", "search"])
+        self.assertEqual(requests[1].k, 3)
+
+    def test_summarize(self):
+        results = [LoadResult("search", "segment", "200", seconds / 1000)
+                   for seconds in range(1, 101)]
+        results.append(LoadResult("rag", "segment", "500", 0.5))
+        results.append(LoadResult("rag", "segment", "ReadTimeout", 60.0))
+        summary = summarize(results, elapsed=10.0)
+
+        search = summary["by_action_kind"]["search/segment"]
+        self.assertEqual(search["requests"], 100)
+        self.assertEqual(search["errors"], 0)
+        self.assertAlmostEqual(search["p50_ms"], 50.5)
+        self.assertAlmostEqual(search["p99_ms"], 99.01)
+        self.assertEqual(search["throughput_rps"], 10.0)
+
+        rag = summary["by_action_kind"]["rag/segment"]
+        self.assertEqual(rag["error_rate"], 1.0)
+        self.assertIsNone(rag["p50_ms"])
+        self.assertEqual(rag["statuses"], {"500": 1, "ReadTimeout": 1})
+        self.assertEqual(summary["overall"]["requests"], 102)
+
+    def run_generator(self, run):
+        bodies = []
+
+        def handler(request):
+            bodies.append(json.loads(request.content))
+            status_code = 503 if len(bodies) == 2 else 200
+            return httpx.Response(status_code, json={})
+
+        async def main():
+            transport = httpx.MockTransport(handler)
+            async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+                generator = LoadGenerator(client, [LoadRequest("a"), LoadRequest("b", "rag")])
+                await run(generator)
+                return generator.results
+
+        return asyncio.run(main()), bodies
+
+    def test_run_rate(self):
+        results, bodies = self.run_generator(lambda generator: generator.run_rate(1000.0, 4))
+        self.assertEqual([body["query"] for body in bodies], ["a", "b", "a", "b"])
+        self.assertEqual(len({body["id"] for body in bodies}), 4)
+        self.assertEqual(sorted(result.status for result in results), ["200", "200", "200", "503"])
+
+    def test_run_concurrency(self):
+        results, bodies = self.run_generator(
+            lambda generator: generator.run_concurrency(3, count=7))
+        self.assertEqual(len(results), 7)
+        self.assertEqual(len(bodies), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
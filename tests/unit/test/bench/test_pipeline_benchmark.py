@@ -0,0 +1,34 @@
+import unittest
+import tempfile
+from pathlib import Path
+
+from bench.pipeline_benchmark import BenchmarkParams, compare_results, run_benchmarks
+
+
+class TestPipelineBenchmark(unittest.TestCase):
+
+    def test_run_benchmarks(self):
+        params = BenchmarkParams(articles=3, plots=3, dim=16, queries=2, repeat=1)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            results = run_benchmarks(params, Path(temp_dir))
+
+        self.assertEqual(results["corpora"]["wiki"]["documents"], 3)
+        self.assertEqual(results["corpora"]["plots"]["documents"], 3)
+        for stage in ["wiki.index", "wiki.segment", "wiki.morph", "wiki.search_articles",
+                      "plots.index", "plots.embeddings_load", "plots.search_segments"]:
+            self.assertIn(stage, results["stages"])
+        self.assertEqual(results["stages"]["wiki.search_segments"]["runs"], 2)
+
+    def test_compare_results(self):
+        base = {"stages": {"a": {"median_s": 2.0}, "b": {"median_s": 1.0}}}
+        head = {"stages": {"a": {"median_s": 1.0}, "c": {"median_s": 1.0}}}
+        rows = compare_results(base, head)
+        self.assertEqual(rows, [
+            {"stage": "a", "base": 2.0, "head": 1.0, "ratio": 0.5},
+            {"stage": "b", "base": 1.0, "head": None, "ratio": None},
+            {"stage": "c", "base": None, "head": 1.0, "ratio": None},
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import tempfile
+from pathlib import Path
+from argparse import Namespace
+
+from bench.synthetic_corpus import generate_wiki_text, write_plots_corpus, write_wiki_corpus
+from gen.element.element import Element
+from gen.index_builder_plots import IndexBuilderPlots
+from gen.index_builder_wiki import IndexBuilderWiki
+
+
+class TestSyntheticCorpus(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.work_dir = Path(self.temp_dir.name)
+        Element.instances.clear()
+
+    def tearDown(self):
+        Element.instances.clear()
+        self.temp_dir.cleanup()
+
+    def test_wiki_text_is_deterministic(self):
+        self.assertEqual(generate_wiki_text(5, seed=1), generate_wiki_text(5, seed=1))
+        self.assertNotEqual(generate_wiki_text(5, seed=1), generate_wiki_text(5, seed=2))
+
+    def test_wiki_corpus_is_indexed(self):
+        text_path = write_wiki_corpus(self.work_dir / "wiki.txt", 7)
+        builder = IndexBuilderWiki(Namespace(text=str(text_path)))
+        builder.build_index()
+        self.assertEqual(len(builder.articles), 7)
+        self.assertTrue(all(article.paragraph_count > 0 for article in builder.articles))
+
+    def test_plots_corpus_is_indexed(self):
+        plots_dir = write_plots_corpus(self.work_dir / "plots", 9)
+        plot_records = IndexBuilderPlots(plots_dir).build_index()
+        self.assertEqual(len(plot_records), 9)
+        text = (plots_dir / "plots").read_bytes()
+        last = plot_records[-1]
+        self.assertEqual(text[last.offset + last.byte_length:], b"<EOS>\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,6 @@
 import io
 import unittest
+import tempfile
 import pandas as pd
 from pathlib import Path
 from unittest.mock import patch
@@ -78,6 +79,22 @@ class TestSegmentRecordStore(unittest.TestCase):
         output_df = pd.read_csv(buffer, index_col=False)
         pd.testing.assert_frame_equal(output_df, segment_record_df)
 
+    def test_append_segment_records(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = SegmentRecordStore(f"{temp_dir}/prefix", 100)
+            self.assertEqual(store.get_next_indexes(), (0, 0))
+
+            store.append_segment_records(self.segment_records[:3])
+            self.assertEqual(store.get_next_indexes(), (3, 2))
+
+            store.append_segment_records(self.segment_records[3:])
+            self.assertEqual(store.load_segment_records(), self.segment_records)
+            self.assertEqual(store.get_next_indexes(), (5, 3))
+
+            # the trailing documents without segments are not segmented again
+            store.save_document_count(5)
+            self.assertEqual(store.get_next_indexes(), (5, 5))
+
     def test_get_segment_record_store_path(self):
         store = SegmentRecordStore('/dev/null/prefix', 100)
         expected_path = Path('/dev/null/prefix_100_segment_records.csv')
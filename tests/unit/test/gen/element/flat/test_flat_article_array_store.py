@@ -0,0 +1,104 @@
+import os
+import json
+import unittest
+import tempfile
+from uuid import uuid4
+from pathlib import Path
+
+from gen.element.flat.flat_article_array_store import (
+    FlatArticleArrayStore,
+    FlatArticleColumns,
+    FlatArticleView,
+)
+
+from ....xutils.byte_reader_tst import TestByteReader
+
+
+class TestFlatArticleArrayStore(unittest.TestCase):
+
+    def setUp(self):
+        self.byte_reader = TestByteReader(
+            b'= header =\nbody of evidence\n= header2 =\nproof of evidence\n'
+        )
+        self.uids = [uuid4(), uuid4()]
+        self.xdata_list = [
+            {"class": "FlatArticle", "uid": str(self.uids[0]),
+             "header_offset": 0, "header_byte_length": 11,
+             "body_offset": 11, "body_byte_length": 17},
+            {"class": "FlatArticle", "uid": str(self.uids[1]),
+             "header_offset": 28, "header_byte_length": 12,
+             "body_offset": 40, "body_byte_length": 18},
+        ]
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path_prefix = os.path.join(self.temp_dir.name, "prefix")
+        with open(f"{self.path_prefix}_flat_articles.json", "w", encoding="utf-8") as file:
+            for xdata in self.xdata_list:
+                file.write(json.dumps(xdata) + "\n")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def assert_articles(self, flat_articles):
+        self.assertEqual(len(flat_articles), 2)
+        self.assertIsInstance(flat_articles[0], FlatArticleView)
+        self.assertEqual(flat_articles[0].uid, self.uids[0])
+        self.assertEqual(flat_articles[1].uid, self.uids[1])
+        self.assertEqual(flat_articles[0].header.bytes, b'= header =\n')
+        self.assertEqual(flat_articles[0].body.bytes, b'body of evidence\n')
+        self.assertEqual(flat_articles[1].header.text, '= header2 =\n')
+        self.assertEqual(flat_articles[1].body.text, 'proof of evidence\n')
+        self.assertEqual(flat_articles[1].offset, 28)
+        self.assertEqual(flat_articles[1].byte_length, 30)
+        self.assertEqual(flat_articles[-1].bytes, b'= header2 =\nproof of evidence\n')
+        self.assertEqual([article.offset for article in flat_articles], [0, 28])
+        with self.assertRaises(IndexError):
+            flat_articles[2]
+
+    def test_load_flat_articles(self):
+        store = FlatArticleArrayStore(self.path_prefix, self.byte_reader)
+        self.assertFalse(store.columns_cache_path.exists())
+
+        flat_articles = store.load_documents()
+        self.assert_articles(flat_articles)
+        self.assertTrue(store.columns_cache_path.exists())
+
+        # second load comes from the npz cache
+        Path(f"{self.path_prefix}_flat_articles.json").write_text("not json\n")
+        os.utime(store.columns_cache_path, None)
+        os.utime(store.flat_article_store_path, (0, 0))
+        self.assertTrue(store.is_cache_valid())
+        flat_articles = store.load_flat_articles()
+        self.assert_articles(flat_articles)
+
+    def test_load_flat_articles_no_cache(self):
+        store = FlatArticleArrayStore(self.path_prefix, self.byte_reader, use_cache=False)
+        flat_articles = store.load_flat_articles()
+        self.assert_articles(flat_articles)
+        self.assertFalse(store.columns_cache_path.exists())
+        self.assertFalse(store.is_cache_valid())
+
+    def test_load_flat_articles_requires_byte_reader(self):
+        store = FlatArticleArrayStore(self.path_prefix)
+        with self.assertRaises(ValueError):
+            store.load_flat_articles()
+
+    def test_columns_save_load(self):
+        with open(f"{self.path_prefix}_flat_articles.json", "r", encoding="utf-8") as file:
+            columns = FlatArticleColumns.from_handle(file)
+        path = Path(f"{self.path_prefix}_columns.npz")
+        columns.save(path)
+        loaded = FlatArticleColumns.load(path)
+        self.assertEqual(len(loaded), 2)
+        self.assertEqual(loaded.body_offset.tolist(), [11, 40])
+        self.assertEqual([row.tobytes() for row in loaded.uids], [uid.bytes for uid in self.uids])
+
+    def test_columns_end_offset(self):
+        store = FlatArticleArrayStore(self.path_prefix, use_cache=False)
+        self.assertEqual(store.load_columns().end_offset, 58)
+
+        empty = FlatArticleColumns.from_handle([])
+        self.assertEqual(empty.end_offset, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -81,6 +81,23 @@ class TestArticle(unittest.TestCase):
         self.assertEqual(self.article.text, 'hello <<sweet>> worlddear')
         self.assertEqual(self.article.clean_text, 'hello sweet worlddear')
 
+    def test_lengths_are_memoized(self):
+        self.assertEqual(self.article.byte_length, 14)
+        self.assertEqual(self.article.char_length, 14)
+        self.elements[1].append_bytes(b'!!')
+        self.assertEqual(self.article.byte_length, 14)
+        self.article.reset()
+        self.assertEqual(self.article.byte_length, 16)
+        self.assertEqual(self.article.char_length, 16)
+
+    def test_append_paragraph_invalidates_lengths(self):
+        self.assertEqual(self.article.byte_length, 14)
+        self.assertEqual(self.article.body.byte_length, 9)
+        Paragraph(34, b'friend', self.article)
+        self.assertEqual(self.article.byte_length, 20)
+        self.assertEqual(self.article.body.byte_length, 15)
+        self.assertEqual(self.article.text, 'helloworlddearfriend')
+
     def test_elements_property_returns_iterator(self):
         self.assertIsInstance(self.article.elements, Iterator)
 
@@ -0,0 +1,134 @@
+import unittest
+import tempfile
+from pathlib import Path
+
+from gen.element.store import Store
+from gen.element.header import Header
+from gen.element.article import Article
+from gen.element.element import Element
+from gen.element.section import Section
+from gen.element.segment import Segment
+from gen.element.paragraph import Paragraph
+from gen.element.extended_segment import ExtendedSegment
+from gen.element.flat.flat_article import FlatArticle
+from gen.element.binary_store import BinaryStore, ElementColumns, create_element_store
+from ...xutils.byte_reader_tst import TestByteReader
+
+
+class TestBinaryStore(unittest.TestCase):
+
+    def setUp(self):
+        Element.instances.clear()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name) / "elements.npz"
+        self.store = BinaryStore()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+        Element.instances.clear()
+
+    def build_article(self, offset=0):
+        header = Header(offset, b'= Title =\n')
+        article = Article(header)
+        Paragraph(header.offset + header.byte_length, b'first paragraph\n', article)
+        Paragraph(header.offset + header.byte_length + 16, b'second paragraph\n', article)
+        return article
+
+    def test_write_and_load_article(self):
+        article = self.build_article()
+        byte_reader = TestByteReader(article.bytes)
+        self.store.store_elements(self.path, list(Element.instances.values()))
+
+        Element.instances.clear()
+        elements = self.store.load_elements_byte_reader(byte_reader, self.path)
+
+        article2 = Element.instances[article.uid]
+        self.assertIsInstance(article2, Article)
+        self.assertEqual(article2.header.uid, article.header.uid)
+        self.assertEqual(article2.paragraph_count, 2)
+        self.assertEqual(article2.bytes, article.bytes)
+        self.assertEqual([paragraph.uid for paragraph in article2.paragraphs],
+                         [paragraph.uid for paragraph in article.paragraphs])
+        self.assertEqual(len(elements), 5)
+
+    def test_same_elements_as_json(self):
+        sections = [Section(index * 10, f"section {index}".encode()) for index in range(4)]
+        _bytes = b''.join(section.bytes + b' ' for section in sections)
+        _, fragment1 = sections[1].split(-4, after_char=True, include_first=False)
+        fragment2, _ = sections[3].split(4, after_char=True, include_remainder=False)
+        article = Article(Header(0, b''))
+        segment1 = Segment(article, sections[0])
+        segment1.append_element(sections[1])
+        segment2 = Segment(article, sections[2])
+        extended_segment = ExtendedSegment(segment2)
+        extended_segment.before_overlap = fragment1
+        extended_segment.after_overlap = fragment2
+        elements = list(Element.instances.values())
+        byte_reader = TestByteReader(_bytes)
+
+        self.store.store_elements(self.path, elements)
+        Element.instances.clear()
+        self.store.load_elements_byte_reader(byte_reader, self.path)
+        binary_loaded = dict(Element.instances)
+
+        Element.instances.clear()
+        json_store = Store()
+        json_path = Path(self.temp_dir.name) / "elements.json"
+        json_store.store_elements(json_path, elements)
+        Element.instances.clear()
+        json_store.load_elements_byte_reader(byte_reader, json_path)
+
+        for element in elements:
+            binary_element = binary_loaded[element.uid]
+            json_element = Element.instances[element.uid]
+            self.assertIs(type(binary_element), type(json_element))
+            if not isinstance(element, Article):
+                self.assertEqual(binary_element.bytes, json_element.bytes)
+
+        extended_segment2 = binary_loaded[extended_segment.uid]
+        self.assertEqual(extended_segment2.before_overlap.uid, fragment1.uid)
+        self.assertEqual(extended_segment2.after_overlap.uid, fragment2.uid)
+        self.assertEqual(extended_segment2.segment.uid, segment2.uid)
+        self.assertEqual(extended_segment2.bytes, extended_segment.bytes)
+        self.assertEqual(binary_loaded[fragment1.uid].parent.uid, sections[1].uid)
+
+    def test_append(self):
+        article1 = self.build_article()
+        self.store.store_elements(self.path, list(Element.instances.values()))
+        with Element.use_registry() as registry:
+            article2 = self.build_article(offset=len(article1.bytes))
+            self.store.store_elements(self.path, list(registry.values()), append=True)
+
+        columns = ElementColumns.load(self.path)
+        self.assertEqual(len(columns), 10)
+        self.assertEqual(columns.children_start[-1], 4)
+
+        Element.instances.clear()
+        byte_reader = TestByteReader(article1.bytes + article2.bytes)
+        self.store.load_elements_byte_reader(byte_reader, self.path)
+        self.assertEqual(Element.instances[article2.uid].bytes, article2.bytes)
+
+    def test_unstored_reference(self):
+        article = self.build_article()
+        paragraphs = list(article.paragraphs)
+        with self.assertRaises(ValueError):
+            self.store.store_elements(self.path, paragraphs)
+
+    def test_unsupported_class(self):
+        flat_article = FlatArticle(self.build_article().uid, 0, 10, 10, 32, None)
+        with self.assertRaises(ValueError):
+            self.store.store_elements(self.path, [flat_article])
+
+    def test_single_store(self):
+        Section(0, b'section')
+        self.store.store_elements(self.path, list(Element.instances.values()))
+        with self.assertRaises(AssertionError):
+            self.store.load_elements_byte_reader(TestByteReader(b'section'), self.path)
+
+    def test_create_element_store(self):
+        self.assertIsInstance(create_element_store(Path("x_elements.npz")), BinaryStore)
+        self.assertIsInstance(create_element_store(Path("x_elements.json")), Store)
+
+
+if __name__ == '__main__':
+    unittest.main()
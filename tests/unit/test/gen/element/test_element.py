@@ -364,6 +364,27 @@ class TestElement(unittest.TestCase):
         self.assertEqual(segment2.offset, 39)
         self.assertEqual(segment2.bytes, b'section')
 
+    def test_elements_are_slotted(self):
+        article = Article(Header(0, b'title\n'))
+        elements = [article, article.header, article.body, Paragraph(6, b'text\n', article),
+                    Fragment(article, 0, b'ti'), Segment(article), article.to_flat_article()]
+        for element in elements:
+            self.assertFalse(hasattr(element, '__dict__'), type(element).__name__)
+
+    def test_use_registry(self):
+        outer = Section(0, b'outer')
+        with Element.use_registry() as registry:
+            inner = Section(5, b'inner')
+            self.assertIs(Element.instances, registry)
+            self.assertEqual(list(registry), [inner.uid])
+        self.assertIn(outer.uid, Element.instances)
+        self.assertNotIn(inner.uid, Element.instances)
+
+        own_registry = {}
+        with Element.use_registry(own_registry):
+            section = Section(0, b'own')
+        self.assertIs(own_registry[section.uid], section)
+
     def test_abstract_element(self):
         element = Element()
 
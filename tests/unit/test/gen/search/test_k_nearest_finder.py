@@ -1,9 +1,17 @@
 import os
+import tempfile
 import unittest
+from pathlib import Path
 import numpy as np
 import numpy.testing as npt
+import torch
 from unittest.mock import MagicMock, patch, PropertyMock
 from search.k_nearest_finder import KNearestFinder
+from search.search_filter import SearchFilter
+from gen.bm25_index import BM25IndexBuilder
+from gen.data.segment_record import SegmentRecord
+from search.stores import Stores
+from gen.embedding_utils import EmbeddingUtils
 from xutils.embedding_config import EmbeddingConfig
 
 
@@ -63,6 +71,82 @@ class TestKNearestFinder(unittest.TestCase):
         self.assertIs(normalized_embeddings5, normalized_embeddings)
         mock_morph_embeddings.assert_called_once_with(embeddings, self.embed_config)
 
+    @patch('search.k_nearest_finder.Encoder')
+    def test_refresh(self, mock_encoder):
+        uids = [0, 1]
+        embeddings = np.array([[3.0, 4.0], [1.0, 0.0]])
+        appended_uids = [0, 1, 2]
+        appended_embeddings = np.array([[3.0, 4.0], [1.0, 0.0], [0.0, 2.0]])
+
+        mock_stores = MagicMock()
+        mock_stores.uids_and_embeddings = (uids, embeddings)
+        finder = KNearestFinder(mock_stores, self.embed_config)
+        _, normalized_embeddings = finder.uids_and_normalized_embeddings
+
+        mock_stores.uids_and_embeddings = (appended_uids, appended_embeddings)
+        with patch('search.k_nearest_finder.EmbeddingUtils.morph_embeddings',
+                   wraps=EmbeddingUtils.morph_embeddings) as mock_morph_embeddings:
+            new_count = finder.refresh()
+            # only the new embeddings are morphed
+            args, _ = mock_morph_embeddings.call_args
+            npt.assert_array_equal(args[0], appended_embeddings[2:])
+
+        self.assertEqual(new_count, 1)
+        mock_stores.refresh.assert_called_once()
+        uids2, normalized_embeddings2 = finder.uids_and_normalized_embeddings
+        self.assertEqual(uids2, appended_uids)
+        npt.assert_array_almost_equal(normalized_embeddings2[:2], normalized_embeddings)
+        npt.assert_array_almost_equal(normalized_embeddings2[2], [0.0, 1.0])
+
+    @patch('search.k_nearest_finder.Encoder')
+    def test_refresh_not_loaded(self, mock_encoder):
+        mock_stores = MagicMock()
+        finder = KNearestFinder(mock_stores, self.embed_config)
+        self.assertEqual(finder.refresh(), 0)
+        mock_stores.refresh.assert_called_once()
+        self.assertIsNone(finder._uids)
+
+    @patch('search.k_nearest_finder.Encoder')
+    def test_shared_encoder(self, mock_encoder):
+        encoder = MagicMock()
+        finder = KNearestFinder(MagicMock(), self.embed_config, encoder=encoder)
+        self.assertIs(finder.encoder, encoder)
+        mock_encoder.assert_not_called()
+
+    @patch('search.k_nearest_finder.Encoder')
+    def test_share_search_matrices(self, mock_encoder):
+        embeddings = np.array([[3.0, 4.0], [1.0, 0.0]], dtype=np.float32)
+        mock_stores = MagicMock()
+        mock_stores.uids_and_embeddings = ([0, 1], embeddings)
+        finder = KNearestFinder(mock_stores, self.embed_config, binary_shortlist=1)
+        new_finder = KNearestFinder(mock_stores, self.embed_config, binary_shortlist=1)
+        self.assertFalse(new_finder.share_search_matrices(finder))
+
+        _, binary_codes = finder.uids_and_binary_codes
+        self.assertTrue(new_finder.share_search_matrices(finder))
+        self.assertIs(new_finder.uids_and_binary_codes[1], binary_codes)
+        self.assertIs(new_finder.uids_and_normalized_embeddings[1],
+                      finder.uids_and_normalized_embeddings[1])
+
+        # other embeddings (a changed embedding store) are morphed again
+        other_stores = MagicMock()
+        other_stores.uids_and_embeddings = ([0, 1], embeddings.copy())
+        other_finder = KNearestFinder(other_stores, self.embed_config, binary_shortlist=1)
+        self.assertFalse(other_finder.share_search_matrices(finder))
+
+    @patch('search.k_nearest_finder.Encoder')
+    def test_memory_bytes(self, mock_encoder):
+        embeddings = np.array([[3.0, 4.0], [1.0, 0.0]], dtype=np.float32)
+        mock_stores = MagicMock()
+        mock_stores.uids_and_embeddings = ([0, 1], embeddings)
+        finder = KNearestFinder(mock_stores, self.embed_config, binary_shortlist=1)
+        self.assertEqual(finder.memory_bytes(), 0)
+
+        _, normalized_embeddings = finder.uids_and_normalized_embeddings
+        _, binary_codes = finder.uids_and_binary_codes
+        # the embeddings are accounted by the stores
+        self.assertEqual(finder.memory_bytes(), normalized_embeddings.nbytes + binary_codes.nbytes)
+
     @patch('search.k_nearest_finder.Encoder')
     def test_find_k_nearest_segments(self, mock_encoder):
         query_embeddings = np.array([[0.1, 0.2, 0.3]])  # Shape (1, 3)
@@ -128,6 +212,452 @@ class TestKNearestFinder(unittest.TestCase):
                            [2 , 0.982708]]
         npt.assert_array_almost_equal(result, expected_result)
 
+    def quantized_embeddings_and_query(self, stype):
+        rng = np.random.default_rng(seed=42)
+        embeddings = EmbeddingUtils.normalize_embeddings(rng.normal(size=(50, 64)), True)
+        query = embeddings[:2] + 0.1
+        query = EmbeddingUtils.normalize_embeddings(query, True)
+        expected = embeddings @ query.T
+        return (EmbeddingUtils.quantize_embeddings(embeddings, stype),
+                EmbeddingUtils.quantize_embeddings(query, stype),
+                expected)
+
+    def test_torch_batched_similarity_stypes(self):
+        for stype in ("float32", "float16", "int8", "uint8"):
+            embeddings, query, expected = self.quantized_embeddings_and_query(stype)
+            similarities = KNearestFinder.torch_batched_similarity(
+                embeddings, query, batch_size=16)
+            self.assertEqual(similarities.dtype, np.float32)
+            npt.assert_allclose(similarities, expected, atol=0.03, err_msg=stype)
+
+    def test_uint8_similarity_blocks(self):
+        embeddings, query, _ = self.quantized_embeddings_and_query("uint8")
+        expected = KNearestFinder.uint8_similarity(embeddings, query)
+        npt.assert_array_equal(
+            KNearestFinder.uint8_similarity(embeddings, query, block_size=7), expected)
+
+    def test_int8_matmul_fallback(self):
+        embeddings, query, _ = self.quantized_embeddings_and_query("int8")
+        expected = embeddings.astype(np.int32) @ query.T.astype(np.int32)
+        npt.assert_array_equal(KNearestFinder.int8_matmul(embeddings, query.T), expected)
+
+        with patch('search.k_nearest_finder.torch._int_mm', side_effect=RuntimeError):
+            npt.assert_array_equal(KNearestFinder.int8_matmul(embeddings, query.T), expected)
+
+    def test_float16_similarity_fallback(self):
+        embeddings, query, expected = self.quantized_embeddings_and_query("float16")
+        matmul = torch.matmul
+
+        def matmul_without_half(a, b):
+            if a.dtype == torch.float16:
+                raise RuntimeError("not implemented for 'Half'")
+            return matmul(a, b)
+
+        with patch('search.k_nearest_finder.torch.matmul', side_effect=matmul_without_half):
+            similarities = KNearestFinder.float16_similarity(embeddings, query)
+        self.assertEqual(similarities.dtype, np.float32)
+        npt.assert_allclose(similarities, expected, atol=0.01)
+
+    def test_hamming_distances(self):
+        rng = np.random.default_rng(seed=42)
+        for n_bytes in (3, 16):
+            binary_codes = rng.integers(0, 256, size=(10, n_bytes), dtype=np.uint8)
+            query_code = rng.integers(0, 256, size=(1, n_bytes), dtype=np.uint8)
+
+            distances = KNearestFinder.hamming_distances(binary_codes, query_code, batch_size=4)
+
+            expected = np.unpackbits(binary_codes ^ query_code, axis=1).sum(axis=1)
+            npt.assert_array_equal(distances, expected)
+
+    def test_hamming_shortlist(self):
+        binary_codes = np.array([[0b11111111], [0b00000001], [0b00000111], [0b00000000]],
+                                dtype=np.uint8)
+        query_code = np.array([[0b00000000]], dtype=np.uint8)
+
+        shortlist = KNearestFinder.hamming_shortlist(binary_codes, query_code, 2)
+        self.assertEqual(set(shortlist), {1, 3})
+
+        shortlist = KNearestFinder.hamming_shortlist(binary_codes, query_code, 10)
+        npt.assert_array_equal(shortlist, [0, 1, 2, 3])
+
+    @patch('search.k_nearest_finder.Encoder')
+    def test_find_k_nearest_segments_binary_shortlist(self, mock_encoder):
+        query_embeddings = np.array([[0.1, 0.2, -0.3]])
+        embeddings = np.array([
+            [-0.6, -0.7, 0.8],
+            [0.1, 0.2, -0.4],
+            [0.3, 0.4, -0.2],
+            [0.3, -0.4, 0.5],
+        ])
+        uids = [1, 2, 3, 4]
+
+        mock_encoder.return_value.encode.return_value = query_embeddings
+
+        finder = KNearestFinder(MagicMock(), self.embed_config, binary_shortlist=1)
+        finder._uids = uids
+        finder._embeddings = embeddings
+
+        # the shortlist grows to max(k, max_results) rows: 2 and 3 share the query's signs
+        uids, similarities, rows = finder.get_scored_rows("test query", min_rows=2)
+        self.assertEqual(set(rows), {1, 2})
+
+        result = finder.find_k_nearest_segments("test query", k=2, threshold=0.99, max_results=2)
+        self.assertEqual([row[0] for row in result], [2, 3])
+        self.assertAlmostEqual(result[0][1], 0.991460, places=5)
+
+    @patch('search.k_nearest_finder.Encoder')
+    def test_binary_stype(self, mock_encoder):
+        binary_config = EmbeddingConfig(prefix='path_prefix', max_len=1, l2_normalize=True,
+                                        stype="binary")
+        with self.assertRaises(ValueError):
+            KNearestFinder(MagicMock(), binary_config, binary_shortlist=1)
+
+        # the binary codes shortlist, the int8 search matrix reranks
+        embeddings = np.array([
+            [0.6, 0.8, 0.0],
+            [-0.6, 0.8, 0.0],
+            [0.0, -0.6, 0.8],
+        ])
+        mock_encoder.return_value.encode.return_value = embeddings[:1]
+        int8_config = EmbeddingConfig(prefix='path_prefix', max_len=1, l2_normalize=True,
+                                      stype="int8")
+        finder = KNearestFinder(MagicMock(), int8_config, binary_shortlist=1)
+        finder._uids = [1, 2, 3]
+        finder._embeddings = embeddings
+
+        result = finder.find_k_nearest_segments("test query", k=1, threshold=0.5, max_results=1)
+        self.assertEqual(result[0][0], 1)
+        self.assertAlmostEqual(result[0][1], 1.0, places=2)
+
+    @patch('search.k_nearest_finder.Encoder')
+    def test_find_k_nearest_articles_binary_shortlist(self, mock_encoder):
+        query_embeddings = np.array([[0.1, 0.2, -0.3]])
+        embeddings = np.array([
+            [-0.6, -0.7, 0.8],
+            [0.1, 0.2, -0.4],
+            [0.3, 0.4, -0.2],
+            [0.3, -0.4, 0.5],
+        ])
+        mock_encoder.return_value.encode.return_value = query_embeddings
+
+        mock_stores = MagicMock()
+        mock_stores.get_embeddings_article_indexes.return_value = [10, 20, 20, 30]
+        finder = KNearestFinder(mock_stores, self.embed_config, binary_shortlist=2)
+        finder._uids = [1, 2, 3, 4]
+        finder._embeddings = embeddings
+
+        result = finder.find_k_nearest_articles("test query", k=1, threshold=0.5, max_results=1)
+        self.assertEqual(result[0][0], 20)
+
+    def filter_of_rows(self, rows):
+        search_filter = MagicMock(spec=SearchFilter)
+        search_filter.is_empty.return_value = False
+        search_filter.segment_rows.return_value = np.array(rows)
+        return search_filter
+
+    @patch('search.k_nearest_finder.Encoder')
+    def test_find_k_nearest_segments_filtered(self, mock_encoder):
+        mock_encoder.return_value.encode.return_value = np.array([[0.1, 0.2, -0.3]])
+        embeddings = np.array([
+            [-0.6, -0.7, 0.8],
+            [0.1, 0.2, -0.4],
+            [0.3, 0.4, -0.2],
+            [0.3, -0.4, 0.5],
+        ])
+        for binary_shortlist in (None, 1):
+            finder = KNearestFinder(MagicMock(), self.embed_config,
+                                    binary_shortlist=binary_shortlist)
+            finder._uids = [1, 2, 3, 4]
+            finder._embeddings = embeddings
+
+            # the nearest segment, 2, is filtered out
+            search_filter = self.filter_of_rows([0, 2, 3])
+            uids, _, rows = finder.get_scored_rows("test query", search_filter=search_filter)
+            search_filter.segment_rows.assert_called_once_with(finder.stores, 4)
+            self.assertEqual(uids, [3] if binary_shortlist else [1, 3, 4])
+            npt.assert_array_equal(rows, [2] if binary_shortlist else [0, 2, 3])
+
+            result = finder.find_k_nearest_segments(
+                "test query", k=1, threshold=0.5, max_results=1, search_filter=search_filter)
+            self.assertEqual(result[0][0], 3)
+
+            result = finder.find_k_nearest_segments(
+                "test query", search_filter=self.filter_of_rows([]))
+            self.assertEqual(result, [])
+
+    @patch('search.k_nearest_finder.Encoder')
+    def test_find_k_nearest_articles_filtered(self, mock_encoder):
+        mock_encoder.return_value.encode.return_value = np.array([[0.1, 0.2, -0.3]])
+        embeddings = np.array([
+            [-0.6, -0.7, 0.8],
+            [0.1, 0.2, -0.4],
+            [0.3, 0.4, -0.2],
+            [0.3, -0.4, 0.5],
+        ])
+        mock_stores = MagicMock()
+        mock_stores.get_embeddings_article_indexes.return_value = [10, 20, 20, 30]
+        finder = KNearestFinder(mock_stores, self.embed_config)
+        finder._uids = [1, 2, 3, 4]
+        finder._embeddings = embeddings
+
+        result = finder.find_k_nearest_articles(
+            "test query", k=2, threshold=0.99, max_results=2,
+            search_filter=self.filter_of_rows([0, 3]))
+        self.assertEqual({row[0] for row in result}, {10, 30})
+
+    def hybrid_finder(self, mock_encoder, **kwargs):
+        mock_encoder.return_value.encode.return_value = np.array([[0.1, 0.2, -0.3]])
+        embeddings = np.array([
+            [-0.6, -0.7, 0.8],
+            [0.1, 0.2, -0.4],
+            [0.3, 0.4, -0.2],
+            [0.3, -0.4, 0.5],
+        ])
+        texts = ["zanzibar", "nothing here", "more nothing", "zanzibar and zanzibar"]
+        lexical_index = BM25IndexBuilder().build(texts)
+        finder = KNearestFinder(MagicMock(), self.embed_config, lexical_index=lexical_index,
+                                **kwargs)
+        finder._uids = [1, 2, 3, 4]
+        finder._embeddings = embeddings
+        return finder
+
+    @patch('search.k_nearest_finder.Encoder')
+    def test_hybrid_union(self, mock_encoder):
+        # the lexical candidates 0 and 3 join the binary shortlist of 1
+        finder = self.hybrid_finder(mock_encoder, binary_shortlist=1)
+        _, _, rows = finder.get_scored_rows("zanzibar")
+        self.assertEqual(len(rows), 3)
+        self.assertTrue({0, 3} <= set(rows))
+
+        # without lexical hits the shortlist is not extended
+        _, _, rows = finder.get_scored_rows("unknown")
+        self.assertEqual(len(rows), 1)
+
+    @patch('search.k_nearest_finder.Encoder')
+    def test_hybrid_union_exact(self, mock_encoder):
+        finder = self.hybrid_finder(mock_encoder, lexical_weight=0.9)
+        # without lexical hits the similarities are not fused
+        _, dense_similarities, _ = finder.get_scored_rows("unknown")
+        _, similarities, rows = finder.get_scored_rows("zanzibar")
+        self.assertIsNone(rows)
+        npt.assert_allclose(similarities[[1, 2]], 0.1 * dense_similarities[[1, 2]], rtol=1e-5)
+        # the short segment 0 has the best BM25 score
+        self.assertAlmostEqual(similarities[0], 0.1 * dense_similarities[0] + 0.9, places=5)
+        self.assertGreater(similarities[3], 0.1 * dense_similarities[3])
+
+        result = finder.find_k_nearest_segments("zanzibar", k=1, threshold=0.99, max_results=1)
+        self.assertEqual(result[0][0], 1)
+
+    @patch('search.k_nearest_finder.Encoder')
+    def test_hybrid_prefilter(self, mock_encoder):
+        finder = self.hybrid_finder(mock_encoder, lexical_mode="prefilter")
+        uids, similarities, rows = finder.get_scored_rows("zanzibar")
+        npt.assert_array_equal(rows, [0, 3])
+        self.assertEqual(uids, [1, 4])
+
+        # combined with a search filter
+        uids, _, _ = finder.get_scored_rows("zanzibar", search_filter=self.filter_of_rows([1, 3]))
+        self.assertEqual(uids, [4])
+
+        # without lexical hits every row is scanned
+        _, _, rows = finder.get_scored_rows("unknown")
+        self.assertIsNone(rows)
+
+        with self.assertRaises(ValueError):
+            KNearestFinder(MagicMock(), self.embed_config, lexical_mode="other")
+
+    def article_finder(self, mock_encoder, **kwargs):
+        mock_encoder.return_value.encode.return_value = np.array([[1.0, 0.0, 0.0]])
+        embeddings = np.array([
+            [1.0, 0.1, 0.0],
+            [0.0, 1.0, 0.0],
+            [0.8, 0.0, 0.6],
+            [0.9, 0.1, 0.4],
+            [0.0, 0.0, 1.0],
+            [-1.0, 0.0, 0.0],
+        ])
+        stores = Stores(MagicMock(), MagicMock(), MagicMock(), MagicMock())
+        stores._segment_records = [
+            SegmentRecord(row, document_index, 0, 0, 0)
+            for row, document_index in enumerate([0, 0, 1, 1, 3, 3])]
+        finder = KNearestFinder(stores, self.embed_config, **kwargs)
+        finder._uids = list(range(10, 16))
+        finder._embeddings = embeddings
+        return finder
+
+    def test_morph_article_embeddings(self):
+        embeddings = np.random.default_rng(0).normal(size=(50, 8)).astype(np.float32)
+        document_indexes = np.repeat(np.arange(10), 5)
+        for pooling in ("mean", "max"):
+            batched = KNearestFinder.morph_article_embeddings(
+                embeddings, document_indexes, self.embed_config, pooling, batch_size=7)
+            single = KNearestFinder.morph_article_embeddings(
+                embeddings, document_indexes, self.embed_config, pooling)
+            npt.assert_allclose(batched, single, rtol=1e-5, atol=1e-6)
+            self.assertEqual(batched.shape, (10, 8))
+            npt.assert_allclose(np.linalg.norm(batched, axis=1), 1.0, rtol=1e-5)
+
+        normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        mean = normalized[:5].mean(axis=0)
+        mean_pooled = KNearestFinder.morph_article_embeddings(
+            embeddings, document_indexes, self.embed_config, "mean")
+        npt.assert_allclose(mean_pooled[0], mean / np.linalg.norm(mean), rtol=1e-5)
+
+    @patch('search.k_nearest_finder.Encoder')
+    def test_find_k_nearest_pooled_articles(self, mock_encoder):
+        finder = self.article_finder(mock_encoder, article_pooling="mean")
+        article_indexes, article_embeddings = finder.article_indexes_and_embeddings
+        npt.assert_array_equal(article_indexes, [0, 1, 3])
+        self.assertEqual(article_embeddings.shape, (3, 3))
+
+        result = finder.find_k_nearest_articles("query", k=3, threshold=0.0, max_results=3)
+        self.assertEqual([row[0] for row in result], [1, 0, 3])
+
+        # article 0 max pools its normalized segments to [0.995, 1.0, 0.0]
+        finder = self.article_finder(mock_encoder, article_pooling="max")
+        result = dict(finder.find_k_nearest_articles("query", k=3, threshold=0.0, max_results=3))
+        pooled = np.array([1.0 / np.linalg.norm([1.0, 0.1]), 1.0])
+        self.assertAlmostEqual(result[0], pooled[0] / np.linalg.norm(pooled), places=5)
+
+        # only the filtered articles are scanned
+        finder = self.article_finder(mock_encoder, article_pooling="mean")
+        result = finder.find_k_nearest_articles(
+            "query", k=3, threshold=0.0, max_results=3,
+            search_filter=self.filter_of_rows([0, 1, 4, 5]))
+        self.assertEqual([row[0] for row in result], [0, 3])
+
+    @patch('search.k_nearest_finder.Encoder')
+    def test_find_k_nearest_pooled_articles_drill_down(self, mock_encoder):
+        finder = self.article_finder(mock_encoder, article_pooling="mean", article_drill_down=1)
+        finder.stores.get_document_segment_rows = MagicMock(
+            wraps=finder.stores.get_document_segment_rows)
+        result = finder.find_k_nearest_articles("query", k=1, threshold=0.0, max_results=1)
+        # the segments of the top article only, scored as without pooling
+        npt.assert_array_equal(finder.stores.get_document_segment_rows.call_args[0][0], [1])
+        self.assertEqual(result[0][0], 1)
+        expected = (0.8 + 0.9 / np.linalg.norm([0.9, 0.1, 0.4])) / 2
+        self.assertAlmostEqual(result[0][1], expected, places=5)
+
+        plain_finder = self.article_finder(mock_encoder)
+        plain_result = plain_finder.find_k_nearest_articles(
+            "query", k=1, threshold=0.0, max_results=1)
+        self.assertEqual(plain_result[0][0], 1)
+        self.assertAlmostEqual(plain_result[0][1], result[0][1], places=5)
+
+    @patch('search.k_nearest_finder.Encoder')
+    def test_refresh_article_embeddings(self, mock_encoder):
+        finder = self.article_finder(mock_encoder, article_pooling="mean")
+        finder.stores = MagicMock(wraps=finder.stores)
+        _, article_embeddings = finder.article_indexes_and_embeddings
+        finder.stores.uids_and_embeddings = (list(range(10, 17)), np.vstack(
+            [finder._embeddings, [[0.0, 1.0, 0.0]]]))
+        finder.stores.get_segment_document_indexes.return_value = np.array(
+            [0, 0, 1, 1, 3, 3, 4])
+        self.assertEqual(finder.refresh(), 1)
+        article_indexes, _ = finder.article_indexes_and_embeddings
+        npt.assert_array_equal(article_indexes, [0, 1, 3, 4])
+
+        with self.assertRaises(ValueError):
+            KNearestFinder(MagicMock(), self.embed_config, article_pooling="median")
+
+    @patch('search.k_nearest_finder.Encoder')
+    def test_refresh_binary_codes(self, mock_encoder):
+        mock_stores = MagicMock()
+        mock_stores.uids_and_embeddings = ([0, 1], np.array([[3.0, -4.0], [-1.0, 1.0]]))
+        finder = KNearestFinder(mock_stores, self.embed_config, binary_shortlist=1)
+        _, binary_codes = finder.uids_and_binary_codes
+        self.assertEqual(len(binary_codes), 2)
+
+        mock_stores.uids_and_embeddings = (
+            [0, 1, 2], np.array([[3.0, -4.0], [-1.0, 1.0], [1.0, 1.0]]))
+        self.assertEqual(finder.refresh(), 1)
+
+        _, binary_codes = finder.uids_and_binary_codes
+        npt.assert_array_equal(binary_codes[:, 0], [0b10000000, 0b01000000, 0b11000000])
+
+    @patch('search.k_nearest_finder.Encoder')
+    def test_binary_shortlist_and_cascade_exclusive(self, mock_encoder):
+        with self.assertRaises(ValueError):
+            KNearestFinder(MagicMock(), self.embed_config, binary_shortlist=10, cascade_dim=2)
+
+    @patch('search.k_nearest_finder.Encoder')
+    def test_find_k_nearest_segments_cascade(self, mock_encoder):
+        query_embeddings = np.array([[1.0, 0.0, 0.0, 1.0]])
+        embeddings = np.array([
+            [-1.0, 0.0, 0.5, 0.5],
+            [1.0, 0.1, 0.0, -1.0],
+            [1.0, 0.0, 0.2, 0.9],
+            [0.9, 0.1, 0.1, 0.5],
+        ])
+        mock_encoder.return_value.encode.return_value = query_embeddings
+
+        finder = KNearestFinder(MagicMock(), self.embed_config, cascade_dim=2, cascade_shortlist=3)
+        finder._uids = [1, 2, 3, 4]
+        finder._embeddings = embeddings
+
+        # the leading 2 dims shortlist 2, 3 and 4, the full dims rank 3 and 4 on top
+        _, cascade_embeddings = finder.uids_and_cascade_embeddings
+        self.assertEqual(cascade_embeddings.shape, (4, 2))
+        self.assertTrue(cascade_embeddings.flags.c_contiguous)
+
+        _, _, rows = finder.get_scored_rows("test query")
+        self.assertEqual(set(rows), {1, 2, 3})
+
+        result = finder.find_k_nearest_segments("test query", k=2, threshold=0.99, max_results=2)
+        self.assertEqual([row[0] for row in result], [3, 4])
+
+    @patch('search.k_nearest_finder.Encoder')
+    def test_refresh_cascade_embeddings(self, mock_encoder):
+        mock_stores = MagicMock()
+        mock_stores.uids_and_embeddings = ([0, 1], np.array([[3.0, -4.0, 1.0], [-1.0, 1.0, 2.0]]))
+        finder = KNearestFinder(mock_stores, self.embed_config, cascade_dim=2)
+        _, cascade_embeddings = finder.uids_and_cascade_embeddings
+
+        appended_embeddings = np.array([[3.0, -4.0, 1.0], [-1.0, 1.0, 2.0], [1.0, 1.0, 0.0]])
+        mock_stores.uids_and_embeddings = ([0, 1, 2], appended_embeddings)
+        self.assertEqual(finder.refresh(), 1)
+
+        _, refreshed_cascade_embeddings = finder.uids_and_cascade_embeddings
+        npt.assert_array_equal(refreshed_cascade_embeddings[:2], cascade_embeddings)
+        npt.assert_array_almost_equal(refreshed_cascade_embeddings,
+                                      finder.morph_cascade_embeddings(appended_embeddings))
+
+    @patch('search.k_nearest_finder.Encoder')
+    def test_persist_search_matrix(self, mock_encoder):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            embeddings = np.array([[3.0, 4.0], [1.0, 0.0]])
+            mock_stores = MagicMock()
+            mock_stores.embedding_store.path = Path(temp_dir) / "data_1_embeddings.npz"
+            np.savez(mock_stores.embedding_store.path, uids=[0, 1], embeddings=embeddings)
+            mock_stores.uids_and_embeddings = ([0, 1], embeddings)
+
+            finder = KNearestFinder(mock_stores, self.embed_config, persist_search_matrix=True)
+            _, normalized_embeddings = finder.uids_and_normalized_embeddings
+
+            finder = KNearestFinder(mock_stores, self.embed_config, persist_search_matrix=True)
+            with patch('search.k_nearest_finder.EmbeddingUtils.morph_embeddings') as mock_morph:
+                _, loaded_embeddings = finder.uids_and_normalized_embeddings
+                mock_morph.assert_not_called()
+            npt.assert_array_equal(loaded_embeddings, normalized_embeddings)
+
+    def test_touch_pages(self):
+        array = np.ones((4, 3000), dtype=np.int8)
+        # bytes 0, 4096 and 8192
+        self.assertEqual(KNearestFinder.touch_pages(array), 3)
+
+    @patch('search.k_nearest_finder.Encoder')
+    def test_warm_up(self, mock_encoder):
+        mock_encoder.return_value.encode.return_value = np.array([[1.0, 0.0]])
+        mock_stores = MagicMock()
+        mock_stores.uids_and_embeddings = ([0, 1], np.array([[3.0, 4.0], [1.0, 0.0]]))
+        finder = KNearestFinder(mock_stores, self.embed_config, cascade_dim=1)
+
+        finder.warm_up()
+
+        self.assertIsNotNone(finder._normalized_embeddings)
+        self.assertIsNotNone(finder._cascade_embeddings)
+        mock_encoder.return_value.encode.assert_called_once_with(["warm up"])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+import numpy as np
+
+from search.recall_evaluator import (
+    Candidate, RecallEvaluator, exact_top_k, make_candidates, ndcg_at_k, normalize,
+    similarity_preservation
+)
+
+
+def clustered_embeddings(rows=400, dim=64, clusters=20, seed=0):
+    """Embeddings around random centers, so that neighbors are well defined."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(clusters, size=rows)
+    return (centers[labels] + 0.3 * rng.normal(size=(rows, dim))).astype(np.float32)
+
+
+class TestRecallEvaluator(unittest.TestCase):
+
+    def setUp(self):
+        self.embeddings = clustered_embeddings()
+        self.evaluator = RecallEvaluator(self.embeddings, k=10)
+
+    def test_exact_top_k_matches_brute_force(self):
+        normalized = normalize(self.embeddings)
+        queries = normalized[:30]
+        top_k = exact_top_k(normalized, queries, 5, exclude=np.arange(30), block_elements=1000)
+        for row, found in enumerate(top_k):
+            similarities = normalized @ queries[row]
+            similarities[row] = -np.inf
+            self.assertEqual(list(found), list(np.argsort(-similarities)[:5]))
+
+    def test_float32_exact_is_perfect(self):
+        rows = self.evaluator.evaluate([Candidate()], sample_size=50)
+        self.assertEqual(rows[0]["recall"], 1.0)
+        self.assertEqual(rows[0]["ndcg"], 1.0)
+        self.assertEqual(rows[0]["overlap"], 1.0)
+        self.assertEqual(rows[0]["queries"], 50)
+
+    def test_k_of_tiny_corpus(self):
+        # k >= rows - 1: the truth and the search both find all the other rows
+        evaluator = RecallEvaluator(self.embeddings[:6], k=10)
+        rows = evaluator.evaluate([Candidate(), Candidate(backend="binary", shortlist=10)],
+                                  sample_size=0)
+        for row in rows:
+            self.assertEqual(row["recall"], 1.0)
+            self.assertEqual(row["overlap"], 1.0)
+        top_k = exact_top_k(normalize(self.embeddings[:6]), normalize(self.embeddings[:2]), 10,
+                            exclude=np.arange(2))
+        self.assertEqual(top_k.shape, (2, 5))
+
+    def test_quantized_and_approximate_candidates(self):
+        candidates = [
+            Candidate(stype="int8"),
+            Candidate(backend="binary", shortlist=100),
+            Candidate(backend="cascade", shortlist=100, cascade_dim=32),
+            Candidate(dim=32, stype="uint8", backend="exact"),
+        ]
+        rows = self.evaluator.evaluate(candidates, sample_size=50)
+        self.assertEqual([row["candidate"] for row in rows],
+                         ["full/int8/exact", "full/float32/binary@100",
+                          "full/float32/cascade:32@100", "32/uint8/exact"])
+        self.assertGreater(rows[0]["recall"], 0.9)
+        for row in rows:
+            for metric in ("recall", "ndcg", "overlap"):
+                self.assertGreaterEqual(row[metric], 0.0)
+                self.assertLessEqual(row[metric], 1.0)
+            self.assertLessEqual(row["overlap"], row["recall"])
+
+    def test_query_set(self):
+        queries = clustered_embeddings(rows=20, seed=0)[:5] + 0.01
+        rows = self.evaluator.evaluate([Candidate(), Candidate(stype="float16")], queries)
+        self.assertEqual(rows[0]["queries"], 5)
+        self.assertEqual(rows[0]["recall"], 1.0)
+        self.assertGreater(rows[1]["recall"], 0.9)
+
+    def test_ndcg_of_missing_rows(self):
+        normalized = normalize(self.embeddings)
+        truth = exact_top_k(normalized, normalized[:3], 4)
+        found = truth.copy()
+        found[:, 2:] = -1
+        ndcg = ndcg_at_k(normalized, normalized[:3], truth, found)
+        self.assertTrue(np.all(ndcg < 1.0))
+        self.assertTrue(np.all(ndcg > 0.0))
+
+    def test_make_candidates(self):
+        candidates = make_candidates([None, 64], ["float32", "int8"], ["exact", "cascade"],
+                                     shortlists=[100], cascade_dims=[32, 64])
+        names = [candidate.name for candidate in candidates]
+        self.assertIn("64/int8/cascade:32@100", names)
+        self.assertNotIn("64/int8/cascade:64@100", names)
+        self.assertIn("full/float32/cascade:64@100", names)
+
+    def test_invalid_candidates(self):
+        with self.assertRaises(ValueError):
+            Candidate(stype="binary")
+        with self.assertRaises(ValueError):
+            Candidate(backend="binary")
+        with self.assertRaises(ValueError):
+            Candidate(backend="cascade", shortlist=10)
+        with self.assertRaises(ValueError):
+            Candidate(backend="hnsw")
+
+
+class TestSimilarityPreservation(unittest.TestCase):
+
+    @staticmethod
+    def reference(orig_emb, trans_emb, sample_size, top_k):
+        """The nested loop implementation this replaces."""
+        rng = np.random.default_rng(seed=42)
+        sample = rng.choice(len(orig_emb), size=sample_size, replace=False)
+
+        def cosine(a, b):
+            return 1 - np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+
+        scores = []
+        for idx in sample:
+            orig_dists = [cosine(orig_emb[idx], orig_emb[j]) for j in sample if j != idx]
+            trans_dists = [cosine(trans_emb[idx], trans_emb[j]) for j in sample if j != idx]
+            overlap = set(np.argsort(orig_dists)[:top_k]) & set(np.argsort(trans_dists)[:top_k])
+            scores.append(len(overlap) / top_k)
+        return np.mean(scores)
+
+    def test_matches_reference(self):
+        orig_emb = clustered_embeddings(rows=120, dim=32)
+        rng = np.random.default_rng(1)
+        trans_emb = orig_emb + 0.5 * rng.normal(size=orig_emb.shape).astype(np.float32)
+        self.assertAlmostEqual(similarity_preservation(orig_emb, trans_emb, 60, 5),
+                               self.reference(orig_emb, trans_emb, 60, 5))
+
+    def test_identical_embeddings(self):
+        emb = clustered_embeddings(rows=100, dim=16)
+        self.assertEqual(similarity_preservation(emb, emb, 0, 5), 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
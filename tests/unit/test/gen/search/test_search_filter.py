@@ -0,0 +1,76 @@
+import unittest
+import numpy as np
+import numpy.testing as npt
+from unittest.mock import MagicMock
+
+from search.stores import Stores
+from search.search_filter import SearchFilter
+from gen.data.segment_record_store import SegmentRecord
+
+
+class TestSearchFilter(unittest.TestCase):
+
+    def setUp(self):
+        self.stores = Stores(MagicMock(), MagicMock(), MagicMock(), MagicMock())
+        titles = ["= Alpha =", "= Beta =", "= Alphabet =", "= Gamma =", "= Delta ="]
+        documents = []
+        for title in titles:
+            document = MagicMock()
+            document.header.text = title
+            documents.append(document)
+        self.stores._documents = documents
+        # document 3 has no segments, the segments of 0 are not contiguous
+        document_indexes = [0, 1, 1, 2, 0, 4, 4, 2]
+        self.stores._segment_records = [
+            SegmentRecord(index, document_index, 0, 0, 0)
+            for index, document_index in enumerate(document_indexes)]
+
+    def test_empty(self):
+        self.assertTrue(SearchFilter().is_empty())
+        self.assertFalse(SearchFilter(recent=2).is_empty())
+        self.assertTrue(SearchFilter().document_mask(self.stores).all())
+
+    def test_invalid_recent(self):
+        for recent in (0, -2):
+            with self.assertRaises(ValueError):
+                SearchFilter(recent=recent)
+
+    def test_document_indexes(self):
+        search_filter = SearchFilter(document_indexes=[2, 0, 7, -1])
+        npt.assert_array_equal(search_filter.document_mask(self.stores),
+                               [True, False, True, False, False])
+        npt.assert_array_equal(search_filter.segment_rows(self.stores, 8), [0, 3, 4, 7])
+
+    def test_title(self):
+        search_filter = SearchFilter(title="ALPHA")
+        npt.assert_array_equal(search_filter.segment_rows(self.stores, 8), [0, 3, 4, 7])
+
+    def test_recent(self):
+        search_filter = SearchFilter(recent=2)
+        npt.assert_array_equal(search_filter.segment_rows(self.stores, 8), [5, 6])
+
+    def test_combined(self):
+        search_filter = SearchFilter(document_indexes=[0, 1], title="alpha")
+        npt.assert_array_equal(search_filter.segment_rows(self.stores, 8), [0, 4])
+
+    def test_rows_without_embeddings(self):
+        search_filter = SearchFilter(document_indexes=[2])
+        npt.assert_array_equal(search_filter.segment_rows(self.stores, 5), [3])
+
+    def test_document_segment_rows(self):
+        rows = self.stores.get_document_segment_rows(np.array([4, 1, 3]))
+        npt.assert_array_equal(rows, [1, 2, 5, 6])
+        self.assertEqual(len(self.stores.get_document_segment_rows(np.array([], dtype=int))), 0)
+
+    def test_segment_records_reload(self):
+        npt.assert_array_equal(self.stores.get_segment_document_indexes(),
+                               [0, 1, 1, 2, 0, 4, 4, 2])
+        segment_record_store = MagicMock()
+        segment_record_store.load_segment_records.return_value = [SegmentRecord(0, 3, 0, 0, 0)]
+        self.stores.segment_record_store = segment_record_store
+        self.stores._load_segment_records()
+        npt.assert_array_equal(SearchFilter(recent=2).segment_rows(self.stores, 1), [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
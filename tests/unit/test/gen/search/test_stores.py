@@ -4,7 +4,7 @@ import numpy as np
 from unittest.mock import patch, MagicMock, call
 
 from gen.element.element import Element
-from search.stores import Stores
+from search.stores import Stores, OBJECT_BYTES
 from xutils.embedding_config import EmbeddingConfig
 from ...xutils.byte_reader_tst import TestByteReader
 from gen.data.segment_record_store import SegmentRecord
@@ -142,6 +142,16 @@ class TestStores(unittest.TestCase):
         text = stores.get_segment_text(segment_record)
         self.assertEqual(text, '3456')
 
+    def test_get_segment_texts(self):
+        """test that the segments' text is fetched with one batched read"""
+        test_text_byte_reader = TestByteReader(b'0123456789')
+        test_text_byte_reader.read_many = MagicMock(wraps=test_text_byte_reader.read_many)
+        segment_records = [SegmentRecord(1, 0, 1, 3, 4), SegmentRecord(2, 0, 2, 0, 2)]
+        stores = self.create_stores(test_text_byte_reader)
+        texts = stores.get_segment_texts(segment_records)
+        self.assertEqual(texts, ['3456', '01'])
+        test_text_byte_reader.read_many.assert_called_once_with([(3, 4), (0, 2)])
+
     def test_get_document_by_index(self):
         stores = self.create_stores()
         stores._documents = self.mock_articles
@@ -392,12 +402,61 @@ class TestStores(unittest.TestCase):
         stores._load_segment_records()
         self.assertIs(stores._segment_records, self.segment_records)
 
+    def test_refresh(self):
+        document_store = TestFlatArticleStore(self.mock_articles)
+        segment_record_store = TestSegmentRecordStore(self.segment_records)
+        embedding_store = TestEmbeddingStore(self.mock_uids_and_embeddings)
+        stores = self.create_stores(
+            document_store=document_store,
+            segment_record_store=segment_record_store,
+            embedding_store=embedding_store
+        )
+        # only what was loaded is reloaded
+        _ = stores.segment_records
+        _ = stores.uids_and_embeddings
+
+        appended_records = self.segment_records + [SegmentRecord(5, 3, 0, 0, 0)]
+        segment_record_store.segment_records = appended_records
+        stores.refresh()
+
+        self.assertIs(stores.segment_records, appended_records)
+        self.assertEqual(segment_record_store.load_segment_records_call_counter, 2)
+        self.assertEqual(embedding_store.load_embeddings_call_counter, 2)
+        self.assertIsNone(stores._documents)
+
     def test_protected_load_uids_and_embeddings(self):
         embedding_store = TestEmbeddingStore(self.mock_uids_and_embeddings)
         stores = self.create_stores(embedding_store=embedding_store)
         stores._load_uids_and_embeddings()
         self.assertIs(stores._uids_and_embeddings, self.mock_uids_and_embeddings)
 
+    def test_share_embeddings(self):
+        embedding_store = TestEmbeddingStore(self.mock_uids_and_embeddings)
+        stores = self.create_stores(embedding_store=embedding_store)
+        new_stores = self.create_stores(embedding_store=embedding_store)
+        self.assertFalse(new_stores.share_embeddings(stores))
+
+        _ = stores.uids_and_embeddings
+        self.assertTrue(new_stores.share_embeddings(stores))
+        self.assertIs(new_stores.uids_and_embeddings, stores.uids_and_embeddings)
+        self.assertEqual(embedding_store.load_embeddings_call_counter, 1)
+
+    def test_memory_bytes(self):
+        stores = self.create_stores(
+            segment_record_store=TestSegmentRecordStore(self.segment_records),
+            embedding_store=TestEmbeddingStore(self.mock_uids_and_embeddings)
+        )
+        self.assertEqual(stores.memory_bytes(), 0)
+
+        _ = stores.uids_and_embeddings
+        self.assertEqual(stores.memory_bytes(),
+                         5 * OBJECT_BYTES + self.mock_embeddings.nbytes)
+
+        segment_document_indexes = stores.get_segment_document_indexes()
+        self.assertEqual(stores.memory_bytes(),
+                         10 * OBJECT_BYTES + self.mock_embeddings.nbytes
+                         + segment_document_indexes.nbytes)
+
 
 if __name__ == '__main__':
     unittest.main()
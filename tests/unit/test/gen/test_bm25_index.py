@@ -0,0 +1,97 @@
+import math
+import unittest
+import tempfile
+from pathlib import Path
+import numpy as np
+import numpy.testing as npt
+
+from gen.bm25_index import (
+    BM25Index, BM25IndexBuilder, decode_varints, encode_varints, tokenize
+)
+from gen.data.segment_record import SegmentRecord
+from ..xutils.byte_reader_tst import TestByteReader
+
+
+TEXTS = [
+    "The quick brown fox",
+    "jumps over the lazy dog",
+    "",
+    "Fox, fox and fox hunting",
+    "A quick dog",
+]
+
+
+def reference_score(texts, query, row, k1=1.2, b=0.75):
+    """BM25 of a text, computed directly."""
+    documents = [tokenize(text) for text in texts]
+    average_length = sum(len(document) for document in documents) / len(documents)
+    score = 0.0
+    for term in set(tokenize(query)):
+        frequency = documents[row].count(term)
+        if frequency == 0:
+            continue
+        document_frequency = sum(term in document for document in documents)
+        idf = math.log(
+            1 + (len(documents) - document_frequency + 0.5) / (document_frequency + 0.5))
+        norm = k1 * (1 - b + b * len(documents[row]) / average_length)
+        score += idf * frequency * (k1 + 1) / (frequency + norm)
+    return score
+
+
+class TestBM25Index(unittest.TestCase):
+
+    def test_varints(self):
+        values = np.array([0, 1, 127, 128, 300, 2 ** 21, 2 ** 35, 5])
+        encoded = encode_varints(values)
+        self.assertEqual(len(encoded), 1 + 1 + 1 + 2 + 2 + 4 + 6 + 1)
+        npt.assert_array_equal(decode_varints(encoded), values)
+        self.assertEqual(len(decode_varints(encode_varints([]))), 0)
+
+    def test_score(self):
+        index = BM25IndexBuilder().build(TEXTS)
+        rows, scores = index.score("Quick FOX")
+        npt.assert_array_equal(rows, [0, 3, 4])
+        for row, score in zip(rows, scores):
+            self.assertAlmostEqual(score, reference_score(TEXTS, "quick fox", row), places=5)
+
+        rows, _ = index.score("quick fox", rows=np.array([1, 3]))
+        npt.assert_array_equal(rows, [3])
+        self.assertEqual(len(index.score("unknown")[0]), 0)
+
+    def test_spilled_runs(self):
+        """Merging many small runs builds the same index as a single run."""
+        texts = [" ".join(f"w{(row * 7 + i) % 23}" for i in range(row % 11) for _ in range(2))
+                 for row in range(300)]
+        single = BM25IndexBuilder().build(texts)
+        spilled = BM25IndexBuilder(run_postings=50).build(texts)
+        for name in BM25Index.COLUMN_NAMES:
+            npt.assert_array_equal(getattr(spilled, name), getattr(single, name))
+        rows, frequencies = spilled.get_postings(spilled.lookup("w5"))
+        self.assertTrue(np.all(np.diff(rows) > 0))
+        self.assertTrue(np.all(frequencies >= 2))
+
+    def test_top(self):
+        rows, scores = BM25Index.top(np.array([1, 4, 6, 9]), np.array([0.5, 2.0, 1.0, 0.1]), 2)
+        npt.assert_array_equal(rows, [4, 6])
+        npt.assert_array_equal(scores, [2.0, 1.0])
+
+    def test_build_from_records_save_and_load(self):
+        text = "".join(TEXTS)
+        records, offset = [], 0
+        for row, segment_text in enumerate(TEXTS):
+            records.append(SegmentRecord(row, row, 0, offset, len(segment_text)))
+            offset += len(segment_text)
+        builder = BM25IndexBuilder(batch_size=2)
+        index = builder.build_from_records(TestByteReader(text.encode()), records)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = BM25Index.get_path(str(Path(temp_dir) / "wiki"), 100)
+            self.assertEqual(path.name, "wiki_100_bm25.npz")
+            index.save(path)
+            loaded = BM25Index.load(path)
+        self.assertEqual(len(loaded), 5)
+        npt.assert_array_equal(loaded.score("lazy dog")[0], [1, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
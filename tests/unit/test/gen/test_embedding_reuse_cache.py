@@ -0,0 +1,107 @@
+import unittest
+import tempfile
+from pathlib import Path
+import numpy as np
+import numpy.testing as npt
+
+from gen.embedding_reuse_cache import EmbeddingReuseCache
+
+
+class TestEmbeddingReuseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.temp_dir.name) / "cache"
+        self.encoded = []
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def encode(self, texts):
+        """embedding: (length, first char code)"""
+        self.encoded.extend(texts)
+        return np.array([[len(text), ord(text[0])] for text in texts], dtype=np.float32)
+
+    def expected(self, texts):
+        return np.array([[len(text), ord(text[0])] for text in texts], dtype=np.float32)
+
+    def create_cache(self, model_key="model", max_len=100):
+        return EmbeddingReuseCache(self.cache_dir, model_key, max_len)
+
+    def test_make_keys(self):
+        cache = self.create_cache()
+        keys = cache.make_keys(["a", "b", "a"])
+        self.assertEqual(keys[0], keys[2])
+        self.assertNotEqual(keys[0], keys[1])
+
+        # the key depends on the model and max_len
+        other_model_keys = self.create_cache(model_key="other").make_keys(["a"])
+        other_len_keys = self.create_cache(max_len=200).make_keys(["a"])
+        self.assertNotEqual(keys[0], other_model_keys[0])
+        self.assertNotEqual(keys[0], other_len_keys[0])
+
+    def test_encode_empty_cache(self):
+        cache = self.create_cache()
+        texts = ["alpha", "beta"]
+        embeddings = cache.encode(texts, self.encode)
+        npt.assert_array_equal(embeddings, self.expected(texts))
+        self.assertEqual(self.encoded, texts)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+    def test_encode_reuses_flushed_embeddings(self):
+        cache = self.create_cache()
+        cache.encode(["alpha", "beta"], self.encode)
+        cache.flush()
+        cache.encode(["gamma"], self.encode)
+        cache.flush()
+
+        # a rebuild: new order, one new segment
+        self.encoded.clear()
+        cache = self.create_cache()
+        texts = ["gamma", "delta", "alpha", "beta"]
+        embeddings = cache.encode(texts, self.encode)
+
+        npt.assert_array_equal(embeddings, self.expected(texts))
+        self.assertEqual(self.encoded, ["delta"])
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_encode_all_hits(self):
+        cache = self.create_cache()
+        cache.encode(["alpha"], self.encode)
+        cache.flush()
+
+        self.encoded.clear()
+        cache = self.create_cache()
+        embeddings = cache.encode(["alpha", "alpha"], self.encode)
+        npt.assert_array_equal(embeddings, self.expected(["alpha", "alpha"]))
+        self.assertEqual(self.encoded, [])
+
+    def test_other_model_misses(self):
+        cache = self.create_cache()
+        cache.encode(["alpha"], self.encode)
+        cache.flush()
+
+        self.encoded.clear()
+        cache = self.create_cache(model_key="other")
+        cache.encode(["alpha"], self.encode)
+        self.assertEqual(self.encoded, ["alpha"])
+
+    def test_flush_without_pending(self):
+        cache = self.create_cache()
+        cache.flush()
+        self.assertFalse(self.cache_dir.exists())
+
+    def test_load_skips_incomplete_part(self):
+        cache = self.create_cache()
+        cache.encode(["alpha"], self.encode)
+        cache.flush()
+        # an interrupted flush leaves embeddings without keys
+        np.save(self.cache_dir / "part_0_0_0.embeddings.npy", np.zeros((1, 2)))
+
+        cache = self.create_cache()
+        cache.load()
+        self.assertEqual(len(cache._sorted_keys), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -56,6 +56,8 @@ class TestEmbeddingStore(unittest.TestCase):
     def setUp(self):
         TestCleanFileLock.instances.clear()
         UUIDEmbeddingStore.file_lock_class = TestCleanFileLock
+        # some tests replace np.savez, restored in tearDown
+        self.savez = np.savez
         self.embedding_config = EmbeddingConfig(
             prefix="/fake/path",
             max_len=10,
@@ -67,6 +69,7 @@ class TestEmbeddingStore(unittest.TestCase):
         self.embedding_store_path = EmbeddingStore.get_store_path(self.embedding_config)
 
     def tearDown(self):
+        np.savez = self.savez
         module = importlib.import_module(UUIDEmbeddingStore.__module__)
         importlib.reload(module)
 
@@ -170,6 +170,45 @@ class TestEmbeddingUtils(unittest.TestCase):
         expected = np.round((normalized2 + 1) * 127.5).astype(np.uint8)
         npt.assert_array_almost_equal(output, expected)
 
+    def test_quantize_embeddings_binary(self):
+        embeddings = np.array([[1, -2, 3, 0, 5, -6, 7, 8, -9], [-1, 2, 3, 4, 5, 6, 7, 8, 9]],
+                              dtype=np.float64)
+        normalized = EmbeddingUtils.normalize_embeddings(embeddings, True, None)
+        output = EmbeddingUtils.quantize_embeddings(normalized, "binary")
+
+        expected = np.array([[0b10101011, 0b00000000], [0b01111111, 0b10000000]], dtype=np.uint8)
+        npt.assert_array_equal(output, expected)
+
+    def test_binarize_embeddings_quantized(self):
+        normalized = EmbeddingUtils.normalize_embeddings(
+            np.array([[1, -2, 3, -4, 5, -6, 7, -8]], dtype=np.float32), True, None)
+        expected = EmbeddingUtils.binarize_embeddings(normalized)
+        for stype in ("int8", "uint8"):
+            quantized = EmbeddingUtils.quantize_embeddings(normalized, stype)
+            npt.assert_array_equal(EmbeddingUtils.binarize_embeddings(quantized), expected)
+
+    def test_unpack_binary_embeddings(self):
+        rng = np.random.default_rng(seed=42)
+        embeddings = rng.normal(size=(4, 16))
+        binary = EmbeddingUtils.binarize_embeddings(embeddings)
+        unpacked = EmbeddingUtils.unpack_binary_embeddings(binary, 16)
+
+        npt.assert_array_equal(np.sign(unpacked), np.sign(embeddings))
+        npt.assert_array_almost_equal(np.linalg.norm(unpacked, axis=1), np.ones(4))
+
+        # cosine similarity is 1 - 2 * hamming / dim
+        hamming = np.unpackbits(binary[0] ^ binary[1]).sum()
+        self.assertAlmostEqual(unpacked[0] @ unpacked[1], 1 - 2 * hamming / 16, places=6)
+
+    def test_dequantize_embeddings(self):
+        normalized = EmbeddingUtils.normalize_embeddings(
+            np.array([[1, -2, 3, -4]], dtype=np.float32), True, None)
+        for stype in ("int8", "uint8", "float16"):
+            quantized = EmbeddingUtils.quantize_embeddings(normalized, stype)
+            output = EmbeddingUtils.dequantize_embeddings(quantized)
+            self.assertEqual(output.dtype, np.float32)
+            npt.assert_array_almost_equal(output, normalized, decimal=2)
+
     def test_quantize_embeddings_unknown(self):
         embeddings = np.array([[1, 2, 3], [4, 5, 6]], dtype=np.float64)
         normalized = EmbeddingUtils.normalize_embeddings(embeddings, True, None)
@@ -196,6 +235,23 @@ class TestEmbeddingUtils(unittest.TestCase):
         with self.assertRaises(ValueError):
             EmbeddingUtils.get_stype(embeddings)
 
+    def test_pool_embeddings(self):
+        embeddings = np.array([[1.0, 4.0], [3.0, 0.0], [5.0, 5.0], [-1.0, 2.0]])
+        group_indexes = np.array([2, 0, 2, 7])
+
+        indexes, pooled = EmbeddingUtils.pool_embeddings(embeddings, group_indexes)
+        npt.assert_array_equal(indexes, [0, 2, 7])
+        npt.assert_allclose(pooled, [[3.0, 0.0], [3.0, 4.5], [-1.0, 2.0]])
+        self.assertEqual(pooled.dtype, np.float32)
+
+        _, pooled = EmbeddingUtils.pool_embeddings(embeddings, group_indexes, "max")
+        npt.assert_allclose(pooled, [[3.0, 0.0], [5.0, 5.0], [-1.0, 2.0]])
+        _, pooled = EmbeddingUtils.pool_embeddings(embeddings, group_indexes, "sum")
+        npt.assert_allclose(pooled[1], [6.0, 9.0])
+
+        with self.assertRaises(ValueError):
+            EmbeddingUtils.pool_embeddings(embeddings, group_indexes, "median")
+
     @staticmethod
     def torch_normalize(embeddings, stype):
         tensor_batch = torch.from_numpy(embeddings.astype(stype)).to('cpu')
@@ -0,0 +1,142 @@
+import unittest
+import tempfile
+from pathlib import Path
+from unittest.mock import Mock, patch
+import numpy as np
+import numpy.testing as npt
+
+from gen.encode_work_queue import LeaseQueue, EmbeddingShardStore
+
+
+class TestLeaseQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.queue = LeaseQueue(Path(self.temp_dir.name) / "queue.sqlite")
+        self.queue.initialize(5, 30, range_size=10)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_initialize(self):
+        self.assertEqual(self.queue.ranges(), [(5, 15), (15, 25), (25, 30)])
+        self.assertEqual(self.queue.status(), {"pending": 3, "leased": 0, "done": 0})
+
+    def test_initialize_keeps_existing_queue(self):
+        self.queue.acquire("w1", lease_seconds=60)
+        self.queue.initialize(0, 100, range_size=7)
+        self.assertEqual(self.queue.ranges(), [(5, 15), (15, 25), (25, 30)])
+        self.assertEqual(self.queue.status()["leased"], 1)
+
+    def test_initialize_invalid_range_size(self):
+        with self.assertRaises(ValueError):
+            self.queue.initialize(0, 10, range_size=0)
+
+    def test_acquire_in_order(self):
+        lease1 = self.queue.acquire("w1", lease_seconds=60)
+        lease2 = self.queue.acquire("w2", lease_seconds=60)
+        self.assertEqual((lease1.start, lease1.stop, lease1.worker_id), (5, 15, "w1"))
+        self.assertEqual((lease2.start, lease2.stop, lease2.worker_id), (15, 25, "w2"))
+
+    def test_acquire_none_available(self):
+        for _ in range(3):
+            self.assertIsNotNone(self.queue.acquire("w1", lease_seconds=60))
+        self.assertIsNone(self.queue.acquire("w2", lease_seconds=60))
+        self.assertFalse(self.queue.is_done())
+
+    def test_complete(self):
+        leases = [self.queue.acquire("w1", lease_seconds=60) for _ in range(3)]
+        for lease in leases:
+            self.assertTrue(self.queue.complete(lease))
+        self.assertTrue(self.queue.is_done())
+        self.assertIsNone(self.queue.acquire("w1", lease_seconds=60))
+
+    def test_expired_lease_is_reacquired(self):
+        with patch("gen.encode_work_queue.time.time", return_value=1000.0):
+            lease1 = self.queue.acquire("w1", lease_seconds=10)
+
+        with patch("gen.encode_work_queue.time.time", return_value=1011.0):
+            lease2 = self.queue.acquire("w2", lease_seconds=10)
+
+        self.assertEqual(lease2.range_id, lease1.range_id)
+        self.assertEqual(lease2.worker_id, "w2")
+
+        # the crashed worker lost its lease
+        self.assertFalse(self.queue.renew(lease1, lease_seconds=10))
+        self.assertFalse(self.queue.complete(lease1))
+        self.assertTrue(self.queue.complete(lease2))
+
+    def test_renew_extends_lease(self):
+        with patch("gen.encode_work_queue.time.time", return_value=1000.0):
+            lease = self.queue.acquire("w1", lease_seconds=10)
+        with patch("gen.encode_work_queue.time.time", return_value=1009.0):
+            self.assertTrue(self.queue.renew(lease, lease_seconds=10))
+        with patch("gen.encode_work_queue.time.time", return_value=1015.0):
+            other = self.queue.acquire("w2", lease_seconds=10)
+        self.assertNotEqual(other.range_id, lease.range_id)
+
+    def test_remove(self):
+        self.queue.remove()
+        self.assertFalse(self.queue.path.exists())
+
+
+class TestEmbeddingShardStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.shard_store = EmbeddingShardStore(Path(self.temp_dir.name) / "shards")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_shard(self, start, stop):
+        uids = np.arange(start, stop)
+        embeddings = np.full((stop - start, 2), start, dtype=np.float32)
+        self.shard_store.write_shard(start, stop, uids, embeddings)
+
+    def test_merge_in_segment_order(self):
+        ranges = [(0, 3), (3, 5), (5, 6)]
+        # written out of order, as workers finish
+        for start, stop in reversed(ranges):
+            self.write_shard(start, stop)
+
+        embedding_store = Mock()
+        count = self.shard_store.merge(ranges, embedding_store)
+
+        self.assertEqual(count, 6)
+        # one shard at a time, in segment order
+        calls = embedding_store.extend_embeddings.call_args_list
+        self.assertEqual(len(calls), 3)
+        uids = np.concatenate([call[0][0] for call in calls])
+        embeddings = np.concatenate([call[0][1] for call in calls])
+        npt.assert_array_equal(uids, np.arange(6))
+        npt.assert_array_equal(embeddings[:, 0], [0, 0, 0, 3, 3, 5])
+
+    def test_merge_missing_shard(self):
+        self.write_shard(0, 3)
+        embedding_store = Mock()
+        with self.assertRaises(FileNotFoundError):
+            self.shard_store.merge([(0, 3), (3, 5)], embedding_store)
+        # nothing is added before the shards are checked
+        embedding_store.extend_embeddings.assert_not_called()
+
+    def test_merge_gap(self):
+        self.write_shard(0, 3)
+        self.write_shard(4, 5)
+        embedding_store = Mock()
+        with self.assertRaises(ValueError):
+            self.shard_store.merge([(0, 3), (4, 5)], embedding_store)
+        embedding_store.extend_embeddings.assert_not_called()
+
+    def test_write_shard_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            self.shard_store.write_shard(0, 3, np.arange(2), np.zeros((2, 2)))
+
+    def test_remove_shards(self):
+        self.write_shard(0, 3)
+        self.shard_store.remove_shards([(0, 3)])
+        self.assertFalse(self.shard_store.shard_dir.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
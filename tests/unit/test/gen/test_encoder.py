@@ -39,6 +39,25 @@ class TestEncoder(unittest.TestCase):
             model = encoder.get_model()
             self.assertEqual(model, mock_model)
 
+    def test_get_model_onnx_backend(self):
+        mock_model = Mock()
+        encoder = Encoder(31, "big-onnx-int8")
+        with patch.object(encoder, "_get_onnx_model", return_value=mock_model) as mock_get:
+            model = encoder.get_model()
+            self.assertIs(model, mock_model)
+            mock_get.assert_called_once_with("nomic-ai/nomic-embed-text-v1.5", "int8")
+
+    def test_get_model_unknown_backend(self):
+        encoder = Encoder(31)
+        encoder.encoder_config = {"model_id": "model_id", "backend": "unknown"}
+        with self.assertRaises(ValueError):
+            encoder.get_model()
+
+    def test_model_key(self):
+        self.assertEqual(Encoder(31).model_key, "nomic-ai/nomic-embed-text-v1.5")
+        self.assertEqual(Encoder(31, "big-onnx-int8").model_key,
+                         "nomic-ai/nomic-embed-text-v1.5:int8")
+
     def test_model_property_memoized(self):
         mock_model = Mock()
         batch_size = 31
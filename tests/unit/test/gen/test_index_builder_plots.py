@@ -108,6 +108,27 @@ class TestIndexBuilderPlots(unittest.TestCase):
 
         self.assertEqual(plot_record_list, self.plot_record_list)
 
+    def test_get_end_offset(self):
+        self.assertEqual(IndexBuilderPlots.get_end_offset([]), 0)
+        end_offset = IndexBuilderPlots.get_end_offset(self.plot_record_list)
+        self.assertEqual(end_offset, len(plots_content))
+
+    def test_protected_build_index_appended(self):
+        # the first plot was indexed, index the plots appended after it
+        start_index = 1
+        appended_records = self.plot_record_list[start_index:]
+        offsets = [plot.offset for plot in appended_records]
+        offsets.append(None)
+
+        plots_file_handle = MagicMock()
+        plots_file_handle.tell.side_effect = offsets
+        plots_file_handle.readline.side_effect = plot_lines[4:]
+
+        index_builder = IndexBuilderPlots(self.plots_dir, offsets[0], start_index)
+        plot_record_list = index_builder._build_index(titles, plots_file_handle)
+
+        self.assertEqual(plot_record_list, appended_records)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,6 +1,8 @@
 import unittest
+import tempfile
 from unittest.mock import Mock, patch, mock_open
 from gen.element.header import Header
+from gen.element.element import Element
 from gen.element.article import Article
 from gen.index_builder_wiki import IndexBuilderWiki, Chunk
 
@@ -139,6 +141,26 @@ class TestIndexBuilderWiki(unittest.TestCase):
         self.assertEqual(chunks[2].offset, 12)
         self.assertEqual(chunks[2].bytes, b"chun")
 
+    def test_build_index_from_start_offset(self):
+        first_article = b' = Article 1 =\nParagraph 1\n'
+        second_article = b' = Article 2 =\nParagraph 2\nParagraph 3\n'
+        with tempfile.NamedTemporaryFile(suffix=".txt") as text_file:
+            text_file.write(first_article + second_article)
+            text_file.flush()
+
+            args = Mock()
+            args.text = text_file.name
+            builder = IndexBuilderWiki(args, start_offset=len(first_article))
+            try:
+                builder.build_index()
+                self.assertEqual(len(builder.articles), 1)
+                article = builder.articles[0]
+                self.assertEqual(article.offset, len(first_article))
+                self.assertEqual(article.paragraph_count, 2)
+                self.assertEqual(article.header.bytes, b' = Article 2 =\n')
+            finally:
+                Element.instances.clear()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import tempfile
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+import numpy as np
+import numpy.testing as npt
+
+from gen.onnx_encoder import OnnxExporter, OnnxSentenceModel
+
+
+class TestOnnxExporter(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.exporter = OnnxExporter("org/model", Path(self.temp_dir.name))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_get_model_path(self):
+        export_dir = Path(self.temp_dir.name) / "org__model"
+        self.assertEqual(self.exporter.export_dir, export_dir)
+        self.assertEqual(self.exporter.get_model_path(None), export_dir / "model.onnx")
+        self.assertEqual(self.exporter.get_model_path("int8"), export_dir / "model_int8.onnx")
+        with self.assertRaises(ValueError):
+            self.exporter.get_model_path("int4")
+
+    def test_ensure_exported(self):
+        def export():
+            self.exporter.export_dir.mkdir(parents=True)
+            self.exporter.get_model_path(None).touch()
+
+        with patch.object(self.exporter, "export", side_effect=export) as mock_export, \
+                patch.object(OnnxExporter, "quantize_int8") as mock_quantize:
+            path = self.exporter.ensure_exported("int8")
+            self.assertEqual(path, self.exporter.get_model_path("int8"))
+            mock_export.assert_called_once()
+            mock_quantize.assert_called_once_with(
+                self.exporter.get_model_path(None), self.exporter.get_model_path("int8"))
+
+            # full precision exists, no export, no quantization
+            path = self.exporter.ensure_exported(None)
+            self.assertEqual(path, self.exporter.get_model_path(None))
+            mock_export.assert_called_once()
+            mock_quantize.assert_called_once()
+
+
+class TestOnnxSentenceModel(unittest.TestCase):
+
+    def create_model(self):
+        """create a model with a fake tokenizer and session (no onnxruntime needed)"""
+        model = OnnxSentenceModel.__new__(OnnxSentenceModel)
+        model.input_names = ["input_ids", "attention_mask"]
+        model.max_seq_length = 16
+
+        def tokenizer(sentences, **kwargs):
+            length = max(len(sentence) for sentence in sentences)
+            input_ids = np.array([[len(sentence)] * length for sentence in sentences])
+            return {"input_ids": input_ids, "attention_mask": np.ones_like(input_ids)}
+
+        def run(output_names, inputs):
+            # the "embedding" of a sentence is (its length, batch size)
+            input_ids = inputs["input_ids"]
+            batch = np.stack([input_ids[:, 0], np.full(len(input_ids), len(input_ids))], axis=1)
+            return [batch.astype(np.float64)]
+
+        model.tokenizer = MagicMock(side_effect=tokenizer)
+        model.session = MagicMock()
+        model.session.run.side_effect = run
+        return model
+
+    def test_encode_restores_order(self):
+        model = self.create_model()
+        sentences = ["a", "abcd", "ab", "abcdef", "abc"]
+        embeddings = model.encode(sentences, batch_size=2)
+
+        self.assertEqual(embeddings.dtype, np.float32)
+        npt.assert_array_equal(embeddings[:, 0], [1, 4, 2, 6, 3])
+        # batches are formed by length: (6, 4), (3, 2), (1)
+        npt.assert_array_equal(embeddings[:, 1], [1, 2, 2, 2, 2])
+        self.assertEqual(model.session.run.call_count, 3)
+        _, kwargs = model.tokenizer.call_args
+        self.assertEqual(kwargs["max_length"], 16)
+        self.assertTrue(kwargs["truncation"])
+
+    def test_encode_empty(self):
+        model = self.create_model()
+        embeddings = model.encode([])
+        self.assertEqual(len(embeddings), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import unittest
+import tempfile
+from pathlib import Path
+import numpy as np
+import numpy.testing as npt
+
+from gen.search_matrix_store import SearchMatrixStore
+from xutils.embedding_config import EmbeddingConfig
+
+
+class TestSearchMatrixStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.source_path = Path(self.temp_dir.name) / "data_100_2_embeddings.npz"
+        self.embeddings = np.array([[3.0, 4.0], [1.0, 0.0]])
+        np.savez(self.source_path, uids=np.arange(2), embeddings=self.embeddings)
+        self.embed_config = EmbeddingConfig(prefix="data", max_len=100, dim=2, l2_normalize=True)
+        self.morphed = []
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def morph(self, embeddings):
+        self.morphed.append(len(embeddings))
+        return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    def create_store(self, embed_config=None):
+        return SearchMatrixStore(embed_config or self.embed_config, self.source_path)
+
+    def touch_source(self, mtime_ns):
+        os.utime(self.source_path, ns=(mtime_ns, mtime_ns))
+
+    def test_load_or_create(self):
+        matrix = self.create_store().load_or_create(self.embeddings, self.morph)
+        self.assertEqual(self.morphed, [2])
+
+        # a later run loads the saved matrix
+        loaded = self.create_store().load_or_create(self.embeddings, self.morph)
+        self.assertEqual(self.morphed, [2])
+        self.assertIsInstance(loaded, np.memmap)
+        npt.assert_array_equal(loaded, matrix)
+
+    def test_config_is_part_of_the_key(self):
+        self.create_store().load_or_create(self.embeddings, self.morph)
+        other_config = EmbeddingConfig(prefix="data", max_len=100, dim=2, l2_normalize=False)
+        self.assertIsNone(self.create_store(other_config).load(2))
+
+    def test_modified_source_is_rebuilt(self):
+        self.touch_source(1_000_000_000)
+        store = self.create_store()
+        store.load_or_create(self.embeddings, self.morph)
+        old_path = store.get_path()
+
+        self.touch_source(2_000_000_000)
+        self.assertIsNone(store.load(2))
+        store.load_or_create(self.embeddings, self.morph)
+
+        self.assertEqual(self.morphed, [2, 2])
+        # the outdated matrix is removed
+        self.assertEqual(store.get_config_paths(), [store.get_path()])
+        self.assertFalse(old_path.exists())
+
+    def test_load_count_mismatch(self):
+        store = self.create_store()
+        store.load_or_create(self.embeddings, self.morph)
+        self.assertIsNone(store.load(3))
+
+    def test_kind(self):
+        search_store = self.create_store()
+        article_store = SearchMatrixStore(self.embed_config, self.source_path, kind="articles_mean")
+        search_store.load_or_create(self.embeddings, self.morph)
+        article_store.load_or_create(self.embeddings, lambda e: self.morph(e[:1]), count=1)
+
+        self.assertIn("_articles_mean_", article_store.get_path().name)
+        self.assertEqual(len(article_store.load(1)), 1)
+        # the kinds do not remove each other's matrices
+        self.assertEqual(len(search_store.load(2)), 2)
+
+    def test_missing_source(self):
+        self.source_path.unlink()
+        store = self.create_store()
+        self.assertIsNone(store.get_path())
+        # nothing to key the matrix by, it is not saved
+        matrix = store.load_or_create(self.embeddings, self.morph)
+        self.assertEqual(len(matrix), 2)
+        self.assertEqual(store.get_config_paths(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
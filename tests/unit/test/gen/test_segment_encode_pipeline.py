@@ -0,0 +1,96 @@
+import unittest
+import numpy as np
+import numpy.testing as npt
+
+from gen.data.segment_record import SegmentRecord
+from gen.segment_encode_pipeline import TokenBudgetBatcher, SegmentEncodePipeline
+from ..xutils.byte_reader_tst import TestByteReader
+
+
+class TestTokenBudgetBatcher(unittest.TestCase):
+
+    def test_estimate_tokens(self):
+        self.assertEqual(TokenBudgetBatcher.estimate_tokens(0, 4), 1)
+        self.assertEqual(TokenBudgetBatcher.estimate_tokens(8, 4), 2)
+        self.assertEqual(TokenBudgetBatcher.estimate_tokens(9, 4), 3)
+
+    def test_make_batches(self):
+        # tokens (bytes_per_token=1): 10, 2, 8, 3, 2
+        byte_lengths = [10, 2, 8, 3, 2]
+        batches = TokenBudgetBatcher.make_batches(byte_lengths, token_budget=16,
+                                                  bytes_per_token=1)
+        # longest first: [10] (10 + 10 > 16), [8, 3] (2 * 8 <= 16), [2, 2]
+        self.assertEqual(batches, [[0], [2, 3], [1, 4]])
+
+    def test_make_batches_max_batch_size(self):
+        byte_lengths = [1] * 5
+        batches = TokenBudgetBatcher.make_batches(byte_lengths, token_budget=100,
+                                                  max_batch_size=2, bytes_per_token=1)
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual(sorted(i for batch in batches for i in batch), list(range(5)))
+
+    def test_make_batches_over_budget_segment(self):
+        batches = TokenBudgetBatcher.make_batches([100, 1], token_budget=10, bytes_per_token=1)
+        self.assertEqual(batches, [[0], [1]])
+
+    def test_make_batches_empty(self):
+        self.assertEqual(TokenBudgetBatcher.make_batches([], token_budget=10), [])
+
+
+class TestSegmentEncodePipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.text = b'a' * 3 + b'bb' * 20 + b'c' * 7 + b'd' + b'e' * 30
+        lengths = [3, 40, 7, 1, 30]
+        self.records = []
+        offset = 0
+        for index, length in enumerate(lengths):
+            self.records.append(SegmentRecord(index, 0, index, offset, length))
+            offset += length
+        self.byte_reader = TestByteReader(self.text)
+        self.batches = []
+
+    def encode(self, texts):
+        """embedding: (first char code, length)"""
+        self.batches.append(texts)
+        return np.array([[ord(text[0]), len(text)] for text in texts], dtype=np.float32)
+
+    def test_encode_windows(self):
+        # 40 bytes ~ 10 tokens, 7 bytes ~ 2 tokens: 10 * 2 > 15, the longest goes alone
+        pipeline = SegmentEncodePipeline(self.byte_reader, self.encode, token_budget=15,
+                                         prefetch_batches=1)
+        windows = list(pipeline.encode_windows(self.records, window_size=3))
+
+        self.assertEqual(len(windows), 2)
+        window0, embeddings0 = windows[0]
+        self.assertEqual(list(window0), self.records[:3])
+        npt.assert_array_equal(embeddings0, [[ord('a'), 3], [ord('b'), 40], [ord('c'), 7]])
+        window1, embeddings1 = windows[1]
+        self.assertEqual(list(window1), self.records[3:])
+        npt.assert_array_equal(embeddings1, [[ord('d'), 1], [ord('e'), 30]])
+
+        # batches are longest first within a window
+        self.assertEqual([[len(text) for text in texts] for texts in self.batches],
+                         [[40], [7, 3], [30, 1]])
+
+    def test_encode_windows_close_early(self):
+        pipeline = SegmentEncodePipeline(self.byte_reader, self.encode, token_budget=1,
+                                         prefetch_batches=1)
+        windows = pipeline.encode_windows(self.records, window_size=1)
+        window, _ = next(windows)
+        self.assertEqual(list(window), self.records[:1])
+        windows.close()
+        self.assertEqual(len(self.batches), 1)
+
+    def test_encode_windows_reader_error(self):
+        class FailingByteReader:
+            def read_many(self, ranges):
+                raise IOError("read failed")
+
+        pipeline = SegmentEncodePipeline(FailingByteReader(), self.encode, token_budget=20)
+        with self.assertRaises(IOError):
+            list(pipeline.encode_windows(self.records, window_size=3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -244,6 +244,39 @@ class TestSegmentOrchestrator(unittest.TestCase):
         self.assertIs(args[1], self.adjusted_records)
         self.assertIs(args[2], self.adjusted_segments_per_document)
 
+    @patch('gen.segment_overlap_setter.SegmentOverlapSetter.set_overlaps_for_documents')
+    @patch('gen.segment_orchestrator.SegmentOrchestrator.describe_segments')
+    @patch('gen.segment_orchestrator.SegmentBuilder.segmentize_documents')
+    def test_build_segments_append(
+        self,
+        mock_segmentize_documents,
+        mock_describe_segments,
+        mock_set_overlaps_for_documents,
+    ):
+        records = [SegmentRecord(0, 0, 0, 100, 5), SegmentRecord(1, 1, 0, 105, 7)]
+        # the third document is too short for a segment
+        mock_segmentize_documents.return_value = [[MagicMock()], [MagicMock()], []]
+        mock_set_overlaps_for_documents.return_value = records, MagicMock()
+        segment_record_store = MagicMock()
+
+        SegmentOrchestrator.build_segments(
+            10,
+            MagicMock(),
+            [100, 105, 112],
+            segment_record_store,
+            None,
+            base_segment_index=20,
+            base_document_index=8,
+            append=True
+        )
+
+        segment_record_store.save_segment_records.assert_not_called()
+        segment_record_store.append_segment_records.assert_called_once_with([
+            SegmentRecord(20, 8, 0, 100, 5),
+            SegmentRecord(21, 9, 0, 105, 7),
+        ])
+        segment_record_store.save_document_count.assert_called_once_with(11)
+
 
 if __name__ == "__main__":
     unittest.main()
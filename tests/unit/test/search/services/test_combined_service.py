@@ -13,6 +13,7 @@ from search.services.combined_service import (
     CombinedResponse,
     CombinedService
 )
+from prometheus_client import REGISTRY
 from ...xutils.byte_reader_tst import TestByteReader
 from gen.element.flat.flat_article import FlatArticle
 from gen.data.segment_record import SegmentRecord
@@ -184,6 +185,29 @@ class TestCombinedService(unittest.TestCase):
         )
         self.assertIsNotNone(combined_service)
 
+    def test_swap_generation(self):
+        stores, finder = MagicMock(), MagicMock()
+        combined_service = CombinedService(stores, None, finder)
+        self.assertEqual(combined_service.generation.number, 0)
+
+        with combined_service.use_generation() as generation:
+            self.assertEqual(generation.in_flight, 1)
+            new_stores, new_finder = MagicMock(), MagicMock()
+            old_generation = combined_service.swap_generation(new_stores, new_finder)
+            self.assertIs(old_generation, generation)
+            # the request keeps its generation
+            self.assertIs(combined_service.stores, stores)
+            self.assertIs(combined_service.finder, finder)
+            with combined_service.use_generation() as nested_generation:
+                self.assertIs(nested_generation, generation)
+            self.assertFalse(combined_service.wait_drained(old_generation, timeout=0.01))
+
+        self.assertTrue(combined_service.wait_drained(old_generation, timeout=0.01))
+        self.assertEqual(old_generation.in_flight, 0)
+        self.assertEqual(combined_service.generation.number, 1)
+        self.assertIs(combined_service.stores, new_stores)
+        self.assertIs(combined_service.finder, new_finder)
+
     @patch.dict(os.environ, {"OPENAI_PROJECT_ID": "test_project_id"})
     @patch("search.services.combined_service.OpenAI")
     def test_get_openai_client(self, mock_openai):
@@ -232,7 +256,7 @@ class TestCombinedService(unittest.TestCase):
             finder=None
         )
         combined_service.find_nearest_elements = lambda req: [(0, 0.7), (1, 0.6)]
-        combined_service.get_element_results = lambda kind, tuple_list: self.result_elements
+        combined_service.get_element_results = lambda *args: self.result_elements
 
         combined_request = CombinedRequest(
             id="test_id",
@@ -261,7 +285,7 @@ class TestCombinedService(unittest.TestCase):
             finder=None
         )
         combined_service.find_nearest_elements = lambda req: [(0, 0.7), (1, 0.6)]
-        combined_service.get_element_results = lambda kind, tuple_list: self.result_elements
+        combined_service.get_element_results = lambda *args: self.result_elements
         combined_service.do_rag = lambda query, element_results: ("prompt", "answer")
 
         combined_request = CombinedRequest(
@@ -295,7 +319,7 @@ class TestCombinedService(unittest.TestCase):
             finder=None
         )
         combined_service.find_nearest_elements = lambda req: [(0, 0.7), (1, 0.6)]
-        combined_service.get_element_results = lambda kind, tuple_list: self.result_elements
+        combined_service.get_element_results = lambda *args: self.result_elements
         combined_service.do_rag = lambda query, element_results: ("prompt", "answer")
 
         combined_request = InvalidCombinedRequest(
@@ -310,6 +334,34 @@ class TestCombinedService(unittest.TestCase):
         with self.assertRaises(ValueError):
             combined_service.combined(combined_request)
 
+    def test_combined_counts_requests(self):
+        combined_service = CombinedService(
+            stores=None,
+            embed_config=None,
+            finder=None
+        )
+        combined_service.find_nearest_elements = lambda req: [(0, 0.7), (1, 0.6)]
+        combined_service.get_element_results = lambda *args: self.result_elements
+        combined_service.split_query = lambda query: (query, query)
+
+        def request_count(action, kind, status):
+            labels = {"action": action, "kind": kind, "status": status}
+            return REGISTRY.get_sample_value("wiki_rag_requests_total", labels) or 0
+
+        errors_before = request_count("invalid", "segment", "error")
+        with self.assertRaises(ValueError):
+            combined_service.combined(InvalidCombinedRequest(
+                id="test_id", action=InvalidAction.INVALID, kind=Kind.SEGMENT,
+                query="dummy query", k=10, threshold=0.5, max=100))
+        self.assertEqual(request_count("invalid", "segment", "error"), errors_before + 1)
+
+        ok_before = request_count("search", "article", "ok")
+        combined_service.combined(CombinedRequest(
+            id="test_id", action=Action.SEARCH, kind=Kind.ARTICLE,
+            query="dummy query", k=10, threshold=0.5, max=100))
+        self.assertEqual(request_count("search", "article", "ok"), ok_before + 1)
+        self.assertEqual(REGISTRY.get_sample_value("wiki_rag_requests_in_flight"), 0)
+
     def test_do_rag(self):
         combined_service = CombinedService(
             stores=None,
@@ -322,7 +374,7 @@ class TestCombinedService(unittest.TestCase):
         mock_openai.chat.completions.create.return_value = mock_completion
 
         combined_service.find_nearest_elements = lambda req: [(0, 0.7), (1, 0.6)]
-        combined_service.get_element_results = lambda kind, tuple_list: self.result_elements
+        combined_service.get_element_results = lambda *args: self.result_elements
         combined_service.get_openai_client = lambda: mock_openai
 
         query = "dummy query"
@@ -420,7 +472,7 @@ class TestCombinedService(unittest.TestCase):
             embed_config=None,
             finder=None
         )
-        combined_service.get_segment_results = lambda tuple_list: self.result_elements
+        combined_service.get_segment_results = lambda *args: self.result_elements
 
         result = combined_service.get_element_results(Kind.SEGMENT, [(0, 0.7), (1, 0.6)])
         self.assertEqual(result, self.result_elements)
@@ -455,6 +507,9 @@ class TestCombinedService(unittest.TestCase):
             text = result_element.text
             return text
 
+        def get_segment_texts(segment_records):
+            return [get_segment_text(segment_record) for segment_record in segment_records]
+
         def get_document_by_index(index):
             if index == 0:
                 return self.flat_article0
@@ -465,7 +520,7 @@ class TestCombinedService(unittest.TestCase):
 
         stores = MagicMock()
         stores.get_segment_record_by_index = get_segment_record_by_index
-        stores.get_segment_text = get_segment_text
+        stores.get_segment_texts = get_segment_texts
         stores.get_document_by_index = get_document_by_index
 
         combined_service = CombinedService(
@@ -481,6 +536,18 @@ class TestCombinedService(unittest.TestCase):
         result = combined_service.get_segment_results(segment_id_similarity_tuple_list)
         self.assertEqual(result, self.result_elements)
 
+        # the ids only, without reading the texts
+        stores.get_segment_texts = MagicMock()
+        stores.get_document_by_index = MagicMock()
+        result = combined_service.get_segment_results(segment_id_similarity_tuple_list,
+                                                      with_text=False)
+        stores.get_segment_texts.assert_not_called()
+        stores.get_document_by_index.assert_not_called()
+        self.assertEqual([element.record for element in result],
+                         [self.segment_record_0, self.segment_record_1])
+        self.assertEqual([element.text for element in result], ["", ""])
+        self.assertEqual([element.caption for element in result], ["", ""])
+
     def test_get_elements_text(self):
         combined_service = CombinedService(
             stores=None,
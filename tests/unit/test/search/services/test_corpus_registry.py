@@ -0,0 +1,117 @@
+import unittest
+from unittest.mock import MagicMock
+
+from xutils.app_config import CorpusConfig, Domain
+from xutils.embedding_config import EmbeddingConfig
+from search.services.corpus_registry import CorpusRegistry
+
+
+def corpus_config(corpus_id, encoder_config_id="small"):
+    return CorpusConfig(
+        domain=Domain.WIKI,
+        text_file_path=f"/path/to/{corpus_id}.txt",
+        embed_config=EmbeddingConfig(prefix=corpus_id, max_len=100),
+        corpus_id=corpus_id,
+        encoder_config_id=encoder_config_id,
+    )
+
+
+def create_service(memory_bytes):
+    """A factory of mock services, whose memory is memory_bytes[corpus id]."""
+    def create(corpus, encoder):
+        service = MagicMock()
+        service.corpus = corpus
+        service.encoder = encoder
+        service.stores.memory_bytes.side_effect = lambda: memory_bytes.get(corpus.corpus_id, 0)
+        service.finder.memory_bytes.return_value = 0
+        return service
+    return create
+
+
+class TestCorpusRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.memory_bytes = {}
+        self.factory = MagicMock(side_effect=create_service(self.memory_bytes))
+        corpora = [corpus_config("a"), corpus_config("b"), corpus_config("c", "big")]
+        self.registry = CorpusRegistry(corpora, self.factory, memory_budget=100)
+
+    def test_lazy_load(self):
+        self.assertFalse(self.registry.is_loaded("a"))
+        service = self.registry.get("a")
+        self.assertTrue(self.registry.is_loaded("a"))
+        self.assertIs(self.registry.get("a"), service)
+        self.assertEqual(service.corpus.corpus_id, "a")
+        self.factory.assert_called_once()
+
+    def test_unknown_corpus(self):
+        self.assertNotIn("x", self.registry)
+        with self.assertRaises(KeyError):
+            self.registry.get("x")
+
+    def test_duplicate_corpus(self):
+        with self.assertRaises(ValueError):
+            CorpusRegistry([corpus_config("a"), corpus_config("a")], self.factory)
+        with self.assertRaises(ValueError):
+            CorpusRegistry([corpus_config("a")], self.factory, pinned=["b"])
+
+    def test_shared_encoder(self):
+        service_a = self.registry.get("a")
+        service_b = self.registry.get("b")
+        service_c = self.registry.get("c")
+        self.assertIs(service_a.encoder, service_b.encoder)
+        self.assertIsNot(service_a.encoder, service_c.encoder)
+        self.assertEqual(service_c.encoder.encoder_config["model_id"],
+                         "nomic-ai/nomic-embed-text-v1.5")
+
+    def test_evict_least_recently_used(self):
+        self.memory_bytes.update(a=40, b=40, c=40)
+        self.registry.get("a")
+        self.registry.get("b")
+        self.assertEqual(self.registry.evict(keep="b"), [])
+
+        # a was used after b, b is the least recently used one
+        self.registry.get("a")
+        self.registry.get("c")
+        self.assertEqual(self.registry.evict(keep="c"), ["b"])
+        self.assertFalse(self.registry.is_loaded("b"))
+        self.assertTrue(self.registry.is_loaded("a"))
+
+        # reloaded on demand
+        self.registry.get("b")
+        self.assertEqual(self.factory.call_count, 4)
+        self.assertEqual(self.registry.evict(keep="b"), ["a"])
+
+    def test_evict_keeps_current_and_pinned(self):
+        registry = CorpusRegistry([corpus_config("a"), corpus_config("b")], self.factory,
+                                  memory_budget=100, pinned=["a"])
+        self.memory_bytes.update(a=80, b=80)
+        registry.get("a")
+        registry.get("b")
+        self.assertEqual(registry.evict(keep="b"), [])
+        self.assertEqual(registry.evict(), ["b"])
+        self.assertTrue(registry.is_loaded("a"))
+
+    def test_no_budget(self):
+        registry = CorpusRegistry([corpus_config("a")], self.factory)
+        self.memory_bytes.update(a=10 ** 12)
+        registry.get("a")
+        self.assertEqual(registry.evict(), [])
+
+    def test_unload_and_status(self):
+        self.memory_bytes.update(a=30)
+        self.registry.get("a")
+        status = self.registry.status()
+        self.assertEqual(status["memory_bytes"], 30)
+        self.assertEqual(status["memory_budget"], 100)
+        self.assertEqual(status["corpora"]["a"],
+                         {"domain": "wiki", "max_len": 100, "loaded": True, "memory_bytes": 30})
+        self.assertFalse(status["corpora"]["b"]["loaded"])
+
+        self.assertTrue(self.registry.unload("a"))
+        self.assertFalse(self.registry.unload("a"))
+        self.assertFalse(self.registry.status()["corpora"]["a"]["loaded"])
+
+
+if __name__ == '__main__':
+    unittest.main()
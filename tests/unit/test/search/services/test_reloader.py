@@ -0,0 +1,140 @@
+import gc
+import os
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from search.services.combined_service import CombinedService
+from search.services.reloader import Reloader, ReloadState
+
+
+class FakeStores:
+    """Not a mock, so that the old generation can be garbage collected."""
+
+    def __init__(self, embeddings_path):
+        self.embedding_store = MagicMock()
+        self.embedding_store.path = embeddings_path
+        self.text_byte_reader = MagicMock()
+
+
+def create_generation(encoder):
+    stores, finder = MagicMock(), MagicMock()
+    finder.encoder = encoder
+    return stores, finder
+
+
+class TestReloader(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.embeddings_path = Path(self.temp_dir.name) / "embeddings.npz"
+        self.records_path = Path(self.temp_dir.name) / "segments.csv"
+        self.write(self.embeddings_path, b"embeddings")
+        self.write(self.records_path, b"records")
+
+        self.stores = FakeStores(self.embeddings_path)
+        self.finder = MagicMock()
+        self.service = CombinedService(self.stores, None, self.finder)
+        self.factory = MagicMock(side_effect=create_generation)
+        self.reloader = Reloader(self.service, self.factory,
+                                 watch_paths=[self.embeddings_path, self.records_path],
+                                 drain_seconds=0.01)
+
+    def tearDown(self):
+        self.reloader.stop_watching()
+        self.temp_dir.cleanup()
+
+    @staticmethod
+    def write(path, content, mtime_ns=None):
+        path.write_bytes(content)
+        if mtime_ns is not None:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    def test_reload(self):
+        self.assertTrue(self.reloader.reload())
+
+        generation = self.service.generation
+        self.assertEqual(generation.number, 1)
+        self.assertIsNot(generation.stores, self.stores)
+        # the encoder is shared, the new generation is warmed up
+        self.factory.assert_called_once_with(self.finder.encoder)
+        generation.finder.warm_up.assert_called_once()
+        # the drained old generation closed its text file
+        self.stores.text_byte_reader.cleanup.assert_called_once()
+        status = self.reloader.status()
+        self.assertEqual(status["state"], ReloadState.IDLE.value)
+        self.assertEqual(status["generation"], 1)
+        self.assertEqual(status["reloads"], 1)
+
+    def test_share_unchanged_embeddings(self):
+        self.reloader.reload()
+        generation = self.service.generation
+        generation.stores.share_embeddings.assert_called_once_with(self.stores)
+        generation.finder.share_search_matrices.assert_called_once_with(self.finder)
+
+        self.write(self.embeddings_path, b"more embeddings")
+        self.reloader.reload()
+        self.service.generation.stores.share_embeddings.assert_not_called()
+
+    def test_reload_failure(self):
+        self.factory.side_effect = FileNotFoundError("no store")
+        self.assertFalse(self.reloader.reload())
+        self.assertIs(self.service.stores, self.stores)
+        status = self.reloader.status()
+        self.assertEqual(status["state"], ReloadState.FAILED.value)
+        self.assertEqual(status["generation"], 0)
+        self.assertIn("no store", status["error"])
+
+    def test_in_flight_request(self):
+        with self.service.use_generation():
+            thread = threading.Thread(target=self.reloader.reload)
+            thread.start()
+            thread.join()
+            # the request finishes on the old generation
+            self.assertIs(self.service.finder, self.finder)
+        self.assertEqual(self.service.generation.number, 1)
+        # not drained in time, the text file is closed once the stores are collected
+        self.stores.text_byte_reader.cleanup.assert_not_called()
+        text_byte_reader = self.stores.text_byte_reader
+        self.stores = None
+        # the recorded share_embeddings(old stores) call holds on to them
+        self.service.generation.stores.reset_mock()
+        gc.collect()
+        text_byte_reader.cleanup.assert_called_once()
+
+    def test_request_reload_coalesces(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def reload():
+            started.set()
+            release.wait(5)
+
+        with patch.object(self.reloader, "reload", side_effect=reload) as mock_reload:
+            self.assertTrue(self.reloader.request_reload())
+            started.wait(5)
+            self.assertFalse(self.reloader.request_reload())
+            self.assertFalse(self.reloader.request_reload())
+            self.assertTrue(self.reloader.reloading)
+            release.set()
+            thread = self.reloader._thread
+            if thread is not None:
+                thread.join(5)
+        self.assertEqual(mock_reload.call_count, 2)
+        self.assertFalse(self.reloader.reloading)
+
+    def test_poll(self):
+        with patch.object(self.reloader, "request_reload") as mock_request_reload:
+            self.assertFalse(self.reloader.poll())
+
+            self.write(self.records_path, b"more records", mtime_ns=10 ** 18)
+            # picked up once stable
+            self.assertFalse(self.reloader.poll())
+            self.assertTrue(self.reloader.poll())
+            mock_request_reload.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
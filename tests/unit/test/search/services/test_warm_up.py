@@ -0,0 +1,63 @@
+import unittest
+from unittest.mock import MagicMock, PropertyMock
+
+from search.services.warm_up import WarmUp, ComponentState
+
+
+class TestWarmUp(unittest.TestCase):
+
+    def setUp(self):
+        self.service = MagicMock()
+        self.warm_up = WarmUp(self.service)
+
+    def test_initial_status(self):
+        status = self.warm_up.status()
+        self.assertFalse(status["ready"])
+        self.assertFalse(self.warm_up.ready)
+        self.assertEqual(
+            {name: component["state"] for name, component in status["components"].items()},
+            {name: "pending" for name, _ in self.warm_up.steps})
+
+    def test_run(self):
+        self.assertTrue(self.warm_up.run())
+
+        self.assertTrue(self.warm_up.ready)
+        status = self.warm_up.status()
+        self.assertTrue(status["ready"])
+        for component in status["components"].values():
+            self.assertEqual(component["state"], ComponentState.READY.value)
+            self.assertIn("seconds", component)
+
+        self.service.finder.warm_up.assert_called_once()
+        self.service.get_openai_client.assert_called_once()
+
+    def test_run_stops_at_failure(self):
+        type(self.service.stores).uids_and_embeddings = PropertyMock(
+            side_effect=FileNotFoundError("no store"))
+
+        self.assertFalse(self.warm_up.run())
+
+        self.assertFalse(self.warm_up.ready)
+        components = self.warm_up.status()["components"]
+        self.assertEqual(components["segment_records"]["state"], "ready")
+        self.assertEqual(components["embeddings"]["state"], "failed")
+        self.assertEqual(components["embeddings"]["error"], "FileNotFoundError: no store")
+        self.assertEqual(components["search"]["state"], "pending")
+        self.service.finder.warm_up.assert_not_called()
+
+    def test_optional_openai_client(self):
+        self.service.get_openai_client.side_effect = RuntimeError("no api key")
+
+        self.assertTrue(self.warm_up.run())
+
+        self.assertTrue(self.warm_up.ready)
+        status = self.warm_up.status()
+        self.assertTrue(status["ready"])
+        self.assertEqual(status["components"]["openai_client"]["state"], "failed")
+        self.assertEqual(status["components"]["openai_client"]["error"],
+                         "RuntimeError: no api key")
+        self.assertEqual(status["components"]["search"]["state"], "ready")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1 @@
+# This file makes the tests/unit/test/web directory a package.
@@ -0,0 +1,59 @@
+import unittest
+from unittest.mock import MagicMock
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from web.admin_auth import create_admin_guard
+from web.corpora_router import create_corpora_router
+
+
+def create_request(host, authorization=None):
+    request = MagicMock()
+    request.client.host = host
+    request.headers = {"authorization": authorization} if authorization else {}
+    return request
+
+
+class TestAdminAuth(unittest.TestCase):
+
+    def test_without_token(self):
+        require_admin = create_admin_guard(None)
+        require_admin(create_request("127.0.0.1"))
+        require_admin(create_request("::1"))
+        with self.assertRaises(HTTPException) as context:
+            require_admin(create_request("10.0.0.1"))
+        self.assertEqual(context.exception.status_code, 403)
+
+    def test_with_token(self):
+        require_admin = create_admin_guard("secret")
+        require_admin(create_request("10.0.0.1", "Bearer secret"))
+        for authorization in (None, "Bearer other", "Basic secret"):
+            with self.assertRaises(HTTPException) as context:
+                require_admin(create_request("127.0.0.1", authorization))
+            self.assertEqual(context.exception.status_code, 401)
+
+    def test_corpora_admin_routes(self):
+        registry = MagicMock()
+        registry.__contains__.return_value = True
+        registry.is_loaded.return_value = True
+        registry.get.return_value.refresh.return_value = 3
+        registry.pinned = set()
+        app = FastAPI()
+        app.include_router(create_corpora_router(registry, admin_token="secret"))
+        client = TestClient(app)
+
+        response = client.post("/api/admin/corpora/plots/refresh")
+        self.assertEqual(response.status_code, 401)
+        registry.get.return_value.refresh.assert_not_called()
+
+        headers = {"Authorization": "Bearer secret"}
+        response = client.post("/api/admin/corpora/plots/refresh", headers=headers)
+        self.assertEqual(response.json(), {"new_segments": 3})
+        response = client.delete("/api/admin/corpora/plots", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        registry.unload.assert_called_once_with("plots")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from gen.embedding_store import EmbeddingStore
+from xutils.app_config import AppConfig, Domain
+from xutils.embedding_config import EmbeddingConfig
+from search.services.combined_service import CombinedService
+from search.services.reloader import Reloader
+from web.combined_app import create_generation_factory, create_search_generation
+
+
+class TestCombinedAppReload(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        prefix = f"{self.temp_dir.name}/corpus"
+        text_file_path = f"{self.temp_dir.name}/corpus.txt"
+        with open(text_file_path, "wb") as text_file:
+            text_file.write(b"text")
+        embed_config = EmbeddingConfig(prefix=prefix, max_len=100)
+        np.savez(EmbeddingStore.get_store_path(embed_config),
+                 uids=np.array(["a", "b"]), embeddings=np.eye(2, 4, dtype=np.float32))
+        self.app_config = AppConfig(Domain.WIKI, text_file_path, embed_config)
+        self.finder_options = {"binary_shortlist": 10, "cascade_shortlist": 20}
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_generation_factory(self):
+        encoder = MagicMock()
+        factory = create_generation_factory(self.app_config, "big", self.finder_options)
+        stores, finder = factory(encoder)
+        self.assertIs(finder.encoder, encoder)
+        self.assertIs(finder.stores, stores)
+        self.assertEqual(finder.binary_shortlist, 10)
+        self.assertEqual(finder.cascade_shortlist, 20)
+        stores.text_byte_reader.cleanup()
+
+    def test_reload_with_the_generation_factory(self):
+        encoder = MagicMock()
+        stores, finder = create_search_generation(self.app_config, "big", encoder=encoder,
+                                                  **self.finder_options)
+        _ = stores.uids_and_embeddings
+        service = CombinedService(stores, self.app_config.embed_config, finder)
+        factory = create_generation_factory(self.app_config, "big", self.finder_options)
+        reloader = Reloader(service, factory, drain_seconds=0.01)
+
+        with patch.object(Reloader, "warm_up"):
+            self.assertTrue(reloader.reload())
+
+        generation = service.generation
+        self.assertEqual(generation.number, 1)
+        # the encoder and the unchanged embeddings are shared
+        self.assertIs(generation.finder.encoder, encoder)
+        self.assertIs(generation.stores.uids_and_embeddings, stores.uids_and_embeddings)
+        stores.text_byte_reader.cleanup()
+        generation.stores.text_byte_reader.cleanup()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+
+from pydantic import ValidationError
+
+from web.combined_router import CombinedRequestModel
+
+
+class TestCombinedRequestModel(unittest.TestCase):
+
+    def create_request(self, **fields):
+        return CombinedRequestModel(id="1", action="search", kind="segment", query="query",
+                                    **fields)
+
+    def test_snippet_length(self):
+        self.assertEqual(self.create_request().snippet_length, 200)
+        self.assertEqual(self.create_request(snippet_length=1).snippet_length, 1)
+        for snippet_length in (0, -5):
+            with self.assertRaises(ValidationError):
+                self.create_request(snippet_length=snippet_length)
+
+    def test_filter_recent(self):
+        request = self.create_request(filter={"recent": 2})
+        self.assertEqual(request.filter.recent, 2)
+        for recent in (0, -2):
+            with self.assertRaises(ValidationError):
+                self.create_request(filter={"recent": recent})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import CollectorRegistry, Counter, Histogram
+
+from search.search_metrics import SIMILARITY_SECONDS
+from web.metrics_router import create_metrics_router
+
+
+class TestMetricsRouter(unittest.TestCase):
+
+    def test_metrics(self):
+        registry = CollectorRegistry()
+        requests_total = Counter("requests_total", "Requests.", ["status"], registry=registry)
+        latency = Histogram("latency_seconds", "Latency.", buckets=[0.1, 1], registry=registry)
+        requests_total.labels("ok").inc(2)
+        latency.observe(0.5)
+        app = FastAPI()
+        app.include_router(create_metrics_router(registry))
+
+        response = TestClient(app).get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        self.assertIn('requests_total{status="ok"} 2.0', response.text)
+        self.assertIn('latency_seconds_bucket{le="1.0"} 1.0', response.text)
+
+    def test_service_metrics(self):
+        SIMILARITY_SECONDS.observe(0.01)
+        app = FastAPI()
+        app.include_router(create_metrics_router())
+        response = TestClient(app).get("/metrics")
+        self.assertIn("# TYPE wiki_rag_stage_seconds histogram", response.text)
+        self.assertIn('wiki_rag_stage_seconds_count{stage="similarity"}', response.text)
+
+
+if __name__ == "__main__":
+    unittest.main()
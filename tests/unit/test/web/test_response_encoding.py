@@ -0,0 +1,82 @@
+import gzip
+import json
+import unittest
+from unittest.mock import patch
+import numpy as np
+
+from gen.data.segment_record import SegmentRecord
+from search.services.combined_service import ResultElement
+from web import response_encoding
+from web.response_encoding import (
+    ResultFields,
+    snippet,
+    result_to_dict,
+    dumps,
+    parse_accept_encoding,
+    negotiate_encoding,
+    json_response,
+)
+
+
+class TestResponseEncoding(unittest.TestCase):
+
+    def setUp(self):
+        self.record = SegmentRecord(3, 1, 0, 100, 40)
+        self.result = ResultElement(0.5, self.record, "Title", "the quick brown fox jumps")
+
+    def test_snippet(self):
+        self.assertEqual(snippet("short", 10), "short")
+        self.assertEqual(snippet("the quick brown fox jumps", 19), "the quick brown fox…")
+        # no word boundary close to the cut
+        self.assertEqual(snippet("abcdefghij klm", 8), "abcdefgh…")
+
+    def test_result_fields(self):
+        self.assertEqual(result_to_dict(self.result, ResultFields.IDS, 10),
+                         {"similarity": 0.5, "record": [3, 1, 0, 100, 40]})
+        self.assertEqual(result_to_dict(self.result, ResultFields.SNIPPETS, 10),
+                         {"similarity": 0.5, "record": [3, 1, 0, 100, 40],
+                          "caption": "Title", "text": "the quick…"})
+        self.assertEqual(result_to_dict(self.result, ResultFields.FULL, 10)["text"],
+                         "the quick brown fox jumps")
+
+    def test_dumps(self):
+        content = {"similarity": np.float32(0.5), "record": [np.int64(3)], "text": "é"}
+        self.assertEqual(json.loads(dumps(content)),
+                         {"similarity": 0.5, "record": [3], "text": "é"})
+        with patch.object(response_encoding, "orjson", None):
+            self.assertEqual(dumps(content), '{"similarity":0.5,"record":[3],"text":"é"}'
+                             .encode("utf-8"))
+
+    def test_negotiate_encoding(self):
+        self.assertEqual(parse_accept_encoding("gzip;q=0.5, br , identity;q=x"),
+                         {"gzip": 0.5, "br": 1.0, "identity": 0.0})
+        self.assertIsNone(negotiate_encoding(None))
+        self.assertIsNone(negotiate_encoding("identity"))
+        self.assertIsNone(negotiate_encoding("gzip;q=0"))
+        self.assertEqual(negotiate_encoding("gzip, deflate"), "gzip")
+        self.assertEqual(negotiate_encoding("*"), "br" if response_encoding.brotli else "gzip")
+        with patch.object(response_encoding, "brotli", object()):
+            self.assertEqual(negotiate_encoding("gzip, br"), "br")
+            self.assertEqual(negotiate_encoding("gzip, br;q=0.5"), "gzip")
+        with patch.object(response_encoding, "brotli", None):
+            self.assertEqual(negotiate_encoding("br, gzip;q=0.1"), "gzip")
+
+    def test_json_response(self):
+        small = json_response({"a": 1}, "gzip", headers={"Server-Timing": "x"})
+        self.assertEqual(small.body, b'{"a":1}')
+        self.assertNotIn("content-encoding", small.headers)
+        self.assertEqual(small.headers["vary"], "Accept-Encoding")
+        self.assertEqual(small.headers["server-timing"], "x")
+
+        content = {"text": "lorem ipsum " * 200}
+        large = json_response(content, "gzip")
+        self.assertEqual(large.headers["content-encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(large.body)), content)
+        self.assertLess(len(large.body), len(dumps(content)))
+
+        identity = json_response(content, None)
+        self.assertEqual(json.loads(identity.body), content)
+
+
+if __name__ == '__main__':
+    unittest.main()
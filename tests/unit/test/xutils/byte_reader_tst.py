@@ -12,3 +12,6 @@ class TestByteReader:
 
     def read_bytes(self, offset: int, length: int) -> bytes:
         return self._bytes[offset:offset + length]
+
+    def read_many(self, ranges):
+        return [memoryview(self.read_bytes(offset, length)) for offset, length in ranges]
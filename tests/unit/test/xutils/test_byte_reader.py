@@ -1,7 +1,11 @@
+import gc
+import os
 import unittest
+import tempfile
 from io import BytesIO
 from pathlib import Path
-from xutils.byte_reader import ByteReader
+from concurrent.futures import ThreadPoolExecutor
+from xutils.byte_reader import ByteReader, PreadByteReader, create_byte_reader
 from unittest.mock import mock_open, patch, Mock
 
 
@@ -45,6 +49,82 @@ class TestByteReader(unittest.TestCase):
         mock_file.close.assert_called_once()
         self.assertIsNone(byte_reader._file)
 
+    @patch("builtins.open", new_callable=mock_open)
+    def test_read_many(self, mock_open):
+        mock_open.return_value = BytesIO(b'0123456789abcdefghij')
+        byte_reader = ByteReader(Path("/dev/null"))
+        views = byte_reader.read_many([(10, 3), (0, 2)])
+        self.assertEqual([bytes(view) for view in views], [b'abc', b'01'])
+
+
+class TestPreadByteReader(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name) / "text"
+        self.content = bytes(range(256)) * 64
+        self.path.write_bytes(self.content)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_read_bytes(self):
+        byte_reader = PreadByteReader(self.path)
+        self.assertEqual(byte_reader.read_bytes(0, 12), self.content[:12])
+        self.assertEqual(byte_reader.read_bytes(1000, 50), self.content[1000:1050])
+        # reading past the end of the file returns what is there
+        self.assertEqual(byte_reader.read_bytes(len(self.content) - 2, 10), self.content[-2:])
+        byte_reader.cleanup()
+        byte_reader.cleanup()
+        self.assertIsNone(byte_reader._fd)
+
+    def test_read_many(self):
+        byte_reader = PreadByteReader(self.path, max_gap=16)
+        ranges = [(5000, 10), (0, 4), (10, 5), (2, 6), (5020, 3)]
+        with patch.object(byte_reader, "_pread", wraps=byte_reader._pread) as mock_pread:
+            views = byte_reader.read_many(ranges)
+        # (0, 4), (2, 6), (10, 5) are read together, so are (5000, 10), (5020, 3)
+        self.assertEqual(mock_pread.call_count, 2)
+        for view, (offset, size) in zip(views, ranges):
+            self.assertIsInstance(view, memoryview)
+            self.assertEqual(bytes(view), self.content[offset:offset + size])
+        self.assertEqual(byte_reader.read_many([]), [])
+
+    def test_coalesce_ranges(self):
+        ranges = [(100, 10), (0, 10), (15, 5), (50, 10)]
+        spans = PreadByteReader.coalesce_ranges(ranges, max_gap=5)
+        self.assertEqual(spans, [(0, 20, [1, 2]), (50, 10, [3]), (100, 10, [0])])
+
+        spans = PreadByteReader.coalesce_ranges(ranges, max_gap=0)
+        self.assertEqual(spans, [(0, 10, [1]), (15, 5, [2]), (50, 10, [3]), (100, 10, [0])])
+
+    def test_concurrent_reads(self):
+        byte_reader = create_byte_reader(self.path)
+        self.assertIsInstance(byte_reader, PreadByteReader)
+
+        def read(offset):
+            return byte_reader.read_bytes(offset, 100) == self.content[offset:offset + 100]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(read, range(0, 10000, 7)))
+        self.assertTrue(all(results))
+        byte_reader.cleanup()
+
+    def test_closed_when_collected(self):
+        byte_reader = PreadByteReader(self.path)
+        fd = byte_reader.fd
+        os.fstat(fd)
+        del byte_reader
+        gc.collect()
+        with self.assertRaises(OSError):
+            os.fstat(fd)
+
+        # cleanup() closes the descriptor once, the finalizer is detached
+        byte_reader = PreadByteReader(self.path)
+        _ = byte_reader.fd
+        byte_reader.cleanup()
+        self.assertIsNone(byte_reader._fd_finalizer)
+
 
 if __name__ == '__main__':
     unittest.main()
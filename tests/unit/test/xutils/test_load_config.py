@@ -13,6 +13,7 @@ from xutils.load_config import (
     load_app_config,
     load_embed_config,
     load_run_config,
+    load_corpus_configs,
     parse_args,
     get_app_config_and_query,
     get_app_config,
@@ -84,6 +85,7 @@ class TestLoadConfig(unittest.TestCase):
             self.assertEqual(config.k, 10)
             self.assertAlmostEqual(config.threshold, 0.5)
             self.assertEqual(config.max_documents, 50)
+            self.assertEqual(config.encoder_config_id, "big")
 
             # Assert embed_config values
             embed = config.embed_config
@@ -125,6 +127,36 @@ class TestLoadConfig(unittest.TestCase):
         self.assertEqual(run_config.port, 9090)
         self.assertEqual(run_config.log_level, "DEBUG")
 
+    def test_load_corpus_configs(self):
+        """
+        Test that load_corpus_configs reads the CORPUS.<id> sections and their embeddings.
+        """
+        config_parser = configparser.ConfigParser()
+        config_parser.read_string(CONFIG_TEXT + """
+[CORPUS.plots]
+domain = plots
+text-file-path = /path/to/plots
+encoder-config = small
+lexical-mode = prefilter
+
+[CORPUS.plots.EMBEDDINGS]
+prefix = plots_
+max-len = 400
+""")
+        self.assertEqual(load_corpus_configs(configparser.ConfigParser()), [])
+
+        corpora = load_corpus_configs(config_parser)
+        self.assertEqual(len(corpora), 1)
+        corpus = corpora[0]
+        self.assertEqual(corpus.corpus_id, "plots")
+        self.assertEqual(corpus.domain, Domain.PLOTS)
+        self.assertEqual(corpus.text_file_path, "/path/to/plots")
+        self.assertEqual(corpus.encoder_config_id, "small")
+        self.assertEqual(corpus.embed_config.prefix, "plots_")
+        self.assertEqual(corpus.embed_config.max_len, 400)
+        self.assertEqual(corpus.finder_options["lexical_mode"], "prefilter")
+        self.assertEqual(corpus.finder_options["cascade_shortlist"], 1000)
+
     def test_parse_args_with_search_marker(self):
         """
         Test that parse_args correctly processes query ending with :search.
@@ -0,0 +1,131 @@
+import json
+import unittest
+import tempfile
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from xutils.timer import LoggingTimer
+from xutils.tracing import (
+    Span, Trace, TraceSink, current_trace, record_span, span, start_trace, unobserved
+)
+
+
+class TestTracing(unittest.TestCase):
+
+    def test_nested_spans(self):
+        with start_trace("request-1") as trace:
+            self.assertIs(current_trace(), trace)
+            with span("search") as search_span:
+                search_span.set("results", 3)
+                with span("encode_query"):
+                    pass
+                with span("similarity"):
+                    pass
+            with span("segment_fetch"):
+                pass
+        self.assertIsNone(current_trace())
+
+        tree = trace.to_dict()
+        self.assertEqual(tree["trace_id"], "request-1")
+        root = tree["root"]
+        self.assertEqual([child["name"] for child in root["children"]],
+                         ["search", "segment_fetch"])
+        search = root["children"][0]
+        self.assertEqual(search["attributes"], {"results": 3})
+        self.assertEqual([child["name"] for child in search["children"]],
+                         ["encode_query", "similarity"])
+        self.assertGreaterEqual(root["duration_ms"], search["duration_ms"])
+
+    def test_span_without_trace(self):
+        histogram = MagicMock()
+        with span("similarity", observe=histogram) as current:
+            pass
+        histogram.observe.assert_called_once_with(current.duration)
+        # nothing to record to
+        record_span("step", 0.0, 1.0)
+
+    def test_unobserved_spans(self):
+        histogram = MagicMock()
+        with unobserved():
+            with span("similarity", observe=histogram):
+                pass
+        histogram.observe.assert_not_called()
+        with span("similarity", observe=histogram):
+            pass
+        histogram.observe.assert_called_once()
+
+    def test_span_observes_on_error(self):
+        histogram = MagicMock()
+        with start_trace("request-1") as trace:
+            with self.assertRaises(ValueError):
+                with span("rag", observe=histogram):
+                    raise ValueError("failed")
+        histogram.observe.assert_called_once()
+        self.assertIsNotNone(trace.root.children[0].end)
+
+    def test_logging_timer_steps_are_spans(self):
+        with start_trace("request-1") as trace:
+            with span("pick_results"):
+                timer = LoggingTimer('pick_results', logger=MagicMock())
+                timer.restart("top k")
+                timer.restart("filtered top k")
+        pick_results = trace.root.children[0]
+        self.assertEqual([child.name for child in pick_results.children],
+                         ["top k", "filtered top k"])
+        first, second = pick_results.children
+        self.assertLessEqual(first.end, second.start)
+
+    def test_server_timing(self):
+        trace = Trace("request-1")
+        trace.root.children.append(self.finished_span("split_query", 0.0, 0.5))
+        trace.root.children.append(self.finished_span("rag completion", 0.5, 0.75))
+        trace.root.children.append(self.finished_span("rag completion", 0.75, 1.0))
+        trace.root.start = 0.0
+        trace.root.finish(1.0)
+        self.assertEqual(trace.server_timing(),
+                         "split_query;dur=500.0, rag_completion;dur=500.0, total;dur=1000.0")
+
+    @staticmethod
+    def finished_span(name, start, end):
+        result = Span(name, start)
+        result.finish(end)
+        return result
+
+
+class TestTraceSink(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name) / "traces" / "traces.jsonl"
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def create_trace(self, trace_id, seconds):
+        trace = Trace(trace_id)
+        trace.root.finish(trace.root.start + seconds)
+        return trace
+
+    def read_trace_ids(self):
+        with open(self.path, encoding="utf-8") as file:
+            return [json.loads(line)["trace_id"] for line in file]
+
+    def test_write(self):
+        sink = TraceSink(self.path, sample_rate=1.0)
+        self.assertTrue(sink.write(self.create_trace("a", 0.1)))
+        self.assertTrue(sink.write(self.create_trace("b", 0.1)))
+        self.assertEqual(self.read_trace_ids(), ["a", "b"])
+
+    def test_sampling_keeps_slow_traces(self):
+        sink = TraceSink(self.path, sample_rate=0.0, slow_seconds=1.0)
+        self.assertFalse(sink.write(self.create_trace("fast", 0.1)))
+        self.assertTrue(sink.write(self.create_trace("slow", 2.0)))
+        self.assertEqual(self.read_trace_ids(), ["slow"])
+
+    def test_invalid_sample_rate(self):
+        with self.assertRaises(ValueError):
+            TraceSink(self.path, sample_rate=1.5)
+
+
+if __name__ == "__main__":
+    unittest.main()